@@ -10,9 +10,12 @@ from ._styled_echo import _styled_echo
 from .._configure_logging import _configure_logging
 from ..aind_ephys_pipeline import prepare_aind_ephys_job, submit_job
 from ..dandiset import (
+    configure_download_cache,
     delete_dandiset_version,
     move_job_capsule,
+    prune_download_cache,
     scan_version_directories,
+    summarize_download_cache,
 )
 from ..queue import (
     TEST_QUEUE_CONTENT_ID,
@@ -23,10 +26,13 @@ from ..queue import (
     has_pending_jobs,
     prepare_queue,
     process_queue,
+    replenish_queue,
     summarize_issues,
     write_archive_state,
     write_queue_state,
 )
+from ..queue._duration_string_to_seconds import _duration_string_to_seconds
+from ..queue._globals import _DURATION_PART_RE
 
 logging.basicConfig(level=logging.INFO)
 
@@ -298,6 +304,13 @@ def _queue_group() -> None:
     required=True,
     type=click.Path(exists=True, file_okay=False, path_type=pathlib.Path),
 )
+@click.option(
+    "--full",
+    help="Rebuild every record instead of only those affected since the last refresh.",
+    required=False,
+    is_flag=True,
+    default=False,
+)
 @click.option(
     "--silent",
     help="Suppress informational log output.",
@@ -307,14 +320,15 @@ def _queue_group() -> None:
 )
 def _queue_refresh_command(
     queue_directory: pathlib.Path,
+    full: bool = False,
     silent: bool = False,
 ) -> None:
     """Regenerate state.jsonl and archive_state.jsonl from DANDI assets metadata."""
     _configure_logging(silent=silent)
 
     def _refresh_oop() -> None:
-        QueueState.write_state(queue_directory=queue_directory)
-        QueueState.write_archive_state(queue_directory=queue_directory)
+        QueueState.write_state(queue_directory=queue_directory, incremental=not full)
+        QueueState.write_archive_state(queue_directory=queue_directory, incremental=not full)
 
     def _refresh_fallback() -> None:
         write_queue_state(queue_directory=queue_directory)
@@ -359,7 +373,8 @@ def _queue_clean_command(
     _require_dandi_api_key()
 
     def _clean_oop() -> list[pathlib.Path]:
-        state = QueueState.from_jsonl(queue_directory / "state.jsonl")
+        # Only queued capsules can be cleaned, so the rest of the state is never decoded.
+        state = QueueState.from_jsonl(QueueState.state_file_for(queue_directory), status="pending")
         return state.clean_unsubmitted_capsules(dandiset_directory=dandiset_directory)
 
     def _clean_fallback() -> list[pathlib.Path]:
@@ -418,7 +433,7 @@ def _queue_stats_command(
     _configure_logging(silent=silent)
 
     def _stats_oop() -> dict:
-        state = QueueState.from_jsonl(queue_directory / "state.jsonl")
+        state = QueueState.from_jsonl(QueueState.state_file_for(queue_directory))
         return state.aggregate_statistics(
             queue_directory=queue_directory,
             dandiset_directory=dandiset_directory,
@@ -437,6 +452,59 @@ def _queue_stats_command(
         _styled_echo(text=f"\nWrote queue aggregate statistics: {queue_directory / output_file_name}", color="green")
 
 
+# dandicompute queue sqlite [OPTIONS]
+@_queue_group.command(name="sqlite")
+@click.option(
+    "--queue",
+    "queue_directory",
+    help="Path to the queue root directory.",
+    required=True,
+    type=click.Path(exists=True, file_okay=False, path_type=pathlib.Path),
+)
+@click.option(
+    "--export",
+    help="Write state.jsonl and archive_state.jsonl back from their SQLite stores instead.",
+    required=False,
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--silent",
+    help="Suppress informational log output.",
+    required=False,
+    is_flag=True,
+    default=False,
+)
+def _queue_sqlite_command(queue_directory: pathlib.Path, export: bool = False, silent: bool = False) -> None:
+    """Import state.jsonl and archive_state.jsonl into SQLite stores (or export them back).
+
+    Once ``state.sqlite`` exists under --queue, the queue commands read and
+    update it through indexed queries instead of scanning ``state.jsonl``, and
+    ``queue refresh`` keeps it up to date. Delete it to go back to JSONL only.
+    """
+    _configure_logging(silent=silent)
+
+    converted = []
+    for name in ("state", "archive_state"):
+        jsonl_file = queue_directory / f"{name}.jsonl"
+        sqlite_file = queue_directory / f"{name}.sqlite"
+        source, destination = (sqlite_file, jsonl_file) if export else (jsonl_file, sqlite_file)
+        if not source.exists():
+            continue
+        if export:
+            count = QueueState.sqlite_to_jsonl(source, destination)
+        else:
+            count = QueueState.jsonl_to_sqlite(source, destination)
+        converted.append(f"{destination} ({count} entries)")
+
+    if not converted:
+        message = f"No {'SQLite store' if export else 'state file'} found under {queue_directory}"
+        raise click.ClickException(message)
+    if not silent:
+        for line in converted:
+            _styled_echo(text=f"  Wrote: {line}", color="green")
+
+
 # dandicompute queue pending [OPTIONS]
 @_queue_group.command(name="pending")
 @click.option(
@@ -516,6 +584,41 @@ def _queue_pending_command(context: click.Context, silent: bool = False) -> None
     default=30.0,
     show_default=True,
 )
+@click.option(
+    "--low-watermark",
+    "low_watermark",
+    help=(
+        "After submitting, prepare new capsules when fewer than N remain awaiting submission. "
+        "Requires --high-watermark."
+    ),
+    required=False,
+    type=click.IntRange(min=0),
+    default=None,
+)
+@click.option(
+    "--high-watermark",
+    "high_watermark",
+    help="Number of capsules awaiting submission to prepare up to once below --low-watermark.",
+    required=False,
+    type=click.IntRange(min=0),
+    default=None,
+)
+@click.option(
+    "--pipeline",
+    "pipeline_directory",
+    help="Local path to the AIND pipeline repository, used when preparing new capsules.",
+    required=False,
+    type=click.Path(exists=True, file_okay=False, path_type=pathlib.Path),
+    default=None,
+)
+@click.option(
+    "--config",
+    "config_key",
+    help="Registered configuration key used when preparing new capsules.",
+    required=False,
+    type=str,
+    default="default",
+)
 def _queue_process_command(
     queue_directory: pathlib.Path,
     processing_directory: pathlib.Path,
@@ -523,9 +626,23 @@ def _queue_process_command(
     silent: bool = False,
     test: bool = False,
     jitter_seconds: float = 30.0,
+    low_watermark: int | None = None,
+    high_watermark: int | None = None,
+    pipeline_directory: pathlib.Path | None = None,
+    config_key: str = "default",
 ) -> None:
-    """Submit queued jobs when no active dandicompute jobs are running."""
+    """
+    Submit queued jobs when no active dandicompute jobs are running.
+
+    With --low-watermark and --high-watermark, capsules awaiting submission are
+    then topped up (see ``QueueState.replenish``), so preparation never delays a
+    submission into a free SLURM slot.
+    """
     _configure_logging(silent=silent)
+    if (low_watermark is None) != (high_watermark is None):
+        raise click.UsageError("--low-watermark and --high-watermark must be given together.")
+    if low_watermark is not None and low_watermark > high_watermark:
+        raise click.UsageError("--low-watermark must not exceed --high-watermark.")
     _require_dandi_api_key()
     _require_dandi_devel()
 
@@ -555,6 +672,33 @@ def _queue_process_command(
     if not silent and queue_status == "no-pending":
         _styled_echo(text="\nNo jobs were found waiting to be submitted.", color="yellow")
 
+    if low_watermark is None:
+        return
+
+    def _replenish_oop() -> int:
+        return QueueState.replenish(
+            queue_directory=queue_directory,
+            low_watermark=low_watermark,
+            high_watermark=high_watermark,
+            pipeline_directory=pipeline_directory,
+            config_key=config_key,
+        )
+
+    def _replenish_fallback() -> int:
+        return replenish_queue(
+            queue_directory=queue_directory,
+            low_watermark=low_watermark,
+            high_watermark=high_watermark,
+            pipeline_directory=pipeline_directory,
+            config_key=config_key,
+        )
+
+    prepared_count = run_with_oop_failsafe(
+        command="queue replenish", oop_path=_replenish_oop, fallback_path=_replenish_fallback
+    )
+    if not silent and prepared_count:
+        _styled_echo(text=f"\nPrepared {prepared_count} new capsules.", color="green")
+
 
 # dandicompute queue prepare [OPTIONS]
 @_queue_group.command(name="prepare")
@@ -589,6 +733,22 @@ def _queue_process_command(
     type=click.IntRange(min=1),
     default=None,
 )
+@click.option(
+    "--batch-size",
+    "batch_size",
+    help="Prepare N assets at a time with one Dandiset download and one concurrent upload per batch.",
+    required=False,
+    type=click.IntRange(min=1),
+    default=None,
+)
+@click.option(
+    "--workers",
+    "workers",
+    help="Run up to N preparations (assets, or batches with --batch-size) concurrently.",
+    required=False,
+    type=click.IntRange(min=1),
+    default=None,
+)
 @click.option(
     "--silent",
     help="Suppress informational log output.",
@@ -601,6 +761,8 @@ def _queue_prepare_command(
     pipeline_directory: pathlib.Path | None = None,
     config_key: str = "default",
     limit: int | None = None,
+    batch_size: int | None = None,
+    workers: int | None = None,
     silent: bool = False,
 ) -> None:
     """Prepare queued jobs across configured pipelines without submitting them."""
@@ -614,6 +776,8 @@ def _queue_prepare_command(
             pipeline_directory=pipeline_directory,
             config_key=config_key,
             limit=limit,
+            batch_size=batch_size,
+            workers=workers,
         )
 
     def _prepare_fallback() -> None:
@@ -622,6 +786,8 @@ def _queue_prepare_command(
             pipeline_directory=pipeline_directory,
             config_key=config_key,
             limit=limit,
+            batch_size=batch_size,
+            workers=workers,
         )
 
     run_with_oop_failsafe(command="queue prepare", oop_path=_prepare_oop, fallback_path=_prepare_fallback)
@@ -830,3 +996,161 @@ def _archive_job_command(
     move_job_capsule(capsule_path=capsule_path, processing_directory=processing_directory, test=test)
     if not silent:
         _styled_echo(text=f"\nArchived job capsule: {capsule_path}", color="green")
+
+
+def _parse_duration(value: str) -> float:
+    """Parse a duration such as ``6h`` or ``1d 12h`` into seconds, rejecting strings without a unit."""
+    if not _DURATION_PART_RE.search(value):
+        raise click.BadParameter(f"{value!r} is not a duration such as '30m', '6h', or '1d'.")
+    return _duration_string_to_seconds(value)
+
+
+# dandicompute cache
+@_dandicompute_group.group(name="cache")
+def _cache_group() -> None:
+    """Inspect, configure, and prune the local download cache."""
+    pass
+
+
+# dandicompute cache info
+@_cache_group.command(name="info")
+@click.option(
+    "--silent",
+    help="Suppress informational log output.",
+    required=False,
+    is_flag=True,
+    default=False,
+)
+def _cache_info_command(silent: bool = False) -> None:
+    """Show the download cache location, settings, and entries (least recently used first)."""
+    _configure_logging(silent=silent)
+    summary = summarize_download_cache()
+    click.echo(f"Directory: {summary['directory']}")
+    click.echo(f"Size: {summary['total_bytes']} of {summary['max_bytes']} bytes")
+    click.echo(f"Default upstream TTL: {summary['default_ttl_seconds']:g} seconds")
+    for dandiset_id, seconds in summary["ttl_seconds_by_dandiset"].items():
+        click.echo(f"  TTL override for {dandiset_id}: {seconds:g} seconds")
+    if not summary["entries"]:
+        _styled_echo(text="\nThe download cache is empty.", color="yellow")
+        return
+    click.echo("")
+    for entry in summary["entries"]:
+        validated = entry["validated_seconds_ago"]
+        freshness = "fresh" if entry["fresh"] else "revalidate"
+        click.echo(
+            f"{entry['key']}  {entry['size_bytes']} bytes  "
+            f"used {entry['last_used_seconds_ago']:g}s ago  "
+            f"validated {'never' if validated is None else f'{validated:g}s ago'}  {freshness}"
+        )
+
+
+# dandicompute cache prune [OPTIONS]
+@_cache_group.command(name="prune")
+@click.option(
+    "--max-bytes",
+    "max_bytes",
+    help="Prune least recently used entries until the cache fits in this many bytes (defaults to the budget).",
+    required=False,
+    type=click.IntRange(min=0),
+    default=None,
+)
+@click.option(
+    "--dandiset",
+    "dandiset_ids",
+    help="Also remove the cached assets.jsonld of this Dandiset. May be repeated.",
+    required=False,
+    multiple=True,
+    type=str,
+)
+@click.option(
+    "--all",
+    "clear",
+    help="Remove every entry.",
+    required=False,
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--silent",
+    help="Suppress informational log output.",
+    required=False,
+    is_flag=True,
+    default=False,
+)
+def _cache_prune_command(
+    max_bytes: int | None = None,
+    dandiset_ids: tuple[str, ...] = (),
+    clear: bool = False,
+    silent: bool = False,
+) -> None:
+    """Remove download cache entries to fit the size budget or by Dandiset."""
+    _configure_logging(silent=silent)
+    removed = prune_download_cache(max_bytes=max_bytes, dandiset_ids=list(dandiset_ids), clear=clear)
+    if not silent:
+        noun = "entry" if len(removed) == 1 else "entries"
+        _styled_echo(text=f"\nRemoved {len(removed)} cache {noun}.", color="green")
+
+
+# dandicompute cache configure [OPTIONS]
+@_cache_group.command(name="configure")
+@click.option(
+    "--max-bytes",
+    "max_bytes",
+    help="Total size the cache is pruned back to, least recently used entries first.",
+    required=False,
+    type=click.IntRange(min=0),
+    default=None,
+)
+@click.option(
+    "--default-ttl",
+    "default_ttl",
+    help="How long an upstream assets.jsonld is reused without revalidation (e.g. '6h').",
+    required=False,
+    type=str,
+    default=None,
+)
+@click.option(
+    "--ttl",
+    "dandiset_ttls",
+    help="Per-Dandiset TTL as DANDISET_ID=DURATION (e.g. '000409=1d'). May be repeated.",
+    required=False,
+    multiple=True,
+    type=str,
+)
+@click.option(
+    "--reset-ttl",
+    "reset_dandiset_ids",
+    help="Remove the TTL override of this Dandiset. May be repeated.",
+    required=False,
+    multiple=True,
+    type=str,
+)
+@click.option(
+    "--silent",
+    help="Suppress informational log output.",
+    required=False,
+    is_flag=True,
+    default=False,
+)
+def _cache_configure_command(
+    max_bytes: int | None = None,
+    default_ttl: str | None = None,
+    dandiset_ttls: tuple[str, ...] = (),
+    reset_dandiset_ids: tuple[str, ...] = (),
+    silent: bool = False,
+) -> None:
+    """Set the download cache size budget and upstream TTLs."""
+    _configure_logging(silent=silent)
+    dandiset_ttl_seconds: dict[str, float | None] = dict.fromkeys(reset_dandiset_ids)
+    for dandiset_ttl in dandiset_ttls:
+        dandiset_id, separator, duration = dandiset_ttl.partition("=")
+        if not separator or not dandiset_id:
+            raise click.BadParameter(f"{dandiset_ttl!r} is not of the form DANDISET_ID=DURATION.", param_hint="--ttl")
+        dandiset_ttl_seconds[dandiset_id] = _parse_duration(duration)
+    configure_download_cache(
+        max_bytes=max_bytes,
+        default_ttl_seconds=_parse_duration(default_ttl) if default_ttl is not None else None,
+        dandiset_ttl_seconds=dandiset_ttl_seconds,
+    )
+    if not silent:
+        _styled_echo(text="\nUpdated download cache settings.", color="green")
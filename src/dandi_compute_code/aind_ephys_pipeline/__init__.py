@@ -1,10 +1,12 @@
-from ._prepare_job import UnmappedContentIDError, prepare_aind_ephys_job
+from ._prepare_job import AindEphysJobRequest, UnmappedContentIDError, prepare_aind_ephys_job, prepare_aind_ephys_jobs
 from ._submit_job import submit_job
 from ._handle_template import generate_aind_ephys_submission_script
 
 __all__ = [
+    "AindEphysJobRequest",
     "UnmappedContentIDError",
     "prepare_aind_ephys_job",
+    "prepare_aind_ephys_jobs",
     "submit_job",
     "generate_aind_ephys_submission_script",
 ]
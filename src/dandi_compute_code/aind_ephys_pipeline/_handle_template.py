@@ -1,3 +1,4 @@
+import functools
 import pathlib
 
 import jinja2
@@ -6,6 +7,12 @@ import pydantic
 from ._globals import _RAW_TEMPLATE_FILE_PATH
 
 
+@functools.lru_cache(maxsize=1)
+def _load_submission_template() -> jinja2.Template:
+    """Read and compile the submission template once per process."""
+    return jinja2.Template(source=_RAW_TEMPLATE_FILE_PATH.read_text())
+
+
 @pydantic.validate_call
 def generate_aind_ephys_submission_script(
     script_file_path: pathlib.Path,
@@ -57,8 +64,7 @@ def generate_aind_ephys_submission_script(
     :param params_file_path: The parameters file path.
     :type params_file_path: str
     """
-    raw_template = _RAW_TEMPLATE_FILE_PATH.read_text()
-    template = jinja2.Template(source=raw_template)
+    template = _load_submission_template()
     script = template.render(
         log_directory=log_directory,
         nwb_file_path=nwb_file_path,
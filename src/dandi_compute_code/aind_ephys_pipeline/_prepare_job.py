@@ -1,4 +1,6 @@
 import contextlib
+import dataclasses
+import functools
 import hashlib
 import importlib.metadata
 import io
@@ -7,9 +9,12 @@ import logging
 import os
 import pathlib
 import re
+import shutil
 import subprocess
+import sys
 import tempfile
-import urllib.request
+import threading
+from collections.abc import Callable, Mapping
 
 import dandi
 import dandi.dandiapi
@@ -19,14 +24,66 @@ import pydantic
 
 from ._handle_template import generate_aind_ephys_submission_script
 from ..dandiset._globals import _SANDBOX_DANDISET_ID
+from ..dandiset._load_content_id_to_usage_dandiset_path import _load_content_id_to_usage_dandiset_path
 
 _log = logging.getLogger(__name__)
 
+_DANDI_COMPUTE_DIRECTORY = pathlib.Path("/orcd/data/dandi/001/dandi-compute")
+#: Files uploaded in parallel by one batched ``dandi upload`` of prepared capsules.
+_BATCH_UPLOAD_JOBS = 8
+
 
 class UnmappedContentIDError(ValueError):
     """Raised when a content ID cannot be resolved to a unique Dandiset path."""
 
 
+@dataclasses.dataclass(frozen=True)
+class AindEphysJobRequest:
+    """One job of a :func:`prepare_aind_ephys_jobs` batch."""
+
+    content_id: str
+    pipeline_version: str
+    parameters_key: str = "default"
+
+
+@dataclasses.dataclass(frozen=True)
+class _PreparationContext:
+    """Validated config and parameters shared by every job of one (version, config, parameters) combination."""
+
+    pipeline_version: str
+    config_file_path: pathlib.Path
+    config_text: str
+    config_id: str
+    parameters_file_path: pathlib.Path
+    parameters_text: str
+    params_id: str
+
+
+@dataclasses.dataclass(frozen=True)
+class _PipelineCheckout:
+    """Commit hashes and pipeline files of the local pipeline repository copied into every capsule."""
+
+    pipeline_directory: pathlib.Path
+    pipeline_file_path: pathlib.Path
+    pipeline_text: str
+    capsule_versions_text: str
+    pipeline_commit_hash: str
+    dandi_compute_code_commit_hash: str
+    codebase_version: str
+
+
+@dataclasses.dataclass(frozen=True)
+class _AindEphysJobPlan:
+    """Everything resolved for one job before its capsule is written."""
+
+    content_id: str
+    dandiset_id: str
+    output_dandiset_path: str
+    nwb_file_path: str
+    context: _PreparationContext
+    checkout: _PipelineCheckout
+
+
 def _parse_pipeline_version(version: str, *, label: str) -> tuple[int, int, int]:
     match = re.fullmatch(r"v?(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)(?:[-+][0-9A-Za-z.+-]+)?", version)
     if match is None:
@@ -35,85 +92,47 @@ def _parse_pipeline_version(version: str, *, label: str) -> tuple[int, int, int]
     return int(match["major"]), int(match["minor"]), int(match["patch"])
 
 
-@pydantic.validate_call
-def prepare_aind_ephys_job(
-    pipeline_version: str,
-    content_id: str | None = None,
-    dandiset_id: str | None = None,
-    dandiset_path: str | None = None,
-    config_key: str = "default",
-    parameters_key: str = "default",
-    pipeline_directory: pathlib.Path | None = None,
-    silent: bool = False,
-) -> pathlib.Path:
+def _next_attempt_number(
+    *,
+    dandiset: dandi.dandiapi.RemoteDandiset,
+    output_dandiset_path_base: str,
+    maximum_attempt: int = 99,
+    reserved_attempts: set[int] | None = None,
+) -> int:
     """
-    Prepares an AIND ephys job by generating a submission script and returning the script file path.
+    Return the lowest attempt number not yet used under *output_dandiset_path_base*.
 
-    Parameters
-    ----------
-    pipeline_version : str
-        The version of the pipeline to use, which will be used to checkout a branch of the pipeline repository.
-    content_id : str
-        The content ID for the data to be processed.
-    dandiset_id : str, optional
-        The Dandiset ID for the data to be processed. Required if `content_id`
-        is not provided and will be used to look up the content ID if `content_id` is not provided.
-    dandiset_path : str, optional
-        The local path to the Dandiset data to be processed. Required if `content_id
-        is not provided and will be used to look up the content ID if `content_id` is not provided.
-    config_key : str
-        The short name of the configuration to use.
-        Must be a key registered in `registries/registered_configs.json`.
-    parameters_key : str
-        The short name of the parameters to use.
-        Must be a key registered in `registries/registered_params.json`.
-    pipeline_directory : pathlib.Path, optional
-        Local path to the AIND pipeline repository.
-    silent : bool, optional
-        Whether to suppress output messages from the DANDI client.
-        Default is False.
+    All existing attempts are found with a single asset listing of the shared
+    ``<base>_attempt-`` prefix instead of probing each candidate directory in turn.
+    Numbers in *reserved_attempts* (handed out but not uploaded yet) count as used.
 
-    Returns
-    -------
-    script_file_path : pathlib.Path
-        The path to the generated submission script.
+    :raises ValueError: If every attempt up to *maximum_attempt* is already taken.
+    """
+    attempt_prefix = f"{output_dandiset_path_base}_attempt-"
+    used_attempts = set(reserved_attempts or ())
+    for asset in dandiset.get_assets_with_path_prefix(path=attempt_prefix):
+        attempt, separator, _ = asset.path.removeprefix(attempt_prefix).partition("/")
+        if separator and attempt.isdigit():
+            used_attempts.add(int(attempt))
+
+    attempt = next(number for number in range(1, maximum_attempt + 2) if number not in used_attempts)
+    if attempt > maximum_attempt:
+        message = f"All {maximum_attempt} attempts under {output_dandiset_path_base!r} are already taken."
+        raise ValueError(message)
+    return attempt
 
-    Raises
-    ------
-    ValueError
-        Raised in any of the following situations.
 
-        - Neither ``content_id`` nor both ``dandiset_id`` and ``dandiset_path``
-          are provided.
-        - ``pipeline_version`` is an empty string.
-        - ``pipeline_version`` equals the unsupported ``v1.0.0``.
-        - ``config_key`` is not registered in ``registered_configs.json``.
-        - ``parameters_key`` is not registered in ``registered_params.json``.
-        - The resolved parameters file is missing a ``pipeline_version`` field.
-        - The parameters file ``pipeline_version`` is in a different major
-          series than the requested ``pipeline_version``.
-        - The parameters file ``pipeline_version`` is newer than the requested
-          ``pipeline_version``.
-        - The MD5 checksum of the resolved config or parameters file does not
-          match its registry entry.
-        - ``content_id`` is not present in the content-id-to-Dandiset mapping.
-        - ``content_id`` maps to the retired sandbox dandiset.
-        - The ``sub`` BIDS entity cannot be extracted from the resolved
-          Dandiset path.
-        - A resolved git commit hash does not match the expected
-          40-character hexadecimal format.
+@functools.lru_cache(maxsize=None)
+def _load_preparation_context(*, pipeline_version: str, config_key: str, parameters_key: str) -> _PreparationContext:
+    """
+    Validate and load the registered config and parameters for one combination of keys and version.
+
+    The result is memoized for the whole process, so the registries are read and
+    the files hashed once however many jobs share the combination.
+
+    :raises ValueError: In the version, registry and checksum situations listed for
+        :func:`prepare_aind_ephys_job`.
     """
-    if not content_id and not (dandiset_id and dandiset_path):
-        message = "Either --id or both --dandiset and --dandipath must be provided."
-        raise ValueError(message)
-    if pipeline_version == "":
-        message = f"Pipeline version passed for `{content_id=}` is empty!"
-        raise ValueError(message)
-    if pipeline_version == "v1.0.0":
-        message = (
-            "Version `v1.0.0` is incompatible with the new parameters file usage." "Please use `v1.0.0-fixes` instead."
-        )
-        raise ValueError(message)
     requested_pipeline_version = _parse_pipeline_version(pipeline_version, label="requested pipeline")
     config_registry_path = pathlib.Path(__file__).parent / "registries" / "registered_configs.json"
     config_registry = json.loads(config_registry_path.read_text())
@@ -143,7 +162,8 @@ def prepare_aind_ephys_job(
         )
         raise ValueError(message)
     parameters_file_path = pathlib.Path(__file__).parent / "params" / params_registry[parameters_key]["path"]
-    actual_md5 = hashlib.md5(parameters_file_path.read_bytes()).hexdigest()
+    parameters_bytes = parameters_file_path.read_bytes()
+    actual_md5 = hashlib.md5(parameters_bytes).hexdigest()
     expected_md5 = params_registry[parameters_key]["md5"]
     if actual_md5 != expected_md5:
         message = (
@@ -153,7 +173,7 @@ def prepare_aind_ephys_job(
             "to reflect the new file contents."
         )
         raise ValueError(message)
-    parameters = json.loads(parameters_file_path.read_text())
+    parameters = json.loads(parameters_bytes)
     if "pipeline_version" not in parameters:
         message = f"Parameters file '{parameters_file_path.name}' is missing required 'pipeline_version'."
         raise ValueError(message)
@@ -179,14 +199,8 @@ def prepare_aind_ephys_job(
         raise ValueError(message)
     params_id = actual_md5[0:7]
 
-    if content_id is None:
-        client = dandi.dandiapi.DandiAPIClient()
-        dandiset = client.get_dandiset(dandiset_id=dandiset_id)
-        asset = dandiset.get_asset_by_path(path=dandiset_path)
-        metadata = asset.get_raw_metadata()
-        content_id = metadata["contentUrl"][1].split("/")[-1]
-
-    actual_config_md5 = hashlib.md5(config_file_path.read_bytes()).hexdigest()
+    config_bytes = config_file_path.read_bytes()
+    actual_config_md5 = hashlib.md5(config_bytes).hexdigest()
     if actual_config_md5 != expected_config_md5:
         message = (
             f"MD5 mismatch for config file '{config_file_path.name}': "
@@ -197,21 +211,102 @@ def prepare_aind_ephys_job(
         raise ValueError(message)
     config_id = actual_config_md5[0:7]
 
-    dandi_compute_dir = pathlib.Path("/orcd/data/dandi/001/dandi-compute")
-    content_id_to_usage_dandiset_path_url = (
-        "https://raw.githubusercontent.com/dandi-cache/content-id-to-usage-dandiset-path/derivatives/"
-        "derivatives/content_id_to_usage_dandiset_path.jsonl"
+    return _PreparationContext(
+        pipeline_version=pipeline_version,
+        config_file_path=config_file_path,
+        config_text=config_bytes.decode(),
+        config_id=config_id,
+        parameters_file_path=parameters_file_path,
+        parameters_text=parameters_bytes.decode(),
+        params_id=params_id,
     )
-    with urllib.request.urlopen(url=content_id_to_usage_dandiset_path_url) as response:
-        decoded = response.read().decode()
-    content_id_to_usage_dandiset_path = {
-        content_id_key: dandiset_path
-        for line in decoded.splitlines()
-        if line.strip()
-        for content_id_key, dandiset_path in json.loads(line).items()
-    }
 
-    if content_id not in content_id_to_usage_dandiset_path:
+
+@functools.lru_cache(maxsize=None)
+def _load_pipeline_checkout(pipeline_directory: pathlib.Path) -> _PipelineCheckout:
+    """
+    Read the commit hashes and pipeline files copied into every capsule, once per process.
+
+    :raises ValueError: If a resolved git commit hash is not 40 hexadecimal characters.
+    """
+    pipeline_file_path = pipeline_directory / "pipeline" / "main_multi_backend.nf"
+    dandi_compute_code_source_dir = _DANDI_COMPUTE_DIRECTORY / "code"
+
+    pipeline_commit_hash = subprocess.check_output(
+        ["git", "rev-parse", "HEAD"],
+        cwd=pipeline_directory,
+        text=True,
+    ).strip()
+    if not re.match(r"^[0-9a-f]{40}$", pipeline_commit_hash):
+        message = f"Unexpected commit hash format: {pipeline_commit_hash}"
+        raise ValueError(message)
+
+    dandi_compute_code_commit_hash = subprocess.check_output(
+        ["git", "rev-parse", "HEAD"],
+        cwd=dandi_compute_code_source_dir,
+        text=True,
+    ).strip()
+    if not re.match(r"^[0-9a-f]{40}$", dandi_compute_code_commit_hash):
+        message = f"Unexpected commit hash format: {dandi_compute_code_commit_hash}"
+        raise ValueError(message)
+
+    capsule_versions_file_path = pipeline_directory / "pipeline" / "capsule_versions.env"
+
+    return _PipelineCheckout(
+        pipeline_directory=pipeline_directory,
+        pipeline_file_path=pipeline_file_path,
+        pipeline_text=pipeline_file_path.read_text(),
+        capsule_versions_text=capsule_versions_file_path.read_text(),
+        pipeline_commit_hash=pipeline_commit_hash,
+        dandi_compute_code_commit_hash=dandi_compute_code_commit_hash,
+        codebase_version=importlib.metadata.version("dandi-compute-code"),
+    )
+
+
+def _plan_aind_ephys_job(
+    *,
+    pipeline_version: str,
+    content_id: str | None,
+    dandiset_id: str | None,
+    dandiset_path: str | None,
+    config_key: str,
+    parameters_key: str,
+    pipeline_directory: pathlib.Path | None,
+    content_id_resolver: Callable[[str], Mapping[str, str] | None] | None,
+    reserved_attempts: dict[str, set[int]] | None = None,
+) -> _AindEphysJobPlan:
+    """
+    Validate the inputs of one job and resolve everything needed to write its capsule.
+
+    Accepts the arguments of :func:`prepare_aind_ephys_job` and raises the same errors.
+    Attempt numbers already handed out to other capsules of the same batch are
+    passed in *reserved_attempts* (keyed by capsule base path) and are skipped.
+    """
+    if not content_id and not (dandiset_id and dandiset_path):
+        message = "Either --id or both --dandiset and --dandipath must be provided."
+        raise ValueError(message)
+    if pipeline_version == "":
+        message = f"Pipeline version passed for `{content_id=}` is empty!"
+        raise ValueError(message)
+    if pipeline_version == "v1.0.0":
+        message = (
+            "Version `v1.0.0` is incompatible with the new parameters file usage." "Please use `v1.0.0-fixes` instead."
+        )
+        raise ValueError(message)
+    context = _load_preparation_context(
+        pipeline_version=pipeline_version, config_key=config_key, parameters_key=parameters_key
+    )
+
+    if content_id is None:
+        client = dandi.dandiapi.DandiAPIClient()
+        dandiset = client.get_dandiset(dandiset_id=dandiset_id)
+        asset = dandiset.get_asset_by_path(path=dandiset_path)
+        metadata = asset.get_raw_metadata()
+        content_id = metadata["contentUrl"][1].split("/")[-1]
+
+    resolve_content_id = content_id_resolver or _load_content_id_to_usage_dandiset_path().get
+    usage_dandiset_paths = resolve_content_id(content_id)
+    if not usage_dandiset_paths:
         message = (
             f"Content ID {content_id} not found in content ID to usage Dandiset path mapping. "
             "This likely means that the content ID is not associated with a Dandiset, "
@@ -219,7 +314,7 @@ def prepare_aind_ephys_job(
         )
         raise UnmappedContentIDError(message)
 
-    dandiset_id, dandiset_path = next(iter(content_id_to_usage_dandiset_path[content_id].items()))
+    dandiset_id, dandiset_path = next(iter(usage_dandiset_paths.items()))
     if dandiset_id == _SANDBOX_DANDISET_ID:
         message = (
             f"Content ID {content_id} maps to sandbox dandiset {_SANDBOX_DANDISET_ID}, "
@@ -252,74 +347,64 @@ def prepare_aind_ephys_job(
 
     # TODO: if first run for asset, skip below and add sourcedata
 
-    pipeline_directory = (pipeline_directory or dandi_compute_dir / "aind-ephys-pipeline").absolute()
-    pipeline_file_path = pipeline_directory / "pipeline" / "main_multi_backend.nf"
-    dandi_compute_code_source_dir = dandi_compute_dir / "code"
-
-    pipeline_commit_hash = subprocess.check_output(
-        ["git", "rev-parse", "HEAD"],
-        cwd=pipeline_directory,
-        text=True,
-    ).strip()
-    if not re.match(r"^[0-9a-f]{40}$", pipeline_commit_hash):
-        message = f"Unexpected commit hash format: {pipeline_commit_hash}"
-        raise ValueError(message)
-
-    dandi_compute_code_commit_hash = subprocess.check_output(
-        ["git", "rev-parse", "HEAD"],
-        cwd=dandi_compute_code_source_dir,
-        text=True,
-    ).strip()
-    if not re.match(r"^[0-9a-f]{40}$", dandi_compute_code_commit_hash):
-        message = f"Unexpected commit hash format: {dandi_compute_code_commit_hash}"
-        raise ValueError(message)
-
-    codebase_version = importlib.metadata.version("dandi-compute-code")
+    checkout = _load_pipeline_checkout(
+        (pipeline_directory or _DANDI_COMPUTE_DIRECTORY / "aind-ephys-pipeline").absolute()
+    )
     bidsy_pipeline_version = pipeline_version.replace("-", "+")
     output_dandiset_path_base = f"derivatives/dandiset-{dandiset_id}/{output_dandi_path}/"
     output_dandiset_path_base += (
         f"pipeline-aind+ephys/"
-        f"version-{bidsy_pipeline_version}_codebase-v{codebase_version}"
-        f"_params-{params_id}_config-{config_id}"
+        f"version-{bidsy_pipeline_version}_codebase-v{checkout.codebase_version}"
+        f"_params-{context.params_id}_config-{context.config_id}"
     )
 
     # Assign the lowest integer run ID that has not been used yet, up to a maximum limit
     client = dandi.dandiapi.DandiAPIClient(token=os.environ["DANDI_API_KEY"])
     dandiset = client.get_dandiset(dandiset_id="001697")
 
-    maximum_run_id = 99
-    run_id = 1
+    reserved = None if reserved_attempts is None else reserved_attempts.setdefault(output_dandiset_path_base, set())
+    run_id = _next_attempt_number(
+        dandiset=dandiset, output_dandiset_path_base=output_dandiset_path_base, reserved_attempts=reserved
+    )
+    if reserved is not None:
+        reserved.add(run_id)
     output_dandiset_path = f"{output_dandiset_path_base}_attempt-{run_id}"
-    for _ in range(maximum_run_id + 1):
-        assets_checker = dandiset.get_assets_with_path_prefix(path=output_dandiset_path)
-        if next(assets_checker, None) is None:
-            continue
-
-        run_id += 1
-        output_dandiset_path = f"{output_dandiset_path_base}_attempt-{run_id}"
 
     blob_head = content_id[0]
     partition = "001" if ord(blob_head) - ord("0") <= 8 else "002"  # TODO: pull from source to keep up to date
     nwbfile_path = f"/orcd/data/dandi/{partition}/s3dandiarchive/blobs/{content_id[0:3]}/{content_id[3:6]}/{content_id}"
     # TODO: figure out if Zarr or not - only supports blobs ATM
 
-    # Create an empty copy of Dandiset
-    processing_directory = dandi_compute_dir / "processing"
-    temporary_processing_directory = pathlib.Path(tempfile.mkdtemp(dir=processing_directory, prefix="prepare-job-"))
-    dandi.download.download(
-        urls="DANDI:001697",
-        output_dir=temporary_processing_directory,
-        get_metadata=True,
-        get_assets=False,
+    return _AindEphysJobPlan(
+        content_id=content_id,
+        dandiset_id=dandiset_id,
+        output_dandiset_path=output_dandiset_path,
+        nwb_file_path=nwbfile_path,
+        context=context,
+        checkout=checkout,
     )
 
+
+def _write_aind_ephys_capsule(
+    plan: _AindEphysJobPlan, *, dandiset_directory: pathlib.Path, temp_name: str
+) -> pathlib.Path:
+    """
+    Materialize the capsule of *plan* inside a local copy of the job capsules Dandiset.
+
+    :param dandiset_directory: The local ``001697`` tree the capsule is written into.
+    :param temp_name: Name recorded in the done tracker once the job finishes.
+    :returns: The path of the generated submission script.
+    """
     # Construct BIDS derivative content
-    dandiset_output_dir = temporary_processing_directory / "001697" / output_dandiset_path
+    dandiset_output_dir = dandiset_directory / plan.output_dandiset_path
+    context = plan.context
+    checkout = plan.checkout
+    pipeline_file_path = checkout.pipeline_file_path
 
     code_dir = dandiset_output_dir / "code"
     script_file_path = code_dir / "submit.sh"
-    code_config_file_path = code_dir / config_file_path.name
-    code_parameters_file_path = code_dir / parameters_file_path.name
+    code_config_file_path = code_dir / context.config_file_path.name
+    code_parameters_file_path = code_dir / context.parameters_file_path.name
     code_pipeline_file_path = code_dir / pipeline_file_path.name
     code_capsule_versions_file_path = code_dir / "capsule_versions.env"
     dataset_description_file_path = dandiset_output_dir / "dataset_description.json"
@@ -331,38 +416,39 @@ def prepare_aind_ephys_job(
     intermediate_dir = dandiset_output_dir / "intermediate"
     intermediate_dir.mkdir()
 
-    work_directory = dandi_compute_dir / "work"
+    work_directory = _DANDI_COMPUTE_DIRECTORY / "work"
     apptainer_cache_directory = work_directory / "apptainer_cache"
     # NOTE: NUMBA_CACHE_DIR is also needed for the pipeline
     # but must be set in `~/.bashrc`, and must be the same as WORKDIR
     # NUMBA_CACHE_DIR = "/orcd/data/dandi/001/dandi-compute/work"
     environment_directory = "/orcd/data/dandi/001/environments/name-nextflow_environment"
-    done_tracker_file_path = processing_directory / "done.txt"
+    done_tracker_file_path = _DANDI_COMPUTE_DIRECTORY / "processing" / "done.txt"
 
     pipeline_repo_directory = pipeline_file_path.parent.parent
-    capsule_versions_file_path = pipeline_repo_directory / "pipeline" / "capsule_versions.env"
 
     # TODO: could look up description, authors, license, etc. from source dandiset metadata
-    pipeline_url = f"https://github.com/CodyCBakerPhD/aind-ephys-pipeline/tree/{pipeline_version.replace('+','%2B')}"
+    pipeline_url = (
+        f"https://github.com/CodyCBakerPhD/aind-ephys-pipeline/tree/{context.pipeline_version.replace('+','%2B')}"
+    )
     dataset_description = {
-        "Name": f"DANDI Compute: AIND Ephys pipeline output for Dandiset {dandiset_id}",
+        "Name": f"DANDI Compute: AIND Ephys pipeline output for Dandiset {plan.dandiset_id}",
         "BIDSVersion": "1.10",
         "DatasetType": "study",
         "GeneratedBy": [
             {
                 "Name": "AIND Ephys Pipeline",
                 "Description": "A customized and version-locked branch of the main AIND ephys pipeline.",
-                "Version": f"{pipeline_version}+{pipeline_commit_hash}",
+                "Version": f"{context.pipeline_version}+{checkout.pipeline_commit_hash}",
                 "CodeURL": pipeline_url,
             },
             {
                 "Name": "DANDI Compute: Code",
                 "Description": "The primary source code for orchestration of AIND on MIT Engaging.",
-                "Version": f"v{codebase_version}+{dandi_compute_code_commit_hash}",
+                "Version": f"v{checkout.codebase_version}+{checkout.dandi_compute_code_commit_hash}",
                 "CodeURL": "https://github.com/dandi-compute/code",
             },
         ],
-        "SourceDatasets": [{"URL": f"https://dandiarchive.org/dandiset/{dandiset_id}/"}],
+        "SourceDatasets": [{"URL": f"https://dandiarchive.org/dandiset/{plan.dandiset_id}/"}],
     }
 
     # Construct submission script from template
@@ -370,7 +456,7 @@ def prepare_aind_ephys_job(
     generate_aind_ephys_submission_script(
         script_file_path=script_file_path,
         log_directory=str(log_directory),
-        nwb_file_path=nwbfile_path,
+        nwb_file_path=plan.nwb_file_path,
         results_directory=str(intermediate_dir),  # Start off the results in the intermediate folder and separate later
         work_directory=str(work_directory),
         apptainer_cache_directory=str(apptainer_cache_directory),
@@ -378,30 +464,269 @@ def prepare_aind_ephys_job(
         config_file_path=str(code_config_file_path),
         pipeline_file_path=str(pipeline_file_path),
         pipeline_repo_directory=str(pipeline_repo_directory.absolute()),
-        pipeline_version=pipeline_version,
-        temp_name=temporary_processing_directory.name,
+        pipeline_version=context.pipeline_version,
+        temp_name=temp_name,
         done_tracker_file_path=str(done_tracker_file_path),
         params_file_path=str(code_parameters_file_path),
     )
-    code_config_file_path.write_text(data=config_file_path.read_text())
-    code_parameters_file_path.write_text(data=parameters_file_path.read_text())
-    code_capsule_versions_file_path.write_text(data=capsule_versions_file_path.read_text())
-    code_pipeline_file_path.write_text(data=pipeline_file_path.read_text())
+    code_config_file_path.write_text(data=context.config_text)
+    code_parameters_file_path.write_text(data=context.parameters_text)
+    code_capsule_versions_file_path.write_text(data=checkout.capsule_versions_text)
+    code_pipeline_file_path.write_text(data=checkout.pipeline_text)
     dataset_description_file_path.write_text(data=json.dumps(obj=dataset_description, indent=2))
 
-    # Upload preparation to 'reserve' spot during processing
-    if silent:
-        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
-            dandi.upload.upload(
-                paths=[dandiset_output_dir],
-                allow_any_path=True,
-                validation=dandi.upload.UploadValidation.SKIP,
-            )
-    else:
+    return script_file_path
+
+
+def _download_job_capsules_dandiset(processing_directory: pathlib.Path, *, prefix: str) -> pathlib.Path:
+    """Create a temporary directory holding an empty copy of the job capsules Dandiset and return it."""
+    temporary_processing_directory = pathlib.Path(tempfile.mkdtemp(dir=processing_directory, prefix=prefix))
+    dandi.download.download(
+        urls="DANDI:001697",
+        output_dir=temporary_processing_directory,
+        get_metadata=True,
+        get_assets=False,
+    )
+    return temporary_processing_directory
+
+
+class _OutputSilencer:
+    """
+    Discard ``stdout`` and ``stderr`` while at least one thread is inside the context.
+
+    :func:`contextlib.redirect_stdout` swaps a process-wide attribute, so two threads
+    nesting it out of order can leave output silenced for good. The streams are
+    instead swapped by the first thread to enter and restored by the last to leave.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._saved_streams: tuple = ()
+
+    def __enter__(self) -> None:
+        with self._lock:
+            if self._depth == 0:
+                self._saved_streams = (sys.stdout, sys.stderr)
+                sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+            self._depth += 1
+
+    def __exit__(self, *exc_info: object) -> None:
+        with self._lock:
+            self._depth -= 1
+            if self._depth == 0:
+                sys.stdout, sys.stderr = self._saved_streams
+
+
+_silence_output = _OutputSilencer()
+
+
+def _upload_job_capsules(capsule_directories: list[pathlib.Path], *, silent: bool, jobs: int | None = None) -> None:
+    """Upload capsules to 'reserve' their spots during processing, with up to *jobs* files in flight."""
+    with _silence_output if silent else contextlib.nullcontext():
         dandi.upload.upload(
-            paths=[dandiset_output_dir],
+            paths=capsule_directories,
             allow_any_path=True,
             validation=dandi.upload.UploadValidation.SKIP,
+            jobs=jobs,
         )
 
+
+@pydantic.validate_call
+def prepare_aind_ephys_job(
+    pipeline_version: str,
+    content_id: str | None = None,
+    dandiset_id: str | None = None,
+    dandiset_path: str | None = None,
+    config_key: str = "default",
+    parameters_key: str = "default",
+    pipeline_directory: pathlib.Path | None = None,
+    silent: bool = False,
+    content_id_resolver: Callable[[str], Mapping[str, str] | None] | None = None,
+) -> pathlib.Path:
+    """
+    Prepares an AIND ephys job by generating a submission script and returning the script file path.
+
+    Parameters
+    ----------
+    pipeline_version : str
+        The version of the pipeline to use, which will be used to checkout a branch of the pipeline repository.
+    content_id : str
+        The content ID for the data to be processed.
+    dandiset_id : str, optional
+        The Dandiset ID for the data to be processed. Required if `content_id`
+        is not provided and will be used to look up the content ID if `content_id` is not provided.
+    dandiset_path : str, optional
+        The local path to the Dandiset data to be processed. Required if `content_id
+        is not provided and will be used to look up the content ID if `content_id` is not provided.
+    config_key : str
+        The short name of the configuration to use.
+        Must be a key registered in `registries/registered_configs.json`.
+    parameters_key : str
+        The short name of the parameters to use.
+        Must be a key registered in `registries/registered_params.json`.
+    pipeline_directory : pathlib.Path, optional
+        Local path to the AIND pipeline repository.
+    silent : bool, optional
+        Whether to suppress output messages from the DANDI client.
+        Default is False.
+    content_id_resolver : callable, optional
+        Returns the ``{dandiset_id: path}`` usages of a content ID, or ``None`` if
+        it is unknown. Defaults to lookups in the process-wide cached
+        content-id-to-usage-Dandiset-path mapping.
+
+    Returns
+    -------
+    script_file_path : pathlib.Path
+        The path to the generated submission script.
+
+    Raises
+    ------
+    ValueError
+        Raised in any of the following situations.
+
+        - Neither ``content_id`` nor both ``dandiset_id`` and ``dandiset_path``
+          are provided.
+        - ``pipeline_version`` is an empty string.
+        - ``pipeline_version`` equals the unsupported ``v1.0.0``.
+        - ``config_key`` is not registered in ``registered_configs.json``.
+        - ``parameters_key`` is not registered in ``registered_params.json``.
+        - The resolved parameters file is missing a ``pipeline_version`` field.
+        - The parameters file ``pipeline_version`` is in a different major
+          series than the requested ``pipeline_version``.
+        - The parameters file ``pipeline_version`` is newer than the requested
+          ``pipeline_version``.
+        - The MD5 checksum of the resolved config or parameters file does not
+          match its registry entry.
+        - ``content_id`` is not present in the content-id-to-Dandiset mapping.
+        - ``content_id`` maps to the retired sandbox dandiset.
+        - The ``sub`` BIDS entity cannot be extracted from the resolved
+          Dandiset path.
+        - A resolved git commit hash does not match the expected
+          40-character hexadecimal format.
+        - Every attempt number for the resulting job capsule is already taken.
+    RuntimeError
+        If no ``content_id_resolver`` is given and the shared content-id mapping
+        cannot be loaded.
+    """
+    plan = _plan_aind_ephys_job(
+        pipeline_version=pipeline_version,
+        content_id=content_id,
+        dandiset_id=dandiset_id,
+        dandiset_path=dandiset_path,
+        config_key=config_key,
+        parameters_key=parameters_key,
+        pipeline_directory=pipeline_directory,
+        content_id_resolver=content_id_resolver,
+    )
+    temporary_processing_directory = _download_job_capsules_dandiset(
+        _DANDI_COMPUTE_DIRECTORY / "processing", prefix="prepare-job-"
+    )
+    script_file_path = _write_aind_ephys_capsule(
+        plan,
+        dandiset_directory=temporary_processing_directory / "001697",
+        temp_name=temporary_processing_directory.name,
+    )
+    _upload_job_capsules([script_file_path.parent.parent], silent=silent)
     return script_file_path
+
+
+@pydantic.validate_call
+def prepare_aind_ephys_jobs(
+    jobs: list[AindEphysJobRequest],
+    config_key: str = "default",
+    pipeline_directory: pathlib.Path | None = None,
+    silent: bool = False,
+    content_id_resolver: Callable[[str], Mapping[str, str] | None] | None = None,
+    upload_jobs: int | None = _BATCH_UPLOAD_JOBS,
+) -> dict[AindEphysJobRequest, pathlib.Path]:
+    """
+    Prepare many AIND ephys jobs with one Dandiset download and one upload.
+
+    As for a single job, every capsule is materialized in its own temporary
+    processing directory, whose name it records in the done tracker once it
+    finishes, so cleaning up one finished capsule never touches another. The
+    Dandiset is downloaded once, and hard links to every capsule are gathered
+    into one staging copy of it so that a single ``dandi upload`` call transfers
+    them all, up to *upload_jobs* files concurrently.
+
+    Parameters
+    ----------
+    jobs : list of AindEphysJobRequest
+        The content ID, pipeline version and parameters key of each job.
+    config_key : str
+        The short name of the configuration used for every job.
+    pipeline_directory : pathlib.Path, optional
+        Local path to the AIND pipeline repository.
+    silent : bool, optional
+        Whether to suppress output messages from the DANDI client.
+    content_id_resolver : callable, optional
+        See :func:`prepare_aind_ephys_job`.
+    upload_jobs : int, optional
+        Number of files uploaded in parallel; ``None`` uses the DANDI client default.
+
+    Returns
+    -------
+    script_file_paths : dict
+        The generated submission script of each prepared job. A job that cannot be
+        prepared, in any of the situations listed under ``ValueError`` for
+        :func:`prepare_aind_ephys_job` (for example an unmapped content ID or every
+        attempt number already taken), is skipped with a warning and omitted; the
+        other jobs are still prepared. Every job is validated before anything is
+        written or uploaded.
+
+    Raises
+    ------
+    RuntimeError
+        If no ``content_id_resolver`` is given and the shared content-id mapping
+        cannot be loaded.
+    """
+    reserved_attempts: dict[str, set[int]] = {}
+    plans: dict[AindEphysJobRequest, _AindEphysJobPlan] = {}
+    for job in dict.fromkeys(jobs):
+        try:
+            plans[job] = _plan_aind_ephys_job(
+                pipeline_version=job.pipeline_version,
+                content_id=job.content_id,
+                dandiset_id=None,
+                dandiset_path=None,
+                config_key=config_key,
+                parameters_key=job.parameters_key,
+                pipeline_directory=pipeline_directory,
+                content_id_resolver=content_id_resolver,
+                reserved_attempts=reserved_attempts,
+            )
+        except ValueError as error:  # Including UnmappedContentIDError
+            _log.warning(
+                f"Skipping preparation for {job.pipeline_version}/{job.parameters_key}/{job.content_id}: {error}"
+            )
+    if not plans:
+        return {}
+
+    processing_directory = _DANDI_COMPUTE_DIRECTORY / "processing"
+    staging_directory = _download_job_capsules_dandiset(processing_directory, prefix="prepare-batch-")
+    staged_dandiset_directory = staging_directory / "001697"
+    script_file_paths = {}
+    staged_capsule_directories = []
+    try:
+        for job, plan in plans.items():
+            temporary_processing_directory = pathlib.Path(
+                tempfile.mkdtemp(dir=processing_directory, prefix="prepare-job-")
+            )
+            dandiset_directory = temporary_processing_directory / "001697"
+            dandiset_directory.mkdir()
+            shutil.copy2(staged_dandiset_directory / "dandiset.yaml", dandiset_directory / "dandiset.yaml")
+            script_file_path = _write_aind_ephys_capsule(
+                plan, dandiset_directory=dandiset_directory, temp_name=temporary_processing_directory.name
+            )
+            capsule_directory = script_file_path.parent.parent
+            staged_capsule_directory = staged_dandiset_directory / capsule_directory.relative_to(dandiset_directory)
+            shutil.copytree(capsule_directory, staged_capsule_directory, copy_function=os.link)
+            script_file_paths[job] = script_file_path
+            staged_capsule_directories.append(staged_capsule_directory)
+
+        _log.info(f"Uploading {len(script_file_paths)} prepared job capsules from {staging_directory}")
+        _upload_job_capsules(staged_capsule_directories, silent=silent, jobs=upload_jobs)
+    finally:
+        shutil.rmtree(staging_directory, ignore_errors=True)
+    return script_file_paths
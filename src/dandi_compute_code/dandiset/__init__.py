@@ -1,13 +1,19 @@
+from ._configure_download_cache import configure_download_cache
 from ._delete_dandiset_version import delete_dandiset_version
 from ._load_assets_jsonld_metadata import AssetMetadata, AssetsJsonldMetadata, load_assets_jsonld_metadata
 from ._move_job_capsule import move_job_capsule
+from ._prune_download_cache import prune_download_cache
 from ._scan_version_directories import scan_version_directories
+from ._summarize_download_cache import summarize_download_cache
 
 __all__ = [
     "AssetMetadata",
     "AssetsJsonldMetadata",
+    "configure_download_cache",
     "delete_dandiset_version",
     "load_assets_jsonld_metadata",
     "move_job_capsule",
+    "prune_download_cache",
     "scan_version_directories",
+    "summarize_download_cache",
 ]
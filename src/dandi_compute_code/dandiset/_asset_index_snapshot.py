@@ -0,0 +1,116 @@
+import array
+import json
+import logging
+import mmap
+import os
+import pathlib
+import struct
+import sys
+import tempfile
+
+from ._compact_asset_index import _CompactAssetIndex
+
+_log = logging.getLogger(__name__)
+
+_SNAPSHOT_MAGIC = b"DCAIDX\0\0"
+#: Bumped whenever the layout of the snapshot or of :class:`_CompactAssetIndex` changes.
+_SNAPSHOT_FORMAT_VERSION = 1
+#: Magic, format version, and byte length of the JSON header that follows.
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def _asset_index_snapshot_path(body_path: pathlib.Path) -> pathlib.Path:
+    """Location of the binary index snapshot kept next to a cached ``assets.jsonld`` body."""
+    return body_path.with_name(f"{body_path.name}.index")
+
+
+def _write_asset_index_snapshot(*, index: _CompactAssetIndex, file_path: pathlib.Path, key: str) -> None:
+    """
+    Write *index* to a versioned binary snapshot at *file_path*, tagged with *key*.
+
+    The snapshot is a small JSON header (format version, *key*, byte order, and the
+    type code and length of every column) followed by the raw bytes of the index
+    columns, so it is restored with plain buffer copies instead of JSON parsing and
+    re-hashing. It is written to a temporary file and renamed into place.
+    """
+    columns = index._columns()
+    segments = "\0".join(index._segments).encode("utf-8")
+    header = {
+        "key": key,
+        "byteorder": sys.byteorder,
+        "segment_count": len(index._segments),
+        "sections": [["segments", "B", len(segments)]]
+        + [
+            [name, column.typecode if isinstance(column, array.array) else "B", len(column) * _itemsize(column)]
+            for name, column in columns.items()
+        ],
+    }
+    encoded_header = json.dumps(header).encode("utf-8")
+
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_descriptor, temporary_name = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.")
+    try:
+        with os.fdopen(file_descriptor, mode="wb") as file_stream:
+            file_stream.write(_PREAMBLE.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_FORMAT_VERSION, len(encoded_header)))
+            file_stream.write(encoded_header)
+            file_stream.write(segments)
+            for column in columns.values():
+                file_stream.write(column)
+        os.replace(temporary_name, file_path)
+    except BaseException:
+        pathlib.Path(temporary_name).unlink(missing_ok=True)
+        raise
+
+
+def _read_asset_index_snapshot(*, file_path: pathlib.Path, key: str) -> _CompactAssetIndex | None:
+    """
+    Restore an index from the snapshot at *file_path* if it was written for *key*.
+
+    The file is memory-mapped and each column is copied straight into its array.
+
+    :returns: The restored index, or ``None`` if there is no snapshot, it was
+        written for a different key or format version, or it is unreadable.
+    """
+    try:
+        with (
+            file_path.open(mode="rb") as file_stream,
+            mmap.mmap(file_stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped,
+            memoryview(mapped) as view,
+        ):
+            return _decode_snapshot(view, key=key)
+    except (OSError, ValueError, KeyError, TypeError, struct.error) as exception:
+        _log.debug("Ignoring unreadable asset index snapshot %s: %s", file_path, exception)
+        return None
+
+
+def _decode_snapshot(view: memoryview, *, key: str) -> _CompactAssetIndex | None:
+    magic, version, header_length = _PREAMBLE.unpack_from(view)
+    if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_FORMAT_VERSION:
+        return None
+    with view[_PREAMBLE.size : _PREAMBLE.size + header_length] as header_view:
+        header = json.loads(bytes(header_view))
+    if header["key"] != key or header["byteorder"] != sys.byteorder:
+        return None
+
+    offset = _PREAMBLE.size + header_length
+    columns: dict[str, array.array | bytearray] = {}
+    for name, typecode, length in header["sections"]:
+        with view[offset : offset + length] as section:
+            if len(section) != length:
+                raise ValueError(f"Truncated section {name!r}")
+            if typecode == "B":
+                columns[name] = bytearray(section)
+            else:
+                columns[name] = array.array(typecode)
+                columns[name].frombytes(section)
+        offset += length
+    if offset != len(view):
+        raise ValueError("Trailing data after the last section")
+
+    segments_bytes = columns.pop("segments")
+    segments = segments_bytes.decode("utf-8").split("\0") if header["segment_count"] else []
+    return _CompactAssetIndex._from_columns(segments=segments, columns=columns)
+
+
+def _itemsize(column: array.array | bytearray) -> int:
+    return column.itemsize if isinstance(column, array.array) else 1
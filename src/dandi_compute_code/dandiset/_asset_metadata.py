@@ -0,0 +1,11 @@
+import dataclasses
+
+
+@dataclasses.dataclass(frozen=True)
+class AssetMetadata:
+    """Minimal indexed metadata for one asset path."""
+
+    path: str
+    date_modified: str
+    content_size: int
+    content_id: str
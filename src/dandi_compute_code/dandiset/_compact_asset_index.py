@@ -0,0 +1,250 @@
+import array
+import zlib
+from collections.abc import ItemsView, Iterator, Mapping, ValuesView
+
+from ._asset_metadata import AssetMetadata
+
+#: Initial number of hash table slots; always a power of two.
+_INITIAL_TABLE_SIZE = 8
+
+
+class _StringColumn:
+    """Variable-length strings packed into one UTF-8 buffer and addressed by per-row offsets."""
+
+    __slots__ = ("buffer", "lengths", "starts")
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.starts = array.array("I")
+        self.lengths = array.array("I")
+
+    def append(self, value: str) -> None:
+        encoded = value.encode("utf-8")
+        self.starts.append(len(self.buffer))
+        self.lengths.append(len(encoded))
+        self.buffer += encoded
+
+    def replace(self, index: int, value: str) -> None:
+        """Point row *index* at *value*; the previous bytes are left in place as dead space."""
+        if self[index] == value:
+            return
+        encoded = value.encode("utf-8")
+        self.starts[index] = len(self.buffer)
+        self.lengths[index] = len(encoded)
+        self.buffer += encoded
+
+    def __getitem__(self, index: int) -> str:
+        start = self.starts[index]
+        return self.buffer[start : start + self.lengths[index]].decode("utf-8")
+
+
+class _CompactAssetIndex(Mapping[str, AssetMetadata]):
+    """
+    Read-only mapping of asset path to :class:`AssetMetadata` backed by flat arrays.
+
+    Storing one frozen dataclass (plus its three strings and an int) per asset costs
+    several hundred bytes of object overhead per entry, which dominates memory for
+    Dandisets with 10^5 - 10^6 assets. This index instead keeps:
+
+    * paths as sequences of ids into a table of interned ``/``-separated segments,
+      so shared directory prefixes are stored once;
+    * content sizes in one contiguous ``array('q')``;
+    * modification timestamps and content ids packed into UTF-8 buffers addressed
+      by offset;
+    * an open-addressing hash table of row numbers keyed by the CRC-32 of the path.
+
+    :class:`AssetMetadata` values are built on access. Iteration follows insertion
+    order and re-adding a path replaces its values in place, exactly like ``dict``.
+    """
+
+    __slots__ = (
+        "_content_ids",
+        "_content_sizes",
+        "_date_modified",
+        "_path_hashes",
+        "_path_offsets",
+        "_path_segment_ids",
+        "_segment_ids",
+        "_segments",
+        "_table",
+    )
+
+    def __init__(self) -> None:
+        self._segments: list[str] = []
+        self._segment_ids: dict[str, int] | None = {}
+        self._path_segment_ids = array.array("I")
+        self._path_offsets = array.array("I", [0])
+        self._path_hashes = array.array("I")
+        self._content_sizes = array.array("q")
+        self._date_modified = _StringColumn()
+        self._content_ids = _StringColumn()
+        self._table = array.array("I", bytes(4 * _INITIAL_TABLE_SIZE))
+
+    # --- building ----------------------------------------------------------
+
+    def _add(self, metadata: AssetMetadata) -> None:
+        """Insert *metadata*, replacing the values of an existing entry with the same path."""
+        path = metadata.path
+        path_hash = zlib.crc32(path.encode("utf-8"))
+        index = self._find(path, path_hash)
+        if index is not None:
+            self._content_sizes[index] = metadata.content_size
+            self._date_modified.replace(index, metadata.date_modified)
+            self._content_ids.replace(index, metadata.content_id)
+            return
+
+        if self._segment_ids is None:
+            self._segment_ids = {segment: segment_id for segment_id, segment in enumerate(self._segments)}
+        for segment in path.split("/"):
+            segment_id = self._segment_ids.get(segment)
+            if segment_id is None:
+                segment_id = len(self._segments)
+                self._segment_ids[segment] = segment_id
+                self._segments.append(segment)
+            self._path_segment_ids.append(segment_id)
+        self._path_offsets.append(len(self._path_segment_ids))
+        self._path_hashes.append(path_hash)
+        self._content_sizes.append(metadata.content_size)
+        self._date_modified.append(metadata.date_modified)
+        self._content_ids.append(metadata.content_id)
+
+        index = len(self._path_hashes) - 1
+        if 2 * len(self._path_hashes) > len(self._table):
+            self._rehash(2 * len(self._table))
+        else:
+            self._claim_slot(index)
+
+    def _freeze(self) -> None:
+        """Release the segment lookup only needed while adding entries; it is rebuilt if more are added."""
+        self._segment_ids = None
+
+    def _claim_slot(self, index: int) -> None:
+        mask = len(self._table) - 1
+        slot = self._path_hashes[index] & mask
+        while self._table[slot]:
+            slot = (slot + 1) & mask
+        self._table[slot] = index + 1
+
+    def _rehash(self, table_size: int) -> None:
+        self._table = array.array("I", bytes(4 * table_size))
+        for index in range(len(self._path_hashes)):
+            self._claim_slot(index)
+
+    # --- serialization -----------------------------------------------------
+
+    def _columns(self) -> dict[str, array.array | bytearray]:
+        """The flat buffers backing the index, keyed by a stable name (see :meth:`_from_columns`)."""
+        return {
+            "path_segment_ids": self._path_segment_ids,
+            "path_offsets": self._path_offsets,
+            "path_hashes": self._path_hashes,
+            "content_sizes": self._content_sizes,
+            "date_modified_buffer": self._date_modified.buffer,
+            "date_modified_starts": self._date_modified.starts,
+            "date_modified_lengths": self._date_modified.lengths,
+            "content_ids_buffer": self._content_ids.buffer,
+            "content_ids_starts": self._content_ids.starts,
+            "content_ids_lengths": self._content_ids.lengths,
+            "table": self._table,
+        }
+
+    def _has_same_entries(self, other: "_CompactAssetIndex") -> bool:
+        """
+        Cheap check that *other* holds exactly the same entries in the same order.
+
+        Compares the flat buffers directly, so a ``False`` answer may be spurious
+        (e.g. after in-place replacements); callers fall back to a per-path comparison.
+        """
+        if self._segments != other._segments:
+            return False
+        own_columns = self._columns()
+        other_columns = other._columns()
+        return all(own_columns[name] == other_columns[name] for name in own_columns if name != "table")
+
+    @classmethod
+    def _from_columns(cls, *, segments: list[str], columns: dict[str, array.array | bytearray]) -> "_CompactAssetIndex":
+        """Rebuild a frozen index from :meth:`_columns` output without re-hashing any path."""
+        index = cls()
+        index._segments = segments
+        index._segment_ids = None
+        index._path_segment_ids = columns["path_segment_ids"]
+        index._path_offsets = columns["path_offsets"]
+        index._path_hashes = columns["path_hashes"]
+        index._content_sizes = columns["content_sizes"]
+        index._date_modified.buffer = columns["date_modified_buffer"]
+        index._date_modified.starts = columns["date_modified_starts"]
+        index._date_modified.lengths = columns["date_modified_lengths"]
+        index._content_ids.buffer = columns["content_ids_buffer"]
+        index._content_ids.starts = columns["content_ids_starts"]
+        index._content_ids.lengths = columns["content_ids_lengths"]
+        index._table = columns["table"]
+        return index
+
+    # --- lookup ------------------------------------------------------------
+
+    def _find(self, path: str, path_hash: int) -> int | None:
+        """Return the row holding *path*, or ``None``; table slots store ``row + 1`` so ``0`` marks empty."""
+        mask = len(self._table) - 1
+        slot = path_hash & mask
+        while stored := self._table[slot]:
+            index = stored - 1
+            if self._path_hashes[index] == path_hash and self._path(index) == path:
+                return index
+            slot = (slot + 1) & mask
+        return None
+
+    def _path(self, index: int) -> str:
+        segment_ids = self._path_segment_ids[self._path_offsets[index] : self._path_offsets[index + 1]]
+        return "/".join(map(self._segments.__getitem__, segment_ids))
+
+    def _entry(self, index: int, path: str) -> AssetMetadata:
+        return AssetMetadata(
+            path=path,
+            date_modified=self._date_modified[index],
+            content_size=self._content_sizes[index],
+            content_id=self._content_ids[index],
+        )
+
+    # --- Mapping interface -------------------------------------------------
+
+    def __getitem__(self, path: str) -> AssetMetadata:
+        index = self._find(path, zlib.crc32(path.encode("utf-8"))) if isinstance(path, str) else None
+        if index is None:
+            raise KeyError(path)
+        return self._entry(index, path)
+
+    def __contains__(self, path: object) -> bool:
+        return isinstance(path, str) and self._find(path, zlib.crc32(path.encode("utf-8"))) is not None
+
+    def __len__(self) -> int:
+        return len(self._path_hashes)
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self._path, range(len(self._path_hashes)))
+
+    def items(self) -> ItemsView[str, AssetMetadata]:
+        return _CompactItemsView(self)
+
+    def values(self) -> ValuesView[AssetMetadata]:
+        return _CompactValuesView(self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(<{len(self)} assets>)"
+
+
+class _CompactItemsView(ItemsView):
+    """Items view that walks rows directly instead of re-hashing every key."""
+
+    def __iter__(self) -> Iterator[tuple[str, AssetMetadata]]:
+        index: _CompactAssetIndex = self._mapping
+        for row in range(len(index)):
+            path = index._path(row)
+            yield path, index._entry(row, path)
+
+
+class _CompactValuesView(ValuesView):
+    """Values view that walks rows directly instead of re-hashing every key."""
+
+    def __iter__(self) -> Iterator[AssetMetadata]:
+        for _, metadata in _CompactItemsView(self._mapping):
+            yield metadata
@@ -0,0 +1,50 @@
+import dataclasses
+
+from ._download_cache import _load_download_cache_settings, _save_download_cache_settings
+
+
+def configure_download_cache(
+    *,
+    max_bytes: int | None = None,
+    default_ttl_seconds: float | None = None,
+    dandiset_ttl_seconds: dict[str, float | None] | None = None,
+) -> None:
+    """
+    Update the persistent settings of the download cache.
+
+    Settings are stored in ``settings.json`` inside the cache directory, so they
+    apply to every process that shares it. Arguments left as ``None`` keep their
+    current value.
+
+    :param max_bytes: Total size the cache is pruned back to, least recently used
+        entries first.
+    :type max_bytes: int | None
+    :param default_ttl_seconds: Seconds an upstream Dandiset's ``assets.jsonld`` is
+        reused without revalidating it against the archive.
+    :type default_ttl_seconds: float | None
+    :param dandiset_ttl_seconds: Per-Dandiset overrides of *default_ttl_seconds*;
+        a value of ``None`` removes the override for that Dandiset.
+    :type dandiset_ttl_seconds: dict[str, float | None] | None
+    :raises ValueError: If a size or duration is negative.
+    """
+    overrides = dandiset_ttl_seconds or {}
+    if max_bytes is not None and max_bytes < 0:
+        raise ValueError("max_bytes must not be negative")
+    if any(seconds is not None and seconds < 0 for seconds in [default_ttl_seconds, *overrides.values()]):
+        raise ValueError("TTLs must not be negative")
+
+    settings = _load_download_cache_settings()
+    ttl_seconds_by_dandiset = dict(settings.ttl_seconds_by_dandiset)
+    for dandiset_id, seconds in overrides.items():
+        if seconds is None:
+            ttl_seconds_by_dandiset.pop(dandiset_id, None)
+        else:
+            ttl_seconds_by_dandiset[dandiset_id] = seconds
+    _save_download_cache_settings(
+        dataclasses.replace(
+            settings,
+            max_bytes=settings.max_bytes if max_bytes is None else max_bytes,
+            default_ttl_seconds=settings.default_ttl_seconds if default_ttl_seconds is None else default_ttl_seconds,
+            ttl_seconds_by_dandiset=ttl_seconds_by_dandiset,
+        )
+    )
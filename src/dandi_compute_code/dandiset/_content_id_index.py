@@ -0,0 +1,199 @@
+import contextlib
+import json
+import os
+import pathlib
+import sqlite3
+import tempfile
+import threading
+from collections.abc import Iterator, Mapping
+from typing import BinaryIO
+
+from ._download_with_cache import _CachedDownload
+
+#: Bumped whenever the schema of the on-disk index changes.
+_INDEX_FORMAT_VERSION = 2
+#: Upper bound on how much of the index file SQLite maps into memory instead of reading through syscalls.
+_INDEX_MMAP_BYTES = 1024**3
+#: Rows inserted per ``executemany`` call while building the index.
+_BUILD_BATCH_SIZE = 10_000
+
+
+def _content_id_index_path(body_path: pathlib.Path) -> pathlib.Path:
+    """Location of the SQLite index kept next to the cached content-id mapping."""
+    return body_path.with_name(f"{body_path.name}.sqlite")
+
+
+def _content_id_index_key(cached_download: _CachedDownload) -> str | None:
+    """Identify the exact mapping document an index was built from; ``None`` when it cannot be identified."""
+    validator = cached_download.etag or cached_download.last_modified
+    if validator is None:
+        return None
+    return f"{_INDEX_FORMAT_VERSION}:{cached_download.body_path.stat().st_size}:{validator}"
+
+
+def _iter_mapping_rows(file_stream: BinaryIO) -> Iterator[tuple[str, str, str, int, int]]:
+    """Yield ``(content_id, dandiset_id, path, position, line_number)`` rows from the JSON Lines mapping."""
+    for line_number, line in enumerate(file_stream):
+        if not line.strip():
+            continue
+        for content_id, dandiset_paths in json.loads(line).items():
+            for position, (dandiset_id, path) in enumerate(dandiset_paths.items()):
+                yield content_id, dandiset_id, path, position, line_number
+
+
+def _build_content_id_index(*, body_path: pathlib.Path, index_path: pathlib.Path, key: str | None) -> None:
+    """
+    Build the SQLite index for the mapping at *body_path* and rename it over *index_path*.
+
+    Every ``(content_id, dandiset_id)`` pair becomes one row of a table clustered on
+    the content id, with a secondary index on the Dandiset id. As when the lines are
+    merged into one ``dict``, a content id listed on several lines keeps only the
+    Dandisets of its last line, but its place in iteration order is that of its first
+    line. The file is written under a temporary name, so concurrent readers never
+    open a partial index.
+
+    :raises json.JSONDecodeError: If a line of the mapping is not valid JSON.
+    """
+    file_descriptor, temporary_name = tempfile.mkstemp(dir=index_path.parent, prefix=f".{index_path.name}.")
+    os.close(file_descriptor)
+    try:
+        with contextlib.closing(sqlite3.connect(temporary_name)) as connection:
+            connection.executescript("""
+                PRAGMA journal_mode = OFF;
+                PRAGMA synchronous = OFF;
+                CREATE TABLE metadata (key TEXT);
+                CREATE TABLE usage (
+                    content_id TEXT NOT NULL,
+                    dandiset_id TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    line_number INTEGER NOT NULL,
+                    PRIMARY KEY (content_id, dandiset_id)
+                ) WITHOUT ROWID;
+                CREATE TABLE content_ids (
+                    content_id TEXT PRIMARY KEY,
+                    first_line_number INTEGER NOT NULL
+                ) WITHOUT ROWID;
+                """)
+            rows = []
+            with body_path.open(mode="rb") as file_stream:
+                for row in _iter_mapping_rows(file_stream):
+                    rows.append(row)
+                    if len(rows) >= _BUILD_BATCH_SIZE:
+                        _insert_mapping_rows(connection, rows)
+                        rows.clear()
+            _insert_mapping_rows(connection, rows)
+            # Only the last line listing a content id counts, exactly like merging the lines into one dict.
+            connection.execute("""
+                DELETE FROM usage WHERE line_number < (
+                    SELECT MAX(latest.line_number) FROM usage AS latest WHERE latest.content_id = usage.content_id
+                )
+                """)
+            connection.execute("CREATE INDEX usage_by_dandiset ON usage (dandiset_id, content_id)")
+            connection.execute("CREATE INDEX content_ids_by_line ON content_ids (first_line_number)")
+            connection.execute("INSERT INTO metadata VALUES (?)", (key,))
+            connection.commit()
+        os.replace(temporary_name, index_path)
+    except BaseException:
+        pathlib.Path(temporary_name).unlink(missing_ok=True)
+        raise
+
+
+def _insert_mapping_rows(connection: sqlite3.Connection, rows: list[tuple[str, str, str, int, int]]) -> None:
+    connection.executemany("INSERT OR REPLACE INTO usage VALUES (?, ?, ?, ?, ?)", rows)
+    connection.executemany("INSERT OR IGNORE INTO content_ids VALUES (?, ?)", ((row[0], row[4]) for row in rows))
+
+
+class _ContentIdIndex(Mapping[str, dict[str, str]]):
+    """
+    Read-only mapping of content id to ``{dandiset_id: path}`` backed by an on-disk SQLite index.
+
+    Only the rows a lookup touches are read (through SQLite's memory map), so a
+    process that resolves a handful of content ids never materializes the whole
+    archive-wide mapping. Content ids iterate, and each value lists the Dandisets,
+    in the order of the original document, exactly like the merged ``dict`` it replaces.
+    """
+
+    def __init__(self, index_path: pathlib.Path) -> None:
+        self._index_path = index_path
+        self._connection = sqlite3.connect(
+            f"{index_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._connection.execute(f"PRAGMA mmap_size = {_INDEX_MMAP_BYTES}")
+        self._lock = threading.Lock()
+        self._length: int | None = None
+
+    @classmethod
+    def _open(cls, index_path: pathlib.Path, *, key: str) -> "_ContentIdIndex | None":
+        """Open the index at *index_path* if it was built for *key*; ``None`` if it is missing, stale or unreadable."""
+        if not index_path.is_file():
+            return None
+        try:
+            index = cls(index_path)
+            with index._lock:
+                stored_key = index._connection.execute("SELECT key FROM metadata").fetchone()
+        except sqlite3.Error:
+            return None
+        if stored_key is None or stored_key[0] != key:
+            index.close()
+            return None
+        return index
+
+    def _query(self, sql: str, parameters: tuple[str, ...] = ()) -> list[tuple]:
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def __getitem__(self, content_id: str) -> dict[str, str]:
+        rows = (
+            self._query("SELECT dandiset_id, path FROM usage WHERE content_id = ? ORDER BY position", (content_id,))
+            if isinstance(content_id, str)
+            else []
+        )
+        if not rows:
+            raise KeyError(content_id)
+        return dict(rows)
+
+    def __contains__(self, content_id: object) -> bool:
+        return isinstance(content_id, str) and bool(
+            self._query("SELECT 1 FROM usage WHERE content_id = ? LIMIT 1", (content_id,))
+        )
+
+    def __len__(self) -> int:
+        if self._length is None:
+            self._length = self._query("SELECT COUNT(*) FROM content_ids")[0][0]
+        return self._length
+
+    def __iter__(self) -> Iterator[str]:
+        for (content_id,) in self._query("SELECT content_id FROM content_ids ORDER BY first_line_number"):
+            yield content_id
+
+    def paths_for_dandiset(self, dandiset_id: str) -> dict[str, str]:
+        """Return ``{content_id: path}`` for every content id used by *dandiset_id*."""
+        return dict(
+            self._query("SELECT content_id, path FROM usage WHERE dandiset_id = ? ORDER BY content_id", (dandiset_id,))
+        )
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._index_path})"
+
+
+def _open_content_id_index(cached_download: _CachedDownload) -> _ContentIdIndex:
+    """
+    Open the index of a cached content-id mapping, building it first if it is missing or stale.
+
+    The index is stored next to the cached body and keyed by the body's size and
+    ``ETag`` (or ``Last-Modified``), so it is built once per version of the mapping
+    and shared by every later process.
+
+    :raises json.JSONDecodeError: If the index has to be built and the mapping is malformed.
+    :raises sqlite3.Error: If the index cannot be built or opened.
+    """
+    index_path = _content_id_index_path(cached_download.body_path)
+    key = _content_id_index_key(cached_download)
+    if key is not None and (index := _ContentIdIndex._open(index_path, key=key)) is not None:
+        return index
+    _build_content_id_index(body_path=cached_download.body_path, index_path=index_path, key=key)
+    return _ContentIdIndex(index_path)
@@ -0,0 +1,23 @@
+from collections.abc import Mapping
+
+from ._asset_metadata import AssetMetadata
+from ._compact_asset_index import _CompactAssetIndex
+
+
+def _diff_asset_indexes(previous: Mapping[str, AssetMetadata], current: Mapping[str, AssetMetadata]) -> set[str]:
+    """
+    Return the paths added, removed, or modified between two path indexes.
+
+    A path counts as modified when any of its indexed fields (modification time,
+    size, or content id) differs. Two compact indexes built from the same document
+    are recognized by comparing their buffers, without decoding any entry.
+    """
+    if (
+        isinstance(previous, _CompactAssetIndex)
+        and isinstance(current, _CompactAssetIndex)
+        and previous._has_same_entries(current)
+    ):
+        return set()
+    changed = {path for path, metadata in current.items() if previous.get(path) != metadata}
+    changed.update(path for path in previous if path not in current)
+    return changed
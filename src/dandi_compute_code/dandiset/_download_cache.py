@@ -0,0 +1,193 @@
+"""
+Shared bookkeeping for the persistent download cache.
+
+The cache directory (see :func:`._download_with_cache._resolve_cache_directory`)
+is shared by every ``dandicompute`` process on a host, including overlapping cron
+jobs. Readers hold a shared ``flock`` on ``<cache>/.lock`` while they download and
+index a document; pruning takes the exclusive lock, so an entry is never removed
+from under a process that is still reading it. Individual files are always
+written to a temporary name and renamed into place.
+"""
+
+import contextlib
+import dataclasses
+import errno
+import fcntl
+import io
+import json
+import logging
+import pathlib
+from collections.abc import Iterator
+
+from ._download_with_cache import _atomic_copy, _read_cached_download, _resolve_cache_directory
+from ._globals import _DEFAULT_CACHE_MAX_BYTES, _DEFAULT_UPSTREAM_TTL_SECONDS
+
+_log = logging.getLogger(__name__)
+
+_LOCK_FILE_NAME = ".lock"
+_SETTINGS_FILE_NAME = "settings.json"
+#: Suffixes of the files stored alongside a cached body; they share its lifetime.
+_COMPANION_SUFFIXES = (".validators.json", ".index", ".sqlite")
+
+
+@dataclasses.dataclass(frozen=True)
+class _DownloadCacheSettings:
+    """User-configurable limits of the download cache, stored in ``<cache>/settings.json``."""
+
+    max_bytes: int = _DEFAULT_CACHE_MAX_BYTES
+    default_ttl_seconds: float = _DEFAULT_UPSTREAM_TTL_SECONDS
+    ttl_seconds_by_dandiset: dict[str, float] = dataclasses.field(default_factory=dict)
+
+    def ttl_seconds(self, dandiset_id: str) -> float:
+        return self.ttl_seconds_by_dandiset.get(dandiset_id, self.default_ttl_seconds)
+
+
+@dataclasses.dataclass(frozen=True)
+class _DownloadCacheEntry:
+    """One cached body together with its companion validator and index snapshot files."""
+
+    key: str
+    files: tuple[pathlib.Path, ...]
+    size_bytes: int
+    last_used: float
+    validated_at: float | None
+
+    @property
+    def dandiset_id(self) -> str | None:
+        """The Dandiset of an ``assets_jsonld/<id>.jsonld`` entry; ``None`` for other entries."""
+        directory, _, name = self.key.rpartition("/")
+        return name.removesuffix(".jsonld") if directory == "assets_jsonld" else None
+
+
+@contextlib.contextmanager
+def _download_cache_lock(*, shared: bool, blocking: bool = True) -> Iterator[bool]:
+    """
+    Hold the cache-wide ``flock``; yields whether it was acquired.
+
+    With ``blocking=False`` the context yields ``False`` immediately instead of
+    waiting when another process holds a conflicting lock.
+    """
+    cache_directory = _resolve_cache_directory()
+    cache_directory.mkdir(parents=True, exist_ok=True)
+    operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        operation |= fcntl.LOCK_NB
+    with open(cache_directory / _LOCK_FILE_NAME, mode="a") as lock_file:
+        try:
+            fcntl.flock(lock_file, operation)
+        except OSError as error:
+            if error.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_download_cache_settings() -> _DownloadCacheSettings:
+    """Read the cache settings, falling back to the defaults for anything unset or unreadable."""
+    settings_path = _resolve_cache_directory() / _SETTINGS_FILE_NAME
+    try:
+        raw = json.loads(settings_path.read_text())
+    except FileNotFoundError:
+        return _DownloadCacheSettings()
+    except (OSError, json.JSONDecodeError) as exception:
+        _log.warning("Ignoring unreadable download cache settings %s: %s", settings_path, exception)
+        return _DownloadCacheSettings()
+    defaults = _DownloadCacheSettings()
+    return _DownloadCacheSettings(
+        max_bytes=int(raw.get("max_bytes", defaults.max_bytes)),
+        default_ttl_seconds=float(raw.get("default_ttl_seconds", defaults.default_ttl_seconds)),
+        ttl_seconds_by_dandiset={
+            str(dandiset_id): float(seconds) for dandiset_id, seconds in raw.get("ttl_seconds", {}).items()
+        },
+    )
+
+
+def _save_download_cache_settings(settings: _DownloadCacheSettings) -> None:
+    raw = {
+        "max_bytes": settings.max_bytes,
+        "default_ttl_seconds": settings.default_ttl_seconds,
+        "ttl_seconds": dict(sorted(settings.ttl_seconds_by_dandiset.items())),
+    }
+    _atomic_copy(
+        source=io.BytesIO((json.dumps(raw, indent=2) + "\n").encode()),
+        file_path=_resolve_cache_directory() / _SETTINGS_FILE_NAME,
+    )
+
+
+def _list_download_cache_entries() -> list[_DownloadCacheEntry]:
+    """List cached bodies with their companions, least recently used first."""
+    cache_directory = _resolve_cache_directory()
+    files_by_body: dict[pathlib.Path, list[pathlib.Path]] = {}
+    for file_path in cache_directory.rglob("*"):
+        relative_parts = file_path.relative_to(cache_directory).parts
+        if not file_path.is_file() or any(part.startswith(".") for part in relative_parts):
+            continue
+        if file_path.parent == cache_directory and file_path.name == _SETTINGS_FILE_NAME:
+            continue
+        body_path = file_path
+        for suffix in _COMPANION_SUFFIXES:
+            if file_path.name.endswith(suffix):
+                body_path = file_path.with_name(file_path.name.removesuffix(suffix))
+                break
+        files_by_body.setdefault(body_path, []).append(file_path)
+
+    entries: list[_DownloadCacheEntry] = []
+    for body_path, files in files_by_body.items():
+        try:
+            statistics = [file_path.stat() for file_path in files]
+        except FileNotFoundError:
+            continue
+        cached = _read_cached_download(body_path)
+        entries.append(
+            _DownloadCacheEntry(
+                key=body_path.relative_to(cache_directory).as_posix(),
+                files=tuple(sorted(files)),
+                size_bytes=sum(stat.st_size for stat in statistics),
+                last_used=max(stat.st_mtime for stat in statistics),
+                validated_at=cached.validated_at if cached is not None else None,
+            )
+        )
+    entries.sort(key=lambda entry: (entry.last_used, entry.key))
+    return entries
+
+
+def _remove_download_cache_entry(entry: _DownloadCacheEntry) -> None:
+    for file_path in entry.files:
+        file_path.unlink(missing_ok=True)
+
+
+def _evict_download_cache_entries(
+    *, max_bytes: int | None = None, keys: set[str] | None = None, blocking: bool = False
+) -> list[_DownloadCacheEntry]:
+    """
+    Remove entries under the exclusive cache lock and return the removed entries.
+
+    Entries named in *keys* are always removed; the remaining entries are then
+    removed least recently used first until the cache fits in *max_bytes*
+    (the configured budget when ``None``). Without *blocking*, nothing is removed
+    if another process currently holds the lock.
+    """
+    if not _resolve_cache_directory().is_dir():
+        return []
+    budget = _load_download_cache_settings().max_bytes if max_bytes is None else max_bytes
+    with _download_cache_lock(shared=False, blocking=blocking) as acquired:
+        if not acquired:
+            _log.debug("Skipping download cache pruning; the cache is in use by another process")
+            return []
+        entries = _list_download_cache_entries()
+        removed = [entry for entry in entries if keys is not None and entry.key in keys]
+        remaining = [entry for entry in entries if entry not in removed]
+        total_bytes = sum(entry.size_bytes for entry in remaining)
+        for entry in remaining:
+            if total_bytes <= budget:
+                break
+            removed.append(entry)
+            total_bytes -= entry.size_bytes
+        for entry in removed:
+            _log.info("Evicting %s (%d bytes) from the download cache", entry.key, entry.size_bytes)
+            _remove_download_cache_entry(entry)
+    return removed
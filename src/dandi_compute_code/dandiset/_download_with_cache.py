@@ -0,0 +1,223 @@
+import dataclasses
+import hashlib
+import io
+import json
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+import typing
+import urllib.error
+import urllib.request
+
+from ._globals import _CACHE_DIRECTORY_ENV_VAR, _DEFAULT_CACHE_DIRECTORY
+from ._http_client import _http_open
+
+_log = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class _BodyFingerprint:
+    """Identifies one written version of a cached body; every atomic replace yields a new inode."""
+
+    inode: int
+    size: int
+    sha256: str
+
+
+@dataclasses.dataclass(frozen=True)
+class _CachedDownload:
+    """A locally cached copy of a remote resource and the validators it was served with."""
+
+    body_path: pathlib.Path
+    etag: str | None
+    last_modified: str | None
+    validated_at: float | None = None
+    #: The body the validators belong to; ``None`` until it is fingerprinted.
+    fingerprint: _BodyFingerprint | None = dataclasses.field(default=None, compare=False)
+
+
+def _resolve_cache_directory() -> pathlib.Path:
+    """Resolve the on-disk cache directory, honoring the override environment variable."""
+    override = os.environ.get(_CACHE_DIRECTORY_ENV_VAR, "").strip()
+    return pathlib.Path(override) if override else _DEFAULT_CACHE_DIRECTORY
+
+
+def _validators_path(body_path: pathlib.Path) -> pathlib.Path:
+    return body_path.with_name(f"{body_path.name}.validators.json")
+
+
+def _file_sha256(file_path: pathlib.Path) -> str:
+    digest = hashlib.sha256()
+    with file_path.open(mode="rb") as file_stream:
+        for chunk in iter(lambda: file_stream.read(1024**2), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fingerprint_body(body_path: pathlib.Path) -> _BodyFingerprint:
+    stat_result = body_path.stat()
+    return _BodyFingerprint(inode=stat_result.st_ino, size=stat_result.st_size, sha256=_file_sha256(body_path))
+
+
+def _read_cached_download(body_path: pathlib.Path) -> _CachedDownload | None:
+    """
+    Return the cached copy at *body_path* with its validators, or ``None`` if nothing usable is cached.
+
+    The body and its validators are replaced by two separate renames, so the
+    validators record the fingerprint of the body they were served with. They are
+    only used with that body: the same inode and size, or else the same SHA-256
+    digest (e.g. after the cache directory was copied).
+    """
+    try:
+        stat_result = body_path.stat()
+        validators = json.loads(_validators_path(body_path).read_text())
+        recorded = _BodyFingerprint(**validators["body"])
+    except (OSError, json.JSONDecodeError, KeyError, TypeError):
+        return None
+    if (recorded.inode, recorded.size) == (stat_result.st_ino, stat_result.st_size):
+        fingerprint = recorded
+    else:
+        if recorded.size != stat_result.st_size:
+            return None
+        try:
+            fingerprint = _fingerprint_body(body_path)
+        except OSError:
+            return None
+        if fingerprint.sha256 != recorded.sha256:
+            return None
+    return _CachedDownload(
+        body_path=body_path,
+        etag=validators.get("etag"),
+        last_modified=validators.get("last_modified"),
+        validated_at=validators.get("validated_at"),
+        fingerprint=fingerprint,
+    )
+
+
+def _write_validators(*, url: str, download: _CachedDownload) -> None:
+    """Record the validators of *download* for its body, fingerprinting the body if it has not been yet."""
+    fingerprint = download.fingerprint or _fingerprint_body(download.body_path)
+    validators = {
+        "url": url,
+        "etag": download.etag,
+        "last_modified": download.last_modified,
+        "validated_at": download.validated_at,
+        "body": dataclasses.asdict(fingerprint),
+    }
+    _atomic_copy(source=io.BytesIO(json.dumps(validators).encode()), file_path=_validators_path(download.body_path))
+
+
+def _mark_used(body_path: pathlib.Path) -> None:
+    """Bump the body's modification time, which the size-bounded eviction treats as its last use."""
+    try:
+        os.utime(body_path)
+    except OSError:
+        pass
+
+
+def _atomic_copy(*, source: typing.BinaryIO, file_path: pathlib.Path) -> _BodyFingerprint:
+    """Stream *source* into a sibling temporary file, rename it over *file_path*, and fingerprint what was written."""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_descriptor, temporary_name = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.")
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(file_descriptor, mode="wb") as file_stream:
+            for chunk in iter(lambda: source.read(shutil.COPY_BUFSIZE), b""):
+                digest.update(chunk)
+                file_stream.write(chunk)
+            file_stream.flush()
+            stat_result = os.fstat(file_stream.fileno())
+        os.replace(temporary_name, file_path)
+    except BaseException:
+        pathlib.Path(temporary_name).unlink(missing_ok=True)
+        raise
+    return _BodyFingerprint(inode=stat_result.st_ino, size=stat_result.st_size, sha256=digest.hexdigest())
+
+
+def _header(response: object, name: str) -> str | None:
+    value = response.headers.get(name)
+    return value if isinstance(value, str) else None
+
+
+def _download_with_cache(
+    *, url: str, cache_key: str, timeout: float = 30, max_age: float | None = None
+) -> _CachedDownload:
+    """
+    Download *url* into the persistent cache, revalidating any cached copy first.
+
+    The body is stored under ``<cache directory>/<cache_key>`` together with the
+    ``ETag`` / ``Last-Modified`` validators the server returned. When a cached copy
+    exists the request is sent as a conditional GET (``If-None-Match`` /
+    ``If-Modified-Since``); a ``304 Not Modified`` reply reuses the cached body, so
+    an unchanged resource costs a single header-only round trip. The cache
+    directory defaults to ``~/.dandicompute/cache`` and is overridden by the
+    ``DANDICOMPUTE_CACHE`` environment variable.
+
+    Bodies and validators are written to temporary files and renamed into place,
+    so concurrent processes sharing one cache directory never observe a partial
+    file. The validators name the fingerprint of their body, so a reader (or a
+    crash) between the two renames never pairs a body with another body's
+    validators; such a copy is treated as not cached.
+
+    A stale copy is deliberately *not* served when the request fails: callers such
+    as pending detection must not act on an outdated view of the archive. Callers
+    that tolerate some staleness pass *max_age*; a copy validated less than that
+    many seconds ago is then returned without contacting the server at all.
+
+    :param url: The remote resource to download.
+    :type url: str
+    :param cache_key: Relative path of the cached body under the cache directory.
+    :type cache_key: str
+    :param timeout: Socket timeout in seconds for the request.
+    :type timeout: float
+    :param max_age: Seconds since the last successful validation during which the
+        cached copy is trusted without a request; ``None`` always revalidates.
+    :type max_age: float | None
+    :returns: The cached copy, refreshed if the server returned a new body.
+    :rtype: _CachedDownload
+    :raises urllib.error.URLError: If the request fails (other than with ``304``).
+    :raises TimeoutError: If the request times out.
+    """
+    body_path = _resolve_cache_directory() / cache_key
+    cached = _read_cached_download(body_path)
+    if (
+        cached is not None
+        and max_age is not None
+        and cached.validated_at is not None
+        and time.time() - cached.validated_at < max_age
+    ):
+        _log.info("Using cached copy of %s (validated %.0f seconds ago)", url, time.time() - cached.validated_at)
+        _mark_used(body_path)
+        return cached
+
+    request = urllib.request.Request(url)
+    if cached is not None and cached.etag:
+        request.add_header("If-None-Match", cached.etag)
+    if cached is not None and cached.last_modified:
+        request.add_header("If-Modified-Since", cached.last_modified)
+
+    try:
+        with _http_open(request, timeout=timeout) as response:
+            fingerprint = _atomic_copy(source=response, file_path=body_path)
+            downloaded = _CachedDownload(
+                body_path=body_path,
+                etag=_header(response, "ETag"),
+                last_modified=_header(response, "Last-Modified"),
+                validated_at=time.time(),
+                fingerprint=fingerprint,
+            )
+    except urllib.error.HTTPError as error:
+        if error.code == 304 and cached is not None:
+            _log.info("Reusing cached copy of %s (not modified)", url)
+            revalidated = dataclasses.replace(cached, validated_at=time.time())
+            _write_validators(url=url, download=revalidated)
+            _mark_used(body_path)
+            return revalidated
+        raise
+
+    _write_validators(url=url, download=downloaded)
+    _log.info("Downloaded %s to cache at %s", url, body_path)
+    return downloaded
@@ -1,3 +1,4 @@
+import pathlib
 import re
 
 # TODO: rename _ATTEMPT_DIR_RE to JOB_CAPSULE_ID_PATTERN
@@ -13,5 +14,41 @@ _CONTENT_ID_TO_USAGE_DANDISET_PATH_URL = (
     "https://raw.githubusercontent.com/dandi-cache/content-id-to-usage-dandiset-path/derivatives/"
     "derivatives/content_id_to_usage_dandiset_path.jsonl"
 )
+_CONTENT_ID_TO_USAGE_DANDISET_PATH_CACHE_KEY = "content_id_to_usage_dandiset_path.jsonl"
+#: Seconds a cached content-id mapping is trusted without revalidation; it is regenerated about daily upstream.
+_CONTENT_ID_TO_USAGE_DANDISET_PATH_MAX_AGE_SECONDS = 60 * 60
 _ASSETS_JSONLD_URL_TEMPLATE = "https://dandiarchive.s3.amazonaws.com/dandisets/{dandiset_id}/draft/assets.jsonld"
 _ASSETS_JSONLD_URL = _ASSETS_JSONLD_URL_TEMPLATE.format(dandiset_id=_JOB_CAPSULES_DANDISET_ID)
+
+#: Environment variable that overrides the on-disk cache directory for remote downloads.
+_CACHE_DIRECTORY_ENV_VAR = "DANDICOMPUTE_CACHE"
+#: Default on-disk cache directory used when the override variable is unset.
+_DEFAULT_CACHE_DIRECTORY = pathlib.Path.home() / ".dandicompute" / "cache"
+#: Default total size, in bytes, the download cache is pruned back to (least recently used first).
+_DEFAULT_CACHE_MAX_BYTES = 5 * 1024**3
+#: Default number of seconds an upstream ``assets.jsonld`` is trusted without revalidation.
+_DEFAULT_UPSTREAM_TTL_SECONDS = 6 * 60 * 60
+#: Never answer more than this many wanted paths with per-path DANDI API queries.
+_MAX_PER_PATH_QUERIES = 32
+#: Estimated wall time of resolving one asset path through the DANDI API (a few sequential requests).
+_PER_PATH_QUERY_SECONDS = 1.0
+#: Estimated fixed overhead of one ``assets.jsonld`` request (connection setup and first byte).
+_DOCUMENT_REQUEST_SECONDS = 0.5
+#: Estimated download throughput for ``assets.jsonld`` documents, in bytes per second.
+_DOCUMENT_DOWNLOAD_BYTES_PER_SECOND = 20 * 1024**2
+#: Estimated streaming-parse throughput for ``assets.jsonld`` documents, in bytes per second.
+_DOCUMENT_PARSE_BYTES_PER_SECOND = 40 * 1024**2
+#: Size assumed for an ``assets.jsonld`` that has never been downloaded.
+_DEFAULT_DOCUMENT_BYTES = 64 * 1024**2
+#: Idle keep-alive connections kept open per ``(scheme, host, port)`` by the shared HTTP client.
+_HTTP_MAX_IDLE_CONNECTIONS_PER_HOST = 4
+#: Extra attempts made for a request that fails with a connection error or a retryable status.
+_HTTP_RETRIES = 3
+#: Base delay before the first retry; later retries back off exponentially with random jitter.
+_HTTP_RETRY_BACKOFF_SECONDS = 0.5
+#: Longest ``Retry-After`` delay honored before retrying a throttled request.
+_HTTP_MAX_RETRY_AFTER_SECONDS = 60
+#: Seconds without response headers after which an idempotent request is duplicated (hedged).
+_HTTP_HEDGE_AFTER_SECONDS = 2.0
+#: Threads the shared HTTP client may use to run hedged requests at once.
+_HTTP_HEDGE_MAX_WORKERS = 8
@@ -0,0 +1,397 @@
+"""
+Shared HTTP client used for every remote fetch made by the package.
+
+A single process-wide :class:`_HttpClient` keeps idle keep-alive connections per
+``(scheme, host, port)``, asks for ``gzip`` / ``deflate`` transfer compression,
+retries transient failures of idempotent requests with jittered exponential
+backoff, and hedges slow idempotent requests by racing a duplicate once the first has gone
+:data:`._globals._HTTP_HEDGE_AFTER_SECONDS` without response headers. Every
+request is timed and logged at ``DEBUG`` level.
+
+Errors surface exactly as they would from :func:`urllib.request.urlopen`: a
+non-success status raises :class:`urllib.error.HTTPError` (including ``304 Not
+Modified``), a connection failure raises :class:`urllib.error.URLError`, and a
+read timeout raises :class:`TimeoutError`.
+"""
+
+import atexit
+import concurrent.futures
+import functools
+import gzip
+import http.client
+import io
+import logging
+import random
+import threading
+import time
+import typing
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+
+from ._globals import (
+    _HTTP_HEDGE_AFTER_SECONDS,
+    _HTTP_HEDGE_MAX_WORKERS,
+    _HTTP_MAX_IDLE_CONNECTIONS_PER_HOST,
+    _HTTP_MAX_RETRY_AFTER_SECONDS,
+    _HTTP_RETRIES,
+    _HTTP_RETRY_BACKOFF_SECONDS,
+)
+
+_log = logging.getLogger(__name__)
+
+_RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+_REDIRECT_STATUS_CODES = frozenset({301, 302, 303, 307, 308})
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD"})
+_MAX_REDIRECTS = 5
+_PoolKey = tuple[str, str, int]
+
+
+class _DeflateReader(io.RawIOBase):
+    """Incrementally inflate a ``Content-Encoding: deflate`` body (zlib-wrapped or raw)."""
+
+    def __init__(self, raw: typing.BinaryIO) -> None:
+        self._raw = raw
+        self._decompressor: typing.Any = None
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: memoryview) -> int:
+        while not self._pending:
+            chunk = self._raw.read(io.DEFAULT_BUFFER_SIZE)
+            if not chunk:
+                if self._decompressor is not None:
+                    self._pending = self._decompressor.flush()
+                    self._decompressor = None
+                break
+            if self._decompressor is None:
+                # Servers disagree on whether "deflate" carries the zlib header.
+                is_zlib = len(chunk) >= 2 and (chunk[0] & 0x0F) == 8 and int.from_bytes(chunk[:2], "big") % 31 == 0
+                self._decompressor = zlib.decompressobj(zlib.MAX_WBITS if is_zlib else -zlib.MAX_WBITS)
+            self._pending = self._decompressor.decompress(chunk)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class _PooledResponse(io.BufferedIOBase):
+    """
+    A decoded response body that hands its connection back to the pool when closed.
+
+    The connection is only reused if the body was read to the end; a response
+    closed early drops its connection instead.
+    """
+
+    def __init__(
+        self,
+        *,
+        client: "_HttpClient",
+        pool_key: _PoolKey,
+        connection: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+        url: str,
+    ) -> None:
+        super().__init__()
+        self._client = client
+        self._pool_key = pool_key
+        self._connection: http.client.HTTPConnection | None = connection
+        self._response = response
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        encoding = (response.headers.get("Content-Encoding") or "").strip().lower()
+        if encoding in ("gzip", "x-gzip"):
+            self._body: typing.BinaryIO = gzip.GzipFile(fileobj=response, mode="rb")
+        elif encoding == "deflate":
+            self._body = io.BufferedReader(_DeflateReader(response))
+        else:
+            self._body = response
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int | None = -1) -> bytes:
+        # ``HTTPResponse.read(-1)`` reads until the socket closes, which never happens on a kept-alive connection.
+        return self._body.read(None if size is None or size < 0 else size)
+
+    def read1(self, size: int = -1) -> bytes:
+        return self.read(size)
+
+    def readinto(self, buffer: memoryview) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def getcode(self) -> int:
+        return self.status
+
+    def close(self) -> None:
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            reusable = self._response.isclosed() and not self._response.will_close
+            self._response.close()
+            if reusable:
+                self._client._release(self._pool_key, connection)
+            else:
+                connection.close()
+        super().close()
+
+
+class _HttpClient:
+    """Process-wide HTTP client with per-host keep-alive pools, retries, and request hedging."""
+
+    def __init__(
+        self,
+        *,
+        max_idle_connections_per_host: int = _HTTP_MAX_IDLE_CONNECTIONS_PER_HOST,
+        retries: int = _HTTP_RETRIES,
+        backoff_seconds: float = _HTTP_RETRY_BACKOFF_SECONDS,
+        hedge_after_seconds: float | None = _HTTP_HEDGE_AFTER_SECONDS,
+        hedge_max_workers: int = _HTTP_HEDGE_MAX_WORKERS,
+    ) -> None:
+        self._max_idle_connections_per_host = max_idle_connections_per_host
+        self._retries = retries
+        self._backoff_seconds = backoff_seconds
+        self._hedge_after_seconds = hedge_after_seconds
+        self._hedge_max_workers = hedge_max_workers
+        self._idle: dict[_PoolKey, list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+
+    # --- connection pool ---------------------------------------------------
+
+    def _acquire(self, pool_key: _PoolKey, *, timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+        """Return an idle connection for *pool_key* (``True``) or a new one (``False``)."""
+        with self._lock:
+            idle = self._idle.get(pool_key)
+            if idle:
+                connection = idle.pop()
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+        scheme, host, port = pool_key
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        proxy = _proxy_for(scheme=scheme, host=host)
+        if proxy is None:
+            return connection_class(host, port, timeout=timeout), False
+        if scheme == "http":
+            return http.client.HTTPConnection(proxy.hostname, proxy.port or 80, timeout=timeout), False
+        connection = connection_class(proxy.hostname, proxy.port or 443, timeout=timeout)
+        connection.set_tunnel(host, port)
+        return connection, False
+
+    def _release(self, pool_key: _PoolKey, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(pool_key, [])
+            if len(idle) < self._max_idle_connections_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self) -> None:
+        """Close every idle connection and stop the hedging threads; requests still running are not awaited."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    # --- requests ----------------------------------------------------------
+
+    def open(self, request: "str | urllib.request.Request", *, timeout: float = 30) -> _PooledResponse:
+        """
+        Send *request* and return its response once the headers have arrived.
+
+        Connection errors, read timeouts, and ``429`` / ``5xx`` replies to ``GET``
+        and ``HEAD`` requests are retried up to the configured number of times,
+        waiting ``backoff * 2**attempt`` seconds scaled by a random factor in
+        ``[0.5, 1.5)`` (or the server's ``Retry-After``, capped). Other methods
+        may have taken effect before failing, so they are sent once. Redirects
+        are followed.
+
+        :param request: A URL or a prepared :class:`urllib.request.Request`.
+        :param timeout: Socket timeout in seconds for connecting and each read.
+        :returns: A readable, context-managed response with ``status`` and ``headers``.
+        :raises urllib.error.HTTPError: On a non-success status (including ``304``).
+        :raises urllib.error.URLError: If no connection could be made.
+        :raises TimeoutError: If the server stops responding.
+        """
+        if isinstance(request, str):
+            request = urllib.request.Request(request)
+        retries = self._retries if request.get_method() in _IDEMPOTENT_METHODS else 0
+        started = time.perf_counter()
+        for attempt in range(retries + 1):
+            try:
+                response = self._hedged(request, timeout=timeout)
+            except urllib.error.HTTPError as error:
+                if error.code not in _RETRYABLE_STATUS_CODES or attempt == retries:
+                    raise
+                delay = _retry_after_seconds(error) or self._backoff_delay(attempt)
+                failure: Exception = error
+            except (urllib.error.URLError, TimeoutError) as error:
+                if attempt == retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                failure = error
+            else:
+                if attempt:
+                    _log.debug(
+                        "%s %s succeeded after %d retries in %.3f s",
+                        request.get_method(),
+                        request.full_url,
+                        attempt,
+                        time.perf_counter() - started,
+                    )
+                return response
+            _log.info("Retrying %s in %.2f s after: %s", request.full_url, delay, failure)
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return self._backoff_seconds * 2**attempt * random.uniform(0.5, 1.5)
+
+    def _hedged(self, request: urllib.request.Request, *, timeout: float) -> _PooledResponse:
+        """Send *request*, racing a duplicate if an idempotent request is slow to respond."""
+        if self._hedge_after_seconds is None or request.get_method() not in _IDEMPOTENT_METHODS:
+            return self._send(request, timeout=timeout)
+
+        executor = self._hedge_executor()
+        primary = executor.submit(self._send, request, timeout=timeout)
+        done, _ = concurrent.futures.wait([primary], timeout=self._hedge_after_seconds)
+        if done:
+            return primary.result()
+
+        _log.debug("Hedging %s after %.2f s without a response", request.full_url, self._hedge_after_seconds)
+        pending = {primary, executor.submit(self._send, request, timeout=timeout)}
+        failure: BaseException | None = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in (*done, *pending):
+                        if other is not future:
+                            other.add_done_callback(_discard_response)
+                    return future.result()
+                failure = future.exception()
+        raise failure
+
+    def _hedge_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self._hedge_max_workers, thread_name_prefix="dandicompute-http"
+                )
+            return self._executor
+
+    def _send(self, request: urllib.request.Request, *, timeout: float) -> _PooledResponse:
+        """Perform one request (following redirects) without retrying."""
+        url = request.full_url
+        method = request.get_method()
+        headers = {"Accept-Encoding": "gzip, deflate", "User-Agent": "dandi-compute-code"}
+        headers.update(request.header_items())
+        body = request.data
+        for _ in range(_MAX_REDIRECTS + 1):
+            response = self._send_once(method=method, url=url, headers=headers, body=body, timeout=timeout)
+            location = response.headers.get("Location")
+            if response.status not in _REDIRECT_STATUS_CODES or location is None:
+                break
+            response.read()
+            response.close()
+            url = urllib.parse.urljoin(url, location)
+            if response.status == 303:
+                method, body = "GET", None
+        if response.status >= 300:
+            error_body = response.read()
+            response.close()
+            raise urllib.error.HTTPError(
+                url, response.status, response.reason, response.headers, io.BytesIO(error_body)
+            )
+        return response
+
+    def _send_once(
+        self, *, method: str, url: str, headers: dict[str, str], body: bytes | None, timeout: float
+    ) -> _PooledResponse:
+        parsed = urllib.parse.urlsplit(url)
+        scheme = parsed.scheme.lower()
+        if scheme not in ("http", "https") or not parsed.hostname:
+            raise urllib.error.URLError(f"Unsupported URL: {url}")
+        pool_key = (scheme, parsed.hostname, parsed.port or (443 if scheme == "https" else 80))
+        target = urllib.parse.urlunsplit(("", "", parsed.path or "/", parsed.query, ""))
+        if scheme == "http" and _proxy_for(scheme=scheme, host=parsed.hostname) is not None:
+            # Plain HTTP goes through a forward proxy with the absolute URL as the request target.
+            target = url
+
+        started = time.perf_counter()
+        while True:
+            connection, reused = self._acquire(pool_key, timeout=timeout)
+            try:
+                connection.request(method, target, body=body, headers=headers)
+                raw_response = connection.getresponse()
+            except TimeoutError:
+                connection.close()
+                raise
+            except (ConnectionError, http.client.HTTPException) as error:
+                connection.close()
+                if reused:
+                    # The server dropped the idle keep-alive connection; this is not a failed attempt.
+                    continue
+                raise urllib.error.URLError(error) from error
+            except OSError as error:
+                connection.close()
+                raise urllib.error.URLError(error) from error
+            break
+
+        _log.debug(
+            "%s %s -> %d in %.3f s (%s connection)",
+            method,
+            url,
+            raw_response.status,
+            time.perf_counter() - started,
+            "reused" if reused else "new",
+        )
+        return _PooledResponse(client=self, pool_key=pool_key, connection=connection, response=raw_response, url=url)
+
+
+def _discard_response(future: concurrent.futures.Future) -> None:
+    """Close the response of a hedged request that lost the race."""
+    if future.exception() is None:
+        future.result().close()
+
+
+def _retry_after_seconds(error: urllib.error.HTTPError) -> float | None:
+    value = error.headers.get("Retry-After") if error.headers is not None else None
+    try:
+        return min(float(value), _HTTP_MAX_RETRY_AFTER_SECONDS) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _proxy_for(*, scheme: str, host: str) -> urllib.parse.SplitResult | None:
+    """The proxy configured in the environment for *scheme*, unless *host* bypasses it."""
+    proxy_url = urllib.request.getproxies().get(scheme)
+    if not proxy_url or urllib.request.proxy_bypass(host):
+        return None
+    proxy = urllib.parse.urlsplit(proxy_url if "://" in proxy_url else f"http://{proxy_url}")
+    return proxy if proxy.hostname else None
+
+
+@functools.lru_cache(maxsize=1)
+def _get_http_client() -> _HttpClient:
+    """The process-wide client shared by every fetch site; closed when the interpreter exits."""
+    client = _HttpClient()
+    atexit.register(client.close)
+    return client
+
+
+def _http_open(request: "str | urllib.request.Request", *, timeout: float = 30) -> _PooledResponse:
+    """Open *request* through the shared client; see :meth:`_HttpClient.open`."""
+    return _get_http_client().open(request, timeout=timeout)
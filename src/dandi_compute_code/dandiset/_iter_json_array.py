@@ -0,0 +1,103 @@
+import io
+import json
+import typing
+from collections.abc import Iterator
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_INITIAL_READ_SIZE = 1 << 16
+
+
+class _ChunkedText:
+    """A sliding text window over a binary stream that is refilled on demand."""
+
+    def __init__(self, stream: typing.BinaryIO) -> None:
+        self._reader = io.TextIOWrapper(stream, encoding="utf-8")
+        self.buffer = ""
+        self.position = 0
+        self.exhausted = False
+        self._read_size = _INITIAL_READ_SIZE
+
+    def fill(self, *, grow: bool = False) -> None:
+        """Append the next chunk, dropping the consumed prefix; double the chunk size when *grow* is set."""
+        if grow:
+            self._read_size *= 2
+        chunk = self._reader.read(self._read_size)
+        if not chunk:
+            self.exhausted = True
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+
+    def next_significant_character(self) -> str:
+        """Skip whitespace and return the next character without consuming it (``""`` at end of input)."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.exhausted:
+                return ""
+            self.fill()
+
+    def decode_value(self) -> object:
+        """Decode one complete JSON value at the current position, reading more input until it is whole."""
+        self.next_significant_character()
+        grow = False
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+                self.fill(grow=grow)
+                grow = True
+                continue
+            # A scalar that runs to the end of the window (e.g. ``12`` of ``123``) may be truncated.
+            if end == len(self.buffer) and not self.exhausted and not isinstance(value, (dict, list, str)):
+                self.fill(grow=grow)
+                grow = True
+                continue
+            self.position = end
+            return value
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self.buffer, self.position)
+
+
+def _iter_json_array(stream: typing.BinaryIO, *, source: str) -> Iterator[object]:
+    """
+    Yield the elements of the top-level JSON array in *stream* one at a time.
+
+    The stream is decoded incrementally, so peak memory is bounded by the largest
+    single element (plus one read chunk) rather than by the whole document.
+
+    :param stream: Binary stream holding a UTF-8 JSON document.
+    :param source: Human-readable origin of the stream, used in error messages.
+    :raises ValueError: If the top-level value is not a JSON array.
+    :raises json.JSONDecodeError: If the document is malformed.
+    """
+    text = _ChunkedText(stream)
+    first_character = text.next_significant_character()
+    if first_character != "[":
+        text.fill()
+        while not text.exhausted:
+            text.fill()
+        value = json.loads(text.buffer)
+        message = f"Expected a JSON array from {source}, got {type(value).__name__}"
+        raise ValueError(message)
+    text.position += 1
+
+    if text.next_significant_character() == "]":
+        text.position += 1
+    else:
+        while True:
+            yield text.decode_value()
+            separator = text.next_significant_character()
+            text.position += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise text.error("Expecting ',' delimiter")
+
+    if text.next_significant_character() != "":
+        raise text.error("Extra data")
@@ -2,29 +2,37 @@ import dataclasses
 import functools
 import json
 import logging
-import urllib.request
-
+import typing
+import urllib.error
+from collections.abc import Collection, Mapping
+
+from ._asset_index_snapshot import (
+    _asset_index_snapshot_path,
+    _read_asset_index_snapshot,
+    _write_asset_index_snapshot,
+)
+from ._asset_metadata import AssetMetadata
+from ._compact_asset_index import _CompactAssetIndex
+from ._download_cache import _download_cache_lock
+from ._download_with_cache import _CachedDownload, _download_with_cache
 from ._globals import _ASSETS_JSONLD_URL_TEMPLATE, _JOB_CAPSULES_DANDISET_ID
+from ._iter_json_array import _iter_json_array
 
 _log = logging.getLogger(__name__)
 
 
-@dataclasses.dataclass(frozen=True)
-class AssetMetadata:
-    """Minimal indexed metadata for one asset path."""
-
-    path: str
-    date_modified: str
-    content_size: int
-    content_id: str
-
-
 @dataclasses.dataclass(frozen=True)
 class AssetsJsonldMetadata:
-    """Indexed metadata loaded from DANDI ``assets.jsonld``."""
+    """
+    Indexed metadata loaded from DANDI ``assets.jsonld``.
+
+    ``path_to_asset_metadata`` is a plain ``dict`` when the raw assets are kept and a
+    compact array-backed mapping otherwise; consumers should rely only on the
+    read-only ``Mapping`` interface.
+    """
 
     content_id_to_asset: dict[str, dict[str, object]]
-    path_to_asset_metadata: dict[str, AssetMetadata]
+    path_to_asset_metadata: Mapping[str, AssetMetadata]
 
 
 def _build_asset_metadata(asset: dict[str, object]) -> tuple[str, AssetMetadata]:
@@ -64,44 +72,176 @@ def _build_asset_metadata(asset: dict[str, object]) -> tuple[str, AssetMetadata]
     )
 
 
+def _index_assets_jsonld_stream(
+    stream: typing.BinaryIO,
+    *,
+    source: str,
+    keep_raw_assets: bool = False,
+    skip_invalid: bool = False,
+    wanted_paths: Collection[str] | None = None,
+) -> AssetsJsonldMetadata:
+    """
+    Index an ``assets.jsonld`` document while decoding it one asset at a time.
+
+    Each asset is reduced to its :class:`AssetMetadata` as soon as it is decoded, so
+    unless *keep_raw_assets* is set the full asset dicts are discarded immediately and
+    peak memory is bounded by a single asset rather than by the whole document. In
+    that mode the index is also stored compactly (see :class:`_CompactAssetIndex`).
+
+    :param stream: Binary stream over the ``assets.jsonld`` document.
+    :param source: Origin of the document, used in log and error messages.
+    :param keep_raw_assets: Also keep every raw asset dict in ``content_id_to_asset``.
+    :param skip_invalid: Skip assets that are not dicts or lack a required field
+        instead of raising.
+    :param wanted_paths: Only index assets at these paths; the rest are dropped
+        right after decoding, before they are validated.
+    :raises ValueError: If the document is not a JSON array, or if an asset is
+        invalid and *skip_invalid* is not set.
+    :raises json.JSONDecodeError: If the document is malformed.
+    """
+    content_id_to_asset: dict[str, dict[str, object]] = {}
+    path_to_asset_metadata: dict[str, AssetMetadata] | _CompactAssetIndex = (
+        {} if keep_raw_assets else _CompactAssetIndex()
+    )
+    for asset in _iter_json_array(stream, source=source):
+        if not isinstance(asset, dict):
+            if skip_invalid:
+                continue
+            raise ValueError(f"Expected each asset to be a dict, got {type(asset).__name__}: {asset!r}")
+        if wanted_paths is not None and asset.get("path") not in wanted_paths:
+            continue
+        try:
+            content_id, metadata = _build_asset_metadata(asset)
+        except ValueError as exception:
+            if not skip_invalid:
+                raise
+            _log.debug("Skipping malformed asset in %s: %s", source, exception)
+            continue
+        if keep_raw_assets:
+            content_id_to_asset[content_id] = asset
+            path_to_asset_metadata[metadata.path] = metadata
+        else:
+            path_to_asset_metadata._add(metadata)
+    if not keep_raw_assets:
+        path_to_asset_metadata._freeze()
+
+    return AssetsJsonldMetadata(
+        content_id_to_asset=content_id_to_asset,
+        path_to_asset_metadata=path_to_asset_metadata,
+    )
+
+
+def _select_paths(index: _CompactAssetIndex, *, wanted_paths: Collection[str]) -> _CompactAssetIndex:
+    selected = _CompactAssetIndex()
+    for path in wanted_paths:
+        metadata = index.get(path)
+        if metadata is not None:
+            selected._add(metadata)
+    selected._freeze()
+    return selected
+
+
+def _assets_jsonld_cache_key(*, dandiset_id: str) -> str:
+    """Relative location of a Dandiset's draft ``assets.jsonld`` within the download cache."""
+    return f"assets_jsonld/{dandiset_id}.jsonld"
+
+
+def _snapshot_key(cached_download: _CachedDownload, *, skip_invalid: bool) -> str | None:
+    """Identify the exact document (and validation mode) an index snapshot was built from."""
+    validator = cached_download.etag or cached_download.last_modified
+    if validator is None:
+        return None
+    mode = "skip-invalid" if skip_invalid else "strict"
+    return f"{mode}:{cached_download.body_path.stat().st_size}:{validator}"
+
+
+def _index_cached_assets_jsonld(
+    cached_download: _CachedDownload,
+    *,
+    source: str,
+    keep_raw_assets: bool = False,
+    skip_invalid: bool = False,
+    wanted_paths: Collection[str] | None = None,
+) -> AssetsJsonldMetadata:
+    """
+    Index a cached ``assets.jsonld`` download, reusing its binary snapshot when current.
+
+    Without raw assets the compact index is also persisted next to the cached body,
+    keyed by the body's ``ETag`` (or ``Last-Modified``). Later invocations that see
+    the same document, typically after a ``304 Not Modified`` revalidation, restore
+    the index from that snapshot instead of decoding the JSON again.
+
+    With *wanted_paths*, only those assets are kept: they are picked out of a current
+    snapshot if there is one, and otherwise filtered while streaming the document
+    (no snapshot is written, since it would not describe the whole document).
+
+    Accepts the same options and raises the same errors as
+    :func:`_index_assets_jsonld_stream`.
+    """
+    snapshot_key = None if keep_raw_assets else _snapshot_key(cached_download, skip_invalid=skip_invalid)
+    snapshot_path = _asset_index_snapshot_path(cached_download.body_path)
+    if snapshot_key is not None:
+        index = _read_asset_index_snapshot(file_path=snapshot_path, key=snapshot_key)
+        if index is not None:
+            _log.debug("Restored asset index for %s from %s", source, snapshot_path)
+            if wanted_paths is not None:
+                index = _select_paths(index, wanted_paths=wanted_paths)
+            return AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata=index)
+
+    with cached_download.body_path.open(mode="rb") as file_stream:
+        metadata = _index_assets_jsonld_stream(
+            file_stream,
+            source=source,
+            keep_raw_assets=keep_raw_assets,
+            skip_invalid=skip_invalid,
+            wanted_paths=wanted_paths,
+        )
+    if snapshot_key is not None and wanted_paths is None:
+        try:
+            _write_asset_index_snapshot(
+                index=metadata.path_to_asset_metadata, file_path=snapshot_path, key=snapshot_key
+            )
+        except OSError as exception:
+            _log.warning("Unable to write asset index snapshot %s: %s", snapshot_path, exception)
+    return metadata
+
+
 @functools.lru_cache(maxsize=None)
-def load_assets_jsonld_metadata(dandiset_id: str = _JOB_CAPSULES_DANDISET_ID) -> AssetsJsonldMetadata:
+def load_assets_jsonld_metadata(
+    dandiset_id: str = _JOB_CAPSULES_DANDISET_ID, keep_raw_assets: bool = True
+) -> AssetsJsonldMetadata:
     """
     Load content-id and path metadata from a DANDI draft ``assets.jsonld`` stream.
 
+    The document is kept in the persistent download cache and revalidated with a
+    conditional GET, so repeated CLI invocations only re-download it after it has
+    changed on the archive. It is then decoded incrementally, one asset at a time;
+    without raw assets the resulting index is also snapshotted in the cache, so an
+    unchanged document is restored without decoding it again.
+
     :param dandiset_id:
         The Dandiset whose draft ``assets.jsonld`` is loaded.  Defaults to the
         job capsules Dandiset (``001697``), where jobs run; pass the failed runs
         archive Dandiset (``001873``) to describe the archived state instead.
     :type dandiset_id: str
+    :param keep_raw_assets:
+        Keep every raw asset dict in ``content_id_to_asset``.  Pass ``False`` to
+        index only the :class:`AssetMetadata` fields, which keeps peak memory
+        bounded by a single asset for Dandisets with rich per-asset metadata.
+    :type keep_raw_assets: bool
     :returns:
         Indexed assets metadata.
     :rtype: AssetsJsonldMetadata
     """
     assets_jsonld_url = _ASSETS_JSONLD_URL_TEMPLATE.format(dandiset_id=dandiset_id)
-    content_id_to_asset: dict[str, dict[str, object]] = {}
-    path_to_asset_metadata: dict[str, AssetMetadata] = {}
     try:
-        with urllib.request.urlopen(assets_jsonld_url, timeout=30) as response:
-            assets = json.load(response)
+        with _download_cache_lock(shared=True):
+            cached_download = _download_with_cache(
+                url=assets_jsonld_url, cache_key=_assets_jsonld_cache_key(dandiset_id=dandiset_id)
+            )
+            return _index_cached_assets_jsonld(
+                cached_download, source=assets_jsonld_url, keep_raw_assets=keep_raw_assets
+            )
     except (urllib.error.URLError, TimeoutError, json.JSONDecodeError) as exception:
         _log.warning("Unable to load metadata from %s: %s", assets_jsonld_url, exception)
-        return AssetsJsonldMetadata(
-            content_id_to_asset=content_id_to_asset,
-            path_to_asset_metadata=path_to_asset_metadata,
-        )
-
-    if not isinstance(assets, list):
-        raise ValueError(f"Expected a JSON array from {assets_jsonld_url}, got {type(assets).__name__}")
-
-    for asset in assets:
-        if not isinstance(asset, dict):
-            raise ValueError(f"Expected each asset to be a dict, got {type(asset).__name__}: {asset!r}")
-        content_id, metadata = _build_asset_metadata(asset)
-        content_id_to_asset[content_id] = asset
-        path_to_asset_metadata[metadata.path] = metadata
-
-    return AssetsJsonldMetadata(
-        content_id_to_asset=content_id_to_asset,
-        path_to_asset_metadata=path_to_asset_metadata,
-    )
+        return AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={})
@@ -1,34 +1,42 @@
 import functools
-import json
-import urllib.request
 
-from ._globals import _CONTENT_ID_TO_USAGE_DANDISET_PATH_URL
+from ._content_id_index import _ContentIdIndex, _open_content_id_index
+from ._download_cache import _download_cache_lock
+from ._download_with_cache import _download_with_cache
+from ._globals import (
+    _CONTENT_ID_TO_USAGE_DANDISET_PATH_CACHE_KEY,
+    _CONTENT_ID_TO_USAGE_DANDISET_PATH_MAX_AGE_SECONDS,
+    _CONTENT_ID_TO_USAGE_DANDISET_PATH_URL,
+)
 
 
 @functools.lru_cache(maxsize=1)
-def _load_content_id_to_usage_dandiset_path() -> dict[str, dict[str, str]]:
+def _load_content_id_to_usage_dandiset_path() -> _ContentIdIndex:
     """
     Load the content ID to usage Dandiset path mapping.
 
     The remote cache is a JSON Lines file where each line is a single-entry
-    ``{content_id: {dandiset_id: path}}`` object; the lines are merged into one
-    mapping.
+    ``{content_id: {dandiset_id: path}}`` object. It is kept in the persistent
+    download cache and indexed once per version into an on-disk SQLite table, so
+    lookups only read the rows they need instead of merging every content id of
+    the archive into memory. The result is shared by the whole process, and a
+    copy validated within the last hour is reused by later processes without any
+    request; older copies are revalidated with a conditional GET.
 
     Raises
     ------
     RuntimeError
-        If the mapping cannot be downloaded or decoded from the remote URL.
+        If the mapping cannot be downloaded, decoded, or indexed.
         The original exception is chained via ``raise ... from``.
     """
     try:
-        with urllib.request.urlopen(url=_CONTENT_ID_TO_USAGE_DANDISET_PATH_URL) as response:
-            decoded = response.read().decode()
-        return {
-            content_id: dandiset_path
-            for line in decoded.splitlines()
-            if line.strip()
-            for content_id, dandiset_path in json.loads(line).items()
-        }
+        with _download_cache_lock(shared=True):
+            cached_download = _download_with_cache(
+                url=_CONTENT_ID_TO_USAGE_DANDISET_PATH_URL,
+                cache_key=_CONTENT_ID_TO_USAGE_DANDISET_PATH_CACHE_KEY,
+                max_age=_CONTENT_ID_TO_USAGE_DANDISET_PATH_MAX_AGE_SECONDS,
+            )
+            return _open_content_id_index(cached_download)
     except Exception as exception:
         message = (
             "Unable to load content-id-to-usage-dandiset-path mapping from " f"{_CONTENT_ID_TO_USAGE_DANDISET_PATH_URL}"
@@ -30,8 +30,8 @@ def _lookup_asset_size_bytes(
         Either tuple value can be ``None`` when lookup conditions are not met.
     :rtype: tuple[int | None, str | None]
     """
-    content_id_to_usage_dandiset_path = _load_content_id_to_usage_dandiset_path()
-    if content_id not in content_id_to_usage_dandiset_path:
+    mapped_dandiset_path = _load_content_id_to_usage_dandiset_path().get(content_id)
+    if mapped_dandiset_path is None:
         _log.warning(
             (
                 f"Unable to resolve asset_size_bytes for {content_id}. "
@@ -40,7 +40,6 @@ def _lookup_asset_size_bytes(
         )
         return None, None
 
-    mapped_dandiset_path = content_id_to_usage_dandiset_path[content_id]
     if len(mapped_dandiset_path) != 1:
         _log.warning(
             (
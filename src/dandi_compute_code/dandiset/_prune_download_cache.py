@@ -0,0 +1,35 @@
+from ._download_cache import _evict_download_cache_entries, _list_download_cache_entries
+from ._download_with_cache import _resolve_cache_directory
+
+
+def prune_download_cache(
+    *,
+    max_bytes: int | None = None,
+    dandiset_ids: list[str] | None = None,
+    clear: bool = False,
+) -> list[str]:
+    """
+    Remove entries from the download cache.
+
+    Waits for processes that are currently reading from the cache to finish.
+
+    :param max_bytes: Prune least recently used entries until the cache fits in
+        this many bytes. Defaults to the configured budget.
+    :type max_bytes: int | None
+    :param dandiset_ids: Also remove the cached ``assets.jsonld`` of these Dandisets
+        regardless of the budget.
+    :type dandiset_ids: list[str] | None
+    :param clear: Remove every entry.
+    :type clear: bool
+    :returns: Cache keys of the removed entries.
+    :rtype: list[str]
+    """
+    if not _resolve_cache_directory().is_dir():
+        return []
+    keys = {
+        entry.key
+        for entry in _list_download_cache_entries()
+        if clear or (dandiset_ids is not None and entry.dandiset_id in dandiset_ids)
+    }
+    removed = _evict_download_cache_entries(max_bytes=max_bytes, keys=keys, blocking=True)
+    return [entry.key for entry in removed]
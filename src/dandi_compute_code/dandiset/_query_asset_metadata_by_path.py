@@ -0,0 +1,108 @@
+import logging
+import time
+from collections.abc import Collection
+
+import dandi.dandiapi
+import dandi.exceptions
+import requests
+
+from ._asset_index_snapshot import _asset_index_snapshot_path
+from ._compact_asset_index import _CompactAssetIndex
+from ._download_with_cache import _read_cached_download, _resolve_cache_directory
+from ._globals import (
+    _DEFAULT_DOCUMENT_BYTES,
+    _DOCUMENT_DOWNLOAD_BYTES_PER_SECOND,
+    _DOCUMENT_PARSE_BYTES_PER_SECOND,
+    _DOCUMENT_REQUEST_SECONDS,
+    _MAX_PER_PATH_QUERIES,
+    _PER_PATH_QUERY_SECONDS,
+)
+from ._load_assets_jsonld_metadata import AssetsJsonldMetadata, _assets_jsonld_cache_key, _build_asset_metadata
+
+_log = logging.getLogger(__name__)
+
+
+def _estimate_document_seconds(*, dandiset_id: str, max_age: float | None) -> float:
+    """
+    Estimate the cost of resolving paths through the Dandiset's whole ``assets.jsonld``.
+
+    A cached copy validated within *max_age* costs nothing to fetch, and nothing to
+    parse either when its index snapshot is present. Otherwise the estimate is one
+    request plus downloading and parsing a document the size of the cached copy
+    (:data:`._globals._DEFAULT_DOCUMENT_BYTES` if there is none); a revalidation that
+    ends in ``304 Not Modified`` is cheaper, so this errs towards per-path queries.
+    """
+    body_path = _resolve_cache_directory() / _assets_jsonld_cache_key(dandiset_id=dandiset_id)
+    cached_download = _read_cached_download(body_path)
+    if cached_download is None:
+        document_bytes = _DEFAULT_DOCUMENT_BYTES
+        is_fresh = False
+    else:
+        try:
+            document_bytes = body_path.stat().st_size
+        except OSError:
+            document_bytes = _DEFAULT_DOCUMENT_BYTES
+        is_fresh = (
+            max_age is not None
+            and cached_download.validated_at is not None
+            and time.time() - cached_download.validated_at < max_age
+        )
+
+    parse_seconds = document_bytes / _DOCUMENT_PARSE_BYTES_PER_SECOND
+    if is_fresh:
+        return 0.0 if _asset_index_snapshot_path(body_path).is_file() else parse_seconds
+    return _DOCUMENT_REQUEST_SECONDS + document_bytes / _DOCUMENT_DOWNLOAD_BYTES_PER_SECOND + parse_seconds
+
+
+def _prefer_per_path_queries(*, dandiset_id: str, wanted_count: int, max_age: float | None) -> bool:
+    """
+    Decide whether *wanted_count* per-path DANDI API queries beat reading the whole document.
+
+    Never true for more than :data:`._globals._MAX_PER_PATH_QUERIES` paths, so a
+    mis-estimated document cost cannot turn into thousands of API requests.
+    """
+    if wanted_count == 0:
+        return True
+    if wanted_count > _MAX_PER_PATH_QUERIES:
+        return False
+    per_path_seconds = wanted_count * _PER_PATH_QUERY_SECONDS
+    return per_path_seconds < _estimate_document_seconds(dandiset_id=dandiset_id, max_age=max_age)
+
+
+def _query_asset_metadata_by_path(*, dandiset_id: str, paths: Collection[str]) -> AssetsJsonldMetadata | None:
+    """
+    Look up each of *paths* in the draft of a Dandiset through the DANDI API.
+
+    Paths with no asset, or whose metadata lacks a required field, are left out of
+    the result, exactly as if they were absent from ``assets.jsonld``.
+
+    :returns: The metadata of the paths that exist, or ``None`` (with a warning) if
+        the archive could not be queried or the Dandiset is not found (e.g. deleted
+        or embargoed), so that the caller falls back to ``assets.jsonld``.
+    """
+    index = _CompactAssetIndex()
+    try:
+        client = dandi.dandiapi.DandiAPIClient()
+        try:
+            dandiset = client.get_dandiset(dandiset_id=dandiset_id)
+        except dandi.exceptions.NotFoundError as exception:
+            # Deleted or embargoed; the ``assets.jsonld`` path reports it the same way as any other failure.
+            _log.warning("Unable to query dandiset %s by path: %s", dandiset_id, exception)
+            return None
+        for path in sorted(paths):
+            try:
+                asset = dandiset.get_asset_by_path(path=path)
+            except dandi.exceptions.NotFoundError:
+                _log.debug("No asset at %s in dandiset %s", path, dandiset_id)
+                continue
+            try:
+                _, metadata = _build_asset_metadata(asset.get_raw_metadata())
+            except ValueError as exception:
+                _log.warning("%s", exception)
+                continue
+            index._add(metadata)
+    except requests.RequestException as exception:
+        _log.warning("Unable to query dandiset %s by path: %s", dandiset_id, exception)
+        return None
+    index._freeze()
+    return AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata=index)
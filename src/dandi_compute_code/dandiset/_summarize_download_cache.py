@@ -0,0 +1,45 @@
+import time
+
+from ._download_cache import _list_download_cache_entries, _load_download_cache_settings
+from ._download_with_cache import _resolve_cache_directory
+
+
+def summarize_download_cache() -> dict[str, object]:
+    """
+    Describe the download cache: its location, settings, and entries.
+
+    Entries are listed least recently used first. ``fresh`` marks cached
+    ``assets.jsonld`` documents still within their Dandiset's TTL, which upstream
+    lookups reuse without contacting the archive.
+
+    :returns: A JSON-serializable summary of the cache.
+    :rtype: dict[str, object]
+    """
+    cache_directory = _resolve_cache_directory()
+    settings = _load_download_cache_settings()
+    entries = _list_download_cache_entries() if cache_directory.is_dir() else []
+    now = time.time()
+
+    entry_summaries: list[dict[str, object]] = []
+    for entry in entries:
+        ttl_seconds = settings.ttl_seconds(entry.dandiset_id) if entry.dandiset_id is not None else None
+        age_seconds = now - entry.validated_at if entry.validated_at is not None else None
+        entry_summaries.append(
+            {
+                "key": entry.key,
+                "dandiset_id": entry.dandiset_id,
+                "size_bytes": entry.size_bytes,
+                "last_used_seconds_ago": round(now - entry.last_used, 1),
+                "validated_seconds_ago": round(age_seconds, 1) if age_seconds is not None else None,
+                "ttl_seconds": ttl_seconds,
+                "fresh": ttl_seconds is not None and age_seconds is not None and age_seconds < ttl_seconds,
+            }
+        )
+    return {
+        "directory": str(cache_directory),
+        "max_bytes": settings.max_bytes,
+        "total_bytes": sum(entry.size_bytes for entry in entries),
+        "default_ttl_seconds": settings.default_ttl_seconds,
+        "ttl_seconds_by_dandiset": settings.ttl_seconds_by_dandiset,
+        "entries": entry_summaries,
+    }
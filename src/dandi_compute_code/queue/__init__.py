@@ -6,6 +6,7 @@ from ._has_pending_jobs import has_pending_jobs
 from ._prepare_queue import prepare_queue
 from ._process_queue import process_queue
 from ._queue_state import JobEntry, QueueState
+from ._replenish_queue import replenish_queue
 from ._summarize_issues import summarize_issues
 from ._write_queue_state import JobInfo, write_archive_state, write_queue_state
 
@@ -20,6 +21,7 @@ __all__ = [
     "prepare_queue",
     "process_queue",
     "QueueState",
+    "replenish_queue",
     "summarize_issues",
     "write_archive_state",
     "write_queue_state",
@@ -5,6 +5,8 @@ import pathlib
 
 from ._duration_string_to_seconds import _duration_string_to_seconds
 from ._extract_nextflow_timeline_data import _extract_nextflow_timeline_data
+from ._iter_state_entries import _iter_state_entries
+from ._jsonl_state_file import _jsonl_state_file
 from ._resolve_attempt_dir import _resolve_attempt_dir
 
 
@@ -15,24 +17,23 @@ def aggregate_queue_statistics(
     output_file_name: str = "queue_stats.json",
 ) -> dict:
     """Write aggregate queue statistics JSON and return the written payload."""
-    state_file = queue_directory / "state.jsonl"
-    state_entries = (
-        [json.loads(line.strip()) for line in state_file.read_text().splitlines() if line.strip()]
-        if state_file.exists()
-        else []
-    )
-
-    successful_asset_bytes_total = sum(
-        entry["asset_size_bytes"]
-        for entry in state_entries
-        if entry.get("has_output")
-        and isinstance(entry.get("asset_size_bytes"), int)
-        and not isinstance(entry.get("asset_size_bytes"), bool)
-    )
+    state_file = _jsonl_state_file(queue_directory)
+    state_entries = _iter_state_entries(state_file) if state_file.exists() else iter(())
 
+    # A single streaming pass, so the state is never held in memory as a whole.
+    state_entry_count = 0
+    successful_asset_bytes_total = 0
     job_step_wall_time_seconds: collections.defaultdict[str, float] = collections.defaultdict(float)
     timeline_files_processed = 0
     for entry in state_entries:
+        state_entry_count += 1
+        if (
+            entry.get("has_output")
+            and isinstance(entry.get("asset_size_bytes"), int)
+            and not isinstance(entry.get("asset_size_bytes"), bool)
+        ):
+            successful_asset_bytes_total += entry["asset_size_bytes"]
+
         attempt_dir = _resolve_attempt_dir(base_dir=dandiset_directory, entry=entry)
         timeline_file = attempt_dir / "logs" / "timeline.html"
         if not timeline_file.is_file():
@@ -70,7 +71,7 @@ def aggregate_queue_statistics(
 
     statistics = {
         "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-        "state_entry_count": len(state_entries),
+        "state_entry_count": state_entry_count,
         "successful_asset_bytes_total": successful_asset_bytes_total,
         "timeline_files_processed": timeline_files_processed,
         "job_step_wall_time_seconds": {
@@ -0,0 +1,62 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class _AssetAttemptPolicy:
+    """
+    The per-asset limits of one pipeline in ``queue_config.json``.
+
+    ``max_attempts_per_asset`` caps the attempt capsules any single asset may have.
+    Each value of ``asset_overrides`` (keyed by content ID) is one of:
+
+    * ``null`` — never prepare the asset;
+    * an integer (or a string of digits) — a per-asset replacement for
+      ``max_attempts_per_asset``;
+    * any other string — a params key the asset is pinned to; it is prepared with
+      that params key only, even if the key is not listed in ``params_priority``.
+    """
+
+    max_attempts: int | None = None
+    overrides: dict[str, object] = field(default_factory=dict)
+
+    @classmethod
+    def from_pipeline_config(cls, pipeline_config: dict) -> "_AssetAttemptPolicy":
+        return cls(
+            max_attempts=pipeline_config.get("max_attempts_per_asset"),
+            overrides=dict(pipeline_config.get("asset_overrides") or {}),
+        )
+
+    def pinned_params(self, content_id: str) -> str | None:
+        """The params key *content_id* is pinned to, if any."""
+        override = self.overrides.get(content_id)
+        if isinstance(override, str) and not override.isdigit():
+            return override
+        return None
+
+    def params_to_prepare(self, params_priority: Iterable[str]) -> list[str]:
+        """*params_priority* followed by the pinned params keys it does not list."""
+        params_keys = list(params_priority)
+        for content_id in self.overrides:
+            pinned = self.pinned_params(content_id)
+            if pinned is not None and pinned not in params_keys:
+                params_keys.append(pinned)
+        return params_keys
+
+    def skip_reason(self, *, content_id: str, params: str, attempt_count: int) -> str | None:
+        """
+        Explain why *content_id* must not be prepared with *params*; ``None`` if it may be.
+
+        :param attempt_count: Attempt capsules already recorded for the asset under this pipeline.
+        """
+        if content_id in self.overrides and self.overrides[content_id] is None:
+            return "skipped by asset_overrides"
+        pinned = self.pinned_params(content_id)
+        if pinned is not None and pinned != params:
+            return f"pinned to params {pinned!r} by asset_overrides"
+
+        override = self.overrides.get(content_id)
+        max_attempts = int(override) if isinstance(override, int | str) and pinned is None else self.max_attempts
+        if max_attempts is not None and attempt_count >= max_attempts:
+            return f"attempt count ({attempt_count}) has reached max_attempts_per_asset ({max_attempts})"
+        return None
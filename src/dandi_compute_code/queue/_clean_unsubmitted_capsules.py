@@ -3,6 +3,7 @@ import pathlib
 import shutil
 import subprocess
 
+from ._jsonl_state_file import _jsonl_state_file
 from ._read_state_entries import _read_state_entries
 from ._resolve_unsubmitted_attempt_dir import _resolve_unsubmitted_attempt_dir
 
@@ -78,7 +79,7 @@ def clean_unsubmitted_capsules(
         message = "`DANDI_API_KEY` environment variable is not set or is blank."
         raise RuntimeError(message)
 
-    state_entries = _read_state_entries(queue_directory / "state.jsonl")
+    state_entries = _read_state_entries(_jsonl_state_file(queue_directory))
 
     cleanable_attempt_dirs = [
         attempt_dir
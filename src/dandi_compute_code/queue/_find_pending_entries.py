@@ -1,5 +1,6 @@
 import logging
 
+from ._queue_utils import _pending_code_dirs_from_paths
 from ..dandiset._load_assets_jsonld_metadata import load_assets_jsonld_metadata
 
 _log = logging.getLogger(__name__)
@@ -21,18 +22,5 @@ def _find_pending_entries() -> list[str]:
         Sorted list of ``code`` directory paths (relative to the Dandiset root)
         that are pending submission. Empty when nothing is awaiting submission.
     """
-    metadata = load_assets_jsonld_metadata()
-    paths = set(metadata.path_to_asset_metadata.keys())
-
-    pending_entries: list[str] = []
-    for asset_path in sorted(paths):
-        if asset_path.endswith("/code/submit.sh"):
-            code_dir_path = asset_path[: -len("/submit.sh")]
-            submitted_marker_prefix = f"{code_dir_path}/submitted_date-"
-            has_submitted_marker = any(
-                path == f"{code_dir_path}/submitted" or path.startswith(submitted_marker_prefix) for path in paths
-            )
-            if not has_submitted_marker:
-                pending_entries.append(code_dir_path)
-
-    return pending_entries
+    metadata = load_assets_jsonld_metadata(keep_raw_assets=False)
+    return _pending_code_dirs_from_paths(metadata.path_to_asset_metadata.keys())
@@ -5,13 +5,31 @@ import re
 _AIND_EPHYS_PARAMS_REGISTRY_PATH = (
     pathlib.Path(__file__).parent.parent / "aind_ephys_pipeline" / "registries" / "registered_params.json"
 )
+_AIND_EPHYS_CONFIG_REGISTRY_PATH = (
+    pathlib.Path(__file__).parent.parent / "aind_ephys_pipeline" / "registries" / "registered_configs.json"
+)
 _QUEUE_CONFIG_SCHEMA_PATH = pathlib.Path(__file__).parent / "schemas" / "queue_config.linkml.yaml"
 # TODO: consolidate this RE with the other globals and generalize to any job capsule
 _FLAT_ATTEMPT_DIR_RE = re.compile(r"^version-(?P<version>.+?)_codebase-[^_]+_params-[^_]+_config-[^_]+_attempt-\d+$")
 _DURATION_PART_RE = re.compile(r"(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>ms|s|m|h|d)\b")
+#: Upper bound on concurrent upstream ``assets.jsonld`` downloads while building a queue state.
+_UPSTREAM_PREFETCH_MAX_WORKERS = 8
+#: Above this many recomputed attempts an incremental refresh parses every asset path instead of pre-filtering.
+_INCREMENTAL_MAX_ATTEMPT_MARKERS = 256
+#: A state journal is compacted into its state file once it exceeds this many bytes and...
+_STATE_JOURNAL_COMPACT_MIN_BYTES = 1024**2
+#: ...this fraction of the state file's size.
+_STATE_JOURNAL_COMPACT_RATIO = 0.25
+#: A prepared capsule not yet listed in ``assets.jsonld`` keeps its journaled state entry across refreshes this long.
+_PREPARED_CAPSULE_GRACE_SECONDS = 24 * 60 * 60
 TEST_QUEUE_CONTENT_ID = "048d1ee9-83b7-491f-8f02-1ca615b1d455"
 
 try:
     _AIND_EPHYS_PARAMS_REGISTRY: dict = json.loads(_AIND_EPHYS_PARAMS_REGISTRY_PATH.read_text())
 except (OSError, json.JSONDecodeError):
     _AIND_EPHYS_PARAMS_REGISTRY = {}
+
+try:
+    _AIND_EPHYS_CONFIG_REGISTRY: dict = json.loads(_AIND_EPHYS_CONFIG_REGISTRY_PATH.read_text())
+except (OSError, json.JSONDecodeError):
+    _AIND_EPHYS_CONFIG_REGISTRY = {}
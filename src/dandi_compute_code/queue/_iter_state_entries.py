@@ -0,0 +1,22 @@
+import pathlib
+from collections.abc import Iterator
+
+from ._state_journal import _iter_state_records
+
+
+def _iter_state_entries(state_file: pathlib.Path, /) -> Iterator[dict]:
+    """
+    Stream newline-delimited JSON entries from a queue state file, one line at a time.
+
+    Changes appended to the state's journal are merged in.
+
+    Raises
+    ------
+    FileNotFoundError
+        If *state_file* does not exist.
+    """
+    if not state_file.exists():
+        message = f"State file not found: {state_file}"
+        raise FileNotFoundError(message)
+
+    return _iter_state_records(state_file)
@@ -11,9 +11,14 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class JobInfo:
-    """Immutable identity of one attempt capsule."""
+    """
+    Immutable identity of one attempt capsule.
+
+    Slotted, since a full queue state holds one per capsule; loaders intern the
+    strings that repeat across capsules (see :meth:`JobEntry.from_dict`).
+    """
 
     dandiset_id: str
     dandi_path: str
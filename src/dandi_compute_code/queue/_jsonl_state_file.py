@@ -0,0 +1,27 @@
+import pathlib
+
+from ._queue_state_store import _STATE_STORE_SUFFIX
+
+
+def _jsonl_state_file(queue_directory: pathlib.Path, /, *, name: str = "state") -> pathlib.Path:
+    """
+    Return the ``<name>.jsonl`` state file under *queue_directory* read and journaled by the queue functions.
+
+    Only :class:`~._queue_state.QueueState` keeps a ``<name>.sqlite`` store in
+    sync, and once the store exists it is the state the queue commands use. The
+    queue functions (the fallback of those commands) would update the JSON Lines
+    file behind its back, so they refuse to run next to a store instead.
+
+    Raises
+    ------
+    RuntimeError
+        If a ``<name>.sqlite`` store exists under *queue_directory*.
+    """
+    store_file = queue_directory / f"{name}{_STATE_STORE_SUFFIX}"
+    if store_file.exists():
+        message = (
+            f"{store_file} is kept in sync by QueueState only; refusing to use {name}.jsonl directly. "
+            "Run the command through QueueState, or export the store with QueueState.sqlite_to_jsonl and remove it."
+        )
+        raise RuntimeError(message)
+    return queue_directory / f"{name}.jsonl"
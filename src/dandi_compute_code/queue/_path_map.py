@@ -0,0 +1,91 @@
+import json
+import os
+import sys
+from collections.abc import ItemsView, Iterator, Mapping, ValuesView
+
+
+class _PathMapItems(ItemsView):
+    __slots__ = ()
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        prefix = self._mapping._prefix
+        suffixes, values = self._mapping._decode()
+        return ((prefix + suffix, value) for suffix, value in zip(suffixes, values))
+
+
+class _PathMapValues(ValuesView):
+    __slots__ = ()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._mapping._decode()[1])
+
+
+class _PathMap(Mapping[str, str]):
+    """
+    Immutable ``{asset_path: content_id}`` map of one attempt capsule, stored compactly.
+
+    The asset paths of a capsule share its directory, so the map keeps that
+    common prefix once (interned) and encodes the rest of each path and its value
+    into a single compact JSON string, decoded on access. That is a fraction of
+    the size of a ``dict`` holding two string objects per path. Iteration order,
+    equality with plain dicts and ``dict(path_map)`` are unchanged; every access
+    decodes the string again, which is fine for the few reads these maps see.
+    """
+
+    __slots__ = ("_prefix", "_encoded", "_length")
+
+    def __init__(self, mapping: Mapping[str, str] | None = None, /) -> None:
+        mapping = mapping or {}
+        prefix = os.path.commonprefix(list(mapping))
+        prefix = prefix[: prefix.rfind("/") + 1]
+        self._prefix = sys.intern(prefix)
+        self._encoded = json.dumps(
+            [[path[len(prefix) :] for path in mapping], list(mapping.values())],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        self._length = len(mapping)
+
+    @classmethod
+    def of(cls, mapping: Mapping[str, str] | None, /) -> "_PathMap":
+        """Return *mapping* as a :class:`_PathMap`, sharing one instance for every empty map."""
+        if isinstance(mapping, _PathMap):
+            return mapping
+        if not mapping:
+            return _EMPTY_PATH_MAP
+        return cls(mapping)
+
+    def _decode(self) -> tuple[list[str], list[str]]:
+        suffixes, values = json.loads(self._encoded)
+        return suffixes, values
+
+    def __getitem__(self, path: str) -> str:
+        if isinstance(path, str) and path.startswith(self._prefix):
+            suffixes, values = self._decode()
+            try:
+                return values[suffixes.index(path[len(self._prefix) :])]
+            except ValueError:
+                pass
+        raise KeyError(path)
+
+    def __iter__(self) -> Iterator[str]:
+        prefix = self._prefix
+        return (prefix + suffix for suffix in self._decode()[0])
+
+    def __len__(self) -> int:
+        return self._length
+
+    def items(self) -> _PathMapItems:
+        return _PathMapItems(self)
+
+    def values(self) -> _PathMapValues:
+        return _PathMapValues(self)
+
+    def __hash__(self) -> int:
+        return hash(frozenset(self.items()))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+_EMPTY_PATH_MAP = _PathMap()
@@ -0,0 +1,119 @@
+import collections
+import pathlib
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from ._write_queue_state import _parse_attempt_identity
+
+
+@dataclass
+class _PreparationIndex:
+    """
+    Counts over the queue state that drive queue preparation, built in one pass.
+
+    Covers failures by ``(pipeline, version, dandiset_id)``, the source Dandisets
+    of each content ID, attempts by ``(content_id, pipeline)`` and the
+    ``(content_id, pipeline, version, params, config)`` combinations that need no
+    new attempt. Those are the pending capsules (including submitted ones that
+    have not produced logs yet) and the successful ones. Capsules with logs but no
+    output cannot be told apart from failures in ``state.jsonl``, so they are left
+    out and retries stay governed by the failure caps.
+
+    :meth:`reserve_attempt` counts an attempt as soon as it is handed to a worker,
+    and :meth:`release_attempt` gives it back if nothing was prepared, so the
+    attempt cap holds however many preparations are in flight.
+    :meth:`record_prepared` updates the rest in place as capsules are prepared,
+    from any worker thread, so later iterations of the same run see the new
+    capsules without rescanning.
+    """
+
+    failure_counts: collections.Counter[tuple[str, str, str]] = field(default_factory=collections.Counter)
+    content_id_to_dandiset_ids: dict[str, set[str]] = field(default_factory=dict)
+    attempt_counts: collections.Counter[tuple[str, str]] = field(default_factory=collections.Counter)
+    prepared_combinations: set[tuple[str, str, str, str, str]] = field(default_factory=set)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], /, *, archived_records: Iterable[dict] = ()) -> "_PreparationIndex":
+        """Index the ``state.jsonl`` *records*; *archived_records* (e.g. ``archive_state.jsonl``) only add attempts."""
+        index = cls()
+        for record in records:
+            has_code, has_logs, has_output = record.get("has_code"), record.get("has_logs"), record.get("has_output")
+            index.count_entry(
+                content_id=record.get("content_id"),
+                combination=(record.get("pipeline"), record.get("version"), record.get("params"), record.get("config")),
+                dandiset_id=record.get("dandiset_id"),
+                is_failed=bool(has_code and has_logs and not has_output),
+                is_prepared=bool(has_output or (has_code and not has_logs)),
+            )
+        for record in archived_records:
+            index.count_archived_entry(content_id=record.get("content_id"), pipeline=record.get("pipeline"))
+        return index
+
+    def count_entry(
+        self,
+        *,
+        content_id: str | None,
+        combination: tuple[str, str, str, str],
+        dandiset_id: str | None,
+        is_failed: bool,
+        is_prepared: bool,
+    ) -> None:
+        """
+        Count one entry of the state while the index is built, before any worker reads it.
+
+        :param combination: ``(pipeline, version, params, config)`` of the entry.
+        :param is_prepared: Whether the entry is pending or successful, so needs no new attempt.
+        """
+        pipeline, version = combination[:2]
+        if is_failed and dandiset_id:
+            self.failure_counts[(pipeline, version, dandiset_id)] += 1
+        if not content_id:
+            return
+        if dandiset_id:
+            self.content_id_to_dandiset_ids.setdefault(content_id, set()).add(dandiset_id)
+        self.attempt_counts[(content_id, pipeline)] += 1
+        if is_prepared:
+            self.prepared_combinations.add((content_id, *combination))
+
+    def count_archived_entry(self, *, content_id: str | None, pipeline: str) -> None:
+        """Count one archived attempt while the index is built; archived attempts only add to the attempt counts."""
+        if content_id:
+            self.attempt_counts[(content_id, pipeline)] += 1
+
+    def dandiset_ids_for(self, content_id: str) -> frozenset[str]:
+        """A snapshot of the source Dandisets known for *content_id*."""
+        with self._lock:
+            return frozenset(self.content_id_to_dandiset_ids.get(content_id, ()))
+
+    def reserve_attempt(self, *, content_id: str, pipeline: str) -> None:
+        """Count an attempt for *content_id* under *pipeline* before it is prepared."""
+        with self._lock:
+            self.attempt_counts[(content_id, pipeline)] += 1
+
+    def release_attempt(self, *, content_id: str, pipeline: str) -> None:
+        """Give back an attempt reserved with :meth:`reserve_attempt` that did not prepare a capsule."""
+        with self._lock:
+            self.attempt_counts[(content_id, pipeline)] -= 1
+
+    def record_prepared(
+        self,
+        *,
+        content_id: str,
+        combination: tuple[str, str, str, str],
+        script_path: pathlib.Path | None = None,
+    ) -> None:
+        """
+        Record a capsule just prepared for *content_id* under *combination*.
+
+        Its attempt was already counted by :meth:`reserve_attempt`.
+
+        :param combination: ``(pipeline, version, params, config)`` as recorded in capsule paths.
+        :param script_path: The capsule's submission script; its path names the source Dandiset.
+        """
+        parsed = _parse_attempt_identity(str(script_path)) if script_path is not None else None
+        with self._lock:
+            self.prepared_combinations.add((content_id, *combination))
+            if parsed is not None:
+                self.content_id_to_dandiset_ids.setdefault(content_id, set()).add(parsed[0].dandiset_id)
@@ -0,0 +1,69 @@
+import concurrent.futures
+from collections.abc import Callable
+
+
+class _PreparationPool:
+    """
+    Run queue preparations on a bounded thread pool while honoring a global limit exactly.
+
+    Work is submitted in priority order, and each submission reserves as many
+    slots of *limit* as the assets it may prepare. The count it returns (assets
+    actually prepared) replaces that reservation once it finishes, so skipped
+    assets free their slot for the next candidate instead of overshooting or
+    undershooting *limit*. With ``workers=1`` the preparations run one at a time,
+    in order, exactly like the serial loop.
+    """
+
+    def __init__(self, *, workers: int, limit: int | None) -> None:
+        if workers < 1:
+            message = f"workers must be at least 1, got {workers}"
+            raise ValueError(message)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prepare")
+        self._workers = workers
+        self._limit = limit
+        self._reservations: dict[concurrent.futures.Future[int], int] = {}
+        self.prepared_count = 0
+
+    @property
+    def reserved_count(self) -> int:
+        """Assets that submitted but unfinished preparations may still add to :attr:`prepared_count`."""
+        return sum(self._reservations.values())
+
+    def _wait_for_any(self) -> None:
+        done, _ = concurrent.futures.wait(self._reservations, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            del self._reservations[future]
+            self.prepared_count += future.result()
+
+    def has_capacity(self) -> bool:
+        """
+        Block until another preparation may be submitted; ``False`` once *limit* is reached.
+
+        :raises Exception: Whatever a finished preparation raised.
+        """
+        while self._reservations and (
+            len(self._reservations) >= self._workers
+            or (self._limit is not None and self.prepared_count + self.reserved_count >= self._limit)
+        ):
+            self._wait_for_any()
+        return self._limit is None or self.prepared_count + self.reserved_count < self._limit
+
+    def submit(self, function: Callable[[], int], *, size: int = 1) -> None:
+        """Start *function*, which prepares up to *size* assets and returns how many it prepared."""
+        self._reservations[self._executor.submit(function)] = size
+
+    def drain(self) -> int:
+        """
+        Wait for every submitted preparation and return the total number of prepared assets.
+
+        :raises Exception: Whatever a finished preparation raised.
+        """
+        while self._reservations:
+            self._wait_for_any()
+        return self.prepared_count
+
+    def __enter__(self) -> "_PreparationPool":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
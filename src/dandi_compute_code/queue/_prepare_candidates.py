@@ -0,0 +1,173 @@
+import functools
+import logging
+import pathlib
+from collections.abc import Callable
+
+from ._asset_attempt_policy import _AssetAttemptPolicy
+from ._preparation_index import _PreparationIndex
+from ._preparation_pool import _PreparationPool
+from ._resolve_config_key_to_id import _resolve_config_key_to_id
+from ._resolve_params_key_to_id import _resolve_params_key_to_id
+from ..aind_ephys_pipeline import AindEphysJobRequest
+
+_log = logging.getLogger(__name__)
+
+
+def _prepare_candidates(
+    *,
+    queue_config: dict,
+    content_ids: list[str],
+    index: _PreparationIndex,
+    config_key: str,
+    prepare_job: Callable[..., pathlib.Path],
+    prepare_jobs: Callable[..., dict[AindEphysJobRequest, pathlib.Path]],
+    journal_prepared: Callable[..., None],
+    limit: int | None = None,
+    batch_size: int | None = None,
+    workers: int | None = None,
+) -> int:
+    """
+    Prepare the candidate content IDs of every pipeline/version/params combination in *queue_config*.
+
+    Shared by :func:`~._prepare_queue.prepare_queue` and :meth:`~._queue_state.QueueState.prepare`, which
+    read the state into *index* and pass the preparation functions bound to their pipeline directory and
+    config. Combinations already in *index*, ``asset_overrides``, ``max_attempts_per_asset`` and
+    ``max_fail_per_dandiset`` decide which candidates are skipped; every capsule prepared is recorded in
+    *index* and handed to *journal_prepared*, so later candidates of the same run see it.
+
+    :param prepare_job: Called as ``prepare_job(content_id=, parameters_key=, pipeline_version=)``.
+    :param prepare_jobs: Called as ``prepare_jobs(jobs=)`` with a list of
+        :class:`~dandi_compute_code.aind_ephys_pipeline.AindEphysJobRequest`.
+    :param journal_prepared: Called as ``journal_prepared(content_id=, script_path=)`` for each capsule prepared.
+    :returns: The number of assets prepared.
+    """
+    already_prepared_count = 0
+
+    def record_prepared(*, content_id: str, combination: tuple[str, str, str, str], script_path: pathlib.Path) -> None:
+        index.record_prepared(content_id=content_id, combination=combination, script_path=script_path)
+        journal_prepared(content_id=content_id, script_path=script_path)
+
+    #: Batched requests waiting for submission, each with the combination it prepares.
+    pending_jobs: list[tuple[AindEphysJobRequest, tuple[str, str, str, str]]] = []
+
+    def prepare_batch(jobs: list[tuple[AindEphysJobRequest, tuple[str, str, str, str]]]) -> int:
+        _log.info(f"Preparing a batch of {len(jobs)} content IDs")
+        prepared = prepare_jobs(jobs=[job for job, _ in jobs])
+        for job, combination in jobs:
+            if job in prepared:
+                record_prepared(content_id=job.content_id, combination=combination, script_path=prepared[job])
+            else:
+                index.release_attempt(content_id=job.content_id, pipeline=combination[0])
+        return len(prepared)
+
+    def submit_pending_jobs() -> None:
+        pool.submit(functools.partial(prepare_batch, list(pending_jobs)), size=len(pending_jobs))
+        pending_jobs.clear()
+
+    def prepare_one(*, version: str, params: str, content_id: str, combination: tuple[str, str, str, str]) -> int:
+        _log.info(f"Preparing content ID: {content_id}")
+        try:
+            script_path = prepare_job(content_id=content_id, parameters_key=params, pipeline_version=version)
+        except ValueError as error:  # Including UnmappedContentIDError, as for a batch
+            _log.warning(f"Skipping preparation for {combination[0]}/{version}/{params}/{content_id}: {error}")
+            index.release_attempt(content_id=content_id, pipeline=combination[0])
+            return 0
+        record_prepared(content_id=content_id, combination=combination, script_path=script_path)
+        return 1
+
+    with _PreparationPool(workers=workers or 1, limit=limit) as pool:
+        for pipeline_name, pipeline_data in queue_config.get("pipelines", {}).items():
+            if not pool.has_capacity():
+                break
+            attempt_policy = _AssetAttemptPolicy.from_pipeline_config(pipeline_data)
+            params_priority = pipeline_data.get("params_priority", [])
+            max_fail = pipeline_data.get("max_fail_per_dandiset")
+            for version in pipeline_data.get("version_priority", []):
+                if not pool.has_capacity():
+                    break
+                for params in attempt_policy.params_to_prepare(params_priority):
+                    if not pool.has_capacity():
+                        break
+                    # Params keys only reached through a pin are prepared for their pinned assets alone.
+                    candidate_content_ids = (
+                        content_ids
+                        if params in params_priority
+                        else [cid for cid in content_ids if attempt_policy.pinned_params(cid) == params]
+                    )
+                    # Capsule paths record the version with "+" for "-" and the registered ids of params and config.
+                    combination = (
+                        pipeline_name,
+                        version.replace("-", "+"),
+                        _resolve_params_key_to_id(pipeline_name, params),
+                        _resolve_config_key_to_id(pipeline_name, config_key),
+                    )
+
+                    for content_id in candidate_content_ids:
+                        if not pool.has_capacity():
+                            break
+                        if (content_id, *combination) in index.prepared_combinations:
+                            already_prepared_count += 1
+                            continue
+                        skip_reason = attempt_policy.skip_reason(
+                            content_id=content_id,
+                            params=params,
+                            attempt_count=index.attempt_counts[(content_id, pipeline_name)],
+                        )
+                        if skip_reason is not None:
+                            _log.info(
+                                f"Skipping preparation for {pipeline_name}/{version}/{params}/{content_id}: "
+                                f"{skip_reason}."
+                            )
+                            continue
+                        if max_fail is not None:
+                            dandiset_ids = index.dandiset_ids_for(content_id)
+                            if len(dandiset_ids) == 1:
+                                dandiset_id = next(iter(dandiset_ids))
+                                failure_count = index.failure_counts[(pipeline_name, version, dandiset_id)]
+                                if failure_count >= max_fail:
+                                    _log.info(
+                                        f"Skipping preparation for {pipeline_name}/{version}/{params}/{content_id}: "
+                                        f"failure count ({failure_count}) for dandiset-{dandiset_id} has reached "
+                                        f"max_fail_per_dandiset ({max_fail})."
+                                    )
+                                    continue
+                            else:
+                                mapped_dandisets = ", ".join(sorted(dandiset_ids)) if dandiset_ids else "<none>"
+                                _log.info(
+                                    f"Preparing {content_id} without max_fail_per_dandiset enforcement for "
+                                    f"{pipeline_name}/{version}/{params}: expected exactly 1 mapped dandiset but "
+                                    f"found {len(dandiset_ids)} ({mapped_dandisets})."
+                                )
+
+                        # Counted here rather than once prepared, so in-flight attempts count towards the cap.
+                        index.reserve_attempt(content_id=content_id, pipeline=pipeline_name)
+                        if batch_size is not None:
+                            pending_jobs.append(
+                                (
+                                    AindEphysJobRequest(
+                                        content_id=content_id, pipeline_version=version, parameters_key=params
+                                    ),
+                                    combination,
+                                )
+                            )
+                            if len(pending_jobs) >= batch_size or (
+                                limit is not None
+                                and pool.prepared_count + pool.reserved_count + len(pending_jobs) >= limit
+                            ):
+                                submit_pending_jobs()
+                            continue
+
+                        pool.submit(
+                            functools.partial(
+                                prepare_one,
+                                version=version,
+                                params=params,
+                                content_id=content_id,
+                                combination=combination,
+                            )
+                        )
+        if pending_jobs:
+            submit_pending_jobs()
+        prepared_count = pool.drain()
+    _log.info(f"Skipped {already_prepared_count} content IDs with a pending or successful capsule already")
+    return prepared_count
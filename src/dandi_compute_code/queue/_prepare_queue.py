@@ -1,13 +1,21 @@
-import collections
+import datetime
+import functools
 import gzip
 import json
 import logging
 import pathlib
-import urllib.request
+import threading
 
+from ._jsonl_state_file import _jsonl_state_file
 from ._load_queue_config import _load_queue_config
 from ._order_content_ids_for_uniform_dandiset_sampling import _order_content_ids_for_uniform_dandiset_sampling
-from ..aind_ephys_pipeline import UnmappedContentIDError, prepare_aind_ephys_job
+from ._preparation_index import _PreparationIndex
+from ._prepare_candidates import _prepare_candidates
+from ._read_state_entries import _read_state_entries
+from ._state_journal import _append_to_state_journal, _put_operation, _write_state_file
+from ._write_queue_state import _new_attempt_record, _parse_attempt_identity
+from ..aind_ephys_pipeline import prepare_aind_ephys_job, prepare_aind_ephys_jobs
+from ..dandiset._http_client import _http_open
 
 _log = logging.getLogger(__name__)
 
@@ -21,7 +29,10 @@ def prepare_queue(
     config_key: str = "default",
     content_ids: list[str] | None = None,
     limit: int | None = None,
-) -> None:
+    batch_size: int | None = None,
+    workers: int | None = None,
+    count_archived_attempts: bool = True,
+) -> int:
     """
     En-masse preparation of qualifying assets based on the current queue config.
 
@@ -38,6 +49,19 @@ def prepare_queue(
     version, and source Dandiset.  Run :func:`write_queue_state` beforehand to
     ensure ``state.jsonl`` is up to date.
 
+    ``max_attempts_per_asset`` caps the attempt capsules recorded per content ID
+    and pipeline.  Each ``asset_overrides`` value either skips the asset
+    (``null``), replaces its attempt cap (an integer), or pins it to a single
+    params key (any other string).
+
+    Content IDs that already have a pending or successful capsule in ``state.jsonl``
+    for the exact pipeline, version, params and config are skipped before any
+    preparation work, and the number skipped is logged.  Every capsule prepared is
+    added to ``state.jsonl`` as pending through its change journal, so later runs
+    skip it and :func:`replenish_queue` counts it even before the state is refreshed.
+    An asset that cannot be prepared (any ``ValueError`` of the preparation, such
+    as an unmapped content ID) is skipped with a warning, one by one or in a batch.
+
     :param queue_directory: Path to the queue root directory.
     :type queue_directory: pathlib.Path
     :param pipeline_directory: Local path to the AIND pipeline repository.  Passed directly to
@@ -56,6 +80,21 @@ def prepare_queue(
         automatically, they are randomized in round-robin order across source
         Dandisets before this limit is applied. Useful for testing.
     :type limit: int, optional
+    :param batch_size: If provided, prepare up to *batch_size* assets at a time with
+        :func:`~dandi_compute_code.aind_ephys_pipeline.prepare_aind_ephys_jobs` (one
+        Dandiset download and one upload per batch) instead of one by one.
+    :type batch_size: int, optional
+    :param workers: If provided, run up to *workers* preparations (single assets or
+        batches) at once on a thread pool. Candidates are still submitted in priority
+        order, *limit* is still honored exactly, and the ``max_fail_per_dandiset``
+        counts are read from ``state.jsonl`` before any preparation starts, so every
+        worker enforces the same caps. Each preparation opens its own DANDI client.
+    :type workers: int, optional
+    :param count_archived_attempts: Also count the attempts recorded in ``archive_state.jsonl``
+        towards ``max_attempts_per_asset``.
+    :type count_archived_attempts: bool
+    :returns: The number of assets prepared.
+    :rtype: int
     """
     queue_config = _load_queue_config(queue_directory=queue_directory)
 
@@ -64,92 +103,51 @@ def prepare_queue(
             "https://raw.githubusercontent.com/dandi-cache/qualifying-aind-content-ids/dist/"
             "derivatives/qualifying_aind_content_ids.jsonl.gz"
         )
-        with urllib.request.urlopen(url=qualifying_aind_content_ids_url) as response:
+        with _http_open(qualifying_aind_content_ids_url) as response:
             decompressed = gzip.decompress(response.read()).decode()
             fetched_content_ids = [json.loads(line) for line in decompressed.splitlines() if line.strip()]
         content_ids = _order_content_ids_for_uniform_dandiset_sampling(content_ids=fetched_content_ids)
 
-    state_file = queue_directory / "state.jsonl"
-    state_entries = (
-        [json.loads(line.strip()) for line in state_file.read_text().splitlines() if line.strip()]
-        if state_file.exists()
-        else []
+    state_file = _jsonl_state_file(queue_directory)
+    archive_state_file = _jsonl_state_file(queue_directory, name="archive_state") if count_archived_attempts else None
+    index = _PreparationIndex.from_records(
+        _read_state_entries(state_file) if state_file.exists() else [],
+        archived_records=(
+            _read_state_entries(archive_state_file)
+            if archive_state_file is not None and archive_state_file.exists()
+            else []
+        ),
     )
+    state_file_lock = threading.Lock()
 
-    # Build from all known state entries. A content ID is expected to map to a
-    # stable source dandiset in normal operation; ambiguous mappings are handled
-    # conservatively below by skipping max-failure enforcement for that asset.
-    content_id_to_dandiset_ids: dict[str, set[str]] = {}
-    for entry in state_entries:
-        content_id = entry.get("content_id")
-        dandiset_id = entry.get("dandiset_id")
-        if content_id and dandiset_id:
-            content_id_to_dandiset_ids.setdefault(content_id, set()).add(dandiset_id)
-    failure_entries = [
-        entry
-        for entry in state_entries
-        if entry.get("has_code") and entry.get("has_logs") and not entry.get("has_output")
-    ]
-
-    prepared_count = 0
-    for pipeline_name, pipeline_data in queue_config.get("pipelines", {}).items():
-        if limit is not None and prepared_count >= limit:
-            break
-        for version in pipeline_data.get("version_priority", []):
-            if limit is not None and prepared_count >= limit:
-                break
-            for params in pipeline_data.get("params_priority", []):
-                if limit is not None and prepared_count >= limit:
-                    break
-                pipeline_cfg = queue_config["pipelines"][pipeline_name]
+    def journal_prepared(*, content_id: str, script_path: pathlib.Path) -> None:
+        parsed = _parse_attempt_identity(str(script_path))
+        if parsed is None:
+            return
+        record = {
+            **_new_attempt_record(parsed[0]),
+            "content_id": content_id,
+            "has_code": True,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        with state_file_lock:
+            if not state_file.exists():
+                _write_state_file(state_file, [])
+            _append_to_state_journal(state_file, [_put_operation(record)])
 
-                max_fail = pipeline_cfg.get("max_fail_per_dandiset")
-                failure_count_by_dandiset: collections.defaultdict[str, int] = collections.defaultdict(int)
-                if max_fail is not None:
-                    for entry in failure_entries:
-                        if entry.get("pipeline") != pipeline_name or entry.get("version", "") != version:
-                            continue
-                        dandiset_id = entry.get("dandiset_id")
-                        if not dandiset_id:
-                            continue
-                        failure_count_by_dandiset[dandiset_id] += 1
-
-                for content_id in content_ids:
-                    if limit is not None and prepared_count >= limit:
-                        break
-                    if max_fail is not None:
-                        dandiset_ids = content_id_to_dandiset_ids.get(content_id, set())
-                        if len(dandiset_ids) == 1:
-                            dandiset_id = next(iter(dandiset_ids))
-                            failure_count = failure_count_by_dandiset.get(dandiset_id, 0)
-                            if failure_count >= max_fail:
-                                _log.info(
-                                    f"Skipping preparation for {pipeline_name}/{version}/{params}/{content_id}: "
-                                    f"failure count ({failure_count}) for dandiset-{dandiset_id} has reached "
-                                    f"max_fail_per_dandiset ({max_fail})."
-                                )
-                                continue
-                        else:
-                            mapped_dandisets = ", ".join(sorted(dandiset_ids)) if dandiset_ids else "<none>"
-                            _log.info(
-                                f"Preparing {content_id} without max_fail_per_dandiset enforcement for "
-                                f"{pipeline_name}/{version}/{params}: expected exactly 1 mapped dandiset but "
-                                f"found {len(dandiset_ids)} ({mapped_dandisets})."
-                            )
-
-                    _log.info(f"Preparing content ID: {content_id}")
-                    try:
-                        prepare_aind_ephys_job(
-                            content_id=content_id,
-                            parameters_key=params,
-                            pipeline_version=version,
-                            pipeline_directory=pipeline_directory,
-                            config_key=config_key,
-                            silent=True,
-                        )
-                    except UnmappedContentIDError as error:
-                        _log.warning(
-                            f"Skipping preparation for {pipeline_name}/{version}/{params}/{content_id}: {error}"
-                        )
-                        continue
-                    prepared_count += 1
+    return _prepare_candidates(
+        queue_config=queue_config,
+        content_ids=content_ids,
+        index=index,
+        config_key=config_key,
+        prepare_job=functools.partial(
+            prepare_aind_ephys_job, pipeline_directory=pipeline_directory, config_key=config_key, silent=True
+        ),
+        prepare_jobs=functools.partial(
+            prepare_aind_ephys_jobs, config_key=config_key, pipeline_directory=pipeline_directory, silent=True
+        ),
+        journal_prepared=journal_prepared,
+        limit=limit,
+        batch_size=batch_size,
+        workers=workers,
+    )
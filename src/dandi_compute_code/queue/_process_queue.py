@@ -5,6 +5,8 @@ import time
 from typing import Literal
 
 from ._count_running_aind_ephys_pipeline_jobs import _count_running_aind_ephys_pipeline_jobs
+from ._jsonl_state_file import _jsonl_state_file
+from ._state_journal import _state_has_entries
 from ._submit_next import _submit_next
 
 _log = logging.getLogger(__name__)
@@ -65,14 +67,14 @@ def process_queue(
         _log.info("Sleeping %.2f seconds (jitter) before processing queue", delay)
         time.sleep(delay)
 
-    state_file = queue_directory / "state.jsonl"
+    state_file = _jsonl_state_file(queue_directory)
     if not state_file.exists():
         message = f"State file not found: {state_file}"
         raise FileNotFoundError(message)
     if max_concurrent_aind_jobs < 1:
         message = "max_concurrent_aind_jobs must be at least 1"
         raise ValueError(message)
-    if not state_file.read_text().strip():
+    if not _state_has_entries(state_file):
         _log.info(f"No entries in {state_file}")
         return "no-pending"
 
@@ -85,5 +87,6 @@ def process_queue(
         processing_directory=processing_directory,
         max_submissions=available_slots,
         test=test,
+        state_file=state_file,
     )
     return "submitted" if submitted_any else "no-pending"
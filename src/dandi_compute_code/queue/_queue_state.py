@@ -15,6 +15,7 @@ from __future__ import annotations
 
 import collections
 import datetime
+import functools
 import gzip
 import json
 import logging
@@ -23,16 +24,22 @@ import pathlib
 import random
 import shutil
 import subprocess
+import sys
 import tempfile
+import threading
 import time
-import urllib.request
-from collections.abc import Iterator
+from collections.abc import Callable, Iterable, Iterator, Mapping
 from dataclasses import dataclass, field
 from typing import Literal
 
-from ._globals import _AIND_EPHYS_PARAMS_REGISTRY
+from ._globals import _AIND_EPHYS_CONFIG_REGISTRY, _AIND_EPHYS_PARAMS_REGISTRY
 from ._job_info import JobInfo
+from ._path_map import _EMPTY_PATH_MAP, _PathMap
+from ._preparation_index import _PreparationIndex
+from ._prepare_candidates import _prepare_candidates
+from ._queue_state_store import _STATE_STORE_SUFFIX, _is_state_store, _QueueStateStore
 from ._queue_utils import (
+    _STATUS_REQUIRED_FLAGS,
     _collect_attempts,
     _duration_string_to_seconds,
     _extract_error_lines,
@@ -40,31 +47,57 @@ from ._queue_utils import (
     _finalize_attempt_records,
     _list_capsule_log_directories,
     _load_queue_config,
+    _load_refresh_baseline,
+    _new_attempt_record,
     _order_content_ids_for_uniform_dandiset_sampling,
+    _parse_attempt_identity,
+    _pending_code_dirs_from_paths,
+    _refresh_attempt_records,
     _remove_empty_parents,
+    _save_refresh_baseline,
     _sort_key,
+    _state_line_may_match,
     _UpstreamMetadataCache,
 )
-from ..aind_ephys_pipeline import UnmappedContentIDError, prepare_aind_ephys_job
+from ._recently_prepared_records import _recently_prepared_records
+from ._state_journal import (
+    _append_to_state_journal,
+    _compact_state_journal,
+    _delete_operation,
+    _iter_state_records,
+    _put_operation,
+    _state_has_entries,
+    _update_operation,
+    _write_state_file,
+)
+from ..aind_ephys_pipeline import prepare_aind_ephys_job, prepare_aind_ephys_jobs
 from ..dandiset._globals import _FAILED_RUNS_ARCHIVE_DANDISET_ID, _JOB_CAPSULES_DANDISET_ID
+from ..dandiset._http_client import _http_open
 from ..dandiset._load_assets_jsonld_metadata import (
-    AssetMetadata,
     AssetsJsonldMetadata,
-    _build_asset_metadata,
+    _index_assets_jsonld_stream,
     load_assets_jsonld_metadata,
 )
 
 _log = logging.getLogger(__name__)
 
+#: Status filters accepted by :meth:`QueueState.iter_jsonl`.
+_EntryStatus = Literal["pending", "running", "successful", "failed"]
+
 #: Dandiset whose assets back the pending/submission queries (the job capsules Dandiset).
 _DANDISET_ID = _JOB_CAPSULES_DANDISET_ID
 
 
-@dataclass
+@dataclass(slots=True)
 class JobEntry:
     """
     A :class:`JobInfo` (identity) plus the status fields written by
     ``write_queue_state`` and consumed across the queue module.
+
+    Entries are slotted and their path maps are stored as immutable, compact
+    :class:`~collections.abc.Mapping` objects (any mapping passed in is converted),
+    so a state with hundreds of thousands of capsules stays small in memory.
+    Replace a path map instead of mutating it.
     """
 
     job: JobInfo
@@ -76,9 +109,14 @@ class JobEntry:
     has_logs: bool = False
     created_at: str | None = None
     job_completion_time: str | None = None
-    dataset_description_path: dict[str, str] = field(default_factory=dict)
-    output_paths: dict[str, str] = field(default_factory=dict)
-    log_paths: dict[str, str] = field(default_factory=dict)
+    dataset_description_path: Mapping[str, str] = _EMPTY_PATH_MAP
+    output_paths: Mapping[str, str] = _EMPTY_PATH_MAP
+    log_paths: Mapping[str, str] = _EMPTY_PATH_MAP
+
+    def __post_init__(self) -> None:
+        self.dataset_description_path = _PathMap.of(self.dataset_description_path)
+        self.output_paths = _PathMap.of(self.output_paths)
+        self.log_paths = _PathMap.of(self.log_paths)
 
     @property
     def is_pending(self) -> bool:
@@ -198,20 +236,26 @@ class JobEntry:
 
     @classmethod
     def from_dict(cls, data: dict, /) -> JobEntry:
-        """Construct from a raw ``state.jsonl`` entry dict."""
+        """
+        Construct from a raw ``state.jsonl`` entry dict.
+
+        Strings repeated across entries (Dandiset, pipeline, version, params,
+        config, codebase and content IDs) are interned, so every entry shares one copy.
+        """
+        content_id = data.get("content_id")
         job = JobInfo(
-            dandiset_id=data["dandiset_id"],
+            dandiset_id=sys.intern(data["dandiset_id"]),
             dandi_path=data["dandi_path"],
-            pipeline=data["pipeline"],
-            version=data["version"],
-            params=data["params"],
-            config=data["config"],
+            pipeline=sys.intern(data["pipeline"]),
+            version=sys.intern(data["version"]),
+            params=sys.intern(data["params"]),
+            config=sys.intern(data["config"]),
             attempt=int(data["attempt"]),
-            codebase=data["codebase"],
+            codebase=sys.intern(data["codebase"]),
         )
         return cls(
             job=job,
-            content_id=data.get("content_id"),
+            content_id=sys.intern(content_id) if content_id else content_id,
             asset_size_bytes=data.get("asset_size_bytes"),
             has_code=bool(data.get("has_code", False)),
             has_been_submitted=bool(data.get("has_been_submitted", False)),
@@ -219,9 +263,9 @@ class JobEntry:
             has_logs=bool(data.get("has_logs", False)),
             created_at=data.get("created_at"),
             job_completion_time=data.get("job_completion_time"),
-            dataset_description_path=dict(data.get("dataset_description_path") or {}),
-            output_paths=dict(data.get("output_paths") or {}),
-            log_paths=dict(data.get("log_paths") or {}),
+            dataset_description_path=_PathMap.of(data.get("dataset_description_path")),
+            output_paths=_PathMap.of(data.get("output_paths")),
+            log_paths=_PathMap.of(data.get("log_paths")),
         )
 
     def to_dict(self) -> dict:
@@ -234,14 +278,92 @@ class JobEntry:
             "has_been_submitted": self.has_been_submitted,
             "has_output": self.has_output,
             "has_logs": self.has_logs,
-            "dataset_description_path": self.dataset_description_path,
-            "output_paths": self.output_paths,
-            "log_paths": self.log_paths,
+            "dataset_description_path": dict(self.dataset_description_path.items()),
+            "output_paths": dict(self.output_paths.items()),
+            "log_paths": dict(self.log_paths.items()),
             "created_at": self.created_at,
             "job_completion_time": self.job_completion_time,
         }
 
 
+class _EntryList(list):
+    """A ``list`` of entries that counts its structural changes, so cached indexes know when to rebuild."""
+
+    __slots__ = ("generation",)
+
+    def __init__(self, iterable: Iterable[JobEntry] = (), /) -> None:
+        super().__init__(iterable)
+        self.generation = 0
+
+
+def _counting_mutation(name: str) -> Callable:
+    method = getattr(list, name)
+
+    @functools.wraps(method)
+    def mutate(self: _EntryList, *args: object, **kwargs: object) -> object:
+        self.generation += 1
+        return method(self, *args, **kwargs)
+
+    return mutate
+
+
+for _mutating_method in (
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+    "__setitem__",
+    "append",
+    "clear",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "reverse",
+    "sort",
+):
+    setattr(_EntryList, _mutating_method, _counting_mutation(_mutating_method))
+
+
+@dataclass
+class _QueueStateIndexes:
+    """Hash indexes over the entries of a :class:`QueueState`, built in one pass and kept in entry order."""
+
+    generation: int
+    by_identity: dict[tuple, JobEntry] = field(default_factory=dict)
+    by_path_attempt: dict[tuple[str, int], JobEntry] = field(default_factory=dict)
+    by_content_id: dict[str, list[JobEntry]] = field(default_factory=dict)
+    by_dandiset_id: dict[str, list[JobEntry]] = field(default_factory=dict)
+    by_pipeline_version: dict[tuple[str, str], list[JobEntry]] = field(default_factory=dict)
+    failed_by_pipeline_version: dict[tuple[str, str], list[JobEntry]] = field(default_factory=dict)
+    by_status: dict[str, list[JobEntry]] = field(
+        default_factory=lambda: {"pending": [], "running": [], "successful": [], "failed": []}
+    )
+
+    @classmethod
+    def build(cls, entries: _EntryList) -> _QueueStateIndexes:
+        indexes = cls(generation=entries.generation)
+        for entry in entries:
+            job = entry.job
+            # Lookups return the first matching entry, as the linear scans they replace did.
+            indexes.by_identity.setdefault(entry.identity, entry)
+            indexes.by_path_attempt.setdefault((job.dandi_path, job.attempt), entry)
+            if entry.content_id:
+                indexes.by_content_id.setdefault(entry.content_id, []).append(entry)
+            if job.dandiset_id:
+                indexes.by_dandiset_id.setdefault(job.dandiset_id, []).append(entry)
+            indexes.by_pipeline_version.setdefault((job.pipeline, job.version), []).append(entry)
+            if entry.is_pending:
+                indexes.by_status["pending"].append(entry)
+            if entry.is_running:
+                indexes.by_status["running"].append(entry)
+            if entry.is_successful:
+                indexes.by_status["successful"].append(entry)
+            if entry.is_failed:
+                indexes.by_status["failed"].append(entry)
+                indexes.failed_by_pipeline_version.setdefault((job.pipeline, job.version), []).append(entry)
+        return indexes
+
+
 @dataclass
 class QueueState:
     """
@@ -250,35 +372,68 @@ class QueueState:
     Replaces the scattered ``list[dict]`` reads in ``_prepare_queue.py``,
     ``_aggregate_queue_statistics.py``, ``_process_queue.py``, and
     ``_clean_unsubmitted_capsules.py``.
+
+    Lookups by identity, ``(dandi_path, attempt)``, content ID, Dandiset ID,
+    ``(pipeline, version)`` and status go through hash indexes built lazily on
+    first use. ``entries`` is kept as a list that records its own changes, so
+    appending, removing or replacing entries (or assigning a new list) rebuilds
+    the indexes on the next lookup. Changing the fields of an entry in place is
+    not observed: do it through :meth:`update_entry`, or call
+    :meth:`invalidate_indexes` afterwards.
     """
 
     entries: list[JobEntry]
 
+    def __setattr__(self, name: str, value: object) -> None:
+        if name == "entries":
+            if not isinstance(value, _EntryList):
+                value = _EntryList(value)
+            self.__dict__["_indexes"] = None
+        super().__setattr__(name, value)
+
     def __iter__(self) -> Iterator[JobEntry]:
         return iter(self.entries)
 
     def __len__(self) -> int:
         return len(self.entries)
 
+    @property
+    def _index(self) -> _QueueStateIndexes:
+        indexes = self.__dict__.get("_indexes")
+        if indexes is None or indexes.generation != self.entries.generation:
+            indexes = _QueueStateIndexes.build(self.entries)
+            self.__dict__["_indexes"] = indexes
+        return indexes
+
+    def invalidate_indexes(self) -> None:
+        """Drop the lookup indexes after entries were changed in place; they are rebuilt on the next lookup."""
+        self.__dict__["_indexes"] = None
+
+    def update_entry(self, entry: JobEntry, /, **changes: object) -> None:
+        """Set the given fields of *entry* (one of :attr:`entries`) and keep the lookup indexes consistent."""
+        for name, value in changes.items():
+            setattr(entry, name, value)
+        self.invalidate_indexes()
+
     @property
     def pending(self) -> list[JobEntry]:
         """Entries with code prepared but not yet submitted."""
-        return [e for e in self.entries if e.is_pending]
+        return list(self._index.by_status["pending"])
 
     @property
     def running(self) -> list[JobEntry]:
         """Entries with logs present but no output — likely still executing."""
-        return [e for e in self.entries if e.is_running]
+        return list(self._index.by_status["running"])
 
     @property
     def successful(self) -> list[JobEntry]:
         """Entries whose output directory is present."""
-        return [e for e in self.entries if e.is_successful]
+        return list(self._index.by_status["successful"])
 
     @property
     def failed(self) -> list[JobEntry]:
         """Entries with code and logs but no output."""
-        return [e for e in self.entries if e.is_failed]
+        return list(self._index.by_status["failed"])
 
     @property
     def successful_asset_bytes_total(self) -> int:
@@ -300,14 +455,55 @@ class QueueState:
         handle them conservatively.
         """
         mapping: dict[str, set[str]] = {}
-        for entry in self.entries:
-            if entry.content_id and entry.job.dandiset_id:
-                mapping.setdefault(entry.content_id, set()).add(entry.job.dandiset_id)
+        for content_id, entries in self._index.by_content_id.items():
+            dandiset_ids = {entry.job.dandiset_id for entry in entries if entry.job.dandiset_id}
+            if dandiset_ids:
+                mapping[content_id] = dandiset_ids
         return mapping
 
+    def entries_for_content_id(self, content_id: str) -> list[JobEntry]:
+        """Entries recorded for *content_id*, in state order."""
+        return list(self._index.by_content_id.get(content_id, ()))
+
+    def entries_for_dandiset(self, dandiset_id: str) -> list[JobEntry]:
+        """Entries whose source asset lives in *dandiset_id*, in state order."""
+        return list(self._index.by_dandiset_id.get(dandiset_id, ()))
+
+    def entries_for(self, *, pipeline: str, version: str) -> list[JobEntry]:
+        """Entries of a given pipeline and version, in state order."""
+        return list(self._index.by_pipeline_version.get((pipeline, version), ()))
+
+    def preparation_index(self, *, archived: QueueState | None = None) -> _PreparationIndex:
+        """
+        Build the indexed counts :meth:`prepare` consults, in a single pass over the entries.
+
+        :param archived: Archived attempts (e.g. ``archive_state.jsonl``) that only add to the attempt counts.
+        """
+        index = _PreparationIndex()
+        for entry in self.entries:
+            job = entry.job
+            index.count_entry(
+                content_id=entry.content_id,
+                combination=(job.pipeline, job.version, job.params, job.config),
+                dandiset_id=job.dandiset_id,
+                is_failed=entry.is_failed,
+                is_prepared=entry.is_pending or entry.is_successful,
+            )
+        for entry in archived.entries if archived else ():
+            index.count_archived_entry(content_id=entry.content_id, pipeline=entry.job.pipeline)
+        return index
+
     def failures_for(self, *, pipeline: str, version: str) -> list[JobEntry]:
         """Failed entries matching a given pipeline and version."""
-        return [e for e in self.failed if e.job.pipeline == pipeline and e.job.version == version]
+        return list(self._index.failed_by_pipeline_version.get((pipeline, version), ()))
+
+    def entry_by_identity(self, identity: tuple, /) -> JobEntry:
+        """
+        Return the entry whose :attr:`JobEntry.identity` is *identity*.
+
+        :raises KeyError: If no entry has that identity.
+        """
+        return self._index.by_identity[identity]
 
     def entry_for(self, *, dandi_path: str, attempt: int = 1) -> JobEntry:
         """
@@ -318,11 +514,11 @@ class QueueState:
             the same asset.
         :raises KeyError: If no entry matches *dandi_path* and *attempt*.
         """
-        for entry in self.entries:
-            if entry.job.dandi_path == dandi_path and entry.job.attempt == attempt:
-                return entry
-        message = f"No entry with dandi_path={dandi_path!r} and attempt={attempt}"
-        raise KeyError(message)
+        entry = self._index.by_path_attempt.get((dandi_path, attempt))
+        if entry is None:
+            message = f"No entry with dandi_path={dandi_path!r} and attempt={attempt}"
+            raise KeyError(message)
+        return entry
 
     @staticmethod
     def pending_code_dirs() -> list[str]:
@@ -339,21 +535,8 @@ class QueueState:
             Dandiset root) that are pending submission. Empty when nothing is
             awaiting submission.
         """
-        metadata = load_assets_jsonld_metadata()
-        paths = set(metadata.path_to_asset_metadata.keys())
-
-        pending_entries: list[str] = []
-        for asset_path in sorted(paths):
-            if asset_path.endswith("/code/submit.sh"):
-                code_dir_path = asset_path[: -len("/submit.sh")]
-                submitted_marker_prefix = f"{code_dir_path}/submitted_date-"
-                has_submitted_marker = any(
-                    path == f"{code_dir_path}/submitted" or path.startswith(submitted_marker_prefix) for path in paths
-                )
-                if not has_submitted_marker:
-                    pending_entries.append(code_dir_path)
-
-        return pending_entries
+        metadata = load_assets_jsonld_metadata(keep_raw_assets=False)
+        return _pending_code_dirs_from_paths(metadata.path_to_asset_metadata.keys())
 
     @classmethod
     def has_pending_jobs(cls) -> bool:
@@ -376,6 +559,7 @@ class QueueState:
         processing_directory: pathlib.Path,
         max_submissions: int = 2,
         test: bool = False,
+        state_file: pathlib.Path | None = None,
     ) -> bool:
         """
         Submit the next eligible pending entries from the DANDI assets metadata.
@@ -397,6 +581,9 @@ class QueueState:
         :param test: When ``True``, leave temporary working directories on disk
             after successful submission for debugging.
         :type test: bool
+        :param state_file: A ``state.jsonl`` in which each submitted entry is
+            marked ``has_been_submitted`` through its journal (see :meth:`journal_update`).
+        :type state_file: pathlib.Path or None
         :returns: ``True`` if at least one job was submitted, ``False`` otherwise.
         :rtype: bool
         :raises RuntimeError: If ``dandi download``, ``sbatch``, or ``dandi upload``
@@ -466,6 +653,10 @@ class QueueState:
                 message = "dandi upload failed - please check the logs to see more details."
                 raise RuntimeError(message)
 
+            parsed = _parse_attempt_identity(f"{code_dir_path}/submit.sh")
+            if state_file is not None and state_file.exists() and parsed is not None:
+                cls.journal_update(state_file, parsed[0], has_been_submitted=True)
+
             if test:
                 _log.info("Leaving temporary directory in place for test mode: %s", temp_dir)
             else:
@@ -519,6 +710,20 @@ class QueueState:
                 return entry["md5"][:7]
         return params_key
 
+    @staticmethod
+    def resolve_config_key_to_id(pipeline: str, config_key: str) -> str:
+        """
+        Resolve a registered config key to its 7-character hash ID.
+
+        Mirrors :meth:`resolve_params_key_to_id`: unknown pipelines and keys are
+        returned unchanged.
+        """
+        if pipeline == "aind+ephys":
+            entry = _AIND_EPHYS_CONFIG_REGISTRY.get(config_key)
+            if entry:
+                return entry["md5"][:7]
+        return config_key
+
     @classmethod
     def from_metadata(cls, metadata: AssetsJsonldMetadata, /) -> QueueState:
         """
@@ -540,7 +745,7 @@ class QueueState:
         return cls(entries=[JobEntry.from_dict(record) for record in records])
 
     @classmethod
-    def from_jsonld(cls, *, file_path: pathlib.Path) -> QueueState:
+    def from_jsonld(cls, *, file_path: pathlib.Path, keep_raw_assets: bool = False) -> QueueState:
         """
         Build a queue state from a local DANDI ``assets.jsonld`` file.
 
@@ -551,45 +756,38 @@ class QueueState:
         the same S3 location because JSON parsing is many times faster than
         YAML for identical content.
 
+        The file is decoded one asset at a time and only the indexed fields are
+        kept, so peak memory is bounded by a single asset.
+
         :param file_path: Path to a local assets JSON-LD file.
         :type file_path: pathlib.Path
+        :param keep_raw_assets: Also keep every raw asset dict in the intermediate
+            metadata's ``content_id_to_asset``.
+        :type keep_raw_assets: bool
         :raises ValueError: If the file content is not a JSON array.
         """
-        raw = json.loads(file_path.read_text())
-        if not isinstance(raw, list):
-            raise ValueError(f"Expected a JSON array in {file_path}, got {type(raw).__name__}")
-        content_id_to_asset: dict[str, dict] = {}
-        path_to_asset_metadata: dict[str, AssetMetadata] = {}
-        for asset in raw:
-            if not isinstance(asset, dict):
-                continue
-            try:
-                content_id, metadata = _build_asset_metadata(asset)
-            except ValueError as exception:
-                _log.debug("Skipping malformed asset in %s: %s", file_path, exception)
-                continue
-            content_id_to_asset[content_id] = asset
-            path_to_asset_metadata[metadata.path] = metadata
-        return cls.from_metadata(
-            AssetsJsonldMetadata(
-                content_id_to_asset=content_id_to_asset,
-                path_to_asset_metadata=path_to_asset_metadata,
+        with file_path.open(mode="rb") as file_stream:
+            metadata = _index_assets_jsonld_stream(
+                file_stream, source=str(file_path), keep_raw_assets=keep_raw_assets, skip_invalid=True
             )
-        )
+        return cls.from_metadata(metadata)
 
     @classmethod
-    def from_dandi(cls, *, dandiset_id: str = _JOB_CAPSULES_DANDISET_ID) -> QueueState:
+    def from_dandi(cls, *, dandiset_id: str = _JOB_CAPSULES_DANDISET_ID, keep_raw_assets: bool = False) -> QueueState:
         """
         Build a queue state from a Dandiset's remote ``assets.jsonld`` metadata.
 
         Fetches ``assets.jsonld`` for *dandiset_id* from the DANDI S3 bucket
-        over the network.
+        over the network and decodes it one asset at a time.
 
         :param dandiset_id: The Dandiset whose ``assets.jsonld`` is read.
             Defaults to the job capsules Dandiset (``001697``).
         :type dandiset_id: str
+        :param keep_raw_assets: Also keep every raw asset dict in the intermediate
+            metadata's ``content_id_to_asset``.
+        :type keep_raw_assets: bool
         """
-        return cls.from_metadata(load_assets_jsonld_metadata(dandiset_id=dandiset_id))
+        return cls.from_metadata(load_assets_jsonld_metadata(dandiset_id=dandiset_id, keep_raw_assets=keep_raw_assets))
 
     @classmethod
     def write_state(
@@ -598,12 +796,28 @@ class QueueState:
         queue_directory: pathlib.Path,
         dandiset_id: str = _JOB_CAPSULES_DANDISET_ID,
         state_file_name: str = "state.jsonl",
+        incremental: bool = True,
     ) -> None:
         """
         Write a queue state file from DANDI ``assets.jsonld`` metadata.
 
-        Validates ``queue_config.json`` under *queue_directory*, builds the state via
-        :meth:`from_dandi`, and writes it to ``queue_directory/state_file_name``.
+        Validates ``queue_config.json`` under *queue_directory*, builds the state as
+        :meth:`from_dandi` does, and writes it to ``queue_directory/state_file_name``.
+
+        Each refresh keeps the asset index it was computed from in the download
+        cache. The next refresh diffs the new index against it and recomputes only
+        the attempts with an added, removed, or modified asset path, looking up
+        upstream source fields only for those attempts (and for attempts whose
+        upstream document has since changed or outlived its TTL). The result is
+        identical to a full rebuild; without a usable baseline (first run, cleared
+        cache, or a state file edited by hand) the state is rebuilt in full. A
+        SQLite store next to the state file (see :meth:`jsonl_to_sqlite`) is
+        rewritten with it.
+
+        ``assets.jsonld`` lags behind uploads, so the capsules :meth:`prepare` just
+        journaled may not be listed yet. Their pending entries are journaled again
+        after the refresh, until their capsules are listed or they outlive a grace
+        period (see :func:`~._recently_prepared_records._recently_prepared_records`).
 
         :param queue_directory: Path to the queue root directory.
         :type queue_directory: pathlib.Path
@@ -611,15 +825,61 @@ class QueueState:
         :type dandiset_id: str
         :param state_file_name: Name of the state file written under *queue_directory*.
         :type state_file_name: str
+        :param incremental: Reuse the previous refresh where possible; ``False``
+            always rebuilds every record.
+        :type incremental: bool
         :raises FileNotFoundError: If ``queue_config.json`` is not found.
         :raises ValueError: If the queue configuration fails LinkML validation.
         """
         _load_queue_config(queue_directory=queue_directory)
-        state = cls.from_dandi(dandiset_id=dandiset_id)
-        state.to_file(queue_directory / state_file_name)
+        state_file = queue_directory / state_file_name
+        store_file = state_file.with_suffix(_STATE_STORE_SUFFIX)
+        current_file = store_file if store_file.exists() else state_file
+        metadata = load_assets_jsonld_metadata(dandiset_id=dandiset_id, keep_raw_assets=False)
+        baseline = _load_refresh_baseline(state_file=state_file, dandiset_id=dandiset_id) if incremental else None
+
+        upstream_cache = _UpstreamMetadataCache()
+        if baseline is None:
+            collection = _collect_attempts(metadata)
+            records = _finalize_attempt_records(collection=collection, upstream_cache=upstream_cache)
+            upstream_resolutions = upstream_cache.resolutions()
+        else:
+            records, upstream_resolutions = _refresh_attempt_records(
+                baseline=baseline, local_metadata=metadata, upstream_cache=upstream_cache
+            )
+        records.sort(key=_sort_key)
+        try:
+            carried_records = (
+                _recently_prepared_records(
+                    (entry.to_dict() for entry in cls.iter_jsonl(current_file, status="pending")), records
+                )
+                if current_file.exists()
+                else []
+            )
+        except RuntimeError:  # A store of another format version is rebuilt below, with nothing to carry over.
+            carried_records = []
+        state = cls(entries=[JobEntry.from_dict(record) for record in records])
+        state.to_file(state_file)
+        if store_file.exists():
+            state.to_file(store_file)
+
+        referenced_dandiset_ids = {entry.job.dandiset_id for entry in state.entries}
+        _save_refresh_baseline(
+            state_file=state_file,
+            dandiset_id=dandiset_id,
+            asset_index=metadata.path_to_asset_metadata,
+            upstream_resolutions={
+                upstream_id: resolution
+                for upstream_id, resolution in upstream_resolutions.items()
+                if upstream_id in referenced_dandiset_ids
+            },
+        )
+        # Journaled rather than written with the state, so the next refresh does not take them for listed capsules.
+        for record in carried_records:
+            cls.journal_entry(current_file, JobEntry.from_dict(record))
 
     @classmethod
-    def write_archive_state(cls, *, queue_directory: pathlib.Path) -> None:
+    def write_archive_state(cls, *, queue_directory: pathlib.Path, incremental: bool = True) -> None:
         """
         Write ``archive_state.jsonl`` from the failed runs archive ``assets.jsonld``.
 
@@ -629,11 +889,14 @@ class QueueState:
 
         :param queue_directory: Path to the queue root directory.
         :type queue_directory: pathlib.Path
+        :param incremental: See :meth:`write_state`.
+        :type incremental: bool
         """
         cls.write_state(
             queue_directory=queue_directory,
             dandiset_id=_FAILED_RUNS_ARCHIVE_DANDISET_ID,
             state_file_name="archive_state.jsonl",
+            incremental=incremental,
         )
 
     def aggregate_statistics(
@@ -767,14 +1030,14 @@ class QueueState:
             _log.info("Sleeping %.2f seconds (jitter) before processing queue", delay)
             time.sleep(delay)
 
-        state_file = queue_directory / "state.jsonl"
+        state_file = cls.state_file_for(queue_directory)
         if not state_file.exists():
             message = f"State file not found: {state_file}"
             raise FileNotFoundError(message)
         if max_concurrent_aind_jobs < 1:
             message = "max_concurrent_aind_jobs must be at least 1"
             raise ValueError(message)
-        if not state_file.read_text().strip():
+        if not cls.has_entries(state_file):
             _log.info(f"No entries in {state_file}")
             return "no-pending"
 
@@ -787,6 +1050,7 @@ class QueueState:
             processing_directory=processing_directory,
             max_submissions=available_slots,
             test=test,
+            state_file=state_file,
         )
         return "submitted" if submitted_any else "no-pending"
 
@@ -799,7 +1063,10 @@ class QueueState:
         config_key: str = "default",
         content_ids: list[str] | None = None,
         limit: int | None = None,
-    ) -> None:
+        batch_size: int | None = None,
+        workers: int | None = None,
+        count_archived_attempts: bool = True,
+    ) -> int:
         """
         En-masse preparation of qualifying assets based on the current queue config.
 
@@ -807,7 +1074,18 @@ class QueueState:
         ``queue_config.json`` this determines which content IDs to prepare and calls
         :func:`~dandi_compute_code.aind_ephys_pipeline.prepare_aind_ephys_job` for
         each asset. The per-pipeline failure cap (``max_fail_per_dandiset``) is
-        enforced by reading the existing ``state.jsonl`` under *queue_directory*.
+        enforced by reading the existing ``state.jsonl`` under *queue_directory*,
+        and so are ``max_attempts_per_asset`` and ``asset_overrides`` (see
+        :class:`~._asset_attempt_policy._AssetAttemptPolicy`).
+        Content IDs that already have a pending or successful capsule for the exact
+        pipeline, version, params and config (see :class:`_PreparationIndex`)
+        are skipped before any preparation work, and the number skipped is logged.
+        Every capsule prepared is added to the state as pending through its
+        journal (see :meth:`journal_entry`), so later runs skip it and
+        :meth:`replenish` counts it even before ``queue refresh`` sees it.
+        An asset that cannot be prepared (any ``ValueError`` of the preparation,
+        such as an unmapped content ID) is skipped with a warning, one by one or
+        in a batch.
 
         :param queue_directory: Path to the queue root directory.
         :param pipeline_directory: Local path to the AIND pipeline repository.
@@ -815,6 +1093,18 @@ class QueueState:
         :param content_ids: Explicit content IDs to prepare; when provided, the
             qualifying list is not fetched from the network.
         :param limit: If provided, stop after preparing *limit* assets in total.
+        :param batch_size: If provided, prepare up to *batch_size* assets at a time with
+            :func:`~dandi_compute_code.aind_ephys_pipeline.prepare_aind_ephys_jobs`
+            (one Dandiset download and one upload per batch) instead of one by one.
+        :param workers: If provided, run up to *workers* preparations (single assets or
+            batches) at once on a thread pool. Candidates are still submitted in
+            priority order, *limit* is still honored exactly, and the failure counts
+            behind ``max_fail_per_dandiset`` are read before any preparation starts,
+            so every worker enforces the same caps.
+        :param count_archived_attempts: Also count the attempts recorded in
+            ``archive_state.jsonl`` (failed runs moved to the archive Dandiset)
+            towards ``max_attempts_per_asset``.
+        :returns: The number of assets prepared.
         """
         queue_config = _load_queue_config(queue_directory=queue_directory)
 
@@ -823,75 +1113,122 @@ class QueueState:
                 "https://raw.githubusercontent.com/dandi-cache/qualifying-aind-content-ids/dist/"
                 "derivatives/qualifying_aind_content_ids.jsonl.gz"
             )
-            with urllib.request.urlopen(url=qualifying_aind_content_ids_url) as response:
+            with _http_open(qualifying_aind_content_ids_url) as response:
                 decompressed = gzip.decompress(response.read()).decode()
                 fetched_content_ids = [json.loads(line) for line in decompressed.splitlines() if line.strip()]
             content_ids = _order_content_ids_for_uniform_dandiset_sampling(content_ids=fetched_content_ids)
 
-        state_file = queue_directory / "state.jsonl"
+        state_file = cls.state_file_for(queue_directory)
         state = cls.from_jsonl(state_file) if state_file.exists() else cls(entries=[])
-        content_id_to_dandiset_ids = state.content_id_to_dandiset_ids()
-
-        prepared_count = 0
-        for pipeline_name, pipeline_data in queue_config.get("pipelines", {}).items():
-            if limit is not None and prepared_count >= limit:
-                break
-            for version in pipeline_data.get("version_priority", []):
-                if limit is not None and prepared_count >= limit:
-                    break
-                for params in pipeline_data.get("params_priority", []):
-                    if limit is not None and prepared_count >= limit:
-                        break
-                    pipeline_cfg = queue_config["pipelines"][pipeline_name]
-
-                    max_fail = pipeline_cfg.get("max_fail_per_dandiset")
-                    failure_count_by_dandiset: collections.defaultdict[str, int] = collections.defaultdict(int)
-                    if max_fail is not None:
-                        for entry in state.failures_for(pipeline=pipeline_name, version=version):
-                            dandiset_id = entry.job.dandiset_id
-                            if not dandiset_id:
-                                continue
-                            failure_count_by_dandiset[dandiset_id] += 1
-
-                    for content_id in content_ids:
-                        if limit is not None and prepared_count >= limit:
-                            break
-                        if max_fail is not None:
-                            dandiset_ids = content_id_to_dandiset_ids.get(content_id, set())
-                            if len(dandiset_ids) == 1:
-                                dandiset_id = next(iter(dandiset_ids))
-                                failure_count = failure_count_by_dandiset.get(dandiset_id, 0)
-                                if failure_count >= max_fail:
-                                    _log.info(
-                                        f"Skipping preparation for {pipeline_name}/{version}/{params}/{content_id}: "
-                                        f"failure count ({failure_count}) for dandiset-{dandiset_id} has reached "
-                                        f"max_fail_per_dandiset ({max_fail})."
-                                    )
-                                    continue
-                            else:
-                                mapped_dandisets = ", ".join(sorted(dandiset_ids)) if dandiset_ids else "<none>"
-                                _log.info(
-                                    f"Preparing {content_id} without max_fail_per_dandiset enforcement for "
-                                    f"{pipeline_name}/{version}/{params}: expected exactly 1 mapped dandiset but "
-                                    f"found {len(dandiset_ids)} ({mapped_dandisets})."
-                                )
-
-                        _log.info(f"Preparing content ID: {content_id}")
-                        try:
-                            prepare_aind_ephys_job(
-                                content_id=content_id,
-                                parameters_key=params,
-                                pipeline_version=version,
-                                pipeline_directory=pipeline_directory,
-                                config_key=config_key,
-                                silent=True,
-                            )
-                        except UnmappedContentIDError as error:
-                            _log.warning(
-                                f"Skipping preparation for {pipeline_name}/{version}/{params}/{content_id}: {error}"
-                            )
-                            continue
-                        prepared_count += 1
+        archive_state_file = cls.state_file_for(queue_directory, name="archive_state")
+        archived = (
+            cls.from_jsonl(archive_state_file)
+            if count_archived_attempts and archive_state_file.exists()
+            else cls(entries=[])
+        )
+        index = state.preparation_index(archived=archived)
+        state_file_lock = threading.Lock()
+
+        def journal_prepared(*, content_id: str, script_path: pathlib.Path) -> None:
+            parsed = _parse_attempt_identity(str(script_path))
+            if parsed is None:
+                return
+            entry = JobEntry.from_dict(
+                {
+                    **_new_attempt_record(parsed[0]),
+                    "content_id": content_id,
+                    "has_code": True,
+                    "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                }
+            )
+            with state_file_lock:
+                if not state_file.exists():
+                    cls(entries=[]).to_file(state_file)
+                cls.journal_entry(state_file, entry)
+
+        return _prepare_candidates(
+            queue_config=queue_config,
+            content_ids=content_ids,
+            index=index,
+            config_key=config_key,
+            prepare_job=functools.partial(
+                prepare_aind_ephys_job, pipeline_directory=pipeline_directory, config_key=config_key, silent=True
+            ),
+            prepare_jobs=functools.partial(
+                prepare_aind_ephys_jobs, config_key=config_key, pipeline_directory=pipeline_directory, silent=True
+            ),
+            journal_prepared=journal_prepared,
+            limit=limit,
+            batch_size=batch_size,
+            workers=workers,
+        )
+
+    @classmethod
+    def replenish(
+        cls,
+        *,
+        queue_directory: pathlib.Path,
+        low_watermark: int,
+        high_watermark: int,
+        pipeline_directory: pathlib.Path | None = None,
+        config_key: str = "default",
+        batch_size: int | None = None,
+        workers: int | None = None,
+    ) -> int:
+        """
+        Keep the number of capsules awaiting submission between two watermarks.
+
+        Counts the pending ``code`` directories (see :meth:`pending_code_dirs`) and,
+        only when fewer than *low_watermark* remain, runs :meth:`prepare` with a
+        limit of just enough assets to reach *high_watermark*. The upper bound keeps
+        the job capsules Dandiset from filling with unsubmitted capsules. Run it
+        after :meth:`process_queue` so preparation never delays a submission.
+
+        ``assets.jsonld`` lags behind uploads, so the unsubmitted pending entries of
+        the state, which include the capsules :meth:`prepare` just recorded, are
+        counted as well; a capsule found in both is counted once.
+
+        :param queue_directory: Path to the queue root directory.
+        :param low_watermark: Replenish when fewer pending capsules than this remain.
+        :param high_watermark: Number of pending capsules to replenish up to.
+        :param pipeline_directory: Local path to the AIND pipeline repository.
+        :param config_key: Key for a registered job configuration.
+        :param batch_size: Passed to :meth:`prepare`.
+        :param workers: Passed to :meth:`prepare`.
+        :returns: The number of assets prepared.
+        :raises ValueError: If the watermarks are negative or *low_watermark* exceeds *high_watermark*.
+        """
+        if not 0 <= low_watermark <= high_watermark:
+            message = (
+                "Watermarks must satisfy 0 <= low_watermark <= high_watermark, "
+                f"got low_watermark={low_watermark} and high_watermark={high_watermark}"
+            )
+            raise ValueError(message)
+
+        pending_jobs = {
+            parsed[0]
+            for code_dir in cls.pending_code_dirs()
+            if (parsed := _parse_attempt_identity(f"{code_dir}/submit.sh")) is not None
+        }
+        state_file = cls.state_file_for(queue_directory)
+        if state_file.exists():
+            pending_jobs.update(
+                entry.job for entry in cls.iter_jsonl(state_file, status="pending") if not entry.has_been_submitted
+            )
+        pending_count = len(pending_jobs)
+        if pending_count >= low_watermark:
+            _log.info(f"{pending_count} capsules pending (low watermark {low_watermark}); not replenishing")
+            return 0
+
+        _log.info(f"{pending_count} capsules pending; preparing up to {high_watermark - pending_count} more")
+        return cls.prepare(
+            queue_directory=queue_directory,
+            pipeline_directory=pipeline_directory,
+            config_key=config_key,
+            limit=high_watermark - pending_count,
+            batch_size=batch_size,
+            workers=workers,
+        )
 
     @staticmethod
     def dump_issues(
@@ -973,30 +1310,289 @@ class QueueState:
         (queue_directory / output_file_name).write_text(json.dumps(output_payload, indent=2, sort_keys=True) + "\n")
         return summary
 
+    @staticmethod
+    def state_file_for(queue_directory: pathlib.Path, /, *, name: str = "state") -> pathlib.Path:
+        """
+        The state file named *name* under *queue_directory*: ``<name>.sqlite`` if that store exists.
+
+        Otherwise ``<name>.jsonl``, as written by :meth:`write_state`. Every method taking a state file path
+        accepts either kind; see :meth:`jsonl_to_sqlite`.
+
+        :param queue_directory: Path to the queue root directory.
+        :type queue_directory: pathlib.Path
+        :param name: ``"state"`` or ``"archive_state"``.
+        :type name: str
+        """
+        store_file = queue_directory / f"{name}{_STATE_STORE_SUFFIX}"
+        return store_file if store_file.exists() else queue_directory / f"{name}.jsonl"
+
+    @staticmethod
+    def jsonl_to_sqlite(jsonl_file: pathlib.Path, sqlite_file: pathlib.Path, /) -> int:
+        """
+        Import the ``state.jsonl`` at *jsonl_file*, journal included, into the SQLite store at *sqlite_file*.
+
+        The store is created if needed (or rebuilt if it has another format
+        version) and its entries are replaced in one transaction, so readers see
+        either the old or the new state. Once
+        ``state.sqlite`` exists next to ``state.jsonl``, the queue commands read
+        and update it instead (see :meth:`state_file_for`), and :meth:`write_state`
+        keeps it in sync.
+
+        :param jsonl_file: Path to the ``state.jsonl`` file to read.
+        :type jsonl_file: pathlib.Path
+        :param sqlite_file: Path to the store to write; it must end in ``.sqlite``.
+        :type sqlite_file: pathlib.Path
+        :returns: The number of imported entries.
+        :raises FileNotFoundError: If *jsonl_file* does not exist.
+        """
+        records = _iter_state_records(jsonl_file)
+        with _QueueStateStore(sqlite_file, rebuild=True) as store:
+            return store.replace_all(records)
+
+    @staticmethod
+    def sqlite_to_jsonl(sqlite_file: pathlib.Path, jsonl_file: pathlib.Path, /) -> int:
+        """
+        Export the SQLite store at *sqlite_file* to *jsonl_file*, in the order of its entries.
+
+        :param sqlite_file: Path to the store to read.
+        :type sqlite_file: pathlib.Path
+        :param jsonl_file: Path to the ``state.jsonl`` file to (atomically) write.
+        :type jsonl_file: pathlib.Path
+        :returns: The number of exported entries.
+        :raises FileNotFoundError: If *sqlite_file* does not exist.
+        """
+        with _QueueStateStore.existing(sqlite_file) as store:
+            records = list(store.iter_records())
+        _write_state_file(jsonl_file, records)
+        return len(records)
+
     @classmethod
-    def from_jsonl(cls, file_path: pathlib.Path, /) -> QueueState:
+    def from_jsonl(
+        cls,
+        file_path: pathlib.Path,
+        /,
+        *,
+        dandiset_id: str | None = None,
+        pipeline: str | None = None,
+        version: str | None = None,
+        content_id: str | None = None,
+        status: _EntryStatus | None = None,
+        predicate: Callable[[JobEntry], bool] | None = None,
+    ) -> QueueState:
         """
-        Load from an existing ``state.jsonl`` file.
+        Load from an existing state file, optionally keeping only a subset of it.
 
-        :param file_path: Path to the ``state.jsonl`` file to read.
+        The filters are those of :meth:`iter_jsonl`; entries they reject are never kept in memory.
+
+        :param file_path: Path to the ``state.jsonl`` file (or ``.sqlite`` store) to read.
         :type file_path: pathlib.Path
         :raises FileNotFoundError: If *file_path* does not exist.
+        :raises ValueError: If *status* is not a known status.
+        """
+        return cls(
+            entries=list(
+                cls.iter_jsonl(
+                    file_path,
+                    dandiset_id=dandiset_id,
+                    pipeline=pipeline,
+                    version=version,
+                    content_id=content_id,
+                    status=status,
+                    predicate=predicate,
+                )
+            )
+        )
+
+    @staticmethod
+    def iter_jsonl(
+        file_path: pathlib.Path,
+        /,
+        *,
+        dandiset_id: str | None = None,
+        pipeline: str | None = None,
+        version: str | None = None,
+        content_id: str | None = None,
+        status: _EntryStatus | None = None,
+        predicate: Callable[[JobEntry], bool] | None = None,
+    ) -> Iterator[JobEntry]:
+        """
+        Stream the entries of a state file, one at a time.
+
+        Only one entry is held in memory at a time, so counting or selecting a
+        subset of a large state runs in constant memory. From ``state.jsonl``,
+        lines that obviously fail a filter other than *predicate* are skipped
+        without being decoded; the rest are decoded and checked exactly. From a
+        ``.sqlite`` store (see :meth:`jsonl_to_sqlite`) the same filters run as
+        an indexed query, so only matching entries are read at all.
+
+        :param file_path: Path to the ``state.jsonl`` file (or ``.sqlite`` store) to read.
+        :type file_path: pathlib.Path
+        :param dandiset_id: Only yield entries whose source asset is in this Dandiset.
+        :type dandiset_id: str or None
+        :param pipeline: Only yield entries of this pipeline.
+        :type pipeline: str or None
+        :param version: Only yield entries of this pipeline version.
+        :type version: str or None
+        :param content_id: Only yield entries for this source asset content ID.
+        :type content_id: str or None
+        :param status: Only yield entries with this status (see :attr:`JobEntry.is_pending` and siblings).
+        :type status: str or None
+        :param predicate: Only yield entries for which this returns ``True``.
+        :raises FileNotFoundError: If *file_path* does not exist.
+        :raises ValueError: If *status* is not a known status.
         """
         if not file_path.exists():
             message = f"State file not found: {file_path}"
             raise FileNotFoundError(message)
-        stripped_lines = [line.strip() for line in file_path.read_text().splitlines()]
-        entries = [JobEntry.from_dict(json.loads(line)) for line in stripped_lines if line]
-        return cls(entries=entries)
+        if status is not None and status not in _STATUS_REQUIRED_FLAGS:
+            message = f"Unknown status {status!r}; expected one of {sorted(_STATUS_REQUIRED_FLAGS)}"
+            raise ValueError(message)
+
+        filters = {"dandiset_id": dandiset_id, "pipeline": pipeline, "version": version, "content_id": content_id}
+        if _is_state_store(file_path):
+            store = _QueueStateStore(file_path)
+
+            def iterate_store() -> Iterator[JobEntry]:
+                with store:
+                    for record in store.iter_records(**filters, status=status):
+                        entry = JobEntry.from_dict(record)
+                        if predicate is None or predicate(entry):
+                            yield entry
+
+            return iterate_store()
+
+        records = _iter_state_records(
+            file_path, may_match=lambda line: _state_line_may_match(line, **filters, status=status)
+        )
+
+        def iterate() -> Iterator[JobEntry]:
+            for record in records:
+                if any(value is not None and record.get(name) != value for name, value in filters.items()):
+                    continue
+                entry = JobEntry.from_dict(record)
+                if status is not None and not getattr(entry, f"is_{status}"):
+                    continue
+                if predicate is not None and not predicate(entry):
+                    continue
+                yield entry
+
+        return iterate()
+
+    @classmethod
+    def count_jsonl(
+        cls,
+        file_path: pathlib.Path,
+        /,
+        *,
+        dandiset_id: str | None = None,
+        pipeline: str | None = None,
+        version: str | None = None,
+        content_id: str | None = None,
+        status: _EntryStatus | None = None,
+        predicate: Callable[[JobEntry], bool] | None = None,
+    ) -> int:
+        """
+        Count the entries of a state file matching the filters of :meth:`iter_jsonl`, in constant memory.
+
+        Without a *predicate*, a ``.sqlite`` store counts them without reading any entry.
+
+        :raises FileNotFoundError: If *file_path* does not exist.
+        :raises ValueError: If *status* is not a known status.
+        """
+        filters = {"dandiset_id": dandiset_id, "pipeline": pipeline, "version": version, "content_id": content_id}
+        if predicate is None and _is_state_store(file_path) and status in (None, *_STATUS_REQUIRED_FLAGS):
+            with _QueueStateStore.existing(file_path) as store:
+                return store.count(**filters, status=status)
+        return sum(1 for _ in cls.iter_jsonl(file_path, **filters, status=status, predicate=predicate))
+
+    @classmethod
+    def has_entries(cls, file_path: pathlib.Path, /) -> bool:
+        """
+        Whether the state file at *file_path* holds any entry; reads no further than the first one.
+
+        :raises FileNotFoundError: If *file_path* does not exist.
+        """
+        if _is_state_store(file_path):
+            return cls.count_jsonl(file_path) > 0
+        return _state_has_entries(file_path)
 
     def to_file(self, file_path: pathlib.Path, /) -> None:
         """
-        Write all entries to *file_path* as newline-delimited JSON.
+        Write all entries to *file_path* as newline-delimited JSON, or into the store if it ends in ``.sqlite``.
+
+        The file is written under a temporary name and renamed over *file_path*
+        (a store is rewritten in one transaction), so concurrent readers see
+        either the old or the new state, never a partial one. Any change journal
+        of the old state is superseded.
 
         :param file_path: Destination path; the file is overwritten if it
             already exists.
         :type file_path: pathlib.Path
         """
-        with file_path.open(mode="w") as file_stream:
-            for entry in self.entries:
-                file_stream.write(json.dumps(entry.to_dict()) + "\n")
+        records = (entry.to_dict() for entry in self.entries)
+        if _is_state_store(file_path):
+            with _QueueStateStore(file_path, rebuild=True) as store:
+                store.replace_all(records)
+            return
+        _write_state_file(file_path, records)
+
+    @staticmethod
+    def journal_entry(file_path: pathlib.Path, entry: JobEntry, /) -> None:
+        """
+        Add *entry* to the state at *file_path*, or replace the entry with its identity, by appending to its journal.
+
+        Journaled changes cost the same whatever the size of the state; readers
+        (:meth:`iter_jsonl`, :meth:`from_jsonl`) merge them in, and the journal is
+        compacted into the state once it grows large enough. A ``.sqlite`` store
+        has no journal and is updated in place instead.
+
+        :raises FileNotFoundError: If *file_path* does not exist.
+        """
+        if _is_state_store(file_path):
+            with _QueueStateStore.existing(file_path) as store:
+                store.put(entry.to_dict())
+            return
+        _append_to_state_journal(file_path, [_put_operation(entry.to_dict())])
+
+    @staticmethod
+    def journal_update(file_path: pathlib.Path, job: JobInfo, /, **changes: object) -> None:
+        """
+        Set fields (as named in ``state.jsonl``) of the entry of *job* in the state at *file_path*.
+
+        For example ``journal_update(state_file, job, has_been_submitted=True)``.
+        Updates for an entry the state does not hold are ignored on read.
+
+        :raises FileNotFoundError: If *file_path* does not exist.
+        """
+        if _is_state_store(file_path):
+            with _QueueStateStore.existing(file_path) as store:
+                store.update(job.to_dict(), changes)
+            return
+        _append_to_state_journal(file_path, [_update_operation(job.to_dict(), changes)])
+
+    @staticmethod
+    def journal_removal(file_path: pathlib.Path, job: JobInfo, /) -> None:
+        """
+        Remove the entry of *job* from the state at *file_path* by appending to its journal.
+
+        :raises FileNotFoundError: If *file_path* does not exist.
+        """
+        if _is_state_store(file_path):
+            with _QueueStateStore.existing(file_path) as store:
+                store.delete(job.to_dict())
+            return
+        _append_to_state_journal(file_path, [_delete_operation(job.to_dict())])
+
+    @staticmethod
+    def compact_journal(file_path: pathlib.Path, /) -> bool:
+        """
+        Merge the journal of the state at *file_path* into it; ``False`` if there was nothing to merge.
+
+        A ``.sqlite`` store never has a journal to merge.
+
+        :raises FileNotFoundError: If *file_path* does not exist.
+        """
+        if _is_state_store(file_path):
+            _QueueStateStore.existing(file_path).close()
+            return False
+        return _compact_state_journal(file_path)
@@ -0,0 +1,286 @@
+import contextlib
+import json
+import pathlib
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator, Mapping
+
+#: Suffix of state files kept in a :class:`_QueueStateStore` rather than as newline-delimited JSON.
+_STATE_STORE_SUFFIX = ".sqlite"
+#: Bumped whenever the schema of the store changes; a store of another version must be re-imported from JSONL.
+_STORE_FORMAT_VERSION = 1
+#: Rows inserted per ``executemany`` call while importing.
+_IMPORT_BATCH_SIZE = 10_000
+
+#: Columns of ``entries``, named and ordered as the fields of a ``state.jsonl`` record.
+_COLUMNS = (
+    "dandiset_id",
+    "dandi_path",
+    "pipeline",
+    "version",
+    "params",
+    "config",
+    "attempt",
+    "codebase",
+    "content_id",
+    "asset_size_bytes",
+    "has_code",
+    "has_been_submitted",
+    "has_output",
+    "has_logs",
+    "dataset_description_path",
+    "output_paths",
+    "log_paths",
+    "created_at",
+    "job_completion_time",
+)
+_IDENTITY_COLUMNS = _COLUMNS[:7]
+_MUTABLE_COLUMNS = _COLUMNS[7:]
+_IDENTITY_CONDITION = " AND ".join(f"{column} = ?" for column in _IDENTITY_COLUMNS)
+_INSERT = f"INSERT INTO entries ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+_FLAG_COLUMNS = frozenset({"has_code", "has_been_submitted", "has_output", "has_logs"})
+_PATH_MAP_COLUMNS = frozenset({"dataset_description_path", "output_paths", "log_paths"})
+#: SQL for each status filter; mirrors the ``JobEntry.is_*`` properties.
+_STATUS_CONDITIONS = {
+    "pending": "has_code AND NOT has_logs AND NOT has_output",
+    "running": "has_logs AND NOT has_output",
+    "successful": "has_output",
+    "failed": "has_code AND has_logs AND NOT has_output",
+}
+_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS entries (
+        position INTEGER PRIMARY KEY,
+        dandiset_id TEXT NOT NULL,
+        dandi_path TEXT NOT NULL,
+        pipeline TEXT NOT NULL,
+        version TEXT NOT NULL,
+        params TEXT NOT NULL,
+        config TEXT NOT NULL,
+        attempt INTEGER NOT NULL,
+        codebase TEXT NOT NULL,
+        content_id TEXT,
+        asset_size_bytes INTEGER,
+        has_code INTEGER NOT NULL,
+        has_been_submitted INTEGER NOT NULL,
+        has_output INTEGER NOT NULL,
+        has_logs INTEGER NOT NULL,
+        dataset_description_path TEXT NOT NULL,
+        output_paths TEXT NOT NULL,
+        log_paths TEXT NOT NULL,
+        created_at TEXT,
+        job_completion_time TEXT
+    );
+    CREATE INDEX IF NOT EXISTS entries_by_identity
+        ON entries (dandi_path, attempt, dandiset_id, pipeline, version, params, config);
+    CREATE INDEX IF NOT EXISTS entries_by_dandiset ON entries (dandiset_id, pipeline, version);
+    CREATE INDEX IF NOT EXISTS entries_by_version ON entries (pipeline, version);
+    CREATE INDEX IF NOT EXISTS entries_by_content_id ON entries (content_id);
+    CREATE INDEX IF NOT EXISTS entries_by_status ON entries (has_output, has_logs, has_code);
+    CREATE INDEX IF NOT EXISTS entries_by_created_at ON entries (created_at);
+    CREATE INDEX IF NOT EXISTS entries_by_completion_time ON entries (job_completion_time);
+    PRAGMA user_version = {_STORE_FORMAT_VERSION};
+"""
+
+
+class _QueueStateStore:
+    """
+    A queue state kept in a SQLite database instead of ``state.jsonl``.
+
+    One row per entry, with the ``state.jsonl`` record fields as columns. The
+    path maps are stored as JSON text. The identity fields, status flags, content
+    ID and timestamps are indexed, so filtered reads only visit the rows they
+    return. Rows keep the order of the state they were imported from, and new
+    entries are added at the end. Records go in and come out as the same dicts
+    ``JobEntry.to_dict``/``JobEntry.from_dict`` use.
+
+    A new database gets the current schema. A store written with another schema
+    version is never read or emptied implicitly: opening it raises, unless
+    *rebuild* is set by a caller about to replace every entry anyway.
+
+    :raises RuntimeError: If the store has another format version and *rebuild* is not set.
+    """
+
+    def __init__(self, database_path: pathlib.Path, *, rebuild: bool = False) -> None:
+        self._database_path = database_path
+        self._connection = sqlite3.connect(database_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            # Other processes (queue processing, refreshes) may write the same store; wait for them.
+            self._connection.execute("PRAGMA busy_timeout = 30000")
+            (user_version,) = self._connection.execute("PRAGMA user_version").fetchone()
+            if user_version == _STORE_FORMAT_VERSION:
+                return
+            has_table = (
+                self._connection.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entries'"
+                ).fetchone()
+                is not None
+            )
+            if has_table and not rebuild:
+                self._connection.close()
+                message = (
+                    f"The queue state store {database_path} has format version {user_version}, but this version of "
+                    f"dandicompute expects {_STORE_FORMAT_VERSION}; rebuild it from the JSONL state with "
+                    "`dandicompute queue refresh` or `dandicompute queue sqlite`"
+                )
+                raise RuntimeError(message)
+            drop = "DROP TABLE IF EXISTS entries;" if has_table else ""
+            self._connection.executescript(f"BEGIN IMMEDIATE; {drop} {_SCHEMA} COMMIT;")
+            self._connection.execute("PRAGMA journal_mode = WAL")
+
+    @classmethod
+    def existing(cls, database_path: pathlib.Path) -> "_QueueStateStore":
+        """
+        Open the store at *database_path* without creating it.
+
+        :raises FileNotFoundError: If *database_path* does not exist.
+        :raises RuntimeError: If the store has another format version.
+        """
+        if not database_path.exists():
+            message = f"State file not found: {database_path}"
+            raise FileNotFoundError(message)
+        return cls(database_path)
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    @staticmethod
+    def _row(record: Mapping[str, object]) -> tuple:
+        values = []
+        for column in _COLUMNS:
+            value = record.get(column)
+            if column in _FLAG_COLUMNS:
+                value = int(bool(value))
+            elif column in _PATH_MAP_COLUMNS:
+                value = json.dumps(dict(value or {}))
+            values.append(value)
+        return tuple(values)
+
+    @staticmethod
+    def _record(row: tuple) -> dict:
+        record = dict(zip(_COLUMNS, row))
+        for column in _FLAG_COLUMNS:
+            record[column] = bool(record[column])
+        for column in _PATH_MAP_COLUMNS:
+            record[column] = json.loads(record[column])
+        return record
+
+    @staticmethod
+    def _where(
+        *,
+        dandiset_id: str | None = None,
+        pipeline: str | None = None,
+        version: str | None = None,
+        content_id: str | None = None,
+        status: str | None = None,
+    ) -> tuple[str, tuple[object, ...]]:
+        conditions: list[str] = []
+        parameters: list[object] = []
+        for column, value in (
+            ("dandiset_id", dandiset_id),
+            ("pipeline", pipeline),
+            ("version", version),
+            ("content_id", content_id),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if status is not None:
+            conditions.append(f"({_STATUS_CONDITIONS[status]})")
+        return (f" WHERE {' AND '.join(conditions)}" if conditions else ""), tuple(parameters)
+
+    def iter_records(self, **filters: str | None) -> Iterator[dict]:
+        """Yield the records matching *filters* (see :meth:`_where`) in state order, a batch of rows at a time."""
+        where, parameters = self._where(**filters)
+        with self._lock:
+            # A dedicated cursor, so concurrent readers of the same store do not share a result set.
+            cursor = self._connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM entries{where} ORDER BY position", parameters
+            )
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(1_000)
+            if not rows:
+                return
+            for row in rows:
+                yield self._record(row)
+
+    def count(self, **filters: str | None) -> int:
+        where, parameters = self._where(**filters)
+        with self._lock:
+            return self._connection.execute(f"SELECT COUNT(*) FROM entries{where}", parameters).fetchone()[0]
+
+    def replace_all(self, records: Iterable[Mapping[str, object]]) -> int:
+        """Replace every entry by *records* in one transaction; return how many were stored."""
+        count = 0
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM entries")
+            rows = []
+            for record in records:
+                rows.append(self._row(record))
+                if len(rows) >= _IMPORT_BATCH_SIZE:
+                    connection.executemany(_INSERT, rows)
+                    count += len(rows)
+                    rows.clear()
+            connection.executemany(_INSERT, rows)
+            count += len(rows)
+        return count
+
+    def put(self, record: Mapping[str, object]) -> None:
+        """Replace the entries with the identity of *record*, or add it at the end if there are none."""
+        row = self._row(record)
+        identity = row[: len(_IDENTITY_COLUMNS)]
+        with self._transaction() as connection:
+            updated = connection.execute(
+                f"UPDATE entries SET {', '.join(f'{column} = ?' for column in _COLUMNS)} WHERE {_IDENTITY_CONDITION}",
+                row + identity,
+            ).rowcount
+            if not updated:
+                connection.execute(_INSERT, row)
+
+    def update(self, identity: Mapping[str, object], changes: Mapping[str, object]) -> None:
+        """Set *changes* on the entries with the identity fields of *identity*; unknown identities are ignored."""
+        unknown = set(changes) - set(_MUTABLE_COLUMNS)
+        if unknown:
+            message = f"Cannot update {sorted(unknown)}; expected fields among {list(_MUTABLE_COLUMNS)}"
+            raise ValueError(message)
+        changed_row = self._row(changes)
+        assignments = [(column, changed_row[_COLUMNS.index(column)]) for column in changes]
+        with self._transaction() as connection:
+            connection.execute(
+                f"UPDATE entries SET {', '.join(f'{column} = ?' for column, _ in assignments)} "
+                f"WHERE {_IDENTITY_CONDITION}",
+                tuple(value for _, value in assignments) + tuple(identity[column] for column in _IDENTITY_COLUMNS),
+            )
+
+    def delete(self, identity: Mapping[str, object]) -> None:
+        """Remove the entries with the identity fields of *identity*."""
+        with self._transaction() as connection:
+            connection.execute(
+                f"DELETE FROM entries WHERE {_IDENTITY_CONDITION}",
+                tuple(identity[column] for column in _IDENTITY_COLUMNS),
+            )
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "_QueueStateStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._database_path})"
+
+
+def _is_state_store(file_path: pathlib.Path) -> bool:
+    return file_path.suffix == _STATE_STORE_SUFFIX
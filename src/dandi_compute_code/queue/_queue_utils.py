@@ -12,26 +12,55 @@ kept until those procedural functions are removed in favor of the model.
 from __future__ import annotations
 
 import collections
+import concurrent.futures
+import hashlib
+import io
 import json
 import logging
 import pathlib
 import random
 import re
+import time
 import urllib.error
-import urllib.request
+from collections.abc import Collection, Iterable, Mapping
 from dataclasses import dataclass
 
 import linkml_runtime.processing.referencevalidator
 import linkml_runtime.utils.schemaview
 
-from ._globals import _DURATION_PART_RE, _QUEUE_CONFIG_SCHEMA_PATH
+from ._globals import (
+    _DURATION_PART_RE,
+    _INCREMENTAL_MAX_ATTEMPT_MARKERS,
+    _QUEUE_CONFIG_SCHEMA_PATH,
+    _UPSTREAM_PREFETCH_MAX_WORKERS,
+)
 from ._job_info import JobInfo
+from ..dandiset._asset_index_snapshot import (
+    _asset_index_snapshot_path,
+    _read_asset_index_snapshot,
+    _write_asset_index_snapshot,
+)
+from ..dandiset._asset_metadata import AssetMetadata
+from ..dandiset._compact_asset_index import _CompactAssetIndex
+from ..dandiset._diff_asset_indexes import _diff_asset_indexes
+from ..dandiset._download_cache import (
+    _download_cache_lock,
+    _evict_download_cache_entries,
+    _load_download_cache_settings,
+)
+from ..dandiset._download_with_cache import (
+    _atomic_copy,
+    _download_with_cache,
+    _read_cached_download,
+    _resolve_cache_directory,
+)
 from ..dandiset._load_assets_jsonld_metadata import (
-    AssetMetadata,
     AssetsJsonldMetadata,
-    _build_asset_metadata,
+    _assets_jsonld_cache_key,
+    _index_cached_assets_jsonld,
 )
 from ..dandiset._load_content_id_to_usage_dandiset_path import _load_content_id_to_usage_dandiset_path
+from ..dandiset._query_asset_metadata_by_path import _prefer_per_path_queries, _query_asset_metadata_by_path
 
 _log = logging.getLogger(__name__)
 
@@ -126,57 +155,144 @@ def _subpath_is_under(subpath: str, directory: str) -> bool:
     return subpath == directory or subpath.startswith(f"{directory}/")
 
 
-def _load_upstream_assets_jsonld_metadata(dandiset_id: str) -> AssetsJsonldMetadata:
-    """Fetch and index ``assets.jsonld`` for another dandiset by id."""
-    url = _UPSTREAM_JSONLD_URL_TEMPLATE.format(dandiset_id=dandiset_id)
-    content_id_to_asset: dict[str, dict[str, object]] = {}
-    path_to_asset_metadata: dict[str, AssetMetadata] = {}
+def _pending_code_dirs_from_paths(asset_paths: Iterable[str]) -> list[str]:
+    """
+    Return sorted ``code`` directories holding a ``submit.sh`` but no submitted marker.
+
+    Runs in a single pass over *asset_paths*: every ``code/submit.sh`` registers its
+    directory as a candidate and every submitted marker registers the directory it
+    sits in, so the result is the set difference rather than a per-script scan.
+    """
+    submit_script_dirs: set[str] = set()
+    submitted_dirs: set[str] = set()
+    for asset_path in asset_paths:
+        if asset_path.endswith("/code/submit.sh"):
+            submit_script_dirs.add(asset_path[: -len("/submit.sh")])
+
+        parent, _, name = asset_path.rpartition("/")
+        if name == "submitted":
+            submitted_dirs.add(parent)
+        # A dated marker only needs its name to start with the prefix, so register
+        # every directory that could own it (normally just the immediate parent).
+        marker_index = asset_path.find("/submitted_date-")
+        while marker_index != -1:
+            submitted_dirs.add(asset_path[:marker_index])
+            marker_index = asset_path.find("/submitted_date-", marker_index + 1)
+
+    return sorted(submit_script_dirs - submitted_dirs)
+
+
+def _load_upstream_assets_jsonld_metadata(
+    dandiset_id: str, wanted_paths: Collection[str] | None = None
+) -> AssetsJsonldMetadata:
+    """
+    Fetch and index ``assets.jsonld`` for another dandiset by id.
 
+    A cached copy validated within the Dandiset's configured TTL is reused without
+    contacting the archive.
+
+    With *wanted_paths*, only those assets are indexed. When there are few enough of
+    them that querying each through the DANDI API is estimated to be cheaper than
+    fetching and reading the whole document, they are looked up individually
+    instead (falling back to the document if the API cannot be reached).
+    """
+    url = _UPSTREAM_JSONLD_URL_TEMPLATE.format(dandiset_id=dandiset_id)
+    max_age = _load_download_cache_settings().ttl_seconds(dandiset_id)
+    if wanted_paths is not None and _prefer_per_path_queries(
+        dandiset_id=dandiset_id, wanted_count=len(wanted_paths), max_age=max_age
+    ):
+        metadata = _query_asset_metadata_by_path(dandiset_id=dandiset_id, paths=wanted_paths)
+        if metadata is not None:
+            return metadata
     try:
-        with urllib.request.urlopen(url, timeout=30) as response:
-            assets = json.load(response)
+        with _download_cache_lock(shared=True):
+            cached_download = _download_with_cache(
+                url=url, cache_key=_assets_jsonld_cache_key(dandiset_id=dandiset_id), max_age=max_age
+            )
+            return _index_cached_assets_jsonld(
+                cached_download, source=url, skip_invalid=True, wanted_paths=wanted_paths
+            )
     except (urllib.error.URLError, TimeoutError, json.JSONDecodeError) as exception:
         _log.warning("Unable to load upstream metadata from %s: %s", url, exception)
-        return AssetsJsonldMetadata(
-            content_id_to_asset=content_id_to_asset,
-            path_to_asset_metadata=path_to_asset_metadata,
-        )
-
-    if not isinstance(assets, list):
-        _log.warning("Expected a JSON array from %s, got %s", url, type(assets).__name__)
-        return AssetsJsonldMetadata(
-            content_id_to_asset=content_id_to_asset,
-            path_to_asset_metadata=path_to_asset_metadata,
-        )
-
-    for asset in assets:
-        if not isinstance(asset, dict):
-            continue
-        try:
-            content_id, metadata = _build_asset_metadata(asset)
-        except ValueError as exception:
-            _log.debug("Skipping malformed upstream asset in %s: %s", url, exception)
-            continue
-        content_id_to_asset[content_id] = asset
-        path_to_asset_metadata[metadata.path] = metadata
-
-    return AssetsJsonldMetadata(
-        content_id_to_asset=content_id_to_asset,
-        path_to_asset_metadata=path_to_asset_metadata,
-    )
+    except ValueError as exception:
+        _log.warning("%s", exception)
+    return AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={})
 
 
 class _UpstreamMetadataCache:
-    """Per-call cache of upstream ``assets.jsonld`` lookups, keyed by dandiset id."""
+    """
+    Per-call cache of upstream ``assets.jsonld`` lookups, keyed by dandiset id.
+
+    Sits in front of the persistent download cache, which reuses each upstream
+    document across processes for its Dandiset's configured TTL.
+    """
 
     def __init__(self) -> None:
         self._cache: dict[str, AssetsJsonldMetadata] = {}
+        self._wanted_paths: dict[str, Collection[str] | None] = {}
+        self._loaded_at: dict[str, float] = {}
 
     def get(self, dandiset_id: str) -> AssetsJsonldMetadata:
         if dandiset_id not in self._cache:
+            self._loaded_at[dandiset_id] = time.time()
+            self._wanted_paths[dandiset_id] = None
             self._cache[dandiset_id] = _load_upstream_assets_jsonld_metadata(dandiset_id)
         return self._cache[dandiset_id]
 
+    def resolutions(self) -> dict[str, _UpstreamResolution]:
+        """
+        How each Dandiset loaded so far was resolved, for reuse by the next incremental refresh.
+
+        A Dandiset missing any of the paths it was asked for is left out, so a
+        failed or incomplete lookup is always retried rather than carried forward.
+        """
+        resolutions: dict[str, _UpstreamResolution] = {}
+        for dandiset_id, metadata in self._cache.items():
+            wanted_paths = self._wanted_paths.get(dandiset_id)
+            if wanted_paths is not None and not all(path in metadata.path_to_asset_metadata for path in wanted_paths):
+                continue
+            resolutions[dandiset_id] = _UpstreamResolution(
+                document_tag=_upstream_document_tag(dandiset_id)[0], resolved_at=self._loaded_at[dandiset_id]
+            )
+        return resolutions
+
+    def prefetch(
+        self,
+        wanted_paths_by_dandiset: Mapping[str, Collection[str] | None],
+        *,
+        max_workers: int = _UPSTREAM_PREFETCH_MAX_WORKERS,
+    ) -> None:
+        """
+        Load every not-yet-cached Dandiset in *wanted_paths_by_dandiset* concurrently.
+
+        Each Dandiset maps to the asset paths needed from it, or ``None`` for all of
+        them; the cached metadata of a Dandiset prefetched with paths holds only
+        those paths. Downloads run on a pool of at most *max_workers* threads. A
+        Dandiset whose load fails is cached as empty metadata (with a warning), so
+        only its own records end up with null source fields.
+        """
+        missing = sorted(wanted_paths_by_dandiset.keys() - self._cache.keys())
+        if not missing:
+            return
+        for dandiset_id in missing:
+            self._loaded_at[dandiset_id] = time.time()
+            self._wanted_paths[dandiset_id] = wanted_paths_by_dandiset[dandiset_id]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            futures = {
+                executor.submit(
+                    _load_upstream_assets_jsonld_metadata, dandiset_id, wanted_paths_by_dandiset[dandiset_id]
+                ): dandiset_id
+                for dandiset_id in missing
+            }
+            for future in concurrent.futures.as_completed(futures):
+                dandiset_id = futures[future]
+                try:
+                    self._cache[dandiset_id] = future.result()
+                except Exception as exception:
+                    _log.warning("Unable to prefetch upstream metadata for dandiset %s: %s", dandiset_id, exception)
+                    self._cache[dandiset_id] = AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={})
+        _evict_download_cache_entries()
+
 
 def _new_attempt_record(job: JobInfo) -> dict[str, object]:
     return {
@@ -200,20 +316,30 @@ class _AttemptCollection:
     submit_sh_timestamps_by_attempt: dict[JobInfo, str]
 
 
-def _collect_attempts(local_metadata: AssetsJsonldMetadata) -> _AttemptCollection:
+def _collect_attempts(
+    local_metadata: AssetsJsonldMetadata, *, only: Mapping[JobInfo, str] | None = None
+) -> _AttemptCollection:
     """
     Walk every asset path, group by attempt identity, record presence flags, and
     capture the ``code/submit.sh`` timestamp per attempt (used for ``created_at``).
+
+    With *only* (as returned by :func:`_attempt_markers`), just those attempts are
+    collected; paths containing none of their markers are skipped unparsed.
     """
     records_by_attempt: dict[JobInfo, dict[str, object]] = {}
     log_timestamps_by_attempt: dict[JobInfo, list[str]] = {}
     submit_sh_timestamps_by_attempt: dict[JobInfo, str] = {}
+    markers = tuple(set(only.values())) if only is not None and len(only) <= _INCREMENTAL_MAX_ATTEMPT_MARKERS else None
 
     for asset_path, asset_metadata in local_metadata.path_to_asset_metadata.items():
+        if markers is not None and not any(marker in asset_path for marker in markers):
+            continue
         parsed = _parse_attempt_identity(asset_path)
         if parsed is None:
             continue
         job_info, subpath = parsed
+        if only is not None and job_info not in only:
+            continue
 
         record = records_by_attempt.setdefault(job_info, _new_attempt_record(job_info))
 
@@ -253,6 +379,10 @@ def _finalize_attempt_records(
     upstream dandiset's ``assets.jsonld``, and ``created_at`` /
     ``job_completion_time`` from local timestamps.
     """
+    wanted_paths_by_dandiset: dict[str, set[str]] = {}
+    for job_info in collection.records_by_attempt:
+        wanted_paths_by_dandiset.setdefault(job_info.dandiset_id, set()).add(job_info.dandi_path)
+    upstream_cache.prefetch(wanted_paths_by_dandiset)
     finalized: list[dict[str, object]] = []
     for job_info, record in collection.records_by_attempt.items():
         upstream_metadata = upstream_cache.get(job_info.dandiset_id)
@@ -284,13 +414,285 @@ def _finalize_attempt_records(
     return finalized
 
 
-def _sort_key(record: dict[str, object]) -> tuple[str, str, str]:
+def _sort_key(record: dict[str, object]) -> tuple[str, str, str, str, str, str, str, str, int]:
     # content_id may be None for attempts whose upstream source wasn't resolvable;
-    # coerce to "" so sorting stays total.
+    # coerce to "" so sorting stays total. The remaining identity fields break ties,
+    # so the order never depends on the order of assets in assets.jsonld (which an
+    # incremental refresh does not replay).
     return (
         str(record["dandiset_id"]),
         str(record["dandi_path"]),
         str(record["content_id"]) if record["content_id"] is not None else "",
+        str(record["pipeline"]),
+        str(record["version"]),
+        str(record["params"]),
+        str(record["config"]),
+        str(record["codebase"]),
+        int(record["attempt"]),
+    )
+
+
+# --- incremental refresh ----------------------------------------------------
+
+
+@dataclass(frozen=True)
+class _UpstreamResolution:
+    """When the source fields of a Dandiset's records were last looked up, and from which document."""
+
+    document_tag: str | None
+    resolved_at: float
+
+
+@dataclass
+class _RefreshBaseline:
+    """The inputs and output of the previous refresh of one state file."""
+
+    records_by_attempt: dict[JobInfo, dict[str, object]]
+    asset_index: Mapping[str, AssetMetadata]
+    upstream_resolutions: dict[str, _UpstreamResolution]
+
+
+def _upstream_document_tag(dandiset_id: str) -> tuple[str | None, float | None]:
+    """
+    Identify the cached upstream ``assets.jsonld`` of *dandiset_id* without any request.
+
+    :returns: A tag that changes whenever the cached body is replaced, and when it
+        was last validated; ``(None, None)`` if nothing is cached.
+    """
+    body_path = _resolve_cache_directory() / _assets_jsonld_cache_key(dandiset_id=dandiset_id)
+    cached_download = _read_cached_download(body_path)
+    if cached_download is None:
+        return None, None
+    try:
+        size = body_path.stat().st_size
+    except OSError:
+        return None, None
+    tag = f"{size}:{cached_download.etag or ''}:{cached_download.last_modified or ''}"
+    return tag, cached_download.validated_at
+
+
+def _stale_upstream_dandisets(resolutions: Mapping[str, _UpstreamResolution], dandiset_ids: Iterable[str]) -> set[str]:
+    """
+    Select the Dandisets whose records' source fields must be looked up again.
+
+    A resolution is reused only while a full rebuild would see the same upstream
+    data: the cached document is unchanged and still within its Dandiset's TTL
+    (counted from its last validation), or, for per-path lookups, the lookup itself
+    is within the TTL.
+    """
+    settings = _load_download_cache_settings()
+    now = time.time()
+    stale: set[str] = set()
+    for dandiset_id in dandiset_ids:
+        resolution = resolutions.get(dandiset_id)
+        if resolution is None:
+            stale.add(dandiset_id)
+            continue
+        document_tag, validated_at = _upstream_document_tag(dandiset_id)
+        age_anchor = resolution.resolved_at if validated_at is None else min(resolution.resolved_at, validated_at)
+        if document_tag != resolution.document_tag or now - age_anchor >= settings.ttl_seconds(dandiset_id):
+            stale.add(dandiset_id)
+    return stale
+
+
+def _attempt_markers(asset_paths: Iterable[str]) -> dict[JobInfo, str]:
+    """
+    Map each attempt owning one of *asset_paths* to a substring of all its asset paths.
+
+    The marker runs from the ``dandiset-*`` segment through the attempt directory,
+    so it is shared by every asset of the attempt whatever segments precede it.
+    """
+    markers: dict[JobInfo, str] = {}
+    for asset_path in asset_paths:
+        parsed = _parse_attempt_identity(asset_path)
+        if parsed is None:
+            continue
+        job_info, subpath = parsed
+        attempt_prefix = asset_path.removesuffix(subpath) if subpath else f"{asset_path}/"
+        parts = attempt_prefix.split("/")
+        dandiset_index = _find_segment_index(tuple(parts), "dandiset-") or 0
+        markers[job_info] = "/".join(parts[dandiset_index:])
+    return markers
+
+
+def _refresh_attempt_records(
+    *,
+    baseline: _RefreshBaseline,
+    local_metadata: AssetsJsonldMetadata,
+    upstream_cache: _UpstreamMetadataCache,
+) -> tuple[list[dict[str, object]], dict[str, _UpstreamResolution]]:
+    """
+    Recompute only the records affected since *baseline*; the result matches a full rebuild.
+
+    An attempt is recomputed from *local_metadata* when any of its asset paths was
+    added, removed, or modified. An untouched attempt keeps its previous local
+    fields, and its source fields too unless its upstream Dandiset is stale (see
+    :func:`_stale_upstream_dandisets`). Upstream Dandisets with nothing to recompute
+    are never loaded.
+
+    :returns: The (unsorted) records and the upstream resolutions to carry forward.
+    """
+    changed_paths = _diff_asset_indexes(baseline.asset_index, local_metadata.path_to_asset_metadata)
+    touched = _attempt_markers(changed_paths)
+    collection = (
+        _collect_attempts(local_metadata, only=touched)
+        if touched
+        else _AttemptCollection(records_by_attempt={}, log_timestamps_by_attempt={}, submit_sh_timestamps_by_attempt={})
+    )
+
+    untouched = {
+        job_info: record for job_info, record in baseline.records_by_attempt.items() if job_info not in touched
+    }
+    stale = _stale_upstream_dandisets(baseline.upstream_resolutions, {job_info.dandiset_id for job_info in untouched})
+    records: list[dict[str, object]] = []
+    for job_info, record in untouched.items():
+        if job_info.dandiset_id not in stale:
+            records.append(record)
+            continue
+        collection.records_by_attempt[job_info] = record
+        if record.get("created_at") is not None:
+            collection.submit_sh_timestamps_by_attempt[job_info] = record["created_at"]
+        if record.get("job_completion_time") is not None:
+            collection.log_timestamps_by_attempt[job_info] = [record["job_completion_time"]]
+    _log.info(
+        "Incremental refresh: %d changed asset paths, %d attempts recomputed, %d reused",
+        len(changed_paths),
+        len(collection.records_by_attempt),
+        len(records),
+    )
+    records.extend(_finalize_attempt_records(collection=collection, upstream_cache=upstream_cache))
+
+    resolutions = {
+        dandiset_id: resolution
+        for dandiset_id, resolution in baseline.upstream_resolutions.items()
+        if dandiset_id not in stale
+    }
+    resolutions.update(upstream_cache.resolutions())
+    return records, resolutions
+
+
+def _refresh_baseline_path(state_file: pathlib.Path) -> pathlib.Path:
+    """Where the baseline of *state_file* is kept in the download cache (with its index snapshot alongside)."""
+    digest = hashlib.sha256(str(state_file.resolve()).encode()).hexdigest()[:16]
+    return _resolve_cache_directory() / "queue_refresh" / f"{digest}.json"
+
+
+def _load_refresh_baseline(*, state_file: pathlib.Path, dandiset_id: str) -> _RefreshBaseline | None:
+    """
+    Load the baseline saved by the previous refresh of *state_file*.
+
+    :returns: ``None`` (forcing a full rebuild) if there is no baseline, it was
+        saved for another Dandiset, or *state_file* changed since it was written.
+    """
+    baseline_path = _refresh_baseline_path(state_file)
+    try:
+        raw = json.loads(baseline_path.read_text())
+        state_bytes = state_file.read_bytes()
+    except (OSError, json.JSONDecodeError):
+        return None
+    state_digest = hashlib.sha256(state_bytes).hexdigest()
+    if raw.get("dandiset_id") != dandiset_id or raw.get("state_sha256") != state_digest:
+        _log.info("State file %s changed since its last refresh; rebuilding it in full", state_file)
+        return None
+    asset_index = _read_asset_index_snapshot(
+        file_path=_asset_index_snapshot_path(baseline_path), key=f"refresh:{dandiset_id}:{state_digest}"
+    )
+    if asset_index is None:
+        return None
+
+    records_by_attempt: dict[JobInfo, dict[str, object]] = {}
+    for line in state_bytes.decode().splitlines():
+        if line.strip():
+            record = json.loads(line)
+            records_by_attempt[_job_info_from_record(record)] = record
+    upstream_resolutions = {
+        upstream_id: _UpstreamResolution(document_tag=value["document_tag"], resolved_at=float(value["resolved_at"]))
+        for upstream_id, value in raw.get("upstream", {}).items()
+    }
+    return _RefreshBaseline(
+        records_by_attempt=records_by_attempt, asset_index=asset_index, upstream_resolutions=upstream_resolutions
+    )
+
+
+def _save_refresh_baseline(
+    *,
+    state_file: pathlib.Path,
+    dandiset_id: str,
+    asset_index: Mapping[str, AssetMetadata],
+    upstream_resolutions: Mapping[str, _UpstreamResolution],
+) -> None:
+    """Record what *state_file* (already written) was computed from, for the next incremental refresh."""
+    if not isinstance(asset_index, _CompactAssetIndex):
+        compact_index = _CompactAssetIndex()
+        for metadata in asset_index.values():
+            compact_index._add(metadata)
+        compact_index._freeze()
+        asset_index = compact_index
+    state_digest = hashlib.sha256(state_file.read_bytes()).hexdigest()
+    raw = {
+        "state_file": str(state_file.resolve()),
+        "dandiset_id": dandiset_id,
+        "state_sha256": state_digest,
+        "upstream": {
+            upstream_id: {"document_tag": resolution.document_tag, "resolved_at": resolution.resolved_at}
+            for upstream_id, resolution in sorted(upstream_resolutions.items())
+        },
+    }
+    baseline_path = _refresh_baseline_path(state_file)
+    with _download_cache_lock(shared=True):
+        _write_asset_index_snapshot(
+            index=asset_index,
+            file_path=_asset_index_snapshot_path(baseline_path),
+            key=f"refresh:{dandiset_id}:{state_digest}",
+        )
+        _atomic_copy(source=io.BytesIO(json.dumps(raw).encode()), file_path=baseline_path)
+
+
+#: Flags that must be ``true`` for an entry to have each status; see the ``JobEntry.is_*`` properties.
+_STATUS_REQUIRED_FLAGS: dict[str, tuple[str, ...]] = {
+    "pending": ("has_code",),
+    "running": ("has_logs",),
+    "successful": ("has_output",),
+    "failed": ("has_code", "has_logs"),
+}
+_TRUE_FLAG_RES = {flag: re.compile(rf'"{flag}"\s*:\s*true') for flag in ("has_code", "has_logs", "has_output")}
+
+
+def _state_line_may_match(
+    line: str,
+    *,
+    dandiset_id: str | None,
+    status: str | None,
+    pipeline: str | None = None,
+    version: str | None = None,
+    content_id: str | None = None,
+) -> bool:
+    """
+    Cheaply rule out a raw ``state.jsonl`` line before decoding it.
+
+    Returns ``False`` only when the line certainly does not match: one of
+    *dandiset_id*, *pipeline*, *version* or *content_id* does not occur in it as
+    a JSON string, or a flag that *status* requires is not ``true``. A ``True``
+    result still has to be confirmed on the decoded entry.
+    """
+    for value in (dandiset_id, pipeline, version, content_id):
+        if value is not None and json.dumps(value) not in line:
+            return False
+    if status is not None:
+        return all(_TRUE_FLAG_RES[flag].search(line) for flag in _STATUS_REQUIRED_FLAGS[status])
+    return True
+
+
+def _job_info_from_record(record: Mapping[str, object]) -> JobInfo:
+    return JobInfo(
+        dandiset_id=str(record["dandiset_id"]),
+        dandi_path=str(record["dandi_path"]),
+        pipeline=str(record["pipeline"]),
+        version=str(record["version"]),
+        params=str(record["params"]),
+        config=str(record["config"]),
+        attempt=int(record["attempt"]),
+        codebase=str(record["codebase"]),
     )
 
 
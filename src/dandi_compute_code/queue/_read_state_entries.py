@@ -1,6 +1,7 @@
-import json
 import pathlib
 
+from ._iter_state_entries import _iter_state_entries
+
 
 def _read_state_entries(state_file: pathlib.Path, /) -> list[dict]:
     """
@@ -11,10 +12,4 @@ def _read_state_entries(state_file: pathlib.Path, /) -> list[dict]:
     FileNotFoundError
         If *state_file* does not exist.
     """
-    if not state_file.exists():
-        message = f"State file not found: {state_file}"
-        raise FileNotFoundError(message)
-
-    stripped_lines = [line.strip() for line in state_file.read_text().splitlines()]
-    state_entries = [json.loads(line) for line in stripped_lines if line]
-    return state_entries
+    return list(_iter_state_entries(state_file))
@@ -0,0 +1,43 @@
+import datetime
+from collections.abc import Iterable, Mapping
+
+from ._globals import _PREPARED_CAPSULE_GRACE_SECONDS
+from ._state_journal import _record_identity
+
+
+def _recently_prepared_records(
+    previous_records: Iterable[Mapping[str, object]],
+    records: Iterable[Mapping[str, object]],
+    /,
+    *,
+    now: datetime.datetime | None = None,
+) -> list[dict[str, object]]:
+    """
+    Select the unsubmitted pending *previous_records* that a refresh to *records* would drop, but should not.
+
+    ``assets.jsonld`` lags behind uploads, so a refresh right after a preparation
+    does not list the capsules it just journaled. Such an entry is carried across
+    refreshes until its capsule is listed, or until it is older (by ``created_at``)
+    than :data:`~._globals._PREPARED_CAPSULE_GRACE_SECONDS`.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    listed_identities = {_record_identity(record) for record in records}
+    carried: list[dict[str, object]] = []
+    for record in previous_records:
+        if (
+            not record.get("has_code")
+            or record.get("has_logs")
+            or record.get("has_output")
+            or record.get("has_been_submitted")
+            or _record_identity(record) in listed_identities
+        ):
+            continue
+        try:
+            created_at = datetime.datetime.fromisoformat(str(record.get("created_at")))
+        except ValueError:
+            continue
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+        if (now - created_at).total_seconds() < _PREPARED_CAPSULE_GRACE_SECONDS:
+            carried.append(dict(record))
+    return carried
@@ -0,0 +1,92 @@
+import dataclasses
+import logging
+import pathlib
+
+from ._entry_identity import _entry_identity
+from ._find_pending_entries import _find_pending_entries
+from ._iter_state_entries import _iter_state_entries
+from ._jsonl_state_file import _jsonl_state_file
+from ._prepare_queue import prepare_queue
+from ._write_queue_state import _parse_attempt_identity
+
+_log = logging.getLogger(__name__)
+
+
+def replenish_queue(
+    *,
+    queue_directory: pathlib.Path,
+    low_watermark: int,
+    high_watermark: int,
+    pipeline_directory: pathlib.Path | None = None,
+    config_key: str = "default",
+    batch_size: int | None = None,
+    workers: int | None = None,
+) -> int:
+    """
+    Keep the number of capsules awaiting submission between two watermarks.
+
+    Counts the attempt directories awaiting submission in the DANDI assets metadata
+    and, only when fewer than *low_watermark* remain, calls :func:`prepare_queue`
+    with a limit of just enough assets to reach *high_watermark*.  The upper bound
+    keeps the job capsules Dandiset from filling with unsubmitted capsules.  Run it
+    after :func:`process_queue` so preparation never delays a submission.
+
+    ``assets.jsonld`` lags behind uploads, so the entries of ``state.jsonl`` that
+    have code but were neither submitted nor run, which include the capsules
+    :func:`prepare_queue` just recorded, are counted as well; a capsule found in
+    both is counted once.
+
+    :param queue_directory: Path to the queue root directory.
+    :type queue_directory: pathlib.Path
+    :param low_watermark: Replenish when fewer pending capsules than this remain.
+    :type low_watermark: int
+    :param high_watermark: Number of pending capsules to replenish up to.
+    :type high_watermark: int
+    :param pipeline_directory: Local path to the AIND pipeline repository.
+    :type pipeline_directory: pathlib.Path, optional
+    :param config_key: Key for a registered job configuration.
+    :type config_key: str
+    :param batch_size: Passed to :func:`prepare_queue`.
+    :type batch_size: int, optional
+    :param workers: Passed to :func:`prepare_queue`.
+    :type workers: int, optional
+    :returns: The number of assets prepared.
+    :rtype: int
+    :raises ValueError: If the watermarks are negative or *low_watermark* exceeds *high_watermark*.
+    """
+    if not 0 <= low_watermark <= high_watermark:
+        message = (
+            "Watermarks must satisfy 0 <= low_watermark <= high_watermark, "
+            f"got low_watermark={low_watermark} and high_watermark={high_watermark}"
+        )
+        raise ValueError(message)
+
+    pending_identities = {
+        _entry_identity(dataclasses.asdict(parsed[0]))
+        for code_dir in _find_pending_entries()
+        if (parsed := _parse_attempt_identity(f"{code_dir}/submit.sh")) is not None
+    }
+    state_file = _jsonl_state_file(queue_directory)
+    if state_file.exists():
+        pending_identities.update(
+            _entry_identity(entry)
+            for entry in _iter_state_entries(state_file)
+            if entry.get("has_code")
+            and not entry.get("has_logs")
+            and not entry.get("has_output")
+            and not entry.get("has_been_submitted")
+        )
+    pending_count = len(pending_identities)
+    if pending_count >= low_watermark:
+        _log.info(f"{pending_count} capsules pending (low watermark {low_watermark}); not replenishing")
+        return 0
+
+    _log.info(f"{pending_count} capsules pending; preparing up to {high_watermark - pending_count} more")
+    return prepare_queue(
+        queue_directory=queue_directory,
+        pipeline_directory=pipeline_directory,
+        config_key=config_key,
+        limit=high_watermark - pending_count,
+        batch_size=batch_size,
+        workers=workers,
+    )
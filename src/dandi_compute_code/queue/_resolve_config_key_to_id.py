@@ -0,0 +1,26 @@
+from ._globals import _AIND_EPHYS_CONFIG_REGISTRY
+
+
+def _resolve_config_key_to_id(pipeline: str, config_key: str) -> str:
+    """
+    Resolve a registered config key to its 7-character hash ID.
+
+    Mirrors :func:`~._resolve_params_key_to_id._resolve_params_key_to_id`: the
+    ``config`` field recorded in queue state entries is the first seven hex
+    characters of the MD5 checksum of the config file, looked up in
+    ``registered_configs.json`` for the ``aind+ephys`` pipeline.  Unknown
+    pipelines and keys are returned unchanged.
+
+    :param pipeline: The pipeline name as recorded in the state entry (e.g. ``"aind+ephys"``).
+    :type pipeline: str
+    :param config_key: A registered config key (e.g. ``"default"``), or a raw hash ID.
+    :type config_key: str
+    :returns: The 7-character hash ID corresponding to *config_key*, or *config_key*
+        itself if no mapping is found.
+    :rtype: str
+    """
+    if pipeline == "aind+ephys":
+        entry = _AIND_EPHYS_CONFIG_REGISTRY.get(config_key)
+        if entry:
+            return entry["md5"][:7]
+    return config_key
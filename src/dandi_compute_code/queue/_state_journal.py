@@ -0,0 +1,248 @@
+"""
+Atomic writes and the append-only change journal of queue state files.
+
+A state file (``state.jsonl``, ``archive_state.jsonl``) is only ever replaced
+whole, by writing a sibling temporary file and renaming it over the original,
+so readers never see a half-written file. Small changes are appended to
+``<state file>.journal`` instead of rewriting the state. The journal starts
+with a header naming the exact version of the state file it applies to (every
+replace creates a new one), followed by one operation per line:
+
+* ``{"op": "put", "entry": {...}}`` — add an entry, or replace the one with the same identity;
+* ``{"op": "update", "identity": {...}, "changes": {...}}`` — set fields of an existing entry;
+* ``{"op": "delete", "identity": {...}}`` — drop an entry.
+
+Readers merge the journal while streaming the state. Writers serialize on an
+``flock`` next to the state file, and the journal is compacted into the state
+once it grows past a fraction of the state's size. A journal left over from an
+older version of the state is ignored.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import pathlib
+import re
+import stat
+import tempfile
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+
+from ._globals import _STATE_JOURNAL_COMPACT_MIN_BYTES, _STATE_JOURNAL_COMPACT_RATIO
+
+#: Fields of a state record that identify its attempt; see ``JobEntry.identity``.
+_IDENTITY_FIELDS = ("dandiset_id", "dandi_path", "pipeline", "version", "params", "config", "attempt")
+_DANDI_PATH_RE = re.compile(r'"dandi_path"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+
+def _state_journal_path(state_file: pathlib.Path) -> pathlib.Path:
+    return state_file.with_name(f"{state_file.name}.journal")
+
+
+def _record_identity(record: Mapping[str, object]) -> tuple:
+    return tuple(record.get(name) for name in _IDENTITY_FIELDS)
+
+
+def _state_version(stat_result: os.stat_result) -> str:
+    """Identify one written version of a state file; every atomic replace yields a new one."""
+    return f"{stat_result.st_ino}:{stat_result.st_size}:{stat_result.st_mtime_ns}"
+
+
+@contextlib.contextmanager
+def _state_write_lock(state_file: pathlib.Path) -> Iterator[None]:
+    """Serialize the writers of *state_file* and its journal across processes; readers never take it."""
+    with open(state_file.with_name(f".{state_file.name}.lock"), mode="a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _atomic_write_lines(file_path: pathlib.Path, lines: Iterable[str]) -> None:
+    """Write *lines* to a sibling temporary file and rename it over *file_path*, keeping its permissions."""
+    mode = stat.S_IMODE(file_path.stat().st_mode) if file_path.exists() else 0o644
+    file_descriptor, temporary_name = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.")
+    try:
+        with os.fdopen(file_descriptor, mode="w") as file_stream:
+            file_stream.writelines(lines)
+        os.chmod(temporary_name, mode)
+        os.replace(temporary_name, file_path)
+    except BaseException:
+        pathlib.Path(temporary_name).unlink(missing_ok=True)
+        raise
+
+
+@dataclass
+class _JournalOutcome:
+    """What the journal does to the entry of one identity."""
+
+    replaced: bool = False
+    record: dict | None = None
+    changes: dict = field(default_factory=dict)
+
+    def apply(self, record: dict) -> dict | None:
+        """The state *record* after the journal; ``None`` if it was deleted."""
+        if self.replaced:
+            return self.record
+        return {**record, **self.changes} if self.changes else record
+
+
+def _read_state_journal(journal_path: pathlib.Path, *, state_version: str) -> dict[tuple, _JournalOutcome]:
+    """
+    Fold the operations of the journal written for *state_version* into one outcome per identity.
+
+    A missing journal, or one written for another version of the state, has no
+    operations. A trailing line without its newline is still being appended and is ignored.
+    """
+    outcomes: dict[tuple, _JournalOutcome] = {}
+    try:
+        journal_stream = journal_path.open()
+    except FileNotFoundError:
+        return outcomes
+    with journal_stream:
+        header = journal_stream.readline()
+        if not header.endswith("\n") or json.loads(header).get("state") != state_version:
+            return outcomes
+        for line in journal_stream:
+            if not line.endswith("\n"):
+                break
+            if not line.strip():
+                continue
+            operation = json.loads(line)
+            if operation["op"] == "put":
+                outcomes[_record_identity(operation["entry"])] = _JournalOutcome(
+                    replaced=True, record=operation["entry"]
+                )
+                continue
+            outcome = outcomes.setdefault(_record_identity(operation["identity"]), _JournalOutcome())
+            if operation["op"] == "delete":
+                outcome.replaced, outcome.record, outcome.changes = True, None, {}
+            elif outcome.replaced:
+                outcome.record = {**outcome.record, **operation["changes"]} if outcome.record is not None else None
+            else:
+                outcome.changes.update(operation["changes"])
+    return outcomes
+
+
+def _may_be_journaled(line: str, journaled_paths: set[str]) -> bool:
+    if not journaled_paths:
+        return False
+    match = _DANDI_PATH_RE.search(line)
+    return match is None or json.loads(match.group(1)) in journaled_paths
+
+
+def _iter_state_records(
+    state_file: pathlib.Path, /, *, may_match: Callable[[str], bool] | None = None
+) -> Iterator[dict]:
+    """
+    Stream the records of *state_file* with its journal merged in, one line at a time.
+
+    Journaled changes replace entries in place and new entries follow the state.
+    Lines for which *may_match* returns ``False`` are skipped without being
+    decoded, unless the journal changes their entry.
+
+    :raises FileNotFoundError: If *state_file* does not exist.
+    """
+    state_stream = state_file.open()
+
+    def iterate() -> Iterator[dict]:
+        with state_stream:
+            outcomes = _read_state_journal(
+                _state_journal_path(state_file), state_version=_state_version(os.fstat(state_stream.fileno()))
+            )
+            journaled_paths = {identity[1] for identity in outcomes}
+            seen: set[tuple] = set()
+            for line in state_stream:
+                line = line.strip()
+                if not line:
+                    continue
+                if may_match is not None and not may_match(line) and not _may_be_journaled(line, journaled_paths):
+                    continue
+                record = json.loads(line)
+                if outcomes and (outcome := outcomes.get(identity := _record_identity(record))) is not None:
+                    seen.add(identity)
+                    record = outcome.apply(record)
+                    if record is None:
+                        continue
+                yield record
+            for identity, outcome in outcomes.items():
+                if identity not in seen and outcome.replaced and outcome.record is not None:
+                    yield outcome.record
+
+    return iterate()
+
+
+def _state_has_entries(state_file: pathlib.Path, /) -> bool:
+    """Whether *state_file*, with its journal merged in, holds any entry; reads no further than the first one."""
+    with contextlib.closing(_iter_state_records(state_file)) as records:
+        return next(records, None) is not None
+
+
+def _write_state_file(state_file: pathlib.Path, records: Iterable[Mapping[str, object]]) -> None:
+    """Atomically replace *state_file* with *records*, superseding its journal."""
+    with _state_write_lock(state_file):
+        _atomic_write_lines(state_file, (json.dumps(record) + "\n" for record in records))
+        _state_journal_path(state_file).unlink(missing_ok=True)
+
+
+def _compact_state_journal_locked(state_file: pathlib.Path) -> bool:
+    journal_path = _state_journal_path(state_file)
+    if not journal_path.exists():
+        return False
+    _atomic_write_lines(state_file, (json.dumps(record) + "\n" for record in _iter_state_records(state_file)))
+    journal_path.unlink(missing_ok=True)
+    return True
+
+
+def _compact_state_journal(state_file: pathlib.Path, /) -> bool:
+    """
+    Merge the journal of *state_file* into it and drop the journal; ``False`` if there was none.
+
+    :raises FileNotFoundError: If *state_file* does not exist.
+    """
+    with _state_write_lock(state_file):
+        return _compact_state_journal_locked(state_file)
+
+
+def _append_to_state_journal(state_file: pathlib.Path, operations: Iterable[Mapping[str, object]]) -> None:
+    """
+    Append *operations* to the journal of *state_file*, compacting it once it grows too large.
+
+    Appending costs the same whatever the size of the state, apart from the
+    occasional compaction.
+
+    :raises FileNotFoundError: If *state_file* does not exist.
+    """
+    lines = "".join(json.dumps(operation) + "\n" for operation in operations)
+    journal_path = _state_journal_path(state_file)
+    with _state_write_lock(state_file):
+        state_stat = state_file.stat()
+        version = _state_version(state_stat)
+        try:
+            with journal_path.open() as journal_stream:
+                header = journal_stream.readline()
+        except FileNotFoundError:
+            header = ""
+        if not header.endswith("\n") or json.loads(header).get("state") != version:
+            _atomic_write_lines(journal_path, [json.dumps({"state": version}) + "\n"])
+        with journal_path.open(mode="a") as journal_stream:
+            journal_stream.write(lines)
+        if journal_path.stat().st_size > max(
+            _STATE_JOURNAL_COMPACT_MIN_BYTES, _STATE_JOURNAL_COMPACT_RATIO * state_stat.st_size
+        ):
+            _compact_state_journal_locked(state_file)
+
+
+def _put_operation(record: Mapping[str, object]) -> dict:
+    return {"op": "put", "entry": dict(record)}
+
+
+def _update_operation(identity: Mapping[str, object], changes: Mapping[str, object]) -> dict:
+    """Set *changes* on the entry identified by the identity fields of *identity* (any record or job dict)."""
+    return {"op": "update", "identity": {name: identity[name] for name in _IDENTITY_FIELDS}, "changes": dict(changes)}
+
+
+def _delete_operation(identity: Mapping[str, object]) -> dict:
+    return {"op": "delete", "identity": {name: identity[name] for name in _IDENTITY_FIELDS}}
@@ -1,3 +1,4 @@
+import dataclasses
 import datetime
 import logging
 import pathlib
@@ -6,6 +7,8 @@ import subprocess
 import tempfile
 
 from ._find_pending_entries import _find_pending_entries
+from ._state_journal import _append_to_state_journal, _update_operation
+from ._write_queue_state import _parse_attempt_identity
 
 _log = logging.getLogger(__name__)
 
@@ -17,6 +20,7 @@ def _submit_next(
     processing_directory: pathlib.Path,
     max_submissions: int = 2,
     test: bool = False,
+    state_file: pathlib.Path | None = None,
 ) -> bool:
     """
     Submit the next eligible pending entries from the DANDI assets metadata.
@@ -40,6 +44,9 @@ def _submit_next(
     test : bool, optional
         When ``True``, leave temporary working directories on disk after
         successful submission for debugging.
+    state_file : pathlib.Path, optional
+        A ``state.jsonl`` in which each submitted entry is marked
+        ``has_been_submitted`` by appending to its change journal.
 
     Returns
     -------
@@ -116,6 +123,11 @@ def _submit_next(
             message = "dandi upload failed - please check the logs to see more details."
             raise RuntimeError(message)
 
+        parsed = _parse_attempt_identity(f"{code_dir_path}/submit.sh")
+        if state_file is not None and state_file.exists() and parsed is not None:
+            operation = _update_operation(dataclasses.asdict(parsed[0]), {"has_been_submitted": True})
+            _append_to_state_journal(state_file, [operation])
+
         if test:
             _log.info("Leaving temporary directory in place for test mode: %s", temp_dir)
         else:
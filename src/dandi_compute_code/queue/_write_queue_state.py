@@ -1,19 +1,31 @@
+import concurrent.futures
 import json
 import logging
 import pathlib
 import re
 import urllib.error
-import urllib.request
+from collections.abc import Collection, Mapping
 from dataclasses import dataclass
 
+from ._globals import _UPSTREAM_PREFETCH_MAX_WORKERS
 from ._load_queue_config import _load_queue_config
+from ._queue_state_store import _STATE_STORE_SUFFIX, _QueueStateStore
+from ._recently_prepared_records import _recently_prepared_records
+from ._state_journal import _append_to_state_journal, _iter_state_records, _put_operation, _write_state_file
+from ..dandiset._download_cache import (
+    _download_cache_lock,
+    _evict_download_cache_entries,
+    _load_download_cache_settings,
+)
+from ..dandiset._download_with_cache import _download_with_cache
 from ..dandiset._globals import _FAILED_RUNS_ARCHIVE_DANDISET_ID, _JOB_CAPSULES_DANDISET_ID
 from ..dandiset._load_assets_jsonld_metadata import (
-    AssetMetadata,
     AssetsJsonldMetadata,
-    _build_asset_metadata,
+    _assets_jsonld_cache_key,
+    _index_cached_assets_jsonld,
     load_assets_jsonld_metadata,
 )
+from ..dandiset._query_asset_metadata_by_path import _prefer_per_path_queries, _query_asset_metadata_by_path
 
 _FLAT_ATTEMPT_RE = re.compile(
     r"^version-(?P<version>.+?)"
@@ -125,53 +137,52 @@ def _subpath_is_under(subpath: str, directory: str) -> bool:
 # --- upstream metadata lookup ----------------------------------------------
 
 
-def _load_upstream_assets_jsonld_metadata(dandiset_id: str) -> AssetsJsonldMetadata:
+def _load_upstream_assets_jsonld_metadata(
+    dandiset_id: str, wanted_paths: Collection[str] | None = None
+) -> AssetsJsonldMetadata:
     """
     Fetch and index ``assets.jsonld`` for another dandiset by id.
 
     Mirrors :func:`load_assets_jsonld_metadata` but parameterized by URL so
-    derivatives in a meta-analysis dandiset can resolve their source assets.
+    derivatives in a meta-analysis dandiset can resolve their source assets. A
+    cached copy validated within the Dandiset's configured TTL is reused without
+    contacting the archive.
+
+    With *wanted_paths*, only those assets are indexed. When there are few enough of
+    them that querying each through the DANDI API is estimated to be cheaper than
+    fetching and reading the whole document, they are looked up individually
+    instead (falling back to the document if the API cannot be reached).
     """
     url = _UPSTREAM_JSONLD_URL_TEMPLATE.format(dandiset_id=dandiset_id)
-    content_id_to_asset: dict[str, dict[str, object]] = {}
-    path_to_asset_metadata: dict[str, AssetMetadata] = {}
-
+    max_age = _load_download_cache_settings().ttl_seconds(dandiset_id)
+    if wanted_paths is not None and _prefer_per_path_queries(
+        dandiset_id=dandiset_id, wanted_count=len(wanted_paths), max_age=max_age
+    ):
+        metadata = _query_asset_metadata_by_path(dandiset_id=dandiset_id, paths=wanted_paths)
+        if metadata is not None:
+            return metadata
     try:
-        with urllib.request.urlopen(url, timeout=30) as response:
-            assets = json.load(response)
+        with _download_cache_lock(shared=True):
+            cached_download = _download_with_cache(
+                url=url, cache_key=_assets_jsonld_cache_key(dandiset_id=dandiset_id), max_age=max_age
+            )
+            return _index_cached_assets_jsonld(
+                cached_download, source=url, skip_invalid=True, wanted_paths=wanted_paths
+            )
     except (urllib.error.URLError, TimeoutError, json.JSONDecodeError) as exception:
         _log.warning("Unable to load upstream metadata from %s: %s", url, exception)
-        return AssetsJsonldMetadata(
-            content_id_to_asset=content_id_to_asset,
-            path_to_asset_metadata=path_to_asset_metadata,
-        )
-
-    if not isinstance(assets, list):
-        _log.warning("Expected a JSON array from %s, got %s", url, type(assets).__name__)
-        return AssetsJsonldMetadata(
-            content_id_to_asset=content_id_to_asset,
-            path_to_asset_metadata=path_to_asset_metadata,
-        )
-
-    for asset in assets:
-        if not isinstance(asset, dict):
-            continue
-        try:
-            content_id, metadata = _build_asset_metadata(asset)
-        except ValueError as exception:
-            _log.debug("Skipping malformed upstream asset in %s: %s", url, exception)
-            continue
-        content_id_to_asset[content_id] = asset
-        path_to_asset_metadata[metadata.path] = metadata
-
-    return AssetsJsonldMetadata(
-        content_id_to_asset=content_id_to_asset,
-        path_to_asset_metadata=path_to_asset_metadata,
-    )
+    except ValueError as exception:
+        _log.warning("%s", exception)
+    return AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={})
 
 
 class _UpstreamMetadataCache:
-    """Per-call cache of upstream ``assets.jsonld`` lookups, keyed by dandiset id."""
+    """
+    Per-call cache of upstream ``assets.jsonld`` lookups, keyed by dandiset id.
+
+    Sits in front of the persistent download cache, which reuses each upstream
+    document across processes for its Dandiset's configured TTL.
+    """
 
     def __init__(self) -> None:
         self._cache: dict[str, AssetsJsonldMetadata] = {}
@@ -181,6 +192,40 @@ class _UpstreamMetadataCache:
             self._cache[dandiset_id] = _load_upstream_assets_jsonld_metadata(dandiset_id)
         return self._cache[dandiset_id]
 
+    def prefetch(
+        self,
+        wanted_paths_by_dandiset: Mapping[str, Collection[str] | None],
+        *,
+        max_workers: int = _UPSTREAM_PREFETCH_MAX_WORKERS,
+    ) -> None:
+        """
+        Load every not-yet-cached Dandiset in *wanted_paths_by_dandiset* concurrently.
+
+        Each Dandiset maps to the asset paths needed from it, or ``None`` for all of
+        them; the cached metadata of a Dandiset prefetched with paths holds only
+        those paths. Downloads run on a pool of at most *max_workers* threads. A
+        Dandiset whose load fails is cached as empty metadata (with a warning), so
+        only its own records end up with null source fields.
+        """
+        missing = sorted(wanted_paths_by_dandiset.keys() - self._cache.keys())
+        if not missing:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            futures = {
+                executor.submit(
+                    _load_upstream_assets_jsonld_metadata, dandiset_id, wanted_paths_by_dandiset[dandiset_id]
+                ): dandiset_id
+                for dandiset_id in missing
+            }
+            for future in concurrent.futures.as_completed(futures):
+                dandiset_id = futures[future]
+                try:
+                    self._cache[dandiset_id] = future.result()
+                except Exception as exception:
+                    _log.warning("Unable to prefetch upstream metadata for dandiset %s: %s", dandiset_id, exception)
+                    self._cache[dandiset_id] = AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={})
+        _evict_download_cache_entries()
+
 
 # --- record construction ---------------------------------------------------
 
@@ -274,6 +319,10 @@ def _finalize_attempt_records(
     Records are emitted even if the upstream lookup fails; the source fields
     become ``None`` and a warning is logged.
     """
+    wanted_paths_by_dandiset: dict[str, set[str]] = {}
+    for job_info in collection.records_by_attempt:
+        wanted_paths_by_dandiset.setdefault(job_info.dandiset_id, set()).add(job_info.dandi_path)
+    upstream_cache.prefetch(wanted_paths_by_dandiset)
     finalized: list[dict[str, object]] = []
     for job_info, record in collection.records_by_attempt.items():
         upstream_metadata = upstream_cache.get(job_info.dandiset_id)
@@ -343,16 +392,23 @@ def write_queue_state(
     ``code/submit.sh`` modification time; ``job_completion_time`` is the
     latest modification time among log files.
 
+    ``assets.jsonld`` lags behind uploads, so the capsules :func:`prepare_queue`
+    just journaled may not be listed yet; their pending entries are journaled
+    again until they are listed or outlive a grace period.
+
     :param queue_directory: Path to the queue root directory.
     :type queue_directory: pathlib.Path
     :param dandiset_id: The Dandiset whose ``assets.jsonld`` is read to portray
         the state. Defaults to the job capsules Dandiset (``001697``).
     :type dandiset_id: str
     :param state_file_name: Name of the state file written under
-        *queue_directory*. Defaults to ``state.jsonl``.
+        *queue_directory*. Defaults to ``state.jsonl``. A SQLite store next to it
+        (e.g. ``state.sqlite``) is rewritten with it, as ``QueueState.write_state`` does.
     :type state_file_name: str
     """
     _load_queue_config(queue_directory=queue_directory)
+    state_file = queue_directory / state_file_name
+    store_file = state_file.with_suffix(_STATE_STORE_SUFFIX)
     local_metadata = load_assets_jsonld_metadata(dandiset_id=dandiset_id)
 
     collection = _collect_attempts(local_metadata)
@@ -363,10 +419,24 @@ def write_queue_state(
     )
     records.sort(key=_sort_key)
 
-    state_file = queue_directory / state_file_name
-    with state_file.open(mode="w") as file_stream:
-        for record in records:
-            file_stream.write(json.dumps(record) + "\n")
+    if store_file.exists():
+        try:
+            with _QueueStateStore.existing(store_file) as store:
+                carried_records = _recently_prepared_records(store.iter_records(), records)
+        except RuntimeError:  # A store of another format version is rebuilt below, with nothing to carry over.
+            carried_records = []
+    else:
+        carried_records = (
+            _recently_prepared_records(_iter_state_records(state_file), records) if state_file.exists() else []
+        )
+    _write_state_file(state_file, records)
+    if store_file.exists():
+        with _QueueStateStore(store_file, rebuild=True) as store:
+            store.replace_all(records)
+            for record in carried_records:
+                store.put(record)
+    elif carried_records:
+        _append_to_state_journal(state_file, [_put_operation(record) for record in carried_records])
 
 
 def write_archive_state(*, queue_directory: pathlib.Path) -> None:
@@ -28,6 +28,10 @@ from dandi_compute_code._cli import _dandicompute_group
             ["archive", "job", "--help"],
             "Move a job capsule from the job capsules Dandiset to the failed runs archive.",
         ),
+        (["cache", "--help"], "Inspect, configure, and prune the local download cache."),
+        (["cache", "info", "--help"], "Show the download cache location, settings, and entries"),
+        (["cache", "prune", "--help"], "Remove download cache entries to fit the size budget or by Dandiset."),
+        (["cache", "configure", "--help"], "Set the download cache size budget and upstream TTLs."),
     ],
 )
 def test_cli_help_includes_descriptions(args: list[str], expected_text: str) -> None:
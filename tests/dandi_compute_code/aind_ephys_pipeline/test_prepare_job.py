@@ -5,15 +5,29 @@ Tests focus on BIDS entity parsing from Dandiset path components, which is the
 logic that resolves the ``sub-`` label used in the output directory hierarchy.
 """
 
+import hashlib
 import importlib.metadata
 import json
 import os
 import pathlib
+from collections.abc import Iterator
 from unittest import mock
 
 import pytest
 
-from dandi_compute_code.aind_ephys_pipeline._prepare_job import prepare_aind_ephys_job
+from dandi_compute_code.aind_ephys_pipeline._prepare_job import (
+    AindEphysJobRequest,
+    UnmappedContentIDError,
+    _load_pipeline_checkout,
+    _load_preparation_context,
+    _next_attempt_number,
+    prepare_aind_ephys_job,
+    prepare_aind_ephys_jobs,
+)
+from dandi_compute_code.dandiset._load_content_id_to_usage_dandiset_path import (
+    _load_content_id_to_usage_dandiset_path,
+)
+from tests.dandi_compute_code.conftest import _FakeResponse
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -23,17 +37,13 @@ _FAKE_COMMIT_HASH = "a" * 40
 
 
 def _make_urlopen_mock(mapping: dict) -> mock.MagicMock:
-    """Build an ``urllib.request.urlopen`` mock returning the mapping as JSON Lines.
+    """Build a shared HTTP client ``open`` mock returning the mapping as JSON Lines.
 
     Each content ID becomes its own single-entry ``{content_id: {...}}`` line,
     matching the remote content-id-to-usage-dandiset-path cache format.
     """
     payload = "\n".join(json.dumps({content_id: value}) for content_id, value in mapping.items()).encode()
-    response = mock.MagicMock()
-    response.read.return_value = payload
-    response.__enter__ = lambda s: s
-    response.__exit__ = mock.MagicMock(return_value=False)
-    return mock.MagicMock(return_value=response)
+    return mock.MagicMock(side_effect=lambda *args, **kwargs: _FakeResponse(payload, {"ETag": '"mapping"'}))
 
 
 def _git_check_output(cmd, *, cwd=None, text=False, **kwargs):
@@ -43,6 +53,22 @@ def _git_check_output(cmd, *, cwd=None, text=False, **kwargs):
     return _FAKE_COMMIT_HASH + "\n"
 
 
+@pytest.fixture(autouse=True)
+def clear_content_id_mapping() -> Iterator[None]:
+    """Each test serves its own mapping, so the process-wide cached copy must not leak between tests."""
+    _load_content_id_to_usage_dandiset_path.cache_clear()
+    yield
+    _load_content_id_to_usage_dandiset_path.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_pipeline_checkout() -> Iterator[None]:
+    """Tests patch git and the compute directory, so the memoized checkout must not leak between tests."""
+    _load_pipeline_checkout.cache_clear()
+    yield
+    _load_pipeline_checkout.cache_clear()
+
+
 @pytest.fixture()
 def fake_pipeline_dir(tmp_path: pathlib.Path) -> pathlib.Path:
     """Create a minimal fake pipeline directory structure."""
@@ -100,7 +126,7 @@ def test_prepare_aind_ephys_job_extracts_sub_entity_from_path(
     mock_dandiset.get_assets_with_path_prefix.return_value = iter([])
 
     with (
-        mock.patch("urllib.request.urlopen", _make_urlopen_mock(mapping)),
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", _make_urlopen_mock(mapping)),
         mock.patch("subprocess.check_output", side_effect=_git_check_output),
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.dandiapi.DandiAPIClient") as mock_client,
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.download.download"),
@@ -141,7 +167,7 @@ def test_prepare_aind_ephys_job_test_content_id_uses_sub_test(
     mock_dandiset.get_assets_with_path_prefix.return_value = iter([])
 
     with (
-        mock.patch("urllib.request.urlopen", _make_urlopen_mock(mapping)),
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", _make_urlopen_mock(mapping)),
         mock.patch("subprocess.check_output", side_effect=_git_check_output),
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.dandiapi.DandiAPIClient") as mock_client,
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.download.download"),
@@ -173,7 +199,7 @@ def test_prepare_aind_ephys_job_raises_on_missing_sub_entity(tmp_path: pathlib.P
     mapping = {content_id: {"000001": no_sub_path}}
 
     with (
-        mock.patch("urllib.request.urlopen", _make_urlopen_mock(mapping)),
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", _make_urlopen_mock(mapping)),
         pytest.raises(ValueError, match="Could not extract 'sub' BIDS entity"),
     ):
         prepare_aind_ephys_job(
@@ -192,7 +218,7 @@ def test_prepare_aind_ephys_job_raises_on_sandbox_dandiset() -> None:
     mapping = {content_id: {"214527": "sub-mouse01/sub-mouse01_ecephys.nwb"}}
 
     with (
-        mock.patch("urllib.request.urlopen", _make_urlopen_mock(mapping)),
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", _make_urlopen_mock(mapping)),
         pytest.raises(ValueError, match="sandbox dandiset 214527"),
     ):
         prepare_aind_ephys_job(
@@ -220,7 +246,7 @@ def test_prepare_aind_ephys_job_uses_simplified_job_id_format(
     mock_dandiset.get_assets_with_path_prefix.return_value = iter([])
 
     with (
-        mock.patch("urllib.request.urlopen", _make_urlopen_mock(mapping)),
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", _make_urlopen_mock(mapping)),
         mock.patch("subprocess.check_output", side_effect=_git_check_output),
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.dandiapi.DandiAPIClient") as mock_client,
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.download.download"),
@@ -265,7 +291,7 @@ def test_prepare_aind_ephys_job_writes_codebase_version_in_dataset_description(
     mock_dandiset.get_assets_with_path_prefix.return_value = iter([])
 
     with (
-        mock.patch("urllib.request.urlopen", _make_urlopen_mock(mapping)),
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", _make_urlopen_mock(mapping)),
         mock.patch("subprocess.check_output", side_effect=_git_check_output),
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.dandiapi.DandiAPIClient") as mock_client,
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.download.download"),
@@ -311,7 +337,7 @@ def test_prepare_aind_ephys_job_accepts_matching_minor_version_params(
     mock_dandiset.get_assets_with_path_prefix.return_value = iter([])
 
     with (
-        mock.patch("urllib.request.urlopen", _make_urlopen_mock(mapping)),
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", _make_urlopen_mock(mapping)),
         mock.patch("subprocess.check_output", side_effect=_git_check_output),
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.dandiapi.DandiAPIClient") as mock_client,
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.download.download"),
@@ -348,7 +374,7 @@ def test_prepare_aind_ephys_job_accepts_newer_pipeline_minor_version_for_default
     mock_dandiset.get_assets_with_path_prefix.return_value = iter([])
 
     with (
-        mock.patch("urllib.request.urlopen", _make_urlopen_mock(mapping)),
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", _make_urlopen_mock(mapping)),
         mock.patch("subprocess.check_output", side_effect=_git_check_output),
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.dandiapi.DandiAPIClient") as mock_client,
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.download.download"),
@@ -373,7 +399,7 @@ def test_prepare_aind_ephys_job_accepts_newer_pipeline_minor_version_for_default
 def test_newer_params_rejected_early(tmp_path: pathlib.Path) -> None:
     """Newer parameters versions are rejected before any content lookup work."""
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.dandiapi.DandiAPIClient") as mock_client,
         pytest.raises(ValueError, match="targets pipeline version .* newer than requested pipeline version"),
     ):
@@ -394,7 +420,7 @@ def test_newer_params_rejected_early(tmp_path: pathlib.Path) -> None:
 def test_different_major_params_rejected_early(tmp_path: pathlib.Path) -> None:
     """Different-major parameters versions are rejected before any content lookup work."""
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.dandiapi.DandiAPIClient") as mock_client,
         pytest.raises(ValueError, match="different major series than requested pipeline version"),
     ):
@@ -409,3 +435,182 @@ def test_different_major_params_rejected_early(tmp_path: pathlib.Path) -> None:
 
     mock_client.assert_not_called()
     mock_urlopen.assert_not_called()
+
+
+@pytest.mark.ai_generated
+def test_injected_resolver_replaces_the_mapping_download(tmp_path: pathlib.Path) -> None:
+    """An injected content ID resolver is used instead of loading the shared mapping."""
+    content_id = "0a000000-0000-0000-0000-000000000000"
+    resolver = mock.MagicMock(return_value=None)
+
+    with (
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
+        pytest.raises(UnmappedContentIDError, match=content_id),
+    ):
+        prepare_aind_ephys_job(
+            pipeline_version="v1.1.0",
+            content_id=content_id,
+            config_key="default",
+            parameters_key="original",
+            pipeline_directory=tmp_path,
+            content_id_resolver=resolver,
+        )
+
+    resolver.assert_called_once_with(content_id)
+    mock_urlopen.assert_not_called()
+
+
+@pytest.mark.ai_generated
+def test_consecutive_preparations_download_the_mapping_once(tmp_path: pathlib.Path) -> None:
+    """The mapping is downloaded once and reused by later calls and, via the disk cache, later processes."""
+    content_id = "0b000000-0000-0000-0000-000000000000"
+    mapping = {content_id: {"214527": "sub-mouse01/sub-mouse01_ecephys.nwb"}}
+    urlopen = _make_urlopen_mock(mapping)
+
+    with mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", urlopen):
+        for _ in range(2):
+            with pytest.raises(ValueError, match="sandbox dandiset"):
+                prepare_aind_ephys_job(
+                    pipeline_version="v1.1.0",
+                    content_id=content_id,
+                    config_key="default",
+                    parameters_key="original",
+                    pipeline_directory=tmp_path,
+                )
+        _load_content_id_to_usage_dandiset_path.cache_clear()
+        with pytest.raises(ValueError, match="sandbox dandiset"):
+            prepare_aind_ephys_job(
+                pipeline_version="v1.1.0",
+                content_id=content_id,
+                config_key="default",
+                parameters_key="original",
+                pipeline_directory=tmp_path,
+            )
+
+    assert urlopen.call_count == 1
+
+
+@pytest.mark.ai_generated
+def test_next_attempt_number_uses_one_prefix_listing() -> None:
+    """The lowest free attempt is found from a single listing of the shared attempt prefix."""
+    base = "derivatives/dandiset-000001/sub-01/pipeline-aind+ephys/version-v1.1.0_params-abc_config-def"
+    paths = [
+        f"{base}_attempt-1/code/submit.sh",
+        f"{base}_attempt-1/logs/run.log",
+        f"{base}_attempt-2/code/submit.sh",
+        f"{base}_attempt-4/code/submit.sh",
+        f"{base}_attempt-3x/code/submit.sh",
+        f"{base}_attempt-3.txt",
+    ]
+    mock_dandiset = mock.MagicMock()
+    mock_dandiset.get_assets_with_path_prefix.return_value = iter([mock.MagicMock(path=path) for path in paths])
+
+    assert _next_attempt_number(dandiset=mock_dandiset, output_dandiset_path_base=base) == 3
+    mock_dandiset.get_assets_with_path_prefix.assert_called_once_with(path=f"{base}_attempt-")
+
+
+@pytest.mark.ai_generated
+def test_next_attempt_number_raises_when_all_attempts_are_taken() -> None:
+    base = "derivatives/dandiset-000001/sub-01/pipeline-aind+ephys/version-v1.1.0_params-abc_config-def"
+    mock_dandiset = mock.MagicMock()
+    mock_dandiset.get_assets_with_path_prefix.return_value = iter(
+        [mock.MagicMock(path=f"{base}_attempt-{attempt}/code/submit.sh") for attempt in range(1, 4)]
+    )
+
+    with pytest.raises(ValueError, match="All 3 attempts"):
+        _next_attempt_number(dandiset=mock_dandiset, output_dandiset_path_base=base, maximum_attempt=3)
+
+
+@pytest.mark.ai_generated
+def test_prepare_aind_ephys_jobs_uploads_all_capsules_at_once(
+    tmp_path: pathlib.Path,
+    fake_pipeline_dir: pathlib.Path,
+) -> None:
+    """A batch shares one Dandiset download and one upload; repeated, unmapped and unpreparable jobs are skipped."""
+    mapping = {
+        "0c000000-0000-0000-0000-000000000000": {"000001": "sub-mouse01/sub-mouse01_ecephys.nwb"},
+        "0d000000-0000-0000-0000-000000000000": {"000001": "sub-mouse02/sub-mouse02_ecephys.nwb"},
+        "0f000000-0000-0000-0000-000000000000": {"000001": "sub-full/sub-full_ecephys.nwb"},
+    }
+    jobs = [
+        AindEphysJobRequest(content_id=content_id, pipeline_version="v1.1.0", parameters_key="original")
+        for content_id in mapping
+    ]
+    jobs += [
+        jobs[0],
+        AindEphysJobRequest(
+            content_id="0e000000-0000-0000-0000-000000000000", pipeline_version="v1.1.0", parameters_key="original"
+        ),
+    ]
+    processing_dir = tmp_path / "processing"
+    staging_dir = processing_dir / "prepare-batch-x"
+    (staging_dir / "001697").mkdir(parents=True)
+    (staging_dir / "001697" / "dandiset.yaml").write_text("identifier: DANDI:001697\n")
+    capsule_dirs = [processing_dir / f"prepare-job-{index}" for index in range(2)]
+    for capsule_dir in capsule_dirs:
+        capsule_dir.mkdir()
+    uploaded_files = []
+
+    def _record_upload(paths: list[pathlib.Path], **kwargs: object) -> None:
+        # The staging copy is removed once the upload returns.
+        uploaded_files.extend(file_path for path in paths for file_path in path.rglob("*") if file_path.is_file())
+
+    def _existing_attempts(path: str) -> Iterator[mock.MagicMock]:
+        # Every attempt number of sub-full is already taken.
+        attempts = range(1, 100) if "sub-full" in path else []
+        return iter([mock.MagicMock(path=f"{path}{attempt}/code/submit.sh") for attempt in attempts])
+
+    mock_dandiset = mock.MagicMock()
+    mock_dandiset.get_assets_with_path_prefix.side_effect = _existing_attempts
+
+    with (
+        mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job._DANDI_COMPUTE_DIRECTORY", tmp_path),
+        mock.patch("subprocess.check_output", side_effect=_git_check_output) as mock_git,
+        mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.dandiapi.DandiAPIClient") as mock_client,
+        mock.patch("dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.download.download") as mock_download,
+        mock.patch(
+            "dandi_compute_code.aind_ephys_pipeline._prepare_job.dandi.upload.upload", side_effect=_record_upload
+        ) as mock_upload,
+        mock.patch("tempfile.mkdtemp", side_effect=[str(path) for path in [staging_dir, *capsule_dirs]]),
+        mock.patch.dict(os.environ, {"DANDI_API_KEY": "fake-key"}),
+    ):
+        mock_client.return_value.get_dandiset.return_value = mock_dandiset
+        script_paths = prepare_aind_ephys_jobs(
+            jobs=jobs,
+            pipeline_directory=fake_pipeline_dir,
+            content_id_resolver=mapping.get,
+        )
+
+    assert list(script_paths) == jobs[:2]
+    assert mock_dandiset.get_assets_with_path_prefix.call_count == 3
+    assert mock_git.call_count == 2  # one ``git rev-parse HEAD`` per repository, shared by both capsules
+    mock_download.assert_called_once()
+    mock_upload.assert_called_once()
+    uploaded = mock_upload.call_args.kwargs["paths"]
+    assert uploaded == [
+        staging_dir / "001697" / script_path.parent.parent.relative_to(capsule_dir / "001697")
+        for script_path, capsule_dir in zip(script_paths.values(), capsule_dirs)
+    ]
+    assert mock_upload.call_args.kwargs["jobs"] == 8
+    assert {file_path.name for file_path in uploaded_files} >= {"submit.sh", "dataset_description.json"}
+    assert not staging_dir.exists()
+    # Like a single job, each capsule runs from and records its own temporary directory, so cleaning up
+    # one finished capsule cannot remove the working data of another.
+    for script_path, capsule_dir in zip(script_paths.values(), capsule_dirs):
+        assert script_path.is_relative_to(capsule_dir / "001697")
+        assert (capsule_dir / "001697" / "dandiset.yaml").exists()
+        assert f'echo "{capsule_dir.name}"' in script_path.read_text()
+
+
+@pytest.mark.ai_generated
+def test_preparation_context_is_loaded_once_per_combination() -> None:
+    """Registry checks and file hashing run once per (version, config, parameters) combination."""
+    _load_preparation_context.cache_clear()
+    with mock.patch("hashlib.md5", wraps=hashlib.md5) as md5:
+        first = _load_preparation_context(pipeline_version="v1.1.0", config_key="default", parameters_key="original")
+        second = _load_preparation_context(pipeline_version="v1.1.0", config_key="default", parameters_key="original")
+
+    assert first is second
+    assert md5.call_count == 2
+    assert first.params_id == hashlib.md5(first.parameters_file_path.read_bytes()).hexdigest()[:7]
+    assert first.config_text == first.config_file_path.read_text()
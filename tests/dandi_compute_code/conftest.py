@@ -0,0 +1,24 @@
+"""Fixtures shared by every test suite in the package."""
+
+import io
+import os
+from collections.abc import Iterator
+from unittest import mock
+
+import pytest
+
+
+class _FakeResponse(io.BytesIO):
+    """A canned HTTP response body with *headers*, as returned by a mocked ``_HttpClient.open``."""
+
+    def __init__(self, payload: bytes, headers: dict[str, str] | None = None) -> None:
+        super().__init__(payload)
+        self.headers = headers or {}
+
+
+@pytest.fixture(autouse=True)
+def redirect_download_cache(tmp_path_factory: pytest.TempPathFactory) -> Iterator[None]:
+    """Redirect the persistent download cache to a temporary directory so tests never write under ``$HOME``."""
+    cache_directory = tmp_path_factory.mktemp("download_cache")
+    with mock.patch.dict(os.environ, {"DANDICOMPUTE_CACHE": str(cache_directory)}):
+        yield
@@ -0,0 +1,72 @@
+"""
+Memory benchmark for the compact ``path_to_asset_metadata`` backend.
+
+The job capsules and large upstream Dandisets carry 10^5 - 10^6 assets. These
+checks index synthetic asset streams into both the ``dict`` of
+:class:`AssetMetadata` representation and :class:`_CompactAssetIndex`, and compare
+the memory each retains once the input strings have been discarded.
+"""
+
+import gc
+import tracemalloc
+from collections.abc import Callable, Iterator
+
+import pytest
+
+from dandi_compute_code.dandiset import AssetMetadata
+from dandi_compute_code.dandiset._compact_asset_index import _CompactAssetIndex
+
+_ASSET_COUNT = 50_000
+
+
+def _synthetic_assets(asset_count: int) -> Iterator[AssetMetadata]:
+    """Yield freshly built metadata shaped like job capsule assets, ten files per capsule."""
+    for index in range(asset_count):
+        capsule_index, file_index = divmod(index, 10)
+        yield AssetMetadata(
+            path=(
+                f"derivatives/dandiset-000409/sub-{capsule_index:07d}/pipeline-aind+ephys/"
+                f"version-v1.1.0_codebase-v0.3.50_params-abc1234_config-def5678_attempt-1/logs/log-{file_index}.txt"
+            ),
+            date_modified=f"2026-01-{1 + index % 28:02d}T00:{index % 60:02d}:00.{index % 1_000_000:06d}+00:00",
+            content_size=index * 7,
+            content_id=f"{index:08x}-0000-4000-8000-{index:012x}",
+        )
+
+
+def _build_dict(assets: Iterator[AssetMetadata]) -> dict[str, AssetMetadata]:
+    return {metadata.path: metadata for metadata in assets}
+
+
+def _build_compact(assets: Iterator[AssetMetadata]) -> _CompactAssetIndex:
+    index = _CompactAssetIndex()
+    for metadata in assets:
+        index._add(metadata)
+    index._freeze()
+    return index
+
+
+def _retained_bytes(build: Callable[[Iterator[AssetMetadata]], object]) -> tuple[int, object]:
+    """Return the bytes still allocated after *build* consumes a fresh synthetic stream."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        index = build(_synthetic_assets(_ASSET_COUNT))
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return after - before, index
+
+
+@pytest.mark.ai_generated
+@pytest.mark.benchmark
+def test_compact_asset_index_retains_far_less_memory_than_dict() -> None:
+    dict_bytes, dict_index = _retained_bytes(_build_dict)
+    compact_bytes, compact_index = _retained_bytes(_build_compact)
+
+    assert compact_index == dict_index
+    assert (
+        compact_bytes < dict_bytes / 3
+    ), f"dict: {dict_bytes / _ASSET_COUNT:.0f} B/asset, compact: {compact_bytes / _ASSET_COUNT:.0f} B/asset"
@@ -0,0 +1,69 @@
+import pathlib
+
+import pytest
+
+from dandi_compute_code.dandiset import AssetMetadata
+from dandi_compute_code.dandiset._asset_index_snapshot import (
+    _read_asset_index_snapshot,
+    _write_asset_index_snapshot,
+)
+from dandi_compute_code.dandiset._compact_asset_index import _CompactAssetIndex
+
+
+def _build_index(asset_count: int) -> _CompactAssetIndex:
+    index = _CompactAssetIndex()
+    for asset_index in range(asset_count):
+        index._add(
+            AssetMetadata(
+                path=f"sub-{asset_index % 7}/sub-{asset_index % 7}_run-{asset_index}_ecephys.nwb",
+                date_modified=f"2026-01-01T00:00:{asset_index % 60:02d}+00:00",
+                content_size=asset_index * 1_000_003,
+                content_id=f"content-{asset_index}",
+            )
+        )
+    index._freeze()
+    return index
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("asset_count", [0, 1, 500])
+def test_asset_index_snapshot_round_trip(tmp_path: pathlib.Path, asset_count: int) -> None:
+    index = _build_index(asset_count)
+    file_path = tmp_path / "assets.jsonld.index"
+
+    _write_asset_index_snapshot(index=index, file_path=file_path, key="etag-1")
+    restored = _read_asset_index_snapshot(file_path=file_path, key="etag-1")
+
+    assert restored is not None
+    assert list(restored.items()) == list(index.items())
+    if asset_count > 3:
+        assert restored["sub-3/sub-3_run-3_ecephys.nwb"] == index["sub-3/sub-3_run-3_ecephys.nwb"]
+    # Restored indexes stay extendable.
+    restored._add(AssetMetadata(path="new.nwb", date_modified="d", content_size=1, content_id="c"))
+    assert "new.nwb" in restored
+
+
+@pytest.mark.ai_generated
+def test_asset_index_snapshot_rejects_other_key(tmp_path: pathlib.Path) -> None:
+    file_path = tmp_path / "assets.jsonld.index"
+    _write_asset_index_snapshot(index=_build_index(3), file_path=file_path, key="etag-1")
+
+    assert _read_asset_index_snapshot(file_path=file_path, key="etag-2") is None
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("damage", ["missing", "empty", "truncated", "garbage"])
+def test_asset_index_snapshot_ignores_unreadable_files(tmp_path: pathlib.Path, damage: str) -> None:
+    file_path = tmp_path / "assets.jsonld.index"
+    _write_asset_index_snapshot(index=_build_index(50), file_path=file_path, key="etag-1")
+    content = file_path.read_bytes()
+    if damage == "missing":
+        file_path.unlink()
+    elif damage == "empty":
+        file_path.write_bytes(b"")
+    elif damage == "truncated":
+        file_path.write_bytes(content[:-10])
+    else:
+        file_path.write_bytes(b"not a snapshot at all" * 10)
+
+    assert _read_asset_index_snapshot(file_path=file_path, key="etag-1") is None
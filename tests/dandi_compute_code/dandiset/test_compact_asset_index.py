@@ -0,0 +1,78 @@
+import pytest
+
+from dandi_compute_code.dandiset import AssetMetadata
+from dandi_compute_code.dandiset._compact_asset_index import _CompactAssetIndex
+
+
+def _metadata(path: str, *, content_size: int = 1, content_id: str = "content-id") -> AssetMetadata:
+    return AssetMetadata(
+        path=path,
+        date_modified="2026-01-01T00:00:00+00:00",
+        content_size=content_size,
+        content_id=content_id,
+    )
+
+
+def _build(*entries: AssetMetadata) -> tuple[_CompactAssetIndex, dict[str, AssetMetadata]]:
+    """Index *entries* into both the compact backend and a reference ``dict``."""
+    index = _CompactAssetIndex()
+    reference: dict[str, AssetMetadata] = {}
+    for metadata in entries:
+        index._add(metadata)
+        reference[metadata.path] = metadata
+    index._freeze()
+    return index, reference
+
+
+@pytest.mark.ai_generated
+def test_compact_asset_index_behaves_like_dict() -> None:
+    entries = [
+        _metadata(
+            f"sub-{index:03d}/ses-{index % 3}/sub-{index:03d}_ecephys.nwb", content_size=index, content_id=f"id-{index}"
+        )
+        for index in range(200)
+    ]
+    entries += [_metadata("", content_id="empty"), _metadata("/leading/slash"), _metadata("unicode/é.nwb")]
+    index, reference = _build(*entries)
+
+    assert len(index) == len(reference)
+    assert list(index) == list(reference)
+    assert list(index.items()) == list(reference.items())
+    assert list(index.values()) == list(reference.values())
+    assert index == reference
+    for path, metadata in reference.items():
+        assert path in index
+        assert index[path] == metadata
+        assert index.get(path) == metadata
+
+
+@pytest.mark.ai_generated
+def test_compact_asset_index_replaces_duplicate_paths_in_place() -> None:
+    index, reference = _build(
+        _metadata("a.nwb", content_size=1, content_id="first"),
+        _metadata("b.nwb"),
+        _metadata("a.nwb", content_size=2, content_id="second"),
+    )
+
+    assert list(index) == ["a.nwb", "b.nwb"]
+    assert index["a.nwb"] == reference["a.nwb"] == _metadata("a.nwb", content_size=2, content_id="second")
+
+
+@pytest.mark.ai_generated
+def test_compact_asset_index_misses() -> None:
+    index, _ = _build(_metadata("sub-1/file.nwb"))
+
+    assert "sub-1" not in index
+    assert "sub-1/file.nwb/" not in index
+    assert 42 not in index
+    assert index.get("missing") is None
+    with pytest.raises(KeyError):
+        index["missing"]
+
+
+@pytest.mark.ai_generated
+def test_compact_asset_index_accepts_entries_after_freeze() -> None:
+    index, _ = _build(_metadata("sub-1/file.nwb"))
+    index._add(_metadata("sub-1/other.nwb"))
+
+    assert list(index) == ["sub-1/file.nwb", "sub-1/other.nwb"]
@@ -0,0 +1,142 @@
+import json
+import time
+import urllib.error
+from collections.abc import Iterator
+from unittest import mock
+
+import pytest
+
+from dandi_compute_code.dandiset import _content_id_index
+from dandi_compute_code.dandiset._download_cache import _list_download_cache_entries
+from dandi_compute_code.dandiset._load_content_id_to_usage_dandiset_path import (
+    _load_content_id_to_usage_dandiset_path,
+)
+from tests.dandi_compute_code.conftest import _FakeResponse
+
+_MAPPING_LINES = [
+    {"cid-a": {"000001": "sub-01/a.nwb"}},
+    {"cid-b": {"000002": "sub-02/b.nwb", "000001": "sub-01/b.nwb"}},
+    {"cid-c": {"000001": "sub-03/c.nwb"}},
+]
+
+
+def _payload(lines: list[dict]) -> bytes:
+    return ("\n".join(json.dumps(line) for line in lines) + "\n\n").encode()
+
+
+def _not_modified() -> urllib.error.HTTPError:
+    return urllib.error.HTTPError("https://example.test", 304, "Not Modified", {}, None)
+
+
+@pytest.fixture(autouse=True)
+def clear_loader_cache() -> Iterator[None]:
+    _load_content_id_to_usage_dandiset_path.cache_clear()
+    yield
+    _load_content_id_to_usage_dandiset_path.cache_clear()
+
+
+@pytest.mark.ai_generated
+def test_index_answers_lookups_by_content_id_and_dandiset() -> None:
+    with mock.patch(
+        "dandi_compute_code.dandiset._http_client._HttpClient.open",
+        return_value=_FakeResponse(_payload(_MAPPING_LINES), {"ETag": '"1"'}),
+    ):
+        index = _load_content_id_to_usage_dandiset_path()
+
+    assert index["cid-b"] == {"000002": "sub-02/b.nwb", "000001": "sub-01/b.nwb"}
+    assert list(index["cid-b"]) == ["000002", "000001"]
+    assert index.get("cid-missing") is None
+    assert "cid-a" in index and "cid-missing" not in index and 1 not in index
+    assert len(index) == 3
+    assert list(index) == ["cid-a", "cid-b", "cid-c"]
+    assert index.paths_for_dandiset("000001") == {
+        "cid-a": "sub-01/a.nwb",
+        "cid-b": "sub-01/b.nwb",
+        "cid-c": "sub-03/c.nwb",
+    }
+    assert index.paths_for_dandiset("999999") == {}
+    with pytest.raises(KeyError):
+        index["cid-missing"]
+
+
+@pytest.mark.ai_generated
+def test_index_keeps_the_last_line_of_a_repeated_content_id() -> None:
+    lines = [
+        {"cid-b": {"000002": "sub-02/old.nwb", "000003": "sub-03/old.nwb"}},
+        {"cid-a": {"000001": "sub-01/a.nwb"}},
+        {"cid-b": {"000004": "sub-04/b.nwb", "000002": "sub-02/b.nwb"}},
+    ]
+    merged = {content_id: paths for line in lines for content_id, paths in line.items()}
+    with mock.patch(
+        "dandi_compute_code.dandiset._http_client._HttpClient.open",
+        return_value=_FakeResponse(_payload(lines), {"ETag": '"1"'}),
+    ):
+        index = _load_content_id_to_usage_dandiset_path()
+
+    assert dict(index) == merged
+    assert list(index) == list(merged) == ["cid-b", "cid-a"]
+    assert list(index["cid-b"]) == ["000004", "000002"]
+    assert len(index) == 2
+    assert index.paths_for_dandiset("000003") == {}
+
+
+@pytest.mark.ai_generated
+def test_index_is_built_once_per_mapping_version() -> None:
+    responses = [
+        _FakeResponse(_payload(_MAPPING_LINES), {"ETag": '"1"'}),
+        _not_modified(),
+        _FakeResponse(_payload([{"cid-d": {"000003": "d.nwb"}}]), {"ETag": '"2"'}),
+    ]
+    with (
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", side_effect=responses),
+        mock.patch.object(
+            _content_id_index, "_build_content_id_index", wraps=_content_id_index._build_content_id_index
+        ) as build,
+    ):
+        first = _load_content_id_to_usage_dandiset_path()
+        with mock.patch("time.time", return_value=time.time() + 2 * 60 * 60):
+            _load_content_id_to_usage_dandiset_path.cache_clear()
+            unchanged = _load_content_id_to_usage_dandiset_path()
+            assert build.call_count == 1
+            assert unchanged["cid-a"] == {"000001": "sub-01/a.nwb"}
+        with mock.patch("time.time", return_value=time.time() + 4 * 60 * 60):
+            _load_content_id_to_usage_dandiset_path.cache_clear()
+            changed = _load_content_id_to_usage_dandiset_path()
+
+    assert build.call_count == 2
+    assert "cid-a" not in changed
+    assert changed["cid-d"] == {"000003": "d.nwb"}
+    first.close()
+    unchanged.close()
+
+
+@pytest.mark.ai_generated
+def test_index_shares_the_lifetime_of_the_cached_mapping() -> None:
+    with mock.patch(
+        "dandi_compute_code.dandiset._http_client._HttpClient.open",
+        return_value=_FakeResponse(_payload(_MAPPING_LINES), {"ETag": '"1"'}),
+    ):
+        _load_content_id_to_usage_dandiset_path()
+
+    (entry,) = _list_download_cache_entries()
+    assert entry.key == "content_id_to_usage_dandiset_path.jsonl"
+    assert [file_path.name for file_path in entry.files] == [
+        "content_id_to_usage_dandiset_path.jsonl",
+        "content_id_to_usage_dandiset_path.jsonl.sqlite",
+        "content_id_to_usage_dandiset_path.jsonl.validators.json",
+    ]
+
+
+@pytest.mark.ai_generated
+def test_malformed_mapping_raises_runtime_error_and_leaves_no_index() -> None:
+    with (
+        mock.patch(
+            "dandi_compute_code.dandiset._http_client._HttpClient.open",
+            return_value=_FakeResponse(b'{"cid-a": {"000001": "a.nwb"}}\n{not json\n', {"ETag": '"1"'}),
+        ),
+        pytest.raises(RuntimeError, match="content-id-to-usage-dandiset-path"),
+    ):
+        _load_content_id_to_usage_dandiset_path()
+
+    (entry,) = _list_download_cache_entries()
+    assert not any(file_path.name.endswith(".sqlite") for file_path in entry.files)
@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+import pytest
+from click.testing import CliRunner
+
+from dandi_compute_code._cli import _dandicompute_group
+from dandi_compute_code.dandiset import configure_download_cache, prune_download_cache, summarize_download_cache
+from dandi_compute_code.dandiset._download_cache import (
+    _download_cache_lock,
+    _evict_download_cache_entries,
+    _load_download_cache_settings,
+)
+from dandi_compute_code.dandiset._download_with_cache import _download_with_cache, _resolve_cache_directory
+from dandi_compute_code.queue import _queue_utils
+from tests.dandi_compute_code.conftest import _FakeResponse
+
+
+def _write_entry(key: str, *, size: int, last_used: float) -> None:
+    """Create a cached body plus validators of *size* bytes in total, last used at *last_used*."""
+    body_path = _resolve_cache_directory() / key
+    body_path.parent.mkdir(parents=True, exist_ok=True)
+    validators_path = body_path.with_name(f"{body_path.name}.validators.json")
+    validators = json.dumps({"etag": None, "validated_at": last_used}).encode()
+    validators_path.write_bytes(validators)
+    body_path.write_bytes(b"x" * (size - len(validators)))
+    for file_path in (body_path, validators_path):
+        os.utime(file_path, (last_used, last_used))
+
+
+@pytest.mark.ai_generated
+def test_download_with_cache_skips_request_within_max_age() -> None:
+    payload = json.dumps([]).encode()
+    with mock.patch(
+        "dandi_compute_code.dandiset._http_client._HttpClient.open",
+        return_value=_FakeResponse(payload, {"ETag": '"1"'}),
+    ) as urlopen:
+        first = _download_with_cache(url="https://example.test/a", cache_key="a.json", max_age=60)
+        second = _download_with_cache(url="https://example.test/a", cache_key="a.json", max_age=60)
+
+    assert urlopen.call_count == 1
+    assert second.body_path == first.body_path
+    assert second.validated_at == pytest.approx(first.validated_at)
+
+
+@pytest.mark.ai_generated
+def test_download_with_cache_revalidates_after_max_age() -> None:
+    payload = json.dumps([]).encode()
+    responses = [_FakeResponse(payload, {"ETag": '"1"'}), _FakeResponse(payload, {"ETag": '"2"'})]
+    with mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", side_effect=responses) as urlopen:
+        _download_with_cache(url="https://example.test/a", cache_key="a.json", max_age=60)
+        with mock.patch("time.time", return_value=time.time() + 120):
+            refreshed = _download_with_cache(url="https://example.test/a", cache_key="a.json", max_age=60)
+
+    assert urlopen.call_count == 2
+    assert refreshed.etag == '"2"'
+
+
+@pytest.mark.ai_generated
+def test_download_with_cache_ignores_validators_of_a_replaced_body() -> None:
+    responses = [_FakeResponse(b"[1]", {"ETag": '"1"'}), _FakeResponse(b"[2]", {"ETag": '"2"'})]
+    with mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", side_effect=responses) as urlopen:
+        first = _download_with_cache(url="https://example.test/a", cache_key="a.json", max_age=60)
+        replacement = first.body_path.with_name("replacement")
+        replacement.write_bytes(b"[9]")
+        os.replace(replacement, first.body_path)
+        second = _download_with_cache(url="https://example.test/a", cache_key="a.json", max_age=60)
+
+    # The validators describe the body that was replaced, so they must not be used to skip or revalidate.
+    assert urlopen.call_count == 2
+    assert second.etag == '"2"'
+    assert second.body_path.read_bytes() == b"[2]"
+
+
+@pytest.mark.ai_generated
+def test_upstream_metadata_is_reused_across_calls_within_ttl() -> None:
+    configure_download_cache(dandiset_ttl_seconds={"000409": 3600})
+    payload = json.dumps([]).encode()
+    with mock.patch(
+        "dandi_compute_code.dandiset._http_client._HttpClient.open",
+        return_value=_FakeResponse(payload, {"ETag": '"1"'}),
+    ) as urlopen:
+        _queue_utils._load_upstream_assets_jsonld_metadata("000409")
+        _queue_utils._load_upstream_assets_jsonld_metadata("000409")
+        _queue_utils._load_upstream_assets_jsonld_metadata("000410")
+
+    # 000410 falls back to the default TTL but has never been fetched.
+    assert urlopen.call_count == 2
+
+
+@pytest.mark.ai_generated
+def test_eviction_removes_least_recently_used_entries_to_fit_budget() -> None:
+    now = time.time()
+    _write_entry("assets_jsonld/000001.jsonld", size=1_000, last_used=now - 300)
+    _write_entry("assets_jsonld/000002.jsonld", size=1_000, last_used=now - 200)
+    _write_entry("assets_jsonld/000003.jsonld", size=1_000, last_used=now - 100)
+
+    removed = _evict_download_cache_entries(max_bytes=2_000)
+
+    assert [entry.key for entry in removed] == ["assets_jsonld/000001.jsonld"]
+    assert [entry["dandiset_id"] for entry in summarize_download_cache()["entries"]] == ["000002", "000003"]
+
+
+@pytest.mark.ai_generated
+def test_eviction_is_skipped_while_another_reader_holds_the_cache() -> None:
+    _write_entry("assets_jsonld/000001.jsonld", size=1_000, last_used=time.time())
+    reader_holds_lock = threading.Event()
+    release_reader = threading.Event()
+
+    def _reader() -> None:
+        with _download_cache_lock(shared=True):
+            reader_holds_lock.set()
+            release_reader.wait(timeout=5)
+
+    reader = threading.Thread(target=_reader)
+    reader.start()
+    reader_holds_lock.wait(timeout=5)
+    try:
+        assert _evict_download_cache_entries(max_bytes=0) == []
+    finally:
+        release_reader.set()
+        reader.join()
+    assert [entry.key for entry in _evict_download_cache_entries(max_bytes=0)] == ["assets_jsonld/000001.jsonld"]
+
+
+@pytest.mark.ai_generated
+def test_prune_download_cache_by_dandiset_and_all() -> None:
+    now = time.time()
+    _write_entry("assets_jsonld/000001.jsonld", size=100, last_used=now)
+    _write_entry("assets_jsonld/000002.jsonld", size=100, last_used=now)
+    _write_entry("other/file.json", size=100, last_used=now)
+
+    assert prune_download_cache(dandiset_ids=["000002"]) == ["assets_jsonld/000002.jsonld"]
+    assert sorted(prune_download_cache(clear=True)) == ["assets_jsonld/000001.jsonld", "other/file.json"]
+    assert summarize_download_cache()["entries"] == []
+
+
+@pytest.mark.ai_generated
+def test_configure_download_cache_persists_settings() -> None:
+    configure_download_cache(max_bytes=10, default_ttl_seconds=60, dandiset_ttl_seconds={"000409": 120, "000410": 5})
+    configure_download_cache(dandiset_ttl_seconds={"000410": None})
+
+    settings = _load_download_cache_settings()
+    assert settings.max_bytes == 10
+    assert settings.ttl_seconds("000409") == 120
+    assert settings.ttl_seconds("000410") == 60
+    with pytest.raises(ValueError, match="negative"):
+        configure_download_cache(max_bytes=-1)
+
+
+@pytest.mark.ai_generated
+def test_cache_cli_configure_info_and_prune() -> None:
+    runner = CliRunner()
+    _write_entry("assets_jsonld/000409.jsonld", size=100, last_used=time.time())
+
+    configured = runner.invoke(
+        _dandicompute_group, ["cache", "configure", "--default-ttl", "2h", "--ttl", "000409=1d", "--max-bytes", "500"]
+    )
+    info = runner.invoke(_dandicompute_group, ["cache", "info", "--silent"])
+    silent_configured = runner.invoke(_dandicompute_group, ["cache", "configure", "--max-bytes", "500", "--silent"])
+    invalid = runner.invoke(_dandicompute_group, ["cache", "configure", "--ttl", "000409=soon"])
+    pruned = runner.invoke(_dandicompute_group, ["cache", "prune", "--all", "--silent"])
+
+    assert configured.exit_code == 0, configured.output
+    assert info.exit_code == 0, info.output
+    assert "Default upstream TTL: 7200 seconds" in info.output
+    assert "TTL override for 000409: 86400 seconds" in info.output
+    assert "assets_jsonld/000409.jsonld  100 bytes" in info.output
+    assert silent_configured.exit_code == 0, silent_configured.output
+    assert "Updated download cache settings." not in silent_configured.output
+    assert invalid.exit_code != 0
+    assert pruned.exit_code == 0
+    assert summarize_download_cache()["entries"] == []
@@ -0,0 +1,233 @@
+import gzip
+import http.server
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from collections.abc import Iterator
+from unittest import mock
+
+import pytest
+
+from dandi_compute_code.dandiset._http_client import _HttpClient
+
+_BODY = b'[{"path": "sub-01/file.nwb"}]' * 100
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Serves a few canned routes and records every request it sees."""
+
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        with self.server.lock:
+            self.server.requests.append((self.path, self.client_address, dict(self.headers)))
+            hits = sum(1 for path, _, _ in self.server.requests if path == self.path)
+        if self.path == "/plain":
+            self._reply(200, _BODY)
+        elif self.path == "/compressed":
+            encoding = "gzip" if "gzip" in self.headers.get("Accept-Encoding", "") else None
+            self._reply(200, gzip.compress(_BODY) if encoding else _BODY, {"Content-Encoding": encoding})
+        elif self.path == "/deflate":
+            self._reply(200, zlib.compress(_BODY), {"Content-Encoding": "deflate"})
+        elif self.path == "/flaky":
+            self._reply(503 if hits < 3 else 200, _BODY)
+        elif self.path == "/missing":
+            self._reply(404, b"not found")
+        elif self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"1"':
+                self._reply(304, b"")
+            else:
+                self._reply(200, _BODY, {"ETag": '"1"'})
+        elif self.path == "/redirect":
+            self._reply(302, b"", {"Location": "/plain"})
+        elif self.path == "/slow-first":
+            if hits == 1:
+                time.sleep(1.0)
+            self._reply(200, f"attempt {hits}".encode())
+        else:
+            self._reply(404, b"")
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.requests.append((self.path, self.client_address, dict(self.headers)))
+        self._reply(503, b"unavailable")
+
+    def _reply(self, status: int, body: bytes, headers: dict[str, str | None] | None = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            if value is not None:
+                self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.lock = threading.Lock()
+        self.requests: list[tuple[str, tuple[str, int], dict[str, str]]] = []
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+@pytest.fixture
+def server() -> Iterator[_Server]:
+    with mock.patch.dict("os.environ", {"no_proxy": "*", "NO_PROXY": "*"}):
+        server = _Server()
+        thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        thread.start()
+        try:
+            yield server
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+@pytest.mark.ai_generated
+def test_sequential_requests_reuse_one_connection(server: _Server) -> None:
+    client = _HttpClient(hedge_after_seconds=None)
+
+    for _ in range(3):
+        with client.open(server.url("/plain")) as response:
+            assert response.read() == _BODY
+
+    assert len({client_address for _, client_address, _ in server.requests}) == 1
+    client.close()
+
+
+@pytest.mark.ai_generated
+def test_response_closed_early_does_not_return_its_connection(server: _Server) -> None:
+    client = _HttpClient(hedge_after_seconds=None)
+
+    with client.open(server.url("/plain")) as response:
+        response.read(10)
+    with client.open(server.url("/plain")) as response:
+        response.read()
+
+    assert len({client_address for _, client_address, _ in server.requests}) == 2
+    client.close()
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("path", ["/compressed", "/deflate"])
+def test_compressed_bodies_are_decoded(server: _Server, path: str) -> None:
+    client = _HttpClient(hedge_after_seconds=None)
+
+    with client.open(server.url(path)) as response:
+        assert response.read() == _BODY
+
+    assert "gzip" in server.requests[0][2]["Accept-Encoding"]
+    client.close()
+
+
+@pytest.mark.ai_generated
+def test_retryable_status_is_retried_with_backoff(server: _Server) -> None:
+    client = _HttpClient(hedge_after_seconds=None, retries=3, backoff_seconds=0.01)
+
+    with mock.patch("time.sleep") as sleep, client.open(server.url("/flaky")) as response:
+        assert response.read() == _BODY
+
+    assert sleep.call_count == 2
+    assert [path for path, _, _ in server.requests] == ["/flaky"] * 3
+    client.close()
+
+
+@pytest.mark.ai_generated
+def test_non_idempotent_request_is_not_retried(server: _Server) -> None:
+    client = _HttpClient(hedge_after_seconds=None, retries=3, backoff_seconds=0.01)
+    request = urllib.request.Request(server.url("/flaky"), data=b"{}", method="POST")
+
+    with mock.patch("time.sleep") as sleep, pytest.raises(urllib.error.HTTPError) as error:
+        client.open(request)
+
+    assert error.value.code == 503
+    sleep.assert_not_called()
+    assert len(server.requests) == 1
+    client.close()
+
+
+@pytest.mark.ai_generated
+def test_non_retryable_status_raises_http_error(server: _Server) -> None:
+    client = _HttpClient(hedge_after_seconds=None, retries=3)
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        client.open(server.url("/missing"))
+
+    assert error.value.code == 404
+    assert len(server.requests) == 1
+    client.close()
+
+
+@pytest.mark.ai_generated
+def test_not_modified_raises_http_error_and_keeps_connection(server: _Server) -> None:
+    client = _HttpClient(hedge_after_seconds=None)
+    with client.open(server.url("/etag")) as response:
+        assert response.headers["ETag"] == '"1"'
+        response.read()
+
+    request = urllib.request.Request(server.url("/etag"), headers={"If-None-Match": '"1"'})
+    with pytest.raises(urllib.error.HTTPError) as error:
+        client.open(request)
+
+    assert error.value.code == 304
+    assert len({client_address for _, client_address, _ in server.requests}) == 1
+    client.close()
+
+
+@pytest.mark.ai_generated
+def test_redirects_are_followed(server: _Server) -> None:
+    client = _HttpClient(hedge_after_seconds=None)
+
+    with client.open(server.url("/redirect")) as response:
+        assert response.read() == _BODY
+        assert response.url == server.url("/plain")
+    client.close()
+
+
+@pytest.mark.ai_generated
+def test_connection_failure_raises_url_error() -> None:
+    client = _HttpClient(hedge_after_seconds=None, retries=1, backoff_seconds=0)
+
+    with mock.patch.dict("os.environ", {"no_proxy": "*"}), pytest.raises(urllib.error.URLError):
+        client.open("http://127.0.0.1:1/unreachable", timeout=1)
+
+
+@pytest.mark.ai_generated
+def test_slow_request_is_hedged(server: _Server) -> None:
+    client = _HttpClient(hedge_after_seconds=0.1)
+
+    started = time.perf_counter()
+    with client.open(server.url("/slow-first")) as response:
+        body = response.read()
+
+    assert body == b"attempt 2"
+    assert time.perf_counter() - started < 0.9
+    client.close()
+
+
+@pytest.mark.ai_generated
+def test_hedge_executor_is_bounded_and_shut_down_on_close(server: _Server) -> None:
+    client = _HttpClient(hedge_after_seconds=0.1, hedge_max_workers=2)
+    with client.open(server.url("/plain")) as response:
+        response.read()
+    executor = client._executor
+
+    assert executor._max_workers == 2
+
+    client.close()
+
+    assert client._executor is None
+    assert executor._shutdown
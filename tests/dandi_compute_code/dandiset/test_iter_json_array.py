@@ -0,0 +1,54 @@
+import io
+import json
+
+import pytest
+
+from dandi_compute_code.dandiset import _iter_json_array as iter_json_array_module
+from dandi_compute_code.dandiset._iter_json_array import _iter_json_array
+
+
+@pytest.fixture
+def tiny_reads(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Force single-byte initial reads so values straddle chunk boundaries."""
+    monkeypatch.setattr(iter_json_array_module, "_INITIAL_READ_SIZE", 1)
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize(
+    "document",
+    [
+        [],
+        [1, 22, 333, -4.5e3, True, None, "text"],
+        [{"path": "a/b.nwb", "contentSize": 12345, "nested": {"list": [1, 2, {"x": "é"}]}}, {"path": "c"}],
+        [[], {}, [[["deep"]]]],
+    ],
+)
+def test_iter_json_array_matches_json_loads(tiny_reads: None, document: list) -> None:
+    stream = io.BytesIO(json.dumps(document, indent=1, ensure_ascii=False).encode("utf-8"))
+
+    assert list(_iter_json_array(stream, source="test")) == document
+
+
+@pytest.mark.ai_generated
+def test_iter_json_array_yields_before_reading_the_whole_document() -> None:
+    """Elements are produced lazily; a malformed tail is only reached after earlier elements are yielded."""
+    stream = io.BytesIO(b'[{"a": 1}, {"b": 2}, !!!]')
+    iterator = _iter_json_array(stream, source="test")
+
+    assert next(iterator) == {"a": 1}
+    assert next(iterator) == {"b": 2}
+    with pytest.raises(json.JSONDecodeError):
+        next(iterator)
+
+
+@pytest.mark.ai_generated
+def test_iter_json_array_rejects_non_array_document() -> None:
+    with pytest.raises(ValueError, match="Expected a JSON array from test, got dict"):
+        list(_iter_json_array(io.BytesIO(b'{"path": "a"}'), source="test"))
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("payload", [b"", b"[1, 2", b"[1 2]", b"[1, 2] 3"])
+def test_iter_json_array_rejects_malformed_documents(tiny_reads: None, payload: bytes) -> None:
+    with pytest.raises(json.JSONDecodeError):
+        list(_iter_json_array(io.BytesIO(payload), source="test"))
@@ -1,4 +1,6 @@
+import email.message
 import json
+import urllib.error
 from unittest import mock
 
 import pytest
@@ -9,20 +11,7 @@ from dandi_compute_code.dandiset._load_assets_jsonld_metadata import (
     AssetsJsonldMetadata,
     load_assets_jsonld_metadata,
 )
-
-
-class _FakeResponse:
-    def __init__(self, payload: bytes) -> None:
-        self._payload = payload
-
-    def __enter__(self) -> "_FakeResponse":
-        return self
-
-    def __exit__(self, exc_type: object, exc_val: object, exc_tb: object) -> None:
-        return None
-
-    def read(self) -> bytes:
-        return self._payload
+from tests.dandi_compute_code.conftest import _FakeResponse
 
 
 def test_load_assets_jsonld_metadata_returns_indexed_model() -> None:
@@ -38,7 +27,7 @@ def test_load_assets_jsonld_metadata_returns_indexed_model() -> None:
         ]
     ).encode("utf-8")
     with mock.patch(
-        "dandi_compute_code.dandiset._load_assets_jsonld_metadata.urllib.request.urlopen",
+        "dandi_compute_code.dandiset._http_client._HttpClient.open",
         return_value=_FakeResponse(payload),
     ):
         metadata = load_assets_jsonld_metadata()
@@ -76,7 +65,7 @@ def _load_with_assets(*assets: dict[str, object]) -> AssetsJsonldMetadata:
     load_assets_jsonld_metadata.cache_clear()
     payload = json.dumps(list(assets)).encode("utf-8")
     with mock.patch(
-        "dandi_compute_code.dandiset._load_assets_jsonld_metadata.urllib.request.urlopen",
+        "dandi_compute_code.dandiset._http_client._HttpClient.open",
         return_value=_FakeResponse(payload),
     ):
         return load_assets_jsonld_metadata()
@@ -125,7 +114,7 @@ def test_load_assets_jsonld_metadata_raises_on_non_dict_asset() -> None:
     load_assets_jsonld_metadata.cache_clear()
     payload = json.dumps(["not-a-dict"]).encode("utf-8")
     with mock.patch(
-        "dandi_compute_code.dandiset._load_assets_jsonld_metadata.urllib.request.urlopen",
+        "dandi_compute_code.dandiset._http_client._HttpClient.open",
         return_value=_FakeResponse(payload),
     ):
         with pytest.raises(ValueError):
@@ -163,3 +152,123 @@ def test_assets_jsonld_metadata_path_index_contains_content_size() -> None:
         content_size=22,
         content_id="content-id-2",
     )
+
+
+def _not_modified(url: str) -> urllib.error.HTTPError:
+    return urllib.error.HTTPError(url, 304, "Not Modified", email.message.Message(), None)
+
+
+@pytest.mark.ai_generated
+def test_load_assets_jsonld_metadata_revalidates_cached_copy_with_conditional_get() -> None:
+    """A second process reuses the on-disk copy when the server answers 304 to the stored ETag."""
+    payload = json.dumps([_make_valid_asset()]).encode("utf-8")
+    requests = []
+
+    def _urlopen(request, timeout):
+        requests.append(request)
+        if len(requests) == 1:
+            return _FakeResponse(
+                payload, headers={"ETag": '"etag-1"', "Last-Modified": "Thu, 01 Jan 2026 00:00:00 GMT"}
+            )
+        raise _not_modified(request.full_url)
+
+    with mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", side_effect=_urlopen):
+        load_assets_jsonld_metadata.cache_clear()
+        first = load_assets_jsonld_metadata()
+        # Clearing the in-process cache stands in for a fresh CLI invocation.
+        load_assets_jsonld_metadata.cache_clear()
+        second = load_assets_jsonld_metadata()
+
+    assert len(requests) == 2
+    assert requests[0].get_header("If-none-match") is None
+    assert requests[1].get_header("If-none-match") == '"etag-1"'
+    assert requests[1].get_header("If-modified-since") == "Thu, 01 Jan 2026 00:00:00 GMT"
+    assert second.path_to_asset_metadata == first.path_to_asset_metadata
+
+
+@pytest.mark.ai_generated
+def test_load_assets_jsonld_metadata_replaces_cached_copy_when_modified() -> None:
+    """A changed document (200 with a new ETag) overwrites the cached body and validators."""
+    first_payload = json.dumps([_make_valid_asset()]).encode("utf-8")
+    second_payload = json.dumps([_make_valid_asset(path="sub-mouse02/sub-mouse02_ecephys.nwb")]).encode("utf-8")
+    responses = [
+        _FakeResponse(first_payload, headers={"ETag": '"etag-1"'}),
+        _FakeResponse(second_payload, headers={"ETag": '"etag-2"'}),
+    ]
+
+    with mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", side_effect=responses):
+        load_assets_jsonld_metadata.cache_clear()
+        load_assets_jsonld_metadata()
+        load_assets_jsonld_metadata.cache_clear()
+        metadata = load_assets_jsonld_metadata()
+
+    assert list(metadata.path_to_asset_metadata) == ["sub-mouse02/sub-mouse02_ecephys.nwb"]
+
+
+@pytest.mark.ai_generated
+def test_load_assets_jsonld_metadata_does_not_serve_stale_copy_on_network_failure() -> None:
+    """A failed refresh yields empty metadata rather than an outdated cached view."""
+    payload = json.dumps([_make_valid_asset()]).encode("utf-8")
+
+    with mock.patch(
+        "dandi_compute_code.dandiset._http_client._HttpClient.open",
+        side_effect=[_FakeResponse(payload, headers={"ETag": '"etag-1"'}), urllib.error.URLError("offline")],
+    ):
+        load_assets_jsonld_metadata.cache_clear()
+        load_assets_jsonld_metadata()
+        load_assets_jsonld_metadata.cache_clear()
+        metadata = load_assets_jsonld_metadata()
+
+    assert metadata.path_to_asset_metadata == {}
+
+
+@pytest.mark.ai_generated
+def test_load_assets_jsonld_metadata_can_drop_raw_assets() -> None:
+    """With ``keep_raw_assets=False`` only the indexed fields are retained."""
+    payload = json.dumps([_make_valid_asset(extra={"rich": ["metadata"] * 10})]).encode("utf-8")
+
+    with mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", return_value=_FakeResponse(payload)):
+        load_assets_jsonld_metadata.cache_clear()
+        metadata = load_assets_jsonld_metadata(keep_raw_assets=False)
+
+    assert metadata.content_id_to_asset == {}
+    assert metadata.path_to_asset_metadata["sub-mouse01/sub-mouse01_ecephys.nwb"].content_id == "content-id-abc"
+
+
+@pytest.mark.ai_generated
+def test_load_assets_jsonld_metadata_restores_unchanged_index_from_snapshot() -> None:
+    """After a 304 the compact index is restored from its binary snapshot without decoding JSON."""
+    payload = json.dumps([_make_valid_asset()]).encode("utf-8")
+    responses = [_FakeResponse(payload, headers={"ETag": '"etag-1"'}), _not_modified("url")]
+
+    with mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", side_effect=responses):
+        load_assets_jsonld_metadata.cache_clear()
+        first = load_assets_jsonld_metadata(keep_raw_assets=False)
+        load_assets_jsonld_metadata.cache_clear()
+        with mock.patch(
+            "dandi_compute_code.dandiset._load_assets_jsonld_metadata._index_assets_jsonld_stream"
+        ) as index_stream:
+            second = load_assets_jsonld_metadata(keep_raw_assets=False)
+
+    index_stream.assert_not_called()
+    assert second.path_to_asset_metadata == first.path_to_asset_metadata
+    assert len(second.path_to_asset_metadata) == 1
+
+
+@pytest.mark.ai_generated
+def test_load_assets_jsonld_metadata_ignores_snapshot_of_previous_document() -> None:
+    """A snapshot keyed by an older ETag is rebuilt rather than served."""
+    first_payload = json.dumps([_make_valid_asset()]).encode("utf-8")
+    second_payload = json.dumps([_make_valid_asset(path="sub-mouse02/sub-mouse02_ecephys.nwb")]).encode("utf-8")
+    responses = [
+        _FakeResponse(first_payload, headers={"ETag": '"etag-1"'}),
+        _FakeResponse(second_payload, headers={"ETag": '"etag-2"'}),
+    ]
+
+    with mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open", side_effect=responses):
+        load_assets_jsonld_metadata.cache_clear()
+        load_assets_jsonld_metadata(keep_raw_assets=False)
+        load_assets_jsonld_metadata.cache_clear()
+        metadata = load_assets_jsonld_metadata(keep_raw_assets=False)
+
+    assert list(metadata.path_to_asset_metadata) == ["sub-mouse02/sub-mouse02_ecephys.nwb"]
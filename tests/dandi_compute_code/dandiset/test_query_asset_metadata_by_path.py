@@ -0,0 +1,159 @@
+import io
+import json
+import time
+from unittest import mock
+
+import dandi.exceptions
+import pytest
+import requests
+
+from dandi_compute_code.dandiset._download_with_cache import (
+    _CachedDownload,
+    _resolve_cache_directory,
+    _write_validators,
+)
+from dandi_compute_code.dandiset._load_assets_jsonld_metadata import (
+    _index_assets_jsonld_stream,
+    _index_cached_assets_jsonld,
+)
+from dandi_compute_code.dandiset._query_asset_metadata_by_path import (
+    _prefer_per_path_queries,
+    _query_asset_metadata_by_path,
+)
+from dandi_compute_code.queue import _queue_utils, _write_queue_state
+from tests.dandi_compute_code.conftest import _FakeResponse
+
+
+def _asset(path: str) -> dict[str, object]:
+    return {
+        "path": path,
+        "contentSize": 100,
+        "dateModified": "2026-01-01T00:00:00+00:00",
+        "contentUrl": [f"https://example.test/blobs/{path.replace('/', '-')}"],
+    }
+
+
+def _payload(count: int) -> bytes:
+    return json.dumps([_asset(f"sub-{index}/file.nwb") for index in range(count)]).encode("utf-8")
+
+
+def _cache_document(*, dandiset_id: str, payload: bytes, validated_at: float) -> _CachedDownload:
+    body_path = _resolve_cache_directory() / "assets_jsonld" / f"{dandiset_id}.jsonld"
+    body_path.parent.mkdir(parents=True, exist_ok=True)
+    body_path.write_bytes(payload)
+    download = _CachedDownload(body_path=body_path, etag='"etag-1"', last_modified=None, validated_at=validated_at)
+    _write_validators(url="https://example.test/assets.jsonld", download=download)
+    return download
+
+
+@pytest.mark.ai_generated
+def test_index_stream_keeps_only_wanted_paths_and_skips_their_validation() -> None:
+    assets = [_asset("sub-0/file.nwb"), {"path": "sub-1/broken.nwb"}, _asset("sub-2/file.nwb")]
+    stream = io.BytesIO(json.dumps(assets).encode("utf-8"))
+
+    metadata = _index_assets_jsonld_stream(stream, source="test", wanted_paths={"sub-2/file.nwb", "sub-9/missing.nwb"})
+
+    assert list(metadata.path_to_asset_metadata) == ["sub-2/file.nwb"]
+
+
+@pytest.mark.ai_generated
+def test_index_cached_filters_snapshot_and_does_not_overwrite_it() -> None:
+    download = _cache_document(dandiset_id="000001", payload=_payload(10), validated_at=time.time())
+    full = _index_cached_assets_jsonld(download, source="test")
+
+    selected = _index_cached_assets_jsonld(download, source="test", wanted_paths={"sub-3/file.nwb"})
+    assert list(selected.path_to_asset_metadata) == ["sub-3/file.nwb"]
+    assert selected.path_to_asset_metadata["sub-3/file.nwb"] == full.path_to_asset_metadata["sub-3/file.nwb"]
+
+    snapshot_path = download.body_path.with_name(f"{download.body_path.name}.index")
+    snapshot_path.unlink()
+    _index_cached_assets_jsonld(download, source="test", wanted_paths={"sub-3/file.nwb"})
+    assert not snapshot_path.exists(), "a filtered index must not be saved as the document snapshot"
+
+
+@pytest.mark.ai_generated
+def test_prefer_per_path_queries_weighs_document_cost() -> None:
+    # Nothing cached: the default document size makes a handful of queries cheaper.
+    assert _prefer_per_path_queries(dandiset_id="000001", wanted_count=2, max_age=3600)
+    # Beyond the hard cap the document is always read.
+    assert not _prefer_per_path_queries(dandiset_id="000001", wanted_count=10_000, max_age=3600)
+
+    # A fresh cached copy with its snapshot is free to reuse.
+    download = _cache_document(dandiset_id="000002", payload=_payload(3), validated_at=time.time())
+    _index_cached_assets_jsonld(download, source="test")
+    assert not _prefer_per_path_queries(dandiset_id="000002", wanted_count=1, max_age=3600)
+    # Once stale, a tiny document is still cheaper to download than even a single query.
+    assert not _prefer_per_path_queries(dandiset_id="000002", wanted_count=1, max_age=0)
+
+
+def _fake_client(assets_by_path: dict[str, dict[str, object]]) -> mock.MagicMock:
+    def _get_asset_by_path(path: str) -> mock.MagicMock:
+        if path not in assets_by_path:
+            raise dandi.exceptions.NotFoundError(path)
+        return mock.MagicMock(get_raw_metadata=mock.MagicMock(return_value=assets_by_path[path]))
+
+    client = mock.MagicMock()
+    client.get_dandiset.return_value.get_asset_by_path.side_effect = _get_asset_by_path
+    return client
+
+
+@pytest.mark.ai_generated
+def test_query_by_path_skips_missing_and_invalid_assets() -> None:
+    client = _fake_client({"sub-0/file.nwb": _asset("sub-0/file.nwb"), "sub-1/file.nwb": {"path": "sub-1/file.nwb"}})
+
+    with mock.patch("dandi.dandiapi.DandiAPIClient", return_value=client):
+        metadata = _query_asset_metadata_by_path(
+            dandiset_id="000001", paths={"sub-0/file.nwb", "sub-1/file.nwb", "sub-2/file.nwb"}
+        )
+
+    client.get_dandiset.assert_called_once_with(dandiset_id="000001")
+    assert list(metadata.path_to_asset_metadata) == ["sub-0/file.nwb"]
+
+
+_UNAVAILABLE_DANDISET_ERRORS = [
+    pytest.param(requests.ConnectionError("offline"), id="offline"),
+    pytest.param(dandi.exceptions.NotFoundError("No such Dandiset: '000001'"), id="not-found"),
+]
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("error", _UNAVAILABLE_DANDISET_ERRORS)
+def test_query_by_path_returns_none_when_dandiset_is_unavailable(error: Exception) -> None:
+    client = mock.MagicMock()
+    client.get_dandiset.side_effect = error
+
+    with mock.patch("dandi.dandiapi.DandiAPIClient", return_value=client):
+        assert _query_asset_metadata_by_path(dandiset_id="000001", paths={"sub-0/file.nwb"}) is None
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("module", [_queue_utils, _write_queue_state], ids=["model", "procedural"])
+def test_upstream_loader_uses_per_path_queries_for_few_paths(module) -> None:
+    client = _fake_client({"sub-0/file.nwb": _asset("sub-0/file.nwb")})
+
+    with (
+        mock.patch("dandi.dandiapi.DandiAPIClient", return_value=client),
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as urlopen,
+    ):
+        metadata = module._load_upstream_assets_jsonld_metadata("000001", {"sub-0/file.nwb"})
+
+    urlopen.assert_not_called()
+    assert list(metadata.path_to_asset_metadata) == ["sub-0/file.nwb"]
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("error", _UNAVAILABLE_DANDISET_ERRORS)
+@pytest.mark.parametrize("module", [_queue_utils, _write_queue_state], ids=["model", "procedural"])
+def test_upstream_loader_falls_back_to_document_when_api_fails(module, error: Exception) -> None:
+    client = mock.MagicMock()
+    client.get_dandiset.side_effect = error
+
+    with (
+        mock.patch("dandi.dandiapi.DandiAPIClient", return_value=client),
+        mock.patch(
+            "dandi_compute_code.dandiset._http_client._HttpClient.open", return_value=_FakeResponse(_payload(5))
+        ),
+    ):
+        metadata = module._load_upstream_assets_jsonld_metadata("000001", {"sub-4/file.nwb"})
+
+    assert list(metadata.path_to_asset_metadata) == ["sub-4/file.nwb"]
@@ -36,7 +36,12 @@ def test_process_queue_submits_when_no_jobs_running(
     ):
         process_queue(queue_directory=queue_directory, processing_directory=processing_directory, jitter_seconds=0)
 
-    mock_submit.assert_called_once_with(processing_directory=processing_directory, max_submissions=2, test=False)
+    mock_submit.assert_called_once_with(
+        processing_directory=processing_directory,
+        max_submissions=2,
+        test=False,
+        state_file=queue_directory / "state.jsonl",
+    )
 
 
 @pytest.mark.ai_generated
@@ -57,7 +62,12 @@ def test_process_queue_respects_explicit_max_concurrent_jobs(
             jitter_seconds=0,
         )
 
-    mock_submit.assert_called_once_with(processing_directory=processing_directory, max_submissions=2, test=False)
+    mock_submit.assert_called_once_with(
+        processing_directory=processing_directory,
+        max_submissions=2,
+        test=False,
+        state_file=queue_directory / "state.jsonl",
+    )
 
 
 @pytest.mark.ai_generated
@@ -89,7 +99,12 @@ def test_process_queue_submits_one_when_one_job_running(
     ):
         process_queue(queue_directory=queue_directory, processing_directory=processing_directory, jitter_seconds=0)
 
-    mock_submit.assert_called_once_with(processing_directory=processing_directory, max_submissions=1, test=False)
+    mock_submit.assert_called_once_with(
+        processing_directory=processing_directory,
+        max_submissions=1,
+        test=False,
+        state_file=queue_directory / "state.jsonl",
+    )
 
 
 @pytest.mark.ai_generated
@@ -105,7 +120,12 @@ def test_process_queue_passes_processing_directory_to_submit_next(
     ):
         process_queue(queue_directory=queue_directory, processing_directory=processing_directory, jitter_seconds=0)
 
-    mock_submit.assert_called_once_with(processing_directory=processing_directory, max_submissions=2, test=False)
+    mock_submit.assert_called_once_with(
+        processing_directory=processing_directory,
+        max_submissions=2,
+        test=False,
+        state_file=queue_directory / "state.jsonl",
+    )
 
 
 @pytest.mark.ai_generated
@@ -124,4 +144,9 @@ def test_process_queue_forwards_test_flag(queue_directory: pathlib.Path, process
             jitter_seconds=0,
         )
 
-    mock_submit.assert_called_once_with(processing_directory=processing_directory, max_submissions=2, test=True)
+    mock_submit.assert_called_once_with(
+        processing_directory=processing_directory,
+        max_submissions=2,
+        test=True,
+        state_file=queue_directory / "state.jsonl",
+    )
@@ -0,0 +1,100 @@
+"""
+Scaling benchmark for ``QueueState.pending_code_dirs``.
+
+Pending detection runs from cron against the job capsules Dandiset, which holds
+hundreds of thousands of assets. These checks build synthetic asset indexes and
+confirm that the detection cost grows linearly with the index size.
+"""
+
+import time
+from unittest import mock
+
+import pytest
+
+from dandi_compute_code.dandiset import AssetsJsonldMetadata
+from dandi_compute_code.queue import QueueState
+
+#: Files per synthetic capsule; one of them is always ``code/submit.sh``.
+_ASSETS_PER_CAPSULE = 10
+
+
+def _synthetic_paths(asset_count: int) -> list[str]:
+    """Build asset paths for ``asset_count // 10`` capsules, every other one carrying a submitted marker."""
+    paths: list[str] = []
+    for capsule_index in range(asset_count // _ASSETS_PER_CAPSULE):
+        attempt_dir = (
+            f"derivatives/dandiset-000409/sub-{capsule_index:07d}/pipeline-aind+ephys/"
+            "version-v1.1.0_codebase-v0.3.50_params-abc1234_config-def5678_attempt-1"
+        )
+        paths.append(f"{attempt_dir}/code/submit.sh")
+        paths.append(f"{attempt_dir}/code/params.json")
+        paths.append(f"{attempt_dir}/dataset_description.json")
+        marker = "submitted_date-2026+01+01_time-00+00+00" if capsule_index % 2 else "main_multi_backend.nf"
+        paths.append(f"{attempt_dir}/code/{marker}")
+        paths.extend(f"{attempt_dir}/logs/log-{log_index}.txt" for log_index in range(_ASSETS_PER_CAPSULE - 4))
+    return paths
+
+
+def _metadata_for(paths: list[str]) -> AssetsJsonldMetadata:
+    # ``pending_code_dirs`` reads only the path keys of the index.
+    return AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata=dict.fromkeys(paths))
+
+
+def _time_pending_code_dirs(metadata: AssetsJsonldMetadata, *, repeats: int = 3) -> tuple[float, list[str]]:
+    """Return the best wall time over *repeats* runs, plus the result of the last run."""
+    best = float("inf")
+    result: list[str] = []
+    with mock.patch("dandi_compute_code.queue._queue_state.load_assets_jsonld_metadata", return_value=metadata):
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = QueueState.pending_code_dirs()
+            best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _reference_pending_code_dirs(paths: list[str]) -> list[str]:
+    """The original per-script scan, kept as the correctness oracle for small inputs."""
+    path_set = set(paths)
+    pending: list[str] = []
+    for asset_path in sorted(path_set):
+        if asset_path.endswith("/code/submit.sh"):
+            code_dir_path = asset_path[: -len("/submit.sh")]
+            if not any(
+                path == f"{code_dir_path}/submitted" or path.startswith(f"{code_dir_path}/submitted_date-")
+                for path in path_set
+            ):
+                pending.append(code_dir_path)
+    return pending
+
+
+@pytest.mark.ai_generated
+def test_pending_code_dirs_matches_reference_scan() -> None:
+    """The single-pass detection returns exactly what the per-script scan returned."""
+    paths = _synthetic_paths(asset_count=2_000) + [
+        "sub-1/attempt-1/code/submit.sh",
+        "sub-1/attempt-1/code/submitted",
+        "sub-2/attempt-1/code/submit.sh",
+        "sub-2/attempt-1/code/submitted_date-2026+01+01_time-00+00+00/nested",
+        "sub-3/attempt-1/code/submit.sh",
+        "sub-3/attempt-1/code/not_submitted",
+    ]
+    _, result = _time_pending_code_dirs(_metadata_for(paths), repeats=1)
+
+    assert result == _reference_pending_code_dirs(paths)
+    assert "sub-3/attempt-1/code" in result
+
+
+@pytest.mark.ai_generated
+@pytest.mark.benchmark
+def test_pending_code_dirs_scales_linearly_to_500k_assets() -> None:
+    """A 10x larger index costs roughly 10x as much, not 100x as the per-script scan did."""
+    small_metadata = _metadata_for(_synthetic_paths(asset_count=50_000))
+    large_metadata = _metadata_for(_synthetic_paths(asset_count=500_000))
+
+    small_seconds, small_result = _time_pending_code_dirs(small_metadata)
+    large_seconds, large_result = _time_pending_code_dirs(large_metadata)
+
+    assert len(small_result) == 50_000 // _ASSETS_PER_CAPSULE // 2
+    assert len(large_result) == 500_000 // _ASSETS_PER_CAPSULE // 2
+    # Linear work plus the final sort gives a ratio close to 10; quadratic would give ~100.
+    assert large_seconds / small_seconds < 25
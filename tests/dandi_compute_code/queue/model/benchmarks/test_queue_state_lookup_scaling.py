@@ -0,0 +1,82 @@
+"""
+Scaling benchmark for the indexed lookups of ``QueueState``.
+
+The queue state tracks every attempt capsule ever prepared, which reaches
+hundreds of thousands of entries. These checks build synthetic states of
+20k and 200k entries and confirm that lookups by path, identity, content ID,
+Dandiset and status cost the same regardless of the state size.
+"""
+
+import time
+
+import pytest
+
+from dandi_compute_code.queue import QueueState
+from dandi_compute_code.queue._job_info import JobInfo
+from dandi_compute_code.queue._queue_state import JobEntry
+
+#: Lookups timed per method; large enough for the timings to be stable.
+_LOOKUP_COUNT = 20_000
+#: Entries per synthetic Dandiset, so Dandiset buckets have the same size at every state size.
+_ENTRIES_PER_DANDISET = 50
+
+
+def _synthetic_state(entry_count: int) -> QueueState:
+    """Two attempts per asset, spread over many Dandisets and pipeline versions, every tenth one failed."""
+    entries = []
+    for index in range(entry_count):
+        asset_index, attempt = divmod(index, 2)
+        job = JobInfo(
+            dandiset_id=f"{index // _ENTRIES_PER_DANDISET:06d}",
+            dandi_path=f"sub-{asset_index:07d}/sub-{asset_index:07d}_ecephys.nwb",
+            pipeline="aind+ephys",
+            version=f"v1.{index // _ENTRIES_PER_DANDISET}.0",
+            params="abc1234",
+            config="def5678",
+            attempt=attempt + 1,
+            codebase="v0.3.50",
+        )
+        entries.append(
+            JobEntry(
+                job=job,
+                content_id=f"cid-{asset_index:07d}",
+                asset_size_bytes=1,
+                has_code=True,
+                has_logs=index % 10 == 0,
+            )
+        )
+    return QueueState(entries=entries)
+
+
+def _time_lookups(state: QueueState) -> float:
+    """Return the best wall time, over three runs, of ``_LOOKUP_COUNT`` rounds of every indexed lookup."""
+    # Probe entries spread over the whole state, so the linear scans would have to walk half of it on average.
+    probes = [state.entries[index * len(state) // _LOOKUP_COUNT] for index in range(_LOOKUP_COUNT)]
+    state.entry_for(dandi_path=probes[0].job.dandi_path, attempt=probes[0].job.attempt)  # build the indexes
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for probe in probes:
+            job = probe.job
+            assert state.entry_for(dandi_path=job.dandi_path, attempt=job.attempt) is probe
+            assert state.entry_by_identity(probe.identity) is probe
+            assert probe in state.entries_for_content_id(probe.content_id)
+            assert probe in state.entries_for_dandiset(job.dandiset_id)
+            state.failures_for(pipeline=job.pipeline, version=job.version)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@pytest.mark.ai_generated
+@pytest.mark.benchmark
+def test_lookups_do_not_scale_with_200k_entry_state() -> None:
+    """A 10x larger state costs about the same per lookup, not ~10x as the linear scans did."""
+    small_state = _synthetic_state(entry_count=20_000)
+    large_state = _synthetic_state(entry_count=200_000)
+
+    small_seconds = _time_lookups(small_state)
+    large_seconds = _time_lookups(large_state)
+
+    assert len(large_state.failed) == 200_000 // 10
+    # Hash lookups give a ratio close to 1 (cache effects aside); linear scans would give ~10.
+    assert large_seconds / small_seconds < 3
@@ -0,0 +1,73 @@
+"""
+Memory benchmark for loading ``state.jsonl``.
+
+Successful capsules record every output file in ``output_paths``, so a full
+queue state carries millions of asset paths. This check loads a synthetic state
+with large path maps and compares what it retains against the plain decoded
+JSON records that used to back each entry.
+"""
+
+import json
+import pathlib
+import tracemalloc
+
+import pytest
+
+from dandi_compute_code.queue import QueueState
+
+#: Output files recorded per synthetic capsule.
+_OUTPUTS_PER_CAPSULE = 100
+
+
+def _record(index: int) -> dict:
+    attempt_dir = (
+        f"derivatives/dandiset-000409/sub-{index:06d}/sub-{index:06d}_ecephys/pipeline-aind+ephys/"
+        "version-v1.1.0_codebase-v0.3.50_params-abc1234_config-def5678_attempt-1"
+    )
+    return {
+        "dandiset_id": "000409",
+        "dandi_path": f"sub-{index:06d}/sub-{index:06d}_ecephys.nwb",
+        "pipeline": "aind+ephys",
+        "version": "v1.1.0",
+        "params": "abc1234",
+        "config": "def5678",
+        "attempt": 1,
+        "codebase": "v0.3.50",
+        "content_id": f"{index:08d}-0000-4000-8000-000000000000",
+        "asset_size_bytes": 1,
+        "has_code": True,
+        "has_been_submitted": True,
+        "has_output": True,
+        "has_logs": True,
+        "dataset_description_path": {f"{attempt_dir}/dataset_description.json": f"{index:08d}-dd"},
+        "output_paths": {
+            f"{attempt_dir}/derivatives/sorting/block{output}/spikes.npy": f"{index:08d}-{output:04d}-4000-8000-0000"
+            for output in range(_OUTPUTS_PER_CAPSULE)
+        },
+        "log_paths": {f"{attempt_dir}/logs/log-{log}.txt": f"{index:08d}-{log:04d}-log" for log in range(10)},
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "job_completion_time": None,
+    }
+
+
+def _retained_bytes(load: object) -> tuple[int, object]:
+    tracemalloc.start()
+    try:
+        result = load()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return retained, result
+
+
+@pytest.mark.ai_generated
+@pytest.mark.benchmark
+def test_loaded_state_is_a_fraction_of_the_decoded_records(tmp_path: pathlib.Path) -> None:
+    state_file = tmp_path / "state.jsonl"
+    state_file.write_text("".join(json.dumps(_record(index)) + "\n" for index in range(2_000)))
+
+    state_bytes, state = _retained_bytes(lambda: QueueState.from_jsonl(state_file))
+    records_bytes, records = _retained_bytes(lambda: [json.loads(line) for line in state_file.read_text().splitlines()])
+
+    assert [entry.to_dict() for entry in state] == records
+    assert state_bytes < records_bytes / 3
@@ -43,7 +43,12 @@ def test_process_queue_submits_when_no_jobs_running(
             queue_directory=queue_directory, processing_directory=processing_directory, jitter_seconds=0
         )
 
-    mock_submit.assert_called_once_with(processing_directory=processing_directory, max_submissions=2, test=False)
+    mock_submit.assert_called_once_with(
+        processing_directory=processing_directory,
+        max_submissions=2,
+        test=False,
+        state_file=queue_directory / "state.jsonl",
+    )
 
 
 @pytest.mark.ai_generated
@@ -66,7 +71,12 @@ def test_process_queue_respects_explicit_max_concurrent_jobs(
             jitter_seconds=0,
         )
 
-    mock_submit.assert_called_once_with(processing_directory=processing_directory, max_submissions=2, test=False)
+    mock_submit.assert_called_once_with(
+        processing_directory=processing_directory,
+        max_submissions=2,
+        test=False,
+        state_file=queue_directory / "state.jsonl",
+    )
 
 
 @pytest.mark.ai_generated
@@ -106,7 +116,12 @@ def test_process_queue_submits_one_when_one_job_running(
             queue_directory=queue_directory, processing_directory=processing_directory, jitter_seconds=0
         )
 
-    mock_submit.assert_called_once_with(processing_directory=processing_directory, max_submissions=1, test=False)
+    mock_submit.assert_called_once_with(
+        processing_directory=processing_directory,
+        max_submissions=1,
+        test=False,
+        state_file=queue_directory / "state.jsonl",
+    )
 
 
 @pytest.mark.ai_generated
@@ -126,7 +141,12 @@ def test_process_queue_passes_processing_directory_to_submit_next(
             queue_directory=queue_directory, processing_directory=processing_directory, jitter_seconds=0
         )
 
-    mock_submit.assert_called_once_with(processing_directory=processing_directory, max_submissions=2, test=False)
+    mock_submit.assert_called_once_with(
+        processing_directory=processing_directory,
+        max_submissions=2,
+        test=False,
+        state_file=queue_directory / "state.jsonl",
+    )
 
 
 @pytest.mark.ai_generated
@@ -149,4 +169,9 @@ def test_process_queue_forwards_test_flag(
             jitter_seconds=0,
         )
 
-    mock_submit.assert_called_once_with(processing_directory=processing_directory, max_submissions=2, test=True)
+    mock_submit.assert_called_once_with(
+        processing_directory=processing_directory,
+        max_submissions=2,
+        test=True,
+        state_file=queue_directory / "state.jsonl",
+    )
@@ -0,0 +1,176 @@
+import json
+import pathlib
+import time
+from unittest import mock
+
+import pytest
+
+from dandi_compute_code.dandiset import AssetMetadata, AssetsJsonldMetadata
+from dandi_compute_code.queue import QueueState
+
+_UPSTREAM_DANDISET_IDS = ("000001", "000002")
+
+
+def _queue_dir(tmp_path: pathlib.Path, name: str) -> pathlib.Path:
+    queue_dir = tmp_path / name
+    queue_dir.mkdir()
+    (queue_dir / "queue_config.json").write_text(
+        json.dumps({"pipelines": {"test": {"version_priority": ["v1.0"], "params_priority": ["default"]}}})
+    )
+    return queue_dir
+
+
+def _attempt_assets(dandiset_id: str, subject: int, attempt: int, subpaths: dict[str, str]) -> list[AssetMetadata]:
+    attempt_dir = (
+        f"derivatives/dandiset-{dandiset_id}/sub-{subject:02d}/sub-{subject:02d}_ecephys/pipeline-test/"
+        f"version-v1.0_codebase-v0.3.0_params-default_config-cfg_attempt-{attempt}"
+    )
+    return [
+        AssetMetadata(path=f"{attempt_dir}/{subpath}", date_modified=modified, content_size=1, content_id=subpath)
+        for subpath, modified in subpaths.items()
+    ]
+
+
+def _local_metadata(assets: list[AssetMetadata]) -> AssetsJsonldMetadata:
+    return AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={asset.path: asset for asset in assets})
+
+
+def _upstream_metadata(dandiset_id: str, wanted_paths=None, *, size: int = 10) -> AssetsJsonldMetadata:
+    paths = [f"sub-{subject:02d}/sub-{subject:02d}_ecephys.nwb" for subject in range(1, 5)]
+    return AssetsJsonldMetadata(
+        content_id_to_asset={},
+        path_to_asset_metadata={
+            path: AssetMetadata(
+                path=path, date_modified="2026-01-01T00:00:00Z", content_size=size, content_id=f"{dandiset_id}:{path}"
+            )
+            for path in paths
+            if wanted_paths is None or path in wanted_paths
+        },
+    )
+
+
+def _refresh(queue_dir: pathlib.Path, assets: list[AssetMetadata], *, incremental: bool = True) -> mock.MagicMock:
+    with (
+        mock.patch(
+            "dandi_compute_code.queue._queue_state.load_assets_jsonld_metadata", return_value=_local_metadata(assets)
+        ),
+        mock.patch(
+            "dandi_compute_code.queue._queue_utils._load_upstream_assets_jsonld_metadata",
+            side_effect=_upstream_metadata,
+        ) as load_upstream,
+    ):
+        QueueState.write_state(queue_directory=queue_dir, incremental=incremental)
+    return load_upstream
+
+
+def _initial_assets() -> list[AssetMetadata]:
+    return [
+        *_attempt_assets("000001", 1, 1, {"code/submit.sh": "2026-01-01", "logs/nextflow.log": "2026-01-02"}),
+        *_attempt_assets("000001", 2, 1, {"code/submit.sh": "2026-01-01"}),
+        *_attempt_assets("000002", 3, 1, {"code/submit.sh": "2026-01-01", "derivatives/out.nwb": "2026-01-03"}),
+    ]
+
+
+@pytest.mark.ai_generated
+def test_unchanged_refresh_skips_every_upstream_lookup(tmp_path: pathlib.Path) -> None:
+    queue_dir = _queue_dir(tmp_path, "queue")
+    _refresh(queue_dir, _initial_assets())
+    first = (queue_dir / "state.jsonl").read_text()
+
+    load_upstream = _refresh(queue_dir, _initial_assets())
+
+    load_upstream.assert_not_called()
+    assert (queue_dir / "state.jsonl").read_text() == first
+
+
+@pytest.mark.ai_generated
+def test_only_touched_attempts_are_looked_up_again(tmp_path: pathlib.Path) -> None:
+    queue_dir = _queue_dir(tmp_path, "queue")
+    _refresh(queue_dir, _initial_assets())
+
+    assets = [
+        *_initial_assets(),
+        *_attempt_assets("000001", 2, 1, {"logs/nextflow.log": "2026-01-05"}),
+    ]
+    load_upstream = _refresh(queue_dir, assets)
+
+    load_upstream.assert_called_once_with("000001", {"sub-02/sub-02_ecephys.nwb"})
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize(
+    "next_assets",
+    [
+        pytest.param(
+            lambda assets: [*assets, *_attempt_assets("000001", 4, 1, {"code/submit.sh": "2026-01-04"})],
+            id="added-attempt",
+        ),
+        pytest.param(lambda assets: [a for a in assets if "sub-02" not in a.path], id="removed-attempt"),
+        pytest.param(lambda assets: [a for a in assets if "logs/" not in a.path], id="removed-asset"),
+        pytest.param(
+            lambda assets: [
+                *(a for a in assets if not a.path.endswith("out.nwb")),
+                *_attempt_assets("000002", 3, 1, {"derivatives/out.nwb": "2026-02-01"}),
+            ],
+            id="modified-asset",
+        ),
+        pytest.param(
+            lambda assets: [*assets, *_attempt_assets("000001", 1, 2, {"code/submit.sh": "2026-01-09"})],
+            id="new-attempt-number",
+        ),
+    ],
+)
+def test_incremental_refresh_matches_full_rebuild(tmp_path: pathlib.Path, next_assets) -> None:
+    incremental_dir = _queue_dir(tmp_path, "incremental")
+    full_dir = _queue_dir(tmp_path, "full")
+    _refresh(incremental_dir, _initial_assets())
+
+    assets = next_assets(_initial_assets())
+    _refresh(incremental_dir, assets)
+    _refresh(full_dir, assets, incremental=False)
+
+    assert (incremental_dir / "state.jsonl").read_text() == (full_dir / "state.jsonl").read_text()
+
+
+@pytest.mark.ai_generated
+def test_upstream_past_its_ttl_is_looked_up_again(tmp_path: pathlib.Path) -> None:
+    queue_dir = _queue_dir(tmp_path, "queue")
+    _refresh(queue_dir, _initial_assets())
+
+    with mock.patch("time.time", return_value=time.time() + 7 * 60 * 60):
+        load_upstream = _refresh(queue_dir, _initial_assets())
+
+    assert sorted(call.args[0] for call in load_upstream.call_args_list) == list(_UPSTREAM_DANDISET_IDS)
+
+
+@pytest.mark.ai_generated
+def test_hand_edited_state_file_forces_a_full_rebuild(tmp_path: pathlib.Path) -> None:
+    queue_dir = _queue_dir(tmp_path, "queue")
+    _refresh(queue_dir, _initial_assets())
+    expected = (queue_dir / "state.jsonl").read_text()
+    (queue_dir / "state.jsonl").write_text("")
+
+    load_upstream = _refresh(queue_dir, _initial_assets())
+
+    assert load_upstream.call_count == len(_UPSTREAM_DANDISET_IDS)
+    assert (queue_dir / "state.jsonl").read_text() == expected
+
+
+@pytest.mark.ai_generated
+def test_unresolved_source_is_retried_on_the_next_refresh(tmp_path: pathlib.Path) -> None:
+    queue_dir = _queue_dir(tmp_path, "queue")
+    empty = AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={})
+    with (
+        mock.patch(
+            "dandi_compute_code.queue._queue_state.load_assets_jsonld_metadata",
+            return_value=_local_metadata(_initial_assets()),
+        ),
+        mock.patch("dandi_compute_code.queue._queue_utils._load_upstream_assets_jsonld_metadata", return_value=empty),
+    ):
+        QueueState.write_state(queue_directory=queue_dir)
+
+    load_upstream = _refresh(queue_dir, _initial_assets())
+
+    assert load_upstream.call_count == len(_UPSTREAM_DANDISET_IDS)
+    entries = [json.loads(line) for line in (queue_dir / "state.jsonl").read_text().splitlines()]
+    assert all(entry["content_id"] is not None for entry in entries)
@@ -1,14 +1,19 @@
+import collections
 import gzip
 import json
+import logging
 import pathlib
+import threading
+import time
 from unittest import mock
 
 import pytest
 
-from dandi_compute_code.queue import QueueState
+from dandi_compute_code.aind_ephys_pipeline import UnmappedContentIDError
+from dandi_compute_code.queue import JobEntry, QueueState
 
 # prepare_queue reaches two external boundaries that cannot run in CI: the
-# qualifying-content-ids download (urllib) and the per-asset job preparation
+# qualifying-content-ids download (HTTP client) and the per-asset job preparation
 # (prepare_aind_ephys_job). Both are mocked here; everything else runs for real.
 
 
@@ -44,7 +49,7 @@ def test_prepare_queue_calls_prepare_for_each_qualifying_asset(queue_directory:
     qualifying_ids = ["asset-bbb", "asset-ccc"]
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch(
             "dandi_compute_code.queue._queue_utils._load_content_id_to_usage_dandiset_path",
             return_value={},
@@ -70,7 +75,7 @@ def test_prepare_queue_skips_when_failures_reach_max(
     qualifying_ids = ["asset-aaa", "asset-bbb"]
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch(
             "dandi_compute_code.queue._queue_utils._load_content_id_to_usage_dandiset_path",
             return_value={},
@@ -93,7 +98,7 @@ def test_prepare_queue_passes_optional_args_through(queue_directory: pathlib.Pat
     qualifying_ids = ["asset-bbb"]
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch(
             "dandi_compute_code.queue._queue_utils._load_content_id_to_usage_dandiset_path",
             return_value={},
@@ -119,7 +124,7 @@ def test_prepare_queue_limit_stops_after_n_assets(queue_directory: pathlib.Path)
     qualifying_ids = ["asset-aaa", "asset-bbb", "asset-ccc"]
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch(
             "dandi_compute_code.queue._queue_utils._load_content_id_to_usage_dandiset_path",
             return_value={},
@@ -143,7 +148,7 @@ def test_prepare_queue_limit_samples_uniformly_over_dandisets(queue_directory: p
     }
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch(
             "dandi_compute_code.queue._queue_utils._load_content_id_to_usage_dandiset_path",
             return_value=content_id_mapping,
@@ -174,7 +179,7 @@ def test_prepare_queue_uses_explicit_content_ids_when_provided(queue_directory:
     explicit_ids = ["explicit-asset-001"]
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch("dandi_compute_code.queue._queue_state.prepare_aind_ephys_job") as mock_prepare,
     ):
         QueueState.prepare(queue_directory=queue_directory, content_ids=explicit_ids)
@@ -182,3 +187,376 @@ def test_prepare_queue_uses_explicit_content_ids_when_provided(queue_directory:
     mock_urlopen.assert_not_called()
     assert mock_prepare.call_count == 1
     assert mock_prepare.call_args.kwargs["content_id"] == "explicit-asset-001"
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_batches_until_limit_is_reached(queue_directory: pathlib.Path) -> None:
+    """With a batch size, jobs are prepared in batches and skipped jobs do not count towards the limit."""
+    qualifying_ids = ["asset-aaa", "asset-bbb", "asset-ccc", "asset-ddd", "asset-eee"]
+
+    def prepare_jobs(*, jobs, **kwargs):
+        return {job: pathlib.Path(job.content_id) for job in jobs if job.content_id != "asset-ccc"}
+
+    with (
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
+        mock.patch(
+            "dandi_compute_code.queue._queue_utils._load_content_id_to_usage_dandiset_path",
+            return_value={},
+        ),
+        mock.patch("dandi_compute_code.queue._queue_utils.random.shuffle"),
+        mock.patch("dandi_compute_code.queue._queue_state.prepare_aind_ephys_job") as mock_prepare,
+        mock.patch(
+            "dandi_compute_code.queue._queue_state.prepare_aind_ephys_jobs", side_effect=prepare_jobs
+        ) as mock_prepare_jobs,
+    ):
+        mock_urlopen.return_value = _mock_urlopen_response(qualifying_ids)
+        QueueState.prepare(queue_directory=queue_directory, limit=3, batch_size=2)
+
+    mock_prepare.assert_not_called()
+    batches = [[job.content_id for job in call.kwargs["jobs"]] for call in mock_prepare_jobs.call_args_list]
+    assert batches == [["asset-aaa", "asset-bbb"], ["asset-ccc"], ["asset-ddd"]]
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_workers_run_concurrently_and_honor_limit(queue_directory: pathlib.Path) -> None:
+    """Workers prepare assets at the same time; an unmapped asset frees its slot for the next candidate."""
+    qualifying_ids = ["asset-aaa", "asset-bbb", "asset-ccc", "asset-ddd", "asset-eee"]
+    first_wave = threading.Barrier(3, timeout=10)
+
+    def prepare_job(*, content_id, **kwargs):
+        if content_id in {"asset-aaa", "asset-bbb", "asset-ccc"}:
+            first_wave.wait()
+        if content_id == "asset-bbb":
+            raise UnmappedContentIDError(content_id)
+        return pathlib.Path(content_id)
+
+    with (
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
+        mock.patch(
+            "dandi_compute_code.queue._queue_utils._load_content_id_to_usage_dandiset_path",
+            return_value={},
+        ),
+        mock.patch("dandi_compute_code.queue._queue_utils.random.shuffle"),
+        mock.patch(
+            "dandi_compute_code.queue._queue_state.prepare_aind_ephys_job", side_effect=prepare_job
+        ) as mock_prepare,
+    ):
+        mock_urlopen.return_value = _mock_urlopen_response(qualifying_ids)
+        QueueState.prepare(queue_directory=queue_directory, limit=3, workers=3)
+
+    prepared = [call.kwargs["content_id"] for call in mock_prepare.call_args_list]
+    assert sorted(prepared) == ["asset-aaa", "asset-bbb", "asset-ccc", "asset-ddd"]
+    assert prepared[3] == "asset-ddd"
+
+
+def _aind_entry(*, content_id: str, params: str, config: str, has_logs: bool, has_output: bool) -> JobEntry:
+    return JobEntry.from_dict(
+        {
+            "dandiset_id": "000001",
+            "dandi_path": f"sub-{content_id}/sub-{content_id}_ecephys.nwb",
+            "pipeline": "aind+ephys",
+            "version": "v1.0.0+fixes",
+            "params": params,
+            "config": config,
+            "attempt": 1,
+            "codebase": "v0.3.0",
+            "content_id": content_id,
+            "has_code": True,
+            "has_logs": has_logs,
+            "has_output": has_output,
+        }
+    )
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_skips_combinations_with_pending_or_successful_capsules(
+    tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Only content IDs without a pending or successful capsule for the exact combination are prepared."""
+    queue_dir = tmp_path / "queue"
+    queue_dir.mkdir()
+    queue_config = {"pipelines": {"aind+ephys": {"version_priority": ["v1.0.0-fixes"], "params_priority": ["default"]}}}
+    (queue_dir / "queue_config.json").write_text(json.dumps(queue_config))
+    params_id = QueueState.resolve_params_key_to_id("aind+ephys", "default")
+    config_id = QueueState.resolve_config_key_to_id("aind+ephys", "default")
+    QueueState(
+        entries=[
+            _aind_entry(
+                content_id="asset-pending", params=params_id, config=config_id, has_logs=False, has_output=False
+            ),
+            _aind_entry(content_id="asset-done", params=params_id, config=config_id, has_logs=True, has_output=True),
+            _aind_entry(content_id="asset-failed", params=params_id, config=config_id, has_logs=True, has_output=False),
+            _aind_entry(content_id="asset-other", params="0000000", config=config_id, has_logs=True, has_output=True),
+        ]
+    ).to_file(queue_dir / "state.jsonl")
+    content_ids = ["asset-pending", "asset-done", "asset-failed", "asset-other", "asset-new"]
+
+    with (
+        mock.patch("dandi_compute_code.queue._queue_state.prepare_aind_ephys_job") as mock_prepare,
+        caplog.at_level(logging.INFO, logger="dandi_compute_code.queue._prepare_candidates"),
+    ):
+        QueueState.prepare(queue_directory=queue_dir, content_ids=content_ids)
+
+    prepared_ids = [call.kwargs["content_id"] for call in mock_prepare.call_args_list]
+    assert prepared_ids == ["asset-failed", "asset-other", "asset-new"]
+    assert "Skipped 2 content IDs" in caplog.text
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_enforces_max_attempts_per_asset_and_asset_overrides(tmp_path: pathlib.Path) -> None:
+    """Attempts in state and archive count towards the cap; overrides skip, re-cap or pin assets."""
+    queue_dir = tmp_path / "queue"
+    queue_dir.mkdir()
+    queue_config = {
+        "pipelines": {
+            "test": {
+                "version_priority": ["v1.0"],
+                "params_priority": ["default"],
+                "max_attempts_per_asset": 2,
+                "asset_overrides": {"asset-skip": None, "asset-retry": 3, "asset-pinned": "special"},
+            }
+        }
+    }
+    (queue_dir / "queue_config.json").write_text(json.dumps(queue_config))
+
+    def failed_attempt(content_id: str, attempt: int) -> JobEntry:
+        return JobEntry.from_dict(
+            {
+                "dandiset_id": "000001",
+                "dandi_path": f"sub-{content_id}",
+                "pipeline": "test",
+                "version": "v1.0",
+                "params": "default",
+                "config": "default",
+                "attempt": attempt,
+                "codebase": "v0.3.0",
+                "content_id": content_id,
+                "has_code": True,
+                "has_logs": True,
+            }
+        )
+
+    QueueState(
+        entries=[failed_attempt("asset-capped", 1), failed_attempt("asset-retry", 1), failed_attempt("asset-retry", 2)]
+    ).to_file(queue_dir / "state.jsonl")
+    QueueState(entries=[failed_attempt("asset-capped", 2)]).to_file(queue_dir / "archive_state.jsonl")
+    content_ids = ["asset-capped", "asset-retry", "asset-skip", "asset-pinned", "asset-new"]
+
+    with mock.patch("dandi_compute_code.queue._queue_state.prepare_aind_ephys_job") as mock_prepare:
+        QueueState.prepare(queue_directory=queue_dir, content_ids=content_ids)
+    prepared = [(call.kwargs["content_id"], call.kwargs["parameters_key"]) for call in mock_prepare.call_args_list]
+    assert prepared == [("asset-retry", "default"), ("asset-new", "default"), ("asset-pinned", "special")]
+
+    with mock.patch("dandi_compute_code.queue._queue_state.prepare_aind_ephys_job") as mock_prepare:
+        QueueState.prepare(queue_directory=queue_dir, content_ids=content_ids, count_archived_attempts=False)
+    prepared_ids = [call.kwargs["content_id"] for call in mock_prepare.call_args_list]
+    assert prepared_ids == ["asset-capped", "asset-retry", "asset-new", "asset-pinned"]
+
+
+@pytest.mark.ai_generated
+def test_preparation_index_counts_in_one_pass_and_records_new_capsules(example_queue_state: QueueState) -> None:
+    """The index matches linear scans and is updated in place by reserve_attempt and record_prepared."""
+    index = example_queue_state.preparation_index()
+
+    entries = [entry for entry in example_queue_state.entries if entry.content_id]
+    assert index.content_id_to_dandiset_ids == example_queue_state.content_id_to_dandiset_ids()
+    assert index.attempt_counts == collections.Counter((entry.content_id, entry.job.pipeline) for entry in entries)
+    assert index.prepared_combinations == {
+        (entry.content_id, entry.job.pipeline, entry.job.version, entry.job.params, entry.job.config)
+        for entry in entries
+        if entry.is_pending or entry.is_successful
+    }
+    for entry in example_queue_state.failed:
+        job = entry.job
+        expected = len(
+            [
+                failure
+                for failure in example_queue_state.failures_for(pipeline=job.pipeline, version=job.version)
+                if failure.job.dandiset_id == job.dandiset_id
+            ]
+        )
+        assert index.failure_counts[(job.pipeline, job.version, job.dandiset_id)] == expected
+
+    script_path = pathlib.Path(
+        "/tmp/prepare-job-x/001697/derivatives/dandiset-000123/sub-01/pipeline-test/"
+        "version-v2.0_codebase-v0.3.0_params-default_config-default_attempt-1/code/submit.sh"
+    )
+    index.reserve_attempt(content_id="asset-gone", pipeline="test")
+    index.release_attempt(content_id="asset-gone", pipeline="test")
+    assert index.attempt_counts[("asset-gone", "test")] == 0
+
+    index.reserve_attempt(content_id="asset-new", pipeline="test")
+    index.record_prepared(
+        content_id="asset-new", combination=("test", "v2.0", "default", "default"), script_path=script_path
+    )
+    assert index.attempt_counts[("asset-new", "test")] == 1
+    assert ("asset-new", "test", "v2.0", "default", "default") in index.prepared_combinations
+    assert index.dandiset_ids_for("asset-new") == {"000123"}
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_sees_capsules_prepared_earlier_in_the_same_run(tmp_path: pathlib.Path) -> None:
+    """An attempt prepared for one version counts towards max_attempts_per_asset for the next version."""
+    queue_dir = tmp_path / "queue"
+    queue_dir.mkdir()
+    queue_config = {
+        "pipelines": {
+            "test": {"version_priority": ["v2.0", "v1.0"], "params_priority": ["default"], "max_attempts_per_asset": 1}
+        }
+    }
+    (queue_dir / "queue_config.json").write_text(json.dumps(queue_config))
+
+    with mock.patch("dandi_compute_code.queue._queue_state.prepare_aind_ephys_job") as mock_prepare:
+        QueueState.prepare(queue_directory=queue_dir, content_ids=["asset-aaa", "asset-bbb"])
+
+    prepared = [(call.kwargs["content_id"], call.kwargs["pipeline_version"]) for call in mock_prepare.call_args_list]
+    assert prepared == [("asset-aaa", "v2.0"), ("asset-bbb", "v2.0")]
+
+
+def _prepared_script_path(
+    root: pathlib.Path, *, content_id: str, pipeline_version: str, parameters_key: str
+) -> pathlib.Path:
+    """Where prepare_aind_ephys_job leaves the submission script of a new capsule for *content_id*."""
+    return (
+        root
+        / "001697"
+        / "derivatives"
+        / "dandiset-000001"
+        / f"sub-{content_id}"
+        / "pipeline-test"
+        / f"version-{pipeline_version}_codebase-v0.3.0_params-{parameters_key}_config-default_attempt-1"
+        / "code"
+        / "submit.sh"
+    )
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize(
+    "options",
+    [pytest.param({"workers": 2}, id="workers"), pytest.param({"batch_size": 2}, id="batch-size")],
+)
+def test_prepare_queue_counts_in_flight_attempts_towards_the_cap(tmp_path: pathlib.Path, options: dict) -> None:
+    """Attempts handed to a worker or batch count towards max_attempts_per_asset before they finish."""
+    queue_dir = tmp_path / "queue"
+    queue_dir.mkdir()
+    queue_config = {
+        "pipelines": {
+            "test": {"version_priority": ["v2.0", "v1.0"], "params_priority": ["default"], "max_attempts_per_asset": 1}
+        }
+    }
+    (queue_dir / "queue_config.json").write_text(json.dumps(queue_config))
+
+    with (
+        # Slow enough that the next version is considered while the first attempt is still in flight.
+        mock.patch(
+            "dandi_compute_code.queue._queue_state.prepare_aind_ephys_job", side_effect=lambda **kwargs: time.sleep(0.2)
+        ) as mock_prepare,
+        mock.patch(
+            "dandi_compute_code.queue._queue_state.prepare_aind_ephys_jobs",
+            side_effect=lambda *, jobs, **kwargs: dict.fromkeys(jobs, pathlib.Path("submit.sh")),
+        ) as mock_prepare_jobs,
+    ):
+        prepared = QueueState.prepare(queue_directory=queue_dir, content_ids=["asset-a"], **options)
+
+    jobs = [job for call in mock_prepare_jobs.call_args_list for job in call.kwargs["jobs"]]
+    assert prepared == 1
+    assert mock_prepare.call_count + len(jobs) == 1
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_gives_back_attempts_of_unprepared_batch_jobs(tmp_path: pathlib.Path) -> None:
+    """A batch job that prepares nothing does not use up the asset's attempt."""
+    queue_dir = tmp_path / "queue"
+    queue_dir.mkdir()
+    queue_config = {
+        "pipelines": {
+            "test": {"version_priority": ["v2.0", "v1.0"], "params_priority": ["default"], "max_attempts_per_asset": 1}
+        }
+    }
+    (queue_dir / "queue_config.json").write_text(json.dumps(queue_config))
+
+    def prepare_only_v1(*, jobs, **kwargs):
+        return {job: pathlib.Path("submit.sh") for job in jobs if job.pipeline_version == "v1.0"}
+
+    with mock.patch(
+        "dandi_compute_code.queue._queue_state.prepare_aind_ephys_jobs", side_effect=prepare_only_v1
+    ) as mock_prepare_jobs:
+        prepared = QueueState.prepare(queue_directory=queue_dir, content_ids=["asset-a"], batch_size=1)
+
+    versions = [call.kwargs["jobs"][0].pipeline_version for call in mock_prepare_jobs.call_args_list]
+    assert versions == ["v2.0", "v1.0"]
+    assert prepared == 1
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize(
+    ("pending_count", "expected_limit"),
+    [(4, 16), (5, None), (0, 20)],
+)
+def test_replenish_prepares_up_to_the_high_watermark_only_below_the_low_watermark(
+    queue_directory: pathlib.Path, pending_count: int, expected_limit: int | None
+) -> None:
+    """replenish tops pending capsules up to the high watermark once they drop below the low watermark."""
+    pending = [
+        f"derivatives/dandiset-000001/sub-{index}/pipeline-test/"
+        "version-v1.0_codebase-v0.3.0_params-default_config-default_attempt-1/code"
+        for index in range(pending_count)
+    ]
+    with (
+        mock.patch.object(QueueState, "pending_code_dirs", return_value=pending),
+        mock.patch.object(QueueState, "prepare", return_value=7) as mock_prepare,
+    ):
+        prepared = QueueState.replenish(queue_directory=queue_directory, low_watermark=5, high_watermark=20)
+
+    if expected_limit is None:
+        mock_prepare.assert_not_called()
+        assert prepared == 0
+    else:
+        assert mock_prepare.call_args.kwargs["limit"] == expected_limit
+        assert prepared == 7
+
+
+@pytest.mark.ai_generated
+def test_replenish_twice_without_a_refresh_counts_the_capsules_it_prepared(
+    queue_directory: pathlib.Path, tmp_path: pathlib.Path
+) -> None:
+    """Capsules prepared by the first run count as pending in the second, before assets.jsonld lists them."""
+    qualifying_ids = ["asset-x", "asset-y", "asset-z"]
+
+    def prepare_job(*, content_id: str, pipeline_version: str, parameters_key: str, **kwargs) -> pathlib.Path:
+        return _prepared_script_path(
+            tmp_path, content_id=content_id, pipeline_version=pipeline_version, parameters_key=parameters_key
+        )
+
+    with (
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
+        mock.patch(
+            "dandi_compute_code.queue._queue_utils._load_content_id_to_usage_dandiset_path",
+            return_value={},
+        ),
+        mock.patch.object(QueueState, "pending_code_dirs", return_value=[]),
+        mock.patch(
+            "dandi_compute_code.queue._queue_state.prepare_aind_ephys_job", side_effect=prepare_job
+        ) as mock_prepare,
+    ):
+        mock_urlopen.side_effect = lambda *args, **kwargs: _mock_urlopen_response(qualifying_ids)
+        assert QueueState.replenish(queue_directory=queue_directory, low_watermark=1, high_watermark=2) == 2
+        assert QueueState.replenish(queue_directory=queue_directory, low_watermark=2, high_watermark=2) == 0
+        assert QueueState.replenish(queue_directory=queue_directory, low_watermark=3, high_watermark=3) == 1
+
+    prepared_ids = [call.kwargs["content_id"] for call in mock_prepare.call_args_list]
+    assert sorted(prepared_ids) == qualifying_ids
+
+
+@pytest.mark.ai_generated
+def test_replenish_rejects_inverted_watermarks(queue_directory: pathlib.Path) -> None:
+    with pytest.raises(ValueError, match="low_watermark <= high_watermark"):
+        QueueState.replenish(queue_directory=queue_directory, low_watermark=10, high_watermark=5)
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_returns_the_number_of_prepared_assets(queue_directory: pathlib.Path) -> None:
+    with mock.patch("dandi_compute_code.queue._queue_state.prepare_aind_ephys_job"):
+        prepared = QueueState.prepare(queue_directory=queue_directory, content_ids=["asset-x", "asset-y"], limit=1)
+
+    assert prepared == 1
@@ -33,3 +33,16 @@ def test_resolve_params_key_to_id_already_hash_passthrough() -> None:
     result = QueueState.resolve_params_key_to_id("aind+ephys", "98fd947")
     # '98fd947' is not a registered key name, so it is returned as-is
     assert result == "98fd947"
+
+
+@pytest.mark.ai_generated
+def test_resolve_config_key_to_id_mirrors_params_resolution() -> None:
+    """resolve_config_key_to_id hashes registered aind+ephys config keys and passes everything else through."""
+    config_registry_path = importlib.resources.files("dandi_compute_code.aind_ephys_pipeline").joinpath(
+        "registries/registered_configs.json"
+    )
+    default_config_id = json.loads(config_registry_path.read_text())["default"]["md5"][:7]
+
+    assert QueueState.resolve_config_key_to_id("aind+ephys", "default") == default_config_id
+    assert QueueState.resolve_config_key_to_id("aind+ephys", default_config_id) == default_config_id
+    assert QueueState.resolve_config_key_to_id("unknown-pipeline", "default") == "default"
@@ -71,7 +71,7 @@ def test_write_archive_state_writes_adjacent_file_from_archive_dandiset(tmp_path
         QueueState.write_archive_state(queue_directory=queue_dir)
 
     # The archive metadata is read from the failed runs archive Dandiset, not the job capsules one.
-    load_metadata.assert_called_once_with(dandiset_id=_FAILED_RUNS_ARCHIVE_DANDISET_ID)
+    load_metadata.assert_called_once_with(dandiset_id=_FAILED_RUNS_ARCHIVE_DANDISET_ID, keep_raw_assets=False)
 
     archive_state_file = queue_dir / "archive_state.jsonl"
     assert archive_state_file.exists()
@@ -1,11 +1,14 @@
+import datetime
 import json
 import pathlib
+import sqlite3
 from unittest import mock
 
 import pytest
 
 from dandi_compute_code.dandiset import AssetMetadata, AssetsJsonldMetadata
-from dandi_compute_code.queue import QueueState
+from dandi_compute_code.queue import JobEntry, QueueState
+from dandi_compute_code.queue._queue_utils import _new_attempt_record, _parse_attempt_identity
 
 # write_queue_state derives state.jsonl from DANDI assets.jsonld metadata fetched over
 # the network. The conftest _no_real_dandi_fetch guard defaults that loader to empty;
@@ -1021,3 +1024,69 @@ def test_queue_state_null_dataset_description_path(
 
     assert len(queue_state) == 1
     assert queue_state.entries[0].dataset_description_path == {}
+
+
+def _journal_prepared_capsule(state_file: pathlib.Path, *, subject: str, created_at: datetime.datetime) -> str:
+    """Journal a pending entry as QueueState.prepare does, and return the path of its submission script."""
+    submit_path = (
+        f"derivatives/dandiset-001697/sub-{subject}/sub-{subject}_ecephys/pipeline-test/"
+        "version-v1.0_codebase-v0.3.0_params-default_config-0000001_attempt-1/code/submit.sh"
+    )
+    job = _parse_attempt_identity(submit_path)[0]
+    record = {**_new_attempt_record(job), "content_id": f"id-{subject}", "has_code": True}
+    QueueState.journal_entry(state_file, JobEntry.from_dict({**record, "created_at": created_at.isoformat()}))
+    return submit_path
+
+
+@pytest.mark.ai_generated
+def test_write_state_keeps_recently_prepared_capsules_until_assets_jsonld_lists_them(tmp_path: pathlib.Path) -> None:
+    """A refresh before assets.jsonld catches up keeps fresh journaled capsules, but not ones past the grace period."""
+    queue_dir = _make_queue_dir(tmp_path)
+    state_file = queue_dir / "state.jsonl"
+    QueueState(entries=[]).to_file(state_file)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    fresh_path = _journal_prepared_capsule(state_file, subject="fresh", created_at=now)
+    _journal_prepared_capsule(state_file, subject="stale", created_at=now - datetime.timedelta(days=2))
+
+    not_listed = AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={})
+    with mock.patch("dandi_compute_code.queue._queue_state.load_assets_jsonld_metadata", return_value=not_listed):
+        QueueState.write_state(queue_directory=queue_dir)
+        # The carried entry survives an incremental refresh as well.
+        QueueState.write_state(queue_directory=queue_dir)
+
+    carried = QueueState.from_jsonl(state_file)
+    assert [entry.job.dandi_path for entry in carried.pending] == ["sub-fresh/sub-fresh_ecephys.nwb"]
+    assert _read_jsonl(state_file) == []
+
+    listed = AssetsJsonldMetadata(
+        content_id_to_asset={},
+        path_to_asset_metadata={
+            fresh_path: AssetMetadata(
+                path=fresh_path, date_modified="2024-01-01T00:00:00+00:00", content_size=1, content_id="attempt-1"
+            )
+        },
+    )
+    with mock.patch("dandi_compute_code.queue._queue_state.load_assets_jsonld_metadata", return_value=listed):
+        QueueState.write_state(queue_directory=queue_dir)
+
+    refreshed = QueueState.from_jsonl(state_file)
+    assert len(refreshed) == 1
+    assert refreshed.entries[0].created_at == "2024-01-01T00:00:00+00:00"
+
+
+@pytest.mark.ai_generated
+def test_write_state_rebuilds_a_store_of_another_format_version(tmp_path: pathlib.Path) -> None:
+    """Looking for capsules to carry over does not stop a refresh from rebuilding an outdated store."""
+    queue_dir = _make_queue_dir(tmp_path)
+    (queue_dir / "state.jsonl").write_text("")
+    QueueState.jsonl_to_sqlite(queue_dir / "state.jsonl", queue_dir / "state.sqlite")
+    with sqlite3.connect(queue_dir / "state.sqlite") as connection:
+        connection.execute("PRAGMA user_version = 0")
+
+    with mock.patch(
+        "dandi_compute_code.queue._queue_state.load_assets_jsonld_metadata",
+        return_value=AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={}),
+    ):
+        QueueState.write_state(queue_directory=queue_dir)
+
+    assert QueueState.count_jsonl(queue_dir / "state.sqlite") == 0
@@ -0,0 +1,105 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from dandi_compute_code.queue import QueueState
+from dandi_compute_code.queue._job_info import JobInfo
+from dandi_compute_code.queue._path_map import _PathMap
+from dandi_compute_code.queue._queue_state import JobEntry
+
+_ATTEMPT_DIR = (
+    "derivatives/dandiset-000001/sub-1/pipeline-test/version-v1.0_codebase-v0.1.0_params-a_config-b_attempt-1"
+)
+
+
+def _record(dandi_path: str) -> dict:
+    return {
+        "dandiset_id": "000001",
+        "dandi_path": dandi_path,
+        "pipeline": "test",
+        "version": "v1.0",
+        "params": "abc1234",
+        "config": "def5678",
+        "attempt": 1,
+        "codebase": "v0.1.0",
+        "content_id": "cid-a",
+        "asset_size_bytes": 10,
+        "has_code": True,
+        "has_been_submitted": True,
+        "has_output": True,
+        "has_logs": True,
+        "dataset_description_path": {f"{_ATTEMPT_DIR}/dataset_description.json": "cid-dd"},
+        "output_paths": {f"{_ATTEMPT_DIR}/derivatives/block{index}/é.npy": f"cid-{index}" for index in range(5)},
+        "log_paths": {},
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "job_completion_time": None,
+    }
+
+
+@pytest.mark.ai_generated
+def test_to_dict_round_trips_the_source_record() -> None:
+    record = _record("sub-1/a.nwb")
+    entry = JobEntry.from_dict(json.loads(json.dumps(record)))
+
+    assert entry.to_dict() == record
+    assert json.dumps(entry.to_dict()) == json.dumps(record)
+    assert type(entry.to_dict()["output_paths"]) is dict
+
+
+@pytest.mark.ai_generated
+def test_entries_are_slotted_and_share_repeated_strings() -> None:
+    first, second = (JobEntry.from_dict(json.loads(json.dumps(_record(path)))) for path in ("sub-1/a", "sub-2/b"))
+
+    assert not hasattr(first, "__dict__")
+    assert not hasattr(first.job, "__dict__")
+    assert first.job.pipeline is second.job.pipeline
+    assert first.job.codebase is second.job.codebase
+    assert first.content_id is second.content_id
+    assert first.log_paths is second.log_paths
+
+
+@pytest.mark.ai_generated
+def test_path_map_behaves_like_the_dict_it_replaces() -> None:
+    paths = _record("sub-1/a.nwb")["output_paths"]
+    path_map = _PathMap.of(paths)
+
+    assert path_map == paths and paths == path_map
+    assert list(path_map) == list(paths)
+    assert list(path_map.items()) == list(paths.items())
+    assert list(path_map.values()) == list(paths.values())
+    assert dict(path_map) == paths
+    assert len(path_map) == 5
+    assert path_map[f"{_ATTEMPT_DIR}/derivatives/block3/é.npy"] == "cid-3"
+    assert f"{_ATTEMPT_DIR}/derivatives/block9/é.npy" not in path_map
+    assert "elsewhere" not in path_map and 1 not in path_map
+    with pytest.raises(KeyError):
+        path_map["elsewhere"]
+    assert hash(path_map) == hash(_PathMap.of(dict(reversed(paths.items()))))
+    assert _PathMap.of({"a.txt": "x", "b/c.txt": "y"}) == {"a.txt": "x", "b/c.txt": "y"}
+    assert _PathMap.of({}) is _PathMap.of(None)
+
+
+@pytest.mark.ai_generated
+def test_constructed_entries_convert_path_maps_and_survive_copies() -> None:
+    entry = JobEntry(
+        job=JobInfo(
+            dandiset_id="000001",
+            dandi_path="sub-1/a.nwb",
+            pipeline="test",
+            version="v1.0",
+            params="a",
+            config="b",
+            attempt=1,
+            codebase="v0.1.0",
+        ),
+        content_id="cid-a",
+        asset_size_bytes=None,
+        output_paths={"out/a.npy": "cid-1"},
+    )
+
+    assert isinstance(entry.output_paths, _PathMap)
+    assert pickle.loads(pickle.dumps(entry)) == entry
+    assert copy.deepcopy(entry) == entry
+    assert QueueState(entries=[copy.deepcopy(entry)]) == QueueState(entries=[entry])
@@ -0,0 +1,76 @@
+import json
+import pathlib
+from unittest import mock
+
+import pytest
+
+from dandi_compute_code.queue import QueueState
+
+EXAMPLE_STATE_FILE = pathlib.Path(__file__).parents[1] / "example_state_files" / "state.jsonl"
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize(
+    ("filters", "expected"),
+    [
+        pytest.param({}, lambda entry: True, id="no-filter"),
+        pytest.param({"dandiset_id": "000001"}, lambda entry: entry.job.dandiset_id == "000001", id="dandiset"),
+        pytest.param({"status": "pending"}, lambda entry: entry.is_pending, id="pending"),
+        pytest.param({"status": "running"}, lambda entry: entry.is_running, id="running"),
+        pytest.param({"status": "successful"}, lambda entry: entry.is_successful, id="successful"),
+        pytest.param({"status": "failed"}, lambda entry: entry.is_failed, id="failed"),
+        pytest.param(
+            {"dandiset_id": "000001", "status": "pending", "predicate": lambda entry: entry.job.attempt == 1},
+            lambda entry: entry.job.dandiset_id == "000001" and entry.is_pending and entry.job.attempt == 1,
+            id="combined",
+        ),
+    ],
+)
+def test_iter_jsonl_matches_filtering_the_loaded_state(filters: dict, expected: object) -> None:
+    state = QueueState.from_jsonl(EXAMPLE_STATE_FILE)
+
+    streamed = list(QueueState.iter_jsonl(EXAMPLE_STATE_FILE, **filters))
+
+    assert streamed == [entry for entry in state if expected(entry)]
+    assert QueueState.count_jsonl(EXAMPLE_STATE_FILE, **filters) == len(streamed)
+    assert QueueState.from_jsonl(EXAMPLE_STATE_FILE, **filters).entries == streamed
+
+
+@pytest.mark.ai_generated
+def test_iter_jsonl_skips_decoding_lines_that_cannot_match(tmp_path: pathlib.Path) -> None:
+    state_file = tmp_path / "state.jsonl"
+    # Compact separators and blank lines are read the same as the files ``to_file`` writes.
+    lines = [
+        json.dumps(json.loads(line), separators=(",", ":")) for line in EXAMPLE_STATE_FILE.read_text().splitlines()
+    ]
+    state_file.write_text("\n\n".join(lines) + "\n")
+
+    with mock.patch("dandi_compute_code.queue._queue_state.json.loads", wraps=json.loads) as loads:
+        (entry,) = QueueState.iter_jsonl(state_file, dandiset_id="000002", status="pending")
+
+    assert entry.job.dandi_path == "sub-fresh"
+    assert loads.call_count == 1
+
+    with mock.patch("dandi_compute_code.queue._queue_state.json.loads", wraps=json.loads) as loads:
+        failed = list(QueueState.iter_jsonl(state_file, status="failed"))
+
+    assert [entry.job.dandi_path for entry in failed] == ["sub-failed/ses-repeated"] * 2
+    assert loads.call_count < len(lines)
+
+
+@pytest.mark.ai_generated
+def test_iter_jsonl_validates_arguments_eagerly(tmp_path: pathlib.Path) -> None:
+    with pytest.raises(FileNotFoundError, match="State file not found"):
+        QueueState.iter_jsonl(tmp_path / "missing.jsonl")
+    with pytest.raises(ValueError, match="Unknown status 'queued'"):
+        QueueState.iter_jsonl(EXAMPLE_STATE_FILE, status="queued")
+
+
+@pytest.mark.ai_generated
+def test_count_jsonl_holds_one_entry_at_a_time(tmp_path: pathlib.Path) -> None:
+    state_file = tmp_path / "state.jsonl"
+    state_file.write_text(EXAMPLE_STATE_FILE.read_text() * 50)
+
+    with mock.patch("pathlib.Path.read_text", side_effect=AssertionError("read the whole file")):
+        assert QueueState.count_jsonl(state_file) == 500
+        assert QueueState.count_jsonl(state_file, status="successful") == 100
@@ -0,0 +1,143 @@
+import copy
+import dataclasses
+
+import pytest
+
+from dandi_compute_code.queue import QueueState
+from dandi_compute_code.queue._queue_state import JobEntry
+
+
+def _entry(
+    dandi_path: str,
+    *,
+    attempt: int = 1,
+    dandiset_id: str = "000001",
+    content_id: str | None = "cid-a",
+    version: str = "v1.0",
+    has_logs: bool = False,
+    has_output: bool = False,
+) -> JobEntry:
+    return JobEntry.from_dict(
+        {
+            "dandiset_id": dandiset_id,
+            "dandi_path": dandi_path,
+            "pipeline": "test",
+            "version": version,
+            "params": "abc1234",
+            "config": "def5678",
+            "attempt": attempt,
+            "codebase": "v0.1.0",
+            "content_id": content_id,
+            "has_code": True,
+            "has_logs": has_logs,
+            "has_output": has_output,
+        }
+    )
+
+
+@pytest.fixture
+def state() -> QueueState:
+    return QueueState(
+        entries=[
+            _entry("sub-1/a.nwb"),
+            _entry("sub-1/a.nwb", attempt=2, has_logs=True),
+            _entry("sub-2/b.nwb", dandiset_id="000002", content_id="cid-b", has_logs=True, has_output=True),
+            _entry("sub-3/c.nwb", content_id=None, version="v2.0", has_logs=True),
+        ]
+    )
+
+
+@pytest.mark.ai_generated
+def test_indexed_lookups_match_linear_scans(state: QueueState) -> None:
+    entries = state.entries
+
+    assert state.entry_for(dandi_path="sub-1/a.nwb", attempt=2) is entries[1]
+    assert state.entry_by_identity(entries[2].identity) is entries[2]
+    assert state.entries_for_content_id("cid-a") == entries[:2]
+    assert state.entries_for_content_id("cid-missing") == []
+    assert state.entries_for_dandiset("000001") == [entries[0], entries[1], entries[3]]
+    assert state.entries_for(pipeline="test", version="v2.0") == [entries[3]]
+    assert state.pending == [e for e in entries if e.is_pending]
+    assert state.running == [e for e in entries if e.is_running]
+    assert state.successful == [e for e in entries if e.is_successful]
+    assert state.failed == [e for e in entries if e.is_failed]
+    assert state.failures_for(pipeline="test", version="v1.0") == [entries[1]]
+    assert state.content_id_to_dandiset_ids() == {"cid-a": {"000001"}, "cid-b": {"000002"}}
+    with pytest.raises(KeyError, match="No entry with dandi_path='sub-9/z.nwb' and attempt=1"):
+        state.entry_for(dandi_path="sub-9/z.nwb", attempt=1)
+    with pytest.raises(KeyError):
+        state.entry_by_identity(("000009",))
+
+
+@pytest.mark.ai_generated
+def test_returned_lists_do_not_alias_the_indexes(state: QueueState) -> None:
+    state.pending.clear()
+    state.entries_for_content_id("cid-a").clear()
+
+    assert len(state.pending) == 1
+    assert len(state.entries_for_content_id("cid-a")) == 2
+
+
+@pytest.mark.ai_generated
+def test_indexes_follow_list_mutations(state: QueueState) -> None:
+    assert len(state.failed) == 2
+
+    new_entry = _entry("sub-4/d.nwb", content_id="cid-d", has_logs=True)
+    state.entries.append(new_entry)
+    assert state.entry_for(dandi_path="sub-4/d.nwb", attempt=1) is new_entry
+    assert len(state.failed) == 3
+
+    state.entries.remove(new_entry)
+    with pytest.raises(KeyError):
+        state.entry_for(dandi_path="sub-4/d.nwb", attempt=1)
+
+    state.entries[0] = _entry("sub-5/e.nwb", content_id="cid-e")
+    assert state.entries_for_content_id("cid-e") == [state.entries[0]]
+    assert len(state.entries_for_content_id("cid-a")) == 1
+
+    del state.entries[0]
+    state.entries += [new_entry]
+    assert state.entries_for_content_id("cid-d") == [new_entry]
+    assert state.entries_for_content_id("cid-e") == []
+
+    state.entries.clear()
+    assert state.pending == [] and state.failed == []
+
+
+@pytest.mark.ai_generated
+def test_indexes_follow_reassignment_and_copies(state: QueueState) -> None:
+    assert state.failed
+
+    state.entries = [_entry("sub-6/f.nwb", content_id="cid-f")]
+    assert state.failed == []
+    assert state.entries_for_content_id("cid-f") == state.entries
+
+    duplicate = copy.deepcopy(state)
+    duplicate.entries.append(_entry("sub-7/g.nwb", content_id="cid-g"))
+    assert duplicate.entries_for_content_id("cid-g")
+    assert state.entries_for_content_id("cid-g") == []
+    assert duplicate != state
+
+
+@pytest.mark.ai_generated
+def test_update_entry_refreshes_status_and_path_indexes(state: QueueState) -> None:
+    pending_entry = state.pending[0]
+
+    state.update_entry(pending_entry, has_logs=True, has_output=True)
+    assert pending_entry not in state.pending
+    assert pending_entry in state.successful
+
+    state.update_entry(pending_entry, job=dataclasses.replace(pending_entry.job, attempt=3))
+    assert state.entry_for(dandi_path="sub-1/a.nwb", attempt=3) is pending_entry
+
+
+@pytest.mark.ai_generated
+def test_invalidate_indexes_after_in_place_edits(state: QueueState) -> None:
+    entry = state.running[0]
+    assert state.running  # builds the indexes
+
+    entry.has_output = True
+    state.invalidate_indexes()
+
+    assert entry in state.successful
+    assert entry not in state.running
@@ -0,0 +1,163 @@
+import dataclasses
+import json
+import pathlib
+import sqlite3
+from unittest import mock
+
+import pytest
+
+from dandi_compute_code.dandiset import AssetsJsonldMetadata
+from dandi_compute_code.queue import QueueState
+from dandi_compute_code.queue._queue_state_store import _COLUMNS, _QueueStateStore
+
+EXAMPLE_STATE_FILE = pathlib.Path(__file__).parents[1] / "example_state_files" / "state.jsonl"
+
+
+@pytest.fixture
+def store_file(tmp_path: pathlib.Path) -> pathlib.Path:
+    store_file = tmp_path / "state.sqlite"
+    QueueState.jsonl_to_sqlite(EXAMPLE_STATE_FILE, store_file)
+    return store_file
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize(
+    "filters",
+    [
+        pytest.param({}, id="no-filter"),
+        pytest.param({"dandiset_id": "000001"}, id="dandiset"),
+        pytest.param({"pipeline": "test", "version": "v1.0"}, id="version"),
+        pytest.param({"content_id": "asset-pending"}, id="content-id"),
+        pytest.param({"status": "pending"}, id="pending"),
+        pytest.param({"status": "running"}, id="running"),
+        pytest.param({"status": "successful"}, id="successful"),
+        pytest.param({"status": "failed"}, id="failed"),
+        pytest.param({"dandiset_id": "000001", "version": "v1.0", "status": "failed"}, id="combined"),
+        pytest.param({"predicate": lambda entry: entry.job.attempt == 1}, id="predicate"),
+    ],
+)
+def test_store_reads_match_jsonl_reads(store_file: pathlib.Path, filters: dict) -> None:
+    expected = list(QueueState.iter_jsonl(EXAMPLE_STATE_FILE, **filters))
+
+    assert list(QueueState.iter_jsonl(store_file, **filters)) == expected
+    assert QueueState.count_jsonl(store_file, **filters) == len(expected)
+    assert QueueState.from_jsonl(store_file, **filters).entries == expected
+
+
+@pytest.mark.ai_generated
+def test_store_round_trips_to_jsonl(store_file: pathlib.Path, tmp_path: pathlib.Path) -> None:
+    exported_file = tmp_path / "exported.jsonl"
+
+    count = QueueState.sqlite_to_jsonl(store_file, exported_file)
+
+    assert count == len(EXAMPLE_STATE_FILE.read_text().splitlines())
+    assert QueueState.from_jsonl(exported_file).entries == QueueState.from_jsonl(EXAMPLE_STATE_FILE).entries
+
+
+@pytest.mark.ai_generated
+def test_store_filters_use_indexes(store_file: pathlib.Path) -> None:
+    with _QueueStateStore(store_file) as store:
+        where, parameters = store._where(dandiset_id="000001", version="v1.0", status="failed")
+        plan = store._connection.execute(
+            f"EXPLAIN QUERY PLAN SELECT {', '.join(_COLUMNS)} FROM entries{where}", parameters
+        ).fetchall()
+
+    assert any("USING INDEX" in detail for *_, detail in plan)
+
+
+@pytest.mark.ai_generated
+def test_store_journal_methods_update_in_place(store_file: pathlib.Path) -> None:
+    state = QueueState.from_jsonl(store_file)
+    pending = state.pending[0]
+    successful = state.successful[0]
+    added = dataclasses.replace(pending, job=dataclasses.replace(pending.job, attempt=9))
+
+    QueueState.journal_update(store_file, pending.job, has_been_submitted=True)
+    QueueState.journal_removal(store_file, successful.job)
+    QueueState.journal_entry(store_file, added)
+
+    entries = QueueState.from_jsonl(store_file).entries
+    assert [entry.job for entry in entries] == [
+        *(entry.job for entry in state.entries if entry.job != successful.job),
+        added.job,
+    ]
+    assert QueueState.from_jsonl(store_file).entry_by_identity(pending.identity).has_been_submitted
+    assert QueueState.compact_journal(store_file) is False
+
+
+@pytest.mark.ai_generated
+def test_store_rejects_unknown_update_fields(store_file: pathlib.Path) -> None:
+    job = QueueState.from_jsonl(store_file).entries[0].job
+
+    with pytest.raises(ValueError, match="Cannot update"):
+        QueueState.journal_update(store_file, job, dandi_path="elsewhere")
+
+
+@pytest.mark.ai_generated
+def test_store_missing_file_raises(tmp_path: pathlib.Path) -> None:
+    store_file = tmp_path / "state.sqlite"
+
+    with pytest.raises(FileNotFoundError):
+        QueueState.iter_jsonl(store_file)
+    with pytest.raises(FileNotFoundError):
+        QueueState.count_jsonl(store_file)
+    with pytest.raises(FileNotFoundError):
+        QueueState.sqlite_to_jsonl(store_file, tmp_path / "state.jsonl")
+    assert not store_file.exists()
+
+
+@pytest.mark.ai_generated
+def test_store_of_another_format_version_is_kept_until_reimported(store_file: pathlib.Path) -> None:
+    with sqlite3.connect(store_file) as connection:
+        connection.execute("PRAGMA user_version = 0")
+
+    with pytest.raises(RuntimeError, match="dandicompute queue sqlite"):
+        QueueState.count_jsonl(store_file)
+    with pytest.raises(RuntimeError, match="format version 0"):
+        QueueState.journal_entry(store_file, QueueState.from_jsonl(EXAMPLE_STATE_FILE).entries[0])
+    with sqlite3.connect(store_file) as connection:
+        (row_count,) = connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+    assert row_count == len(EXAMPLE_STATE_FILE.read_text().splitlines())
+
+    QueueState.jsonl_to_sqlite(EXAMPLE_STATE_FILE, store_file)
+    assert QueueState.from_jsonl(store_file).entries == QueueState.from_jsonl(EXAMPLE_STATE_FILE).entries
+
+
+@pytest.mark.ai_generated
+def test_state_file_for_prefers_the_store(tmp_path: pathlib.Path) -> None:
+    assert QueueState.state_file_for(tmp_path) == tmp_path / "state.jsonl"
+    assert QueueState.state_file_for(tmp_path, name="archive_state") == tmp_path / "archive_state.jsonl"
+
+    QueueState.jsonl_to_sqlite(EXAMPLE_STATE_FILE, tmp_path / "state.sqlite")
+
+    assert QueueState.state_file_for(tmp_path) == tmp_path / "state.sqlite"
+    assert QueueState.has_entries(tmp_path / "state.sqlite")
+
+
+@pytest.mark.ai_generated
+def test_to_file_writes_a_store(tmp_path: pathlib.Path) -> None:
+    state = QueueState.from_jsonl(EXAMPLE_STATE_FILE)
+    store_file = tmp_path / "state.sqlite"
+
+    state.to_file(store_file)
+    QueueState(entries=state.pending).to_file(store_file)
+
+    assert QueueState.from_jsonl(store_file).entries == state.pending
+
+
+@pytest.mark.ai_generated
+def test_write_state_refreshes_an_existing_store(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "queue_config.json").write_text(
+        json.dumps({"pipelines": {"test": {"version_priority": ["v1.0"], "params_priority": ["default"]}}})
+    )
+    QueueState.jsonl_to_sqlite(EXAMPLE_STATE_FILE, tmp_path / "state.sqlite")
+
+    with mock.patch(
+        "dandi_compute_code.queue._queue_state.load_assets_jsonld_metadata",
+        return_value=AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={}),
+    ):
+        QueueState.write_state(queue_directory=tmp_path)
+        QueueState.write_archive_state(queue_directory=tmp_path)
+
+    assert QueueState.count_jsonl(tmp_path / "state.sqlite") == 0
+    assert not (tmp_path / "archive_state.sqlite").exists()
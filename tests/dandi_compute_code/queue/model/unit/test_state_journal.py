@@ -0,0 +1,138 @@
+import dataclasses
+import os
+import pathlib
+import shutil
+from unittest import mock
+
+import pytest
+
+from dandi_compute_code.queue import QueueState
+from dandi_compute_code.queue._state_journal import _state_journal_path
+
+EXAMPLE_STATE_FILE = pathlib.Path(__file__).parents[1] / "example_state_files" / "state.jsonl"
+
+
+@pytest.fixture
+def state_file(tmp_path: pathlib.Path) -> pathlib.Path:
+    state_file = tmp_path / "state.jsonl"
+    shutil.copy(EXAMPLE_STATE_FILE, state_file)
+    return state_file
+
+
+def _paths(state: QueueState) -> list[tuple[str, int]]:
+    return [(entry.job.dandi_path, entry.job.attempt) for entry in state]
+
+
+@pytest.mark.ai_generated
+def test_to_file_replaces_the_state_atomically(state_file: pathlib.Path) -> None:
+    original = state_file.read_text()
+    state = QueueState.from_jsonl(state_file)
+
+    with mock.patch("os.replace", side_effect=OSError("disk full")), pytest.raises(OSError, match="disk full"):
+        QueueState(entries=state.entries[:1]).to_file(state_file)
+
+    assert state_file.read_text() == original
+    assert sorted(path.name for path in state_file.parent.iterdir()) == [".state.jsonl.lock", "state.jsonl"]
+
+    os.chmod(state_file, 0o640)
+    QueueState(entries=state.entries[:1]).to_file(state_file)
+    assert len(QueueState.from_jsonl(state_file)) == 1
+    assert state_file.stat().st_mode & 0o777 == 0o640
+
+
+@pytest.mark.ai_generated
+def test_journaled_changes_are_merged_on_load_without_rewriting_the_state(state_file: pathlib.Path) -> None:
+    original = QueueState.from_jsonl(state_file)
+    pending, successful = original.pending[0], original.successful[0]
+    new_entry = dataclasses.replace(pending, job=dataclasses.replace(pending.job, attempt=9))
+    state_bytes = state_file.read_bytes()
+
+    QueueState.journal_update(state_file, pending.job, has_been_submitted=True, has_logs=True)
+    QueueState.journal_removal(state_file, successful.job)
+    QueueState.journal_entry(state_file, new_entry)
+
+    assert state_file.read_bytes() == state_bytes
+    merged = QueueState.from_jsonl(state_file)
+    expected_paths = [path for path in _paths(original) if path != (successful.job.dandi_path, 1)]
+    assert _paths(merged) == [*expected_paths, (pending.job.dandi_path, 9)]
+    updated = merged.entry_for(dandi_path=pending.job.dandi_path, attempt=pending.job.attempt)
+    assert updated.has_been_submitted and updated.is_running
+    # Filter pushdown must not skip a line whose journaled version matches.
+    assert updated in QueueState.from_jsonl(state_file, status="running").entries
+    assert successful.job.dandi_path not in {entry.job.dandi_path for entry in merged}
+
+    assert QueueState.compact_journal(state_file) is True
+    assert not _state_journal_path(state_file).exists()
+    assert QueueState.from_jsonl(state_file) == merged
+    assert QueueState.compact_journal(state_file) is False
+
+
+@pytest.mark.ai_generated
+def test_later_journal_operations_win(state_file: pathlib.Path) -> None:
+    entry = QueueState.from_jsonl(state_file).pending[0]
+
+    QueueState.journal_removal(state_file, entry.job)
+    QueueState.journal_entry(state_file, entry)
+    QueueState.journal_update(state_file, entry.job, has_output=True)
+
+    merged = QueueState.from_jsonl(state_file)
+    assert merged.entry_for(dandi_path=entry.job.dandi_path, attempt=entry.job.attempt).is_successful
+    assert len(merged) == len(QueueState.from_jsonl(EXAMPLE_STATE_FILE))
+
+
+@pytest.mark.ai_generated
+def test_journal_of_a_replaced_state_is_ignored(state_file: pathlib.Path) -> None:
+    entry = QueueState.from_jsonl(state_file).pending[0]
+    QueueState.journal_removal(state_file, entry.job)
+    stale_journal = _state_journal_path(state_file).read_text()
+
+    QueueState.from_jsonl(EXAMPLE_STATE_FILE).to_file(state_file)
+    assert not _state_journal_path(state_file).exists()
+
+    _state_journal_path(state_file).write_text(stale_journal)
+    assert QueueState.from_jsonl(state_file) == QueueState.from_jsonl(EXAMPLE_STATE_FILE)
+
+    QueueState.journal_update(state_file, entry.job, has_logs=True)
+    assert _state_journal_path(state_file).read_text().count("\n") == 2
+
+
+@pytest.mark.ai_generated
+def test_a_partially_appended_journal_line_is_ignored(state_file: pathlib.Path) -> None:
+    entry = QueueState.from_jsonl(state_file).pending[0]
+    QueueState.journal_update(state_file, entry.job, has_logs=True)
+    with _state_journal_path(state_file).open(mode="a") as journal_stream:
+        journal_stream.write('{"op": "delete", "identity": {"dandiset_id"')
+
+    merged = QueueState.from_jsonl(state_file)
+    assert merged.entry_for(dandi_path=entry.job.dandi_path, attempt=entry.job.attempt).has_logs
+
+
+@pytest.mark.ai_generated
+def test_journal_is_compacted_once_it_outgrows_the_state(state_file: pathlib.Path) -> None:
+    entry = QueueState.from_jsonl(state_file).pending[0]
+
+    with mock.patch("dandi_compute_code.queue._state_journal._STATE_JOURNAL_COMPACT_MIN_BYTES", 0):
+        for attempt in range(50):
+            QueueState.journal_update(state_file, entry.job, created_at=f"2026-01-01T00:00:{attempt:02d}")
+            if not _state_journal_path(state_file).exists():
+                break
+
+    assert not _state_journal_path(state_file).exists()
+    compacted = QueueState.from_jsonl(state_file)
+    assert compacted.entry_for(dandi_path=entry.job.dandi_path, attempt=entry.job.attempt).created_at.startswith(
+        "2026-01-01T00:00:"
+    )
+
+
+@pytest.mark.ai_generated
+def test_journaled_entries_extend_an_empty_state(tmp_path: pathlib.Path) -> None:
+    state_file = tmp_path / "state.jsonl"
+    state_file.write_text("\n")
+    entry = QueueState.from_jsonl(EXAMPLE_STATE_FILE).pending[0]
+
+    assert QueueState.count_jsonl(state_file) == 0
+    QueueState.journal_entry(state_file, entry)
+
+    assert QueueState.from_jsonl(state_file).entries == [entry]
+    with pytest.raises(FileNotFoundError):
+        QueueState.journal_entry(tmp_path / "missing.jsonl", entry)
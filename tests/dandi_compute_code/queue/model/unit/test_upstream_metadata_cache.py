@@ -0,0 +1,96 @@
+import threading
+import urllib.error
+from unittest import mock
+
+import pytest
+
+from dandi_compute_code.dandiset import AssetMetadata, AssetsJsonldMetadata
+from dandi_compute_code.queue import _queue_utils, _write_queue_state
+
+
+def _metadata_for(dandiset_id: str) -> AssetsJsonldMetadata:
+    path = f"sub-{dandiset_id}/file.nwb"
+    return AssetsJsonldMetadata(
+        content_id_to_asset={},
+        path_to_asset_metadata={
+            path: AssetMetadata(path=path, date_modified="2026-01-01T00:00:00Z", content_size=1, content_id=dandiset_id)
+        },
+    )
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("module", [_queue_utils, _write_queue_state], ids=["model", "procedural"])
+def test_prefetch_loads_distinct_dandisets_concurrently(module) -> None:
+    dandiset_ids = ["000001", "000002", "000003"]
+    # Every load waits until all three are in flight, so a serial prefetch would time out here.
+    barrier = threading.Barrier(len(dandiset_ids), timeout=5)
+    calls: list[str] = []
+
+    def _load(dandiset_id: str, wanted_paths: set[str] | None = None) -> AssetsJsonldMetadata:
+        calls.append(dandiset_id)
+        barrier.wait()
+        return _metadata_for(dandiset_id)
+
+    cache = module._UpstreamMetadataCache()
+    with mock.patch.object(module, "_load_upstream_assets_jsonld_metadata", side_effect=_load):
+        cache.prefetch(dict.fromkeys(dandiset_ids))
+        results = {dandiset_id: cache.get(dandiset_id) for dandiset_id in dandiset_ids}
+
+    assert sorted(calls) == dandiset_ids
+    assert results == {dandiset_id: _metadata_for(dandiset_id) for dandiset_id in dandiset_ids}
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("module", [_queue_utils, _write_queue_state], ids=["model", "procedural"])
+def test_prefetch_failure_only_empties_the_failing_dandiset(module) -> None:
+    def _load(dandiset_id: str, wanted_paths: set[str] | None = None) -> AssetsJsonldMetadata:
+        if dandiset_id == "000002":
+            raise urllib.error.URLError("offline")
+        return _metadata_for(dandiset_id)
+
+    cache = module._UpstreamMetadataCache()
+    with mock.patch.object(module, "_load_upstream_assets_jsonld_metadata", side_effect=_load) as load:
+        cache.prefetch({"000001": None, "000002": None}, max_workers=1)
+        failing = cache.get("000002")
+        working = cache.get("000001")
+
+    assert load.call_count == 2
+    assert failing.path_to_asset_metadata == {}
+    assert working == _metadata_for("000001")
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize("module", [_queue_utils, _write_queue_state], ids=["model", "procedural"])
+def test_finalize_prefetches_only_the_referenced_paths(module) -> None:
+    job_infos = [
+        module.JobInfo(
+            dandiset_id=dandiset_id,
+            dandi_path=dandi_path,
+            pipeline="aind-ephys-pipeline",
+            version="v1.0.0",
+            params="abc1234",
+            config="def5678",
+            attempt=1,
+            codebase="0123456",
+        )
+        for dandiset_id, dandi_path in [
+            ("000001", "sub-1/a.nwb"),
+            ("000001", "sub-1/b.nwb"),
+            ("000002", "sub-2/c.nwb"),
+        ]
+    ]
+    collection = module._AttemptCollection(
+        records_by_attempt={job_info: module._new_attempt_record(job_info) for job_info in job_infos},
+        log_timestamps_by_attempt={},
+        submit_sh_timestamps_by_attempt={},
+    )
+    loads: dict[str, set[str] | None] = {}
+
+    def _load(dandiset_id: str, wanted_paths: set[str] | None = None) -> AssetsJsonldMetadata:
+        loads[dandiset_id] = wanted_paths
+        return AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={})
+
+    with mock.patch.object(module, "_load_upstream_assets_jsonld_metadata", side_effect=_load):
+        module._finalize_attempt_records(collection=collection, upstream_cache=module._UpstreamMetadataCache())
+
+    assert loads == {"000001": {"sub-1/a.nwb", "sub-1/b.nwb"}, "000002": {"sub-2/c.nwb"}}
@@ -6,7 +6,7 @@ import pytest
 from click.testing import CliRunner
 
 from dandi_compute_code._cli import _dandicompute_group
-from dandi_compute_code.queue import TEST_QUEUE_CONTENT_ID
+from dandi_compute_code.queue import TEST_QUEUE_CONTENT_ID, QueueState
 
 # These tests exercise CLI argument wiring. Each command first attempts the new
 # OOP ``QueueState`` model (see ``_oop_failsafe``); the model methods are mocked
@@ -138,7 +138,7 @@ def test_cli_queue_clean_calls_helper(tmp_path: pathlib.Path) -> None:
         )
 
     assert result.exit_code == 0, result.output
-    mock_from_jsonl.assert_called_once_with(queue_dir / "state.jsonl")
+    mock_from_jsonl.assert_called_once_with(queue_dir / "state.jsonl", status="pending")
     mock_state.clean_unsubmitted_capsules.assert_called_once_with(dandiset_directory=dandiset_dir)
     mock_clean.assert_not_called()
     assert "Cleaned 1 unsubmitted capsule" in result.output
@@ -499,3 +499,110 @@ def test_cli_queue_process_passes_zero_jitter(tmp_path: pathlib.Path) -> None:
         jitter_seconds=0.0,
         test=False,
     )
+
+
+@pytest.mark.ai_generated
+def test_cli_queue_process_replenishes_after_submitting(tmp_path: pathlib.Path) -> None:
+    """With watermarks, queue process submits first and then calls QueueState.replenish."""
+    queue_dir = _make_queue_dir(tmp_path)
+    processing_dir = tmp_path / "processing"
+    processing_dir.mkdir()
+    calls = mock.MagicMock()
+    runner = CliRunner()
+
+    with (
+        mock.patch(f"{_GROUP}.QueueState.process_queue", calls.process_queue),
+        mock.patch(f"{_GROUP}.QueueState.replenish", calls.replenish),
+    ):
+        calls.process_queue.return_value = "submitted"
+        calls.replenish.return_value = 3
+        result = runner.invoke(
+            _dandicompute_group,
+            [
+                "queue",
+                "process",
+                "--queue",
+                str(queue_dir),
+                "--processing",
+                str(processing_dir),
+                "--low-watermark",
+                "5",
+                "--high-watermark",
+                "20",
+            ],
+            env={"DANDI_API_KEY": "test-key", "DANDI_DEVEL": "1"},
+        )
+
+    assert result.exit_code == 0, result.output
+    assert [name for name, _, _ in calls.mock_calls] == ["process_queue", "replenish"]
+    calls.replenish.assert_called_once_with(
+        queue_directory=queue_dir,
+        low_watermark=5,
+        high_watermark=20,
+        pipeline_directory=None,
+        config_key="default",
+    )
+    assert "Prepared 3 new capsules" in result.output
+
+
+@pytest.mark.ai_generated
+def test_cli_queue_process_requires_both_watermarks(tmp_path: pathlib.Path) -> None:
+    """A single watermark is rejected before anything is submitted."""
+    queue_dir = _make_queue_dir(tmp_path)
+    processing_dir = tmp_path / "processing"
+    processing_dir.mkdir()
+    runner = CliRunner()
+
+    with mock.patch(f"{_GROUP}.QueueState.process_queue") as mock_process:
+        result = runner.invoke(
+            _dandicompute_group,
+            [
+                "queue",
+                "process",
+                "--queue",
+                str(queue_dir),
+                "--processing",
+                str(processing_dir),
+                "--low-watermark",
+                "5",
+            ],
+            env={"DANDI_API_KEY": "test-key", "DANDI_DEVEL": "1"},
+        )
+
+    assert result.exit_code != 0
+    assert "must be given together" in result.output
+    mock_process.assert_not_called()
+
+
+@pytest.mark.ai_generated
+def test_cli_queue_sqlite_imports_and_exports_state(tmp_path: pathlib.Path) -> None:
+    """dandicompute queue sqlite converts state.jsonl into state.sqlite and --export converts it back."""
+    queue_dir = _make_queue_dir(tmp_path)
+    example_state_file = pathlib.Path(__file__).parent / "example_state_files" / "state.jsonl"
+    (queue_dir / "state.jsonl").write_text(example_state_file.read_text())
+    runner = CliRunner()
+
+    result = runner.invoke(_dandicompute_group, ["queue", "sqlite", "--queue", str(queue_dir)])
+
+    assert result.exit_code == 0
+    assert "state.sqlite" in result.output
+    assert not (queue_dir / "archive_state.sqlite").exists()
+    assert QueueState.state_file_for(queue_dir) == queue_dir / "state.sqlite"
+
+    (queue_dir / "state.jsonl").unlink()
+    result = runner.invoke(_dandicompute_group, ["queue", "sqlite", "--queue", str(queue_dir), "--export"])
+
+    assert result.exit_code == 0
+    assert QueueState.from_jsonl(queue_dir / "state.jsonl").entries == QueueState.from_jsonl(example_state_file).entries
+
+
+@pytest.mark.ai_generated
+def test_cli_queue_sqlite_requires_a_state_file(tmp_path: pathlib.Path) -> None:
+    """dandicompute queue sqlite fails when there is nothing to convert."""
+    queue_dir = _make_queue_dir(tmp_path)
+    runner = CliRunner()
+
+    result = runner.invoke(_dandicompute_group, ["queue", "sqlite", "--queue", str(queue_dir)])
+
+    assert result.exit_code != 0
+    assert "No state file found" in result.output
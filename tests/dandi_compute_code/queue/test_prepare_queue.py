@@ -1,15 +1,20 @@
 import gzip
 import json
+import logging
 import pathlib
+import time
 from unittest import mock
 
 import pytest
 from testing_utilities import copy_state_file
 
-from dandi_compute_code.queue import prepare_queue
+from dandi_compute_code.queue import prepare_queue, replenish_queue
+from dandi_compute_code.queue._iter_state_entries import _iter_state_entries
+from dandi_compute_code.queue._resolve_config_key_to_id import _resolve_config_key_to_id
+from dandi_compute_code.queue._resolve_params_key_to_id import _resolve_params_key_to_id
 
 # prepare_queue reaches two external boundaries that cannot run in CI: the
-# qualifying-content-ids download (urllib) and the per-asset job preparation
+# qualifying-content-ids download (HTTP client) and the per-asset job preparation
 # (prepare_aind_ephys_job). Both are mocked here; everything else runs for real.
 
 
@@ -45,7 +50,7 @@ def test_prepare_queue_calls_prepare_for_each_qualifying_asset(queue_directory:
     qualifying_ids = ["asset-bbb", "asset-ccc"]
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch(
             "dandi_compute_code.queue._order_content_ids_for_uniform_dandiset_sampling._load_content_id_to_usage_dandiset_path",
             return_value={},
@@ -69,7 +74,7 @@ def test_prepare_queue_skips_when_failures_reach_max(queue_directory: pathlib.Pa
     qualifying_ids = ["asset-aaa", "asset-bbb"]
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch(
             "dandi_compute_code.queue._order_content_ids_for_uniform_dandiset_sampling._load_content_id_to_usage_dandiset_path",
             return_value={},
@@ -92,7 +97,7 @@ def test_prepare_queue_passes_optional_args_through(queue_directory: pathlib.Pat
     qualifying_ids = ["asset-bbb"]
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch(
             "dandi_compute_code.queue._order_content_ids_for_uniform_dandiset_sampling._load_content_id_to_usage_dandiset_path",
             return_value={},
@@ -118,7 +123,7 @@ def test_prepare_queue_limit_stops_after_n_assets(queue_directory: pathlib.Path)
     qualifying_ids = ["asset-aaa", "asset-bbb", "asset-ccc"]
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch(
             "dandi_compute_code.queue._order_content_ids_for_uniform_dandiset_sampling._load_content_id_to_usage_dandiset_path",
             return_value={},
@@ -142,7 +147,7 @@ def test_prepare_queue_limit_samples_uniformly_over_dandisets(queue_directory: p
     }
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch(
             "dandi_compute_code.queue._order_content_ids_for_uniform_dandiset_sampling._load_content_id_to_usage_dandiset_path",
             return_value=content_id_mapping,
@@ -173,7 +178,7 @@ def test_prepare_queue_uses_explicit_content_ids_when_provided(queue_directory:
     explicit_ids = ["explicit-asset-001"]
 
     with (
-        mock.patch("urllib.request.urlopen") as mock_urlopen,
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
         mock.patch("dandi_compute_code.queue._prepare_queue.prepare_aind_ephys_job") as mock_prepare,
     ):
         prepare_queue(queue_directory=queue_directory, content_ids=explicit_ids)
@@ -181,3 +186,275 @@ def test_prepare_queue_uses_explicit_content_ids_when_provided(queue_directory:
     mock_urlopen.assert_not_called()
     assert mock_prepare.call_count == 1
     assert mock_prepare.call_args.kwargs["content_id"] == "explicit-asset-001"
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_batches_explicit_content_ids(queue_directory: pathlib.Path) -> None:
+    """With a batch size, prepare_queue hands content IDs to prepare_aind_ephys_jobs in batches."""
+    explicit_ids = ["asset-aaa", "asset-bbb", "asset-ccc"]
+
+    with (
+        mock.patch("dandi_compute_code.queue._prepare_queue.prepare_aind_ephys_job") as mock_prepare,
+        mock.patch(
+            "dandi_compute_code.queue._prepare_queue.prepare_aind_ephys_jobs",
+            side_effect=lambda *, jobs, **kwargs: dict.fromkeys(jobs, pathlib.Path("submit.sh")),
+        ) as mock_prepare_jobs,
+    ):
+        prepare_queue(queue_directory=queue_directory, content_ids=explicit_ids, batch_size=2)
+
+    mock_prepare.assert_not_called()
+    batches = [[job.content_id for job in call.kwargs["jobs"]] for call in mock_prepare_jobs.call_args_list]
+    assert batches == [["asset-aaa", "asset-bbb"], ["asset-ccc"]]
+    assert mock_prepare_jobs.call_args.kwargs["config_key"] == "default"
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_workers_prepare_each_content_id_once(queue_directory: pathlib.Path) -> None:
+    """With several workers, prepare_queue still prepares every explicit content ID exactly once."""
+    explicit_ids = [f"asset-{index:03d}" for index in range(10)]
+
+    with mock.patch("dandi_compute_code.queue._prepare_queue.prepare_aind_ephys_job") as mock_prepare:
+        prepare_queue(queue_directory=queue_directory, content_ids=explicit_ids, limit=7, workers=4)
+
+    prepared = [call.kwargs["content_id"] for call in mock_prepare.call_args_list]
+    assert sorted(prepared) == explicit_ids[:7]
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_enforces_asset_overrides_and_attempt_cap(tmp_path: pathlib.Path) -> None:
+    """prepare_queue skips capped and overridden assets and prepares pinned ones with their params."""
+    queue_dir = tmp_path / "queue"
+    queue_dir.mkdir()
+    queue_config = {
+        "pipelines": {
+            "test": {
+                "version_priority": ["v1.0"],
+                "params_priority": ["default"],
+                "max_attempts_per_asset": 1,
+                "asset_overrides": {"asset-skip": None, "asset-pinned": "special"},
+            }
+        }
+    }
+    (queue_dir / "queue_config.json").write_text(json.dumps(queue_config))
+    (queue_dir / "state.jsonl").write_text(
+        json.dumps({"content_id": "asset-capped", "pipeline": "test", "version": "v1.0", "has_code": True}) + "\n"
+    )
+
+    with mock.patch("dandi_compute_code.queue._prepare_queue.prepare_aind_ephys_job") as mock_prepare:
+        prepare_queue(
+            queue_directory=queue_dir, content_ids=["asset-capped", "asset-skip", "asset-pinned", "asset-new"]
+        )
+
+    prepared = [(call.kwargs["content_id"], call.kwargs["parameters_key"]) for call in mock_prepare.call_args_list]
+    assert prepared == [("asset-new", "default"), ("asset-pinned", "special")]
+
+
+def _prepared_script_path(
+    root: pathlib.Path, *, content_id: str, pipeline_version: str, parameters_key: str
+) -> pathlib.Path:
+    """Where prepare_aind_ephys_job leaves the submission script of a new capsule for *content_id*."""
+    return (
+        root
+        / "001697"
+        / "derivatives"
+        / "dandiset-000001"
+        / f"sub-{content_id}"
+        / "pipeline-test"
+        / f"version-{pipeline_version}_codebase-v0.3.0_params-{parameters_key}_config-default_attempt-1"
+        / "code"
+        / "submit.sh"
+    )
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize(
+    "options",
+    [
+        pytest.param({}, id="serial"),
+        pytest.param({"workers": 2}, id="workers"),
+        pytest.param({"batch_size": 2}, id="batch-size"),
+    ],
+)
+def test_prepare_queue_counts_attempts_prepared_in_the_same_run(tmp_path: pathlib.Path, options: dict) -> None:
+    """Attempts prepared or in flight for one version count towards max_attempts_per_asset for the next."""
+    queue_dir = tmp_path / "queue"
+    queue_dir.mkdir()
+    queue_config = {
+        "pipelines": {
+            "test": {"version_priority": ["v2.0", "v1.0"], "params_priority": ["default"], "max_attempts_per_asset": 1}
+        }
+    }
+    (queue_dir / "queue_config.json").write_text(json.dumps(queue_config))
+
+    with (
+        # Slow enough that the next version is considered while the first attempt is still in flight.
+        mock.patch(
+            "dandi_compute_code.queue._prepare_queue.prepare_aind_ephys_job",
+            side_effect=lambda **kwargs: time.sleep(0.2),
+        ) as mock_prepare,
+        mock.patch(
+            "dandi_compute_code.queue._prepare_queue.prepare_aind_ephys_jobs",
+            side_effect=lambda *, jobs, **kwargs: dict.fromkeys(jobs, pathlib.Path("submit.sh")),
+        ) as mock_prepare_jobs,
+    ):
+        prepared = prepare_queue(queue_directory=queue_dir, content_ids=["asset-a"], **options)
+
+    jobs = [job for call in mock_prepare_jobs.call_args_list for job in call.kwargs["jobs"]]
+    assert prepared == 1
+    assert mock_prepare.call_count + len(jobs) == 1
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_skips_combinations_prepared_earlier_in_the_same_run(tmp_path: pathlib.Path) -> None:
+    """A content ID listed twice is prepared once, and the capsule is journaled into the state as pending."""
+    queue_dir = tmp_path / "queue"
+    queue_dir.mkdir()
+    queue_config = {"pipelines": {"test": {"version_priority": ["v1.0"], "params_priority": ["default"]}}}
+    (queue_dir / "queue_config.json").write_text(json.dumps(queue_config))
+
+    def prepare(*, content_id: str, pipeline_version: str, parameters_key: str, **kwargs: object) -> pathlib.Path:
+        return _prepared_script_path(
+            tmp_path, content_id=content_id, pipeline_version=pipeline_version, parameters_key=parameters_key
+        )
+
+    with mock.patch(
+        "dandi_compute_code.queue._prepare_queue.prepare_aind_ephys_job", side_effect=prepare
+    ) as mock_prepare:
+        prepared = prepare_queue(queue_directory=queue_dir, content_ids=["asset-a", "asset-a"])
+
+    assert prepared == 1
+    assert mock_prepare.call_count == 1
+    state_entries = list(_iter_state_entries(queue_dir / "state.jsonl"))
+    assert [(entry["content_id"], entry["has_code"]) for entry in state_entries] == [("asset-a", True)]
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_skips_assets_that_cannot_be_prepared_one_by_one(tmp_path: pathlib.Path) -> None:
+    """As in a batch, any ValueError skips the asset, gives its attempt back and moves on to the next one."""
+    queue_dir = tmp_path / "queue"
+    queue_dir.mkdir()
+    queue_config = {
+        "pipelines": {
+            "test": {"version_priority": ["v2.0", "v1.0"], "params_priority": ["default"], "max_attempts_per_asset": 1}
+        }
+    }
+    (queue_dir / "queue_config.json").write_text(json.dumps(queue_config))
+
+    def prepare(*, content_id: str, pipeline_version: str, parameters_key: str, **kwargs: object) -> pathlib.Path:
+        if pipeline_version == "v2.0":
+            raise ValueError("All 99 attempts are already taken")
+        return _prepared_script_path(
+            tmp_path, content_id=content_id, pipeline_version=pipeline_version, parameters_key=parameters_key
+        )
+
+    with mock.patch(
+        "dandi_compute_code.queue._prepare_queue.prepare_aind_ephys_job", side_effect=prepare
+    ) as mock_prepare:
+        prepared = prepare_queue(queue_directory=queue_dir, content_ids=["asset-a", "asset-b"])
+
+    attempted = [(call.kwargs["content_id"], call.kwargs["pipeline_version"]) for call in mock_prepare.call_args_list]
+    assert attempted == [("asset-a", "v2.0"), ("asset-b", "v2.0"), ("asset-a", "v1.0"), ("asset-b", "v1.0")]
+    assert prepared == 2
+
+
+@pytest.mark.ai_generated
+def test_prepare_queue_skips_combinations_with_pending_or_successful_capsules(
+    tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Only content IDs without a pending or successful capsule for the exact combination are prepared."""
+    queue_dir = tmp_path / "queue"
+    queue_dir.mkdir()
+    queue_config = {"pipelines": {"aind+ephys": {"version_priority": ["v1.0.0-fixes"], "params_priority": ["default"]}}}
+    (queue_dir / "queue_config.json").write_text(json.dumps(queue_config))
+    params_id = _resolve_params_key_to_id("aind+ephys", "default")
+    config_id = _resolve_config_key_to_id("aind+ephys", "default")
+
+    def entry(*, content_id: str, params: str, has_logs: bool, has_output: bool) -> str:
+        return json.dumps(
+            {
+                "content_id": content_id,
+                "pipeline": "aind+ephys",
+                "version": "v1.0.0+fixes",
+                "params": params,
+                "config": config_id,
+                "has_code": True,
+                "has_logs": has_logs,
+                "has_output": has_output,
+            }
+        )
+
+    (queue_dir / "state.jsonl").write_text(
+        "\n".join(
+            [
+                entry(content_id="asset-pending", params=params_id, has_logs=False, has_output=False),
+                entry(content_id="asset-done", params=params_id, has_logs=True, has_output=True),
+                entry(content_id="asset-failed", params=params_id, has_logs=True, has_output=False),
+                entry(content_id="asset-other", params="0000000", has_logs=True, has_output=True),
+            ]
+        )
+        + "\n"
+    )
+    content_ids = ["asset-pending", "asset-done", "asset-failed", "asset-other", "asset-new"]
+
+    with (
+        mock.patch("dandi_compute_code.queue._prepare_queue.prepare_aind_ephys_job") as mock_prepare,
+        caplog.at_level(logging.INFO, logger="dandi_compute_code.queue._prepare_candidates"),
+    ):
+        prepare_queue(queue_directory=queue_dir, content_ids=content_ids)
+
+    prepared_ids = [call.kwargs["content_id"] for call in mock_prepare.call_args_list]
+    assert prepared_ids == ["asset-failed", "asset-other", "asset-new"]
+    assert "Skipped 2 content IDs" in caplog.text
+
+
+@pytest.mark.ai_generated
+def test_replenish_queue_prepares_up_to_the_high_watermark(queue_directory: pathlib.Path) -> None:
+    """replenish_queue limits prepare_queue to the gap between pending capsules and the high watermark."""
+    with (
+        mock.patch(
+            "dandi_compute_code.queue._replenish_queue._find_pending_entries",
+            return_value=[
+                f"derivatives/dandiset-000001/sub-{name}/pipeline-test/"
+                "version-v1.0_codebase-v0.3.0_params-default_config-default_attempt-1/code"
+                for name in ("a", "b")
+            ],
+        ),
+        mock.patch("dandi_compute_code.queue._replenish_queue.prepare_queue", return_value=3) as mock_prepare,
+    ):
+        assert replenish_queue(queue_directory=queue_directory, low_watermark=3, high_watermark=5) == 3
+        assert replenish_queue(queue_directory=queue_directory, low_watermark=2, high_watermark=5) == 0
+
+    mock_prepare.assert_called_once()
+    assert mock_prepare.call_args.kwargs["limit"] == 3
+
+
+@pytest.mark.ai_generated
+def test_replenish_twice_without_a_refresh_counts_the_capsules_it_prepared(
+    queue_directory: pathlib.Path, tmp_path: pathlib.Path
+) -> None:
+    """Capsules prepared by the first run count as pending in the second, before assets.jsonld lists them."""
+    qualifying_ids = ["asset-x", "asset-y", "asset-z"]
+
+    def prepare_job(*, content_id: str, pipeline_version: str, parameters_key: str, **kwargs) -> pathlib.Path:
+        return _prepared_script_path(
+            tmp_path, content_id=content_id, pipeline_version=pipeline_version, parameters_key=parameters_key
+        )
+
+    with (
+        mock.patch("dandi_compute_code.dandiset._http_client._HttpClient.open") as mock_urlopen,
+        mock.patch(
+            "dandi_compute_code.queue._order_content_ids_for_uniform_dandiset_sampling._load_content_id_to_usage_dandiset_path",
+            return_value={},
+        ),
+        mock.patch("dandi_compute_code.queue._replenish_queue._find_pending_entries", return_value=[]),
+        mock.patch(
+            "dandi_compute_code.queue._prepare_queue.prepare_aind_ephys_job", side_effect=prepare_job
+        ) as mock_prepare,
+    ):
+        mock_urlopen.side_effect = lambda *args, **kwargs: _mock_urlopen_response(qualifying_ids)
+        assert replenish_queue(queue_directory=queue_directory, low_watermark=1, high_watermark=2) == 2
+        assert replenish_queue(queue_directory=queue_directory, low_watermark=2, high_watermark=2) == 0
+        assert replenish_queue(queue_directory=queue_directory, low_watermark=3, high_watermark=3) == 1
+
+    prepared_ids = [call.kwargs["content_id"] for call in mock_prepare.call_args_list]
+    assert sorted(prepared_ids) == qualifying_ids
@@ -1,3 +1,5 @@
+import dataclasses
+import json
 import logging
 import pathlib
 import re
@@ -6,7 +8,9 @@ from unittest import mock
 import pytest
 
 from dandi_compute_code.dandiset import AssetMetadata, AssetsJsonldMetadata
+from dandi_compute_code.queue._read_state_entries import _read_state_entries
 from dandi_compute_code.queue._submit_next import _submit_next
+from dandi_compute_code.queue._write_queue_state import _parse_attempt_identity
 
 # _submit_next reaches three external boundaries that cannot run in CI: the
 # assets.jsonld metadata loader (network), the dandi/sbatch subprocess calls, and
@@ -432,3 +436,31 @@ def test_submit_next_skips_candidates_with_submitted_in_metadata(tmp_path: pathl
     assert mock_run.call_count == 3
     download_url = mock_run.call_args_list[0].args[0][-1]
     assert second_path in download_url
+
+
+@pytest.mark.ai_generated
+def test_submit_next_journals_the_submission_in_the_state_file(tmp_path: pathlib.Path) -> None:
+    """With a state file, each submitted entry is marked has_been_submitted without rewriting the state."""
+    processing_dir = tmp_path / "processing"
+    processing_dir.mkdir()
+    code_dir_path = (
+        "derivatives/dandiset-000001/sub-mouse01/sub-mouse01_ecephys/pipeline-aind+ephys"
+        "/version-v1.0_codebase-v0.3.0_params-default_config-abc1234_attempt-1/code"
+    )
+    job, _ = _parse_attempt_identity(f"{code_dir_path}/submit.sh")
+    state_file = tmp_path / "state.jsonl"
+    record = {**dataclasses.asdict(job), "content_id": "asset-a", "has_code": True, "has_been_submitted": False}
+    state_file.write_text(json.dumps(record) + "\n")
+
+    with (
+        mock.patch(
+            "dandi_compute_code.queue._find_pending_entries.load_assets_jsonld_metadata",
+            return_value=_make_metadata_with_submit_sh(code_dir_path),
+        ),
+        mock.patch("dandi_compute_code.queue._submit_next.subprocess.run") as mock_run,
+    ):
+        mock_run.side_effect = lambda cmd, **kw: _download_side_effect(cmd, **kw)
+        _submit_next(processing_directory=processing_dir, state_file=state_file)
+
+    assert json.loads(state_file.read_text()) == record
+    assert _read_state_entries(state_file) == [{**record, "has_been_submitted": True}]
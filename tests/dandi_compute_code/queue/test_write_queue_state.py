@@ -1,11 +1,23 @@
+import datetime
 import json
 import pathlib
+from collections.abc import Callable
 from unittest import mock
 
 import pytest
 
 from dandi_compute_code.dandiset import AssetMetadata, AssetsJsonldMetadata
-from dandi_compute_code.queue import QueueState, write_queue_state
+from dandi_compute_code.queue import (
+    QueueState,
+    aggregate_queue_statistics,
+    prepare_queue,
+    process_queue,
+    replenish_queue,
+    write_queue_state,
+)
+from dandi_compute_code.queue._iter_state_entries import _iter_state_entries
+from dandi_compute_code.queue._state_journal import _append_to_state_journal, _put_operation
+from dandi_compute_code.queue._write_queue_state import _new_attempt_record, _parse_attempt_identity
 
 # write_queue_state derives state.jsonl from DANDI assets.jsonld metadata fetched over
 # the network. The conftest _no_real_dandi_fetch guard defaults that loader to empty;
@@ -1021,3 +1033,86 @@ def test_queue_state_null_dataset_description_path(
 
     assert len(queue_state) == 1
     assert queue_state.entries[0].dataset_description_path == {}
+
+
+@pytest.mark.ai_generated
+def test_write_queue_state_rewrites_a_sqlite_store_next_to_the_state(tmp_path: pathlib.Path) -> None:
+    """A store converted from an older state is refreshed together with state.jsonl."""
+    queue_dir = _make_queue_dir(tmp_path)
+    (queue_dir / "state.jsonl").write_text("")
+    QueueState.jsonl_to_sqlite(queue_dir / "state.jsonl", queue_dir / "state.sqlite")
+    submit_path = (
+        "derivatives/dandiset-001697/sub-01/sub-01_ecephys/pipeline-test/"
+        "version-v1.0_codebase-v0.3.0_params-default_config-0000001_attempt-1/code/submit.sh"
+    )
+    metadata = AssetsJsonldMetadata(
+        content_id_to_asset={},
+        path_to_asset_metadata={
+            submit_path: AssetMetadata(
+                path=submit_path, date_modified="2024-01-01T00:00:00+00:00", content_size=1, content_id="attempt-1"
+            )
+        },
+    )
+    with mock.patch("dandi_compute_code.queue._write_queue_state.load_assets_jsonld_metadata", return_value=metadata):
+        write_queue_state(queue_directory=queue_dir)
+
+    stored = QueueState.from_jsonl(queue_dir / "state.sqlite")
+    assert [entry.to_dict() for entry in stored] == _read_jsonl(queue_dir / "state.jsonl")
+    assert len(stored) == 1
+
+
+@pytest.mark.ai_generated
+@pytest.mark.parametrize(
+    "fallback",
+    [
+        pytest.param(
+            lambda queue_dir: process_queue(queue_directory=queue_dir, processing_directory=queue_dir), id="process"
+        ),
+        pytest.param(lambda queue_dir: prepare_queue(queue_directory=queue_dir, content_ids=[]), id="prepare"),
+        pytest.param(
+            lambda queue_dir: replenish_queue(queue_directory=queue_dir, low_watermark=1, high_watermark=1),
+            id="replenish",
+        ),
+        pytest.param(
+            lambda queue_dir: aggregate_queue_statistics(queue_directory=queue_dir, dandiset_directory=queue_dir),
+            id="statistics",
+        ),
+    ],
+)
+def test_queue_functions_refuse_to_bypass_a_sqlite_store(tmp_path: pathlib.Path, fallback: Callable) -> None:
+    """Only QueueState keeps state.sqlite in sync, so the queue functions do not update state.jsonl behind it."""
+    queue_dir = _make_queue_dir(tmp_path)
+    (queue_dir / "state.jsonl").write_text("")
+    QueueState.jsonl_to_sqlite(queue_dir / "state.jsonl", queue_dir / "state.sqlite")
+
+    with (
+        mock.patch("dandi_compute_code.queue._replenish_queue._find_pending_entries", return_value=[]),
+        pytest.raises(RuntimeError, match="kept in sync by QueueState only"),
+    ):
+        fallback(queue_dir)
+
+
+@pytest.mark.ai_generated
+def test_write_queue_state_keeps_recently_prepared_capsules_until_assets_jsonld_lists_them(
+    tmp_path: pathlib.Path,
+) -> None:
+    """A refresh before assets.jsonld catches up keeps fresh journaled capsules, but not ones past the grace period."""
+    queue_dir = _make_queue_dir(tmp_path)
+    state_file = queue_dir / "state.jsonl"
+    state_file.write_text("")
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for subject, created_at in (("fresh", now), ("stale", now - datetime.timedelta(days=2))):
+        job = _parse_attempt_identity(
+            f"derivatives/dandiset-001697/sub-{subject}/sub-{subject}_ecephys/pipeline-test/"
+            "version-v1.0_codebase-v0.3.0_params-default_config-0000001_attempt-1/code/submit.sh"
+        )[0]
+        record = {**_new_attempt_record(job), "has_code": True, "created_at": created_at.isoformat()}
+        _append_to_state_journal(state_file, [_put_operation(record)])
+
+    with mock.patch(
+        "dandi_compute_code.queue._write_queue_state.load_assets_jsonld_metadata",
+        return_value=AssetsJsonldMetadata(content_id_to_asset={}, path_to_asset_metadata={}),
+    ):
+        write_queue_state(queue_directory=queue_dir)
+
+    assert [entry["dandi_path"] for entry in _iter_state_entries(state_file)] == ["sub-fresh/sub-fresh_ecephys.nwb"]